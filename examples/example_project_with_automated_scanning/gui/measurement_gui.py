@@ -42,9 +42,8 @@ class MyMeasurementGuiWithPlotting(AutoMeasurementGui):
 
         self.timer_interval_ms = 50
 
-        # Make sure the plotting update flags exist:
-        self.experiment.flag_new_spectral_data = False
-        self.experiment.flag_new_camera_image = False
+        # Versions of the live data that are currently plotted (see update_plots):
+        self.plotted_versions = {}
 
         self.timer_update_plotting = QTimer()
         self.timer_update_plotting.timeout.connect(self.update_plots)
@@ -85,57 +84,24 @@ class MyMeasurementGuiWithPlotting(AutoMeasurementGui):
             self.timer_update_plotting.stop()
             return
 
-        # There are multiple ways of getting the plotting data from your experiment/measurement to the plots.
-        # One more direct way is to simply make a variable in you experiment class that holds the (latest) data and
-        # create a boolean flag to indicate that new data is ready. Here you check if the flag is true, send the data to
-        # the plotwindows and reset the flag.
-        if self.experiment.flag_new_spectral_data:
-            self.spec_curve.setData(self.experiment.fake_counts)
-            self.experiment.flag_new_spectral_data = False
-
-        # What is implemented below is basically the same except it doesn't use manually created data variables and flags
-        # but grabs data directly from the datamanager in the experiment class. This is a bit less transparent but
-        # doesn't require extra copies of the data in memory.
-        # ONE DOWNSIDE IS THAT WHEN SAVING IS DISABLED, THE DATA IS NOT STORED IN THE DATAMANGER AND THEREFORE INACCESIBLE FOR PLOTTING
-        # THE OTHER APPROACH IS MORE PRACTICAL
-
-        # if self.experiment.datman.new_data_flags['Image_Before']:
-        #     # grab the data:
-        #     data = self.experiment.datman.root.variables['Image_Before'][:]  # Grab the whole array because it's filled all at once
-        #     self.output_guis['Image'].setImage(data.transpose(), xvals=np.linspace(1., 3., data.shape[0]))
-        #     # self.output_guis['Image'].show()
-        #     # Clear the flag
-        #     self.experiment.datman.new_data_flags['Image_Before'] = False
-
-        # Changed it to the other approach:
-
-        if self.experiment.flag_new_camera_image:
-            self.output_guis['Image'].setImage(self.experiment.camera_image.transpose(), xvals=np.linspace(1., 3., self.experiment.camera_image.shape[0]))
-            self.experiment.flag_new_camera_image = False
-
-
-
-        # if self.experiment.datman.new_data_flags['Spectrum']:
-        #     # grab the data:
-        #
-        #     # Because part of this array is created before it's filled with data, grab the current indices
-        #     indices = self.experiment.datman.new_data_indices['Spectrum']
-        #     ind0 = indices[0]
-        #     # Due to the way the nesing indices are passed by the automated scanner, instead of indices being [X,0],
-        #     # it will be [X]. In that case manually set index1 to 0.
-        #     # (These nesting indices are deeply integrated in the automated scanning in BaseExperiment and it's not
-        #     #  possible to change this behavior. The user needs to fix it at this level
-        #     if len(indices) == 1:
-        #         ind1 = 0
-        #     else:
-        #         ind1 = indices[1]
-        #
-        #     data = self.experiment.datman.root.variables['Spectrum'][ind0, ind1, :]
-        #
-        #     # data = self.experiment.datman.root.variables['Spectrum'][tuple(indices)]
-        #
-        #     # data = np.random.random(100)
-        #     self.spec_curve.setData(data)
-        #     # Clear the flag
-        #     self.experiment.datman.new_data_flags['Spectrum'] = False
-        #     # self.output_guis['Spectrum'].show()
\ No newline at end of file
+        # The DataManager keeps the data of every datman.var() call in memory, also when saving is disabled.
+        # datman.live_var() returns a LiveVariable (or None if there's no data yet). Its version is incremented on every
+        # update, so it's cheap to check if there's new data. Its latest datapoint and its view() of all data are numpy
+        # views, so no data is copied or read from file.
+        image = self.new_live_data('Image Before')
+        if image is not None:
+            data = image.latest
+            self.output_guis['Image'].setImage(data.transpose(), xvals=np.linspace(1., 3., data.shape[0]))
+
+        spectrum = self.new_live_data('Spectrum')
+        if spectrum is not None:
+            # spectrum.view() would hold all spectra measured so far (shape: sample_x, sample_y, wav)
+            self.spec_curve.setData(spectrum.latest)
+
+    def new_live_data(self, name):
+        """ Returns the LiveVariable of name if it has been updated since it was last plotted, otherwise None. """
+        live = self.experiment.datman.live_var(name)
+        if live is None or self.plotted_versions.get(name) == live.version:
+            return None
+        self.plotted_versions[name] = live.version
+        return live
@@ -88,8 +88,7 @@ class MyExperiment(BaseExperiment):
         self.logger.info('Set camera exposure')
         # self.instruments_instances['Camera'].set_exposure(actiondict['exposure'])
         self.logger.info('Acquire image')
-        self.camera_image = self.instruments_instances['Camera'].return_fake_2D_data()
-        self.flag_new_camera_image = True
+        camera_image = self.instruments_instances['Camera'].return_fake_2D_data()
 
         self.logger.info('LED off')
         # self.instruments_instances['LED'].enable = False
@@ -98,9 +97,10 @@ class MyExperiment(BaseExperiment):
         # self.instruments_instances['Filters'].filter_b(False)
 
         # Because this is higher dimensional data, create dimensions:
-        self.datman.dim('im_y', self.camera_image.shape[0])     # add extra axes if they don't exist yet
-        self.datman.dim('im_x', self.camera_image.shape[1])
-        self.datman.var(actiondict, self.camera_image, extra_dims=('im_y', 'im_x') )
+        self.datman.dim('im_y', camera_image.shape[0])     # add extra axes if they don't exist yet
+        self.datman.dim('im_x', camera_image.shape[1])
+        # The DataManager also keeps the data in memory for plotting (see datman.live_var()), even if saving is disabled
+        self.datman.var(actiondict, camera_image, extra_dims=('im_y', 'im_x') )
         self.datman.meta(actiondict, {'exposuretime': actiondict['exposuretime'], 'filter_a': actiondict['filter_a'], 'filter_b': actiondict['filter_b'] })
         # self.datman.meta(actiondict, expo='5s')
         # self.datman.meta(actiondict, actiondict)
@@ -158,11 +158,10 @@ class MyExperiment(BaseExperiment):
 
     def fake_spectrum(self, actiondict, nesting):
         fake_wav_nm = np.arange(500, 600.001, 5)
-        self.fake_counts = self.instruments_instances['Spectrometer'].return_fake_1D_data(len(fake_wav_nm))
-        self.flag_new_spectral_data = True
+        fake_counts = self.instruments_instances['Spectrometer'].return_fake_1D_data(len(fake_wav_nm))
         # self.datman.dim_coord('wav', fake_wav_nm, meta={'units': 'nm'})
         self.datman.dim_coord('wav', fake_wav_nm, units='nm')
-        self.datman.var(actiondict, self.fake_counts, extra_dims=('wav'), meta=actiondict, units='counts')
+        self.datman.var(actiondict, fake_counts, extra_dims=('wav'), meta=actiondict, units='counts')
         nesting()
 
 
@@ -11,6 +11,7 @@ import sys
 import hyperion
 from examples.example_project_with_automated_scanning.my_experiment import MyExperiment
 from hyperion.view.experiment_gui import ExpGui
+from hyperion.tools.loading import prewarm, class_strings
 from PyQt5.QtWidgets import QApplication
 
 # # If you want to add logging to this file, import it and create a logger:
@@ -27,6 +28,9 @@ experiment = MyExperiment()
 # Loading the config from th GUI doesn't work very well yet.
 # It's best to do it here already.
 experiment.load_config(config_file)
+# Optionally, import all classes used in the config (guis, instruments) in a background thread, while the instruments
+# are loading:
+prewarm(class_strings(experiment.properties))
 experiment.load_instruments()
 
 # Create PyQt background application.
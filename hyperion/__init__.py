@@ -1,6 +1,7 @@
 
 __version__ = 0.5
 import os
+import threading
 # useful paths:
 package_path =    os.path.dirname(__file__)          #   ###/###/hyperion/hyperion/
 repository_path = os.path.dirname(package_path)      #   ###/###/hyperion/
@@ -14,14 +15,32 @@ from hyperion.core import logman as logging
 # It's important that lantz is after hyperion.core import
 
 # units
-from lantz.core import UnitRegistry, Q_
-ur = UnitRegistry()
-# Define alternative to Q_ that doesn't throw error when input is None, but returns None
-Quan = lambda inp: None if inp is None else Q_(inp)
-
-# define new unit: percent
-ur.define('fraction = [] = frac')
-ur.define('percent = 1e-2 frac = pct')
+# Creating a unit registry takes a considerable time, so ur, Q_ and Quan are only created the first time they're used
+# (e.g. by 'from hyperion import ur'), see __getattr__ below. They use the unit registry of lantz, so there's only one
+# registry and quantities of hyperion and of lantz drivers can be combined.
+_units_lock = threading.Lock()
+
+
+def _load_units():
+    """ Creates ur, Q_ and Quan (and UnitRegistry) as attributes of the hyperion package. """
+    with _units_lock:
+        if 'ur' in globals():
+            return
+        from lantz.core import UnitRegistry, ureg, Q_
+        # define new unit: percent
+        ureg.define('fraction = [] = frac')
+        ureg.define('percent = 1e-2 frac = pct')
+        # Define alternative to Q_ that doesn't throw error when input is None, but returns None
+        Quan = lambda inp: None if inp is None else Q_(inp)
+        globals().update(UnitRegistry=UnitRegistry, Q_=Q_, Quan=Quan, ur=ureg)
+
+
+def __getattr__(name):
+    if name in ('ur', 'Q_', 'Quan', 'UnitRegistry'):
+        _load_units()
+        return globals()[name]
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
 
 # These colors should not be specified here
 # Maybe in plotting_tools, or ui_tools
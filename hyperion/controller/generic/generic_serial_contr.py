@@ -20,12 +20,13 @@ I've added the experimental decorator _wait_while_busy_and_after.
 If it turns out not to work desirably it can be removed:
 remove the application of the decorator on methods initialize, write and read_serial_buffer_in
 remove the decorator function itself
-remove self._busy and self._additional_timeout from the __init__
+remove self._busy, self._additional_timeout and self._busy_condition from the __init__
 """
 
 import serial
 import serial.tools.list_ports
 import time
+import threading
 from hyperion import logging
 from hyperion.controller.base_controller import BaseController
 
@@ -63,7 +64,7 @@ class GenericSerialController(BaseController):
             self._baud = settings['baudrate']
         else:
             self._baud = 9600
-            self.logger.debug('Baudrate not specified in settings. Using: {}'.format(self._baud))
+            self.logger.debug('Baudrate not specified in settings. Using: %s', self._baud)
             
         if 'write_termination' in settings:
             self._write_termination = settings['write_termination']
@@ -87,13 +88,13 @@ class GenericSerialController(BaseController):
             self._read_timeout = settings['read_timeout']
         else:
             self._read_timeout = 0.5        # in seconds
-            self.logger.debug('Read timeout not specified in settings. Using: {}s'.format(self._read_timeout))
+            self.logger.debug('Read timeout not specified in settings. Using: %ss', self._read_timeout)
             
         if 'encoding' in settings:
             self._encoding = settings['encoding']
         else:
             self._encoding = 'ascii'
-            self.logger.debug('Encoding not specified in settings. Using: {}'.format(self._encoding))
+            self.logger.debug('Encoding not specified in settings. Using: %s', self._encoding)
             
         if 'name' in settings:
             self.name = settings['name']
@@ -103,6 +104,7 @@ class GenericSerialController(BaseController):
         # "global" variables for decorator function _wait_while_busy_and_after
         self._busy = False
         self._additional_timeout = time.time()
+        self._busy_condition = threading.Condition()    # notified when a method with the decorator finishes
 
     # define a decorator function to
     def _wait_while_busy_and_after(additional_timeout=0):
@@ -112,16 +114,25 @@ class GenericSerialController(BaseController):
         that has this decorator wait until the _busy flag is set to false after the previous method
         has finished. This blocking functionality of a method can be extended by setting the
         additional_timeout argument > 0. This is useful for the initialize method e.g..
+        Waiting is done on a threading.Condition, so it doesn't use cpu.
         """
         def decorator(fn):
             def wrapper(*args, **kwargs):
-                while args[0]._busy or time.time() < args[0]._additional_timeout:
-                    pass
-                args[0]._busy = True            # set self._busy True
-                result = fn(*args, **kwargs)    # run the function
-                args[0]._additional_timeout = time.time() + additional_timeout
-                args[0]._busy = False           # set self._busy False
-                return result
+                self = args[0]
+                with self._busy_condition:
+                    while self._busy or time.time() < self._additional_timeout:
+                        if self._busy:
+                            self._busy_condition.wait()
+                        else:
+                            self._busy_condition.wait(self._additional_timeout - time.time())
+                    self._busy = True               # set self._busy True
+                try:
+                    return fn(*args, **kwargs)      # run the function
+                finally:
+                    with self._busy_condition:
+                        self._additional_timeout = time.time() + additional_timeout
+                        self._busy = False          # set self._busy False
+                        self._busy_condition.notify_all()
             return wrapper
         return decorator
 
@@ -133,7 +144,7 @@ class GenericSerialController(BaseController):
                                      baudrate=self._baud,
                                      timeout=self._read_timeout,
                                      write_timeout=self._write_timeout)
-        self.logger.debug('Initialized Serial connection to {} on port {}.'.format(self.name, self._port))
+        self.logger.debug('Initialized Serial connection to %s on port %s.', self.name, self._port)
         self._is_initialized = True     # THIS IS MANDATORY!!
                                         # this is to prevent you to close the device connection if you
                                         # have not initialized it inside a with statement
@@ -148,7 +159,7 @@ class GenericSerialController(BaseController):
         if self._is_initialized:
             if self.rsc is not None:
                 self.rsc.close()
-                self.logger.debug('The Serial connection to {} is closed.'.format(self.name))
+                self.logger.debug('The Serial connection to %s is closed.', self.name)
         else:
             self.logger.warning('Finalizing before initializing connection to {}'.format(self.name))
 
@@ -176,7 +187,7 @@ class GenericSerialController(BaseController):
             raise Warning('Trying to write to {} before initializing'.format(self.name))
 
         message += self._write_termination
-        self.logger.debug('Sending to device: {}'.format(message))
+        self.logger.debug('Sending to device: %s', message)
         self.rsc.write( message.encode(self._encoding) )
 
     @_wait_while_busy_and_after(additional_timeout=0)
@@ -216,7 +227,7 @@ class GenericSerialController(BaseController):
             if not wait_for_termination_char or (len(raw) and (raw[-1] in term_chars)):
                 ends_at_term_char = True
             
-        self.logger.debug('{} bytes received'.format(len(raw)))
+        self.logger.debug('%d bytes received', len(raw))
         return raw
            
     def read_lines(self, remove_leading_trailing_empty_line=True):
@@ -258,9 +269,9 @@ class GenericSerialController(BaseController):
         self.rsc.reset_output_buffer()
         self.rsc.reset_input_buffer()
         self.write(message)
-        self.logger.debug('Sent message: {}.'.format(message))
+        self.logger.debug('Sent message: %s.', message)
         ans = self.read_lines()
-        self.logger.debug('Received message: {}.'.format(ans))
+        self.logger.debug('Received message: %s.', ans)
         return ans
     
 
@@ -302,9 +313,8 @@ class GenericSerialControllerDummy(GenericSerialController):
         """
         if not self._is_initialized:
             raise Warning('Trying to write to DUMMY {} before initializing'.format(self.name))
-        self.logger.debug('Adding message to internal buffer:')
-        self.logger.debug(message)
-        self._buffer.append(message.encode(self._encoding))
+        self.logger.debug('Adding message to internal buffer: %s', message)
+        self._buffer += message.encode(self._encoding)
 
     def read_serial_buffer_in(self, wait_for_termination_char=True):
         """Simulates read from dummy device (returns internal buffer).
@@ -331,7 +341,10 @@ class GenericSerialControllerDummy(GenericSerialController):
             raise Warning('Trying to query DUMMY {} before initializing.'.format(self.name))
         self._empty_buffer()
         self.write(message)
-        return self.read_lines()
+        self.logger.debug('Sent message: %s.', message)
+        ans = self.read_lines()
+        self.logger.debug('Received message: %s.', ans)
+        return ans
 
 
     def wait_if_busy(fn):
@@ -0,0 +1,344 @@
+"""
+======================
+Fake Hydraharp library
+======================
+
+Stand-in for hhlib, the library of the HydraHarp 400, so the Hydraharp controller can run without the device (it's
+used by HydraharpDummy in hyperion.controller.picoquant.hydraharp).
+The HH_* functions are real ctypes function pointers (made with CFUNCTYPE), so the controller calls them exactly like
+the ones of the library: with its argtypes, restype, ctypes buffers and pointers.
+
+What it does:
+
+- Histogram mode: the histograms grow with the acquisition time, for a decay with the given lifetime at the count
+  rate of each channel on top of a flat background.
+- T2 and T3 mode: HH_ReadFiFo gives the records of a synthetic stream (Poisson photons at the count rates of the
+  channels; in T3 mode with the delays after the sync drawn from the decay) or replays recorded records.
+  With realtime the records become available at the pace they were measured at; without, as fast as they are read.
+  In T2 mode the sync is not recorded (as if nothing is connected to it).
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+import ctypes
+import time
+import numpy as np
+from hyperion import logging
+
+_P = ctypes.c_void_p    # pointers and string buffers arrive as addresses
+_I = ctypes.c_int
+
+
+class FakeHHLib:
+    """
+    Fake hhlib with the functions used by the Hydraharp controller.
+
+    :param rates: count rate of each input channel in counts per second (defaults to 100 kcps on 2 channels)
+    :type rates: tuple of float
+    :param sync_rate: rate of the sync in Hz (defaults to 80 MHz)
+    :type sync_rate: float
+    :param lifetime: decay time of the photons after the sync in ps (defaults to 2000)
+    :type lifetime: float
+    :param base_resolution: base resolution in ps (defaults to 1)
+    :type base_resolution: float
+    :param records: TTTR records to replay instead of the synthetic stream: an array, a list of arrays or the filename
+                    of a binary file of uint32 records (defaults to None)
+    :type records: numpy.ndarray or list or str or None
+    :param realtime: give the records at the pace they were measured at (defaults to True)
+    :type realtime: bool
+    :param block_time: time span in s of the synthetic records that are made at once (defaults to 0.01)
+    :type block_time: float
+    :param seed: seed of the random generator (defaults to 0)
+    :type seed: int
+    """
+    prototypes = {'HH_GetLibraryVersion': (_P,),
+                  'HH_GetErrorString': (_P, _I),
+                  'HH_OpenDevice': (_I, _P),
+                  'HH_CloseDevice': (_I,),
+                  'HH_Initialize': (_I, _I, _I),
+                  'HH_GetHardwareInfo': (_I, _P, _P, _P),
+                  'HH_GetNumOfInputChannels': (_I, _P),
+                  'HH_Calibrate': (_I,),
+                  'HH_SetSyncDiv': (_I, _I),
+                  'HH_SetSyncCFD': (_I, _I, _I),
+                  'HH_SetSyncChannelOffset': (_I, _I),
+                  'HH_SetInputCFD': (_I, _I, _I, _I),
+                  'HH_SetInputChannelOffset': (_I, _I, _I),
+                  'HH_SetHistoLen': (_I, _I, _P),
+                  'HH_SetBinning': (_I, _I),
+                  'HH_SetOffset': (_I, _I),
+                  'HH_GetResolution': (_I, _P),
+                  'HH_GetSyncRate': (_I, _P),
+                  'HH_GetCountRate': (_I, _I, _P),
+                  'HH_GetWarnings': (_I, _P),
+                  'HH_GetWarningsText': (_I, _P, _I),
+                  'HH_SetStopOverflow': (_I, _I, _I),
+                  'HH_ClearHistMem': (_I,),
+                  'HH_StartMeas': (_I, _I),
+                  'HH_StopMeas': (_I,),
+                  'HH_CTCStatus': (_I, _P),
+                  'HH_GetFlags': (_I, _P),
+                  'HH_GetHistogram': (_I, _P, _I, _I),
+                  'HH_ReadFiFo': (_I, _P, _I, _P)}
+    error_code = -99    # returned when a fake function fails
+
+    def __init__(self, rates=(1e5, 1e5), sync_rate=80e6, lifetime=2000, base_resolution=1, records=None,
+                 realtime=True, block_time=0.01, seed=0):
+        self.logger = logging.getLogger(__name__)
+        self.rates = tuple(float(rate) for rate in rates)
+        self.sync_rate = float(sync_rate)
+        self.lifetime = float(lifetime)
+        self.base_resolution = float(base_resolution)
+        self.records = np.fromfile(records, dtype=np.uint32) if isinstance(records, str) else records
+        self.realtime = realtime
+        self.block_time = block_time
+        self.rng = np.random.default_rng(seed)
+        self.calls = 0              # number of calls to the HH_* functions
+        self.last_error = ''
+
+        self.mode = 0
+        self.binning = 0
+        self.histogram_length = 65536
+        self.measuring = False
+        self._start = 0             # time.monotonic() when the measurement started
+        self._end = 0               # time.monotonic() when the acquisition time ends
+        self._acquired = 0          # acquisition time in the histograms before the current measurement (in s)
+        self._cleared = None        # time.monotonic() of the last clear during the current measurement
+        self._shape = None          # (length, binning, histogram shape normalized to 1)
+        self._counts = None         # ((channel, acquisition time, length, binning), histogram) of the last histogram
+        self._blocks = None         # generator of (time in s after the start, records)
+        self._next_block = None
+        self._pending = np.zeros(0, dtype=np.uint32)
+        self._exhausted = True
+
+        for name, argtypes in self.prototypes.items():
+            setattr(self, name, ctypes.CFUNCTYPE(ctypes.c_int, *argtypes)(self._wrap(getattr(self, name))))
+
+    def _wrap(self, function):
+        # Returns an error code instead of an exception (which ctypes would only print) and counts the calls
+        def wrapper(*args):
+            self.calls += 1
+            try:
+                return function(*args) or 0
+            except Exception as e:
+                self.last_error = '{}: {}'.format(function.__name__, e)
+                self.logger.error('Fake hhlib %s', self.last_error)
+                return self.error_code
+        wrapper.__name__ = function.__name__
+        return wrapper
+
+    @staticmethod
+    def _write(address, ctype, value):
+        ctype.from_address(address).value = value
+
+    @staticmethod
+    def _write_string(address, text, size):
+        data = text.encode('utf-8')[:size - 1] + b'\0'
+        ctypes.memmove(address, data, len(data))
+
+    # General functions
+
+    def HH_GetLibraryVersion(self, version):
+        self._write_string(version, '3.0', 8)
+
+    def HH_GetErrorString(self, text, error):
+        self._write_string(text, self.last_error if error else 'no error', 40)
+
+    def HH_OpenDevice(self, devidx, serial):
+        self._write_string(serial, '1000{:04d}'.format(devidx), 8)
+
+    def HH_CloseDevice(self, devidx):
+        self.HH_StopMeas(devidx)
+
+    def HH_Initialize(self, devidx, mode, clock):
+        self.mode = mode
+
+    def HH_GetHardwareInfo(self, devidx, model, partno, version):
+        self._write_string(model, 'HydraHarp 400 fake', 16)
+        self._write_string(partno, '930021', 8)
+        self._write_string(version, '2.0', 8)
+
+    def HH_GetNumOfInputChannels(self, devidx, number):
+        self._write(number, ctypes.c_int, len(self.rates))
+
+    def HH_Calibrate(self, devidx):
+        pass
+
+    # Settings that don't change the fake data
+
+    def HH_SetSyncDiv(self, devidx, divider):
+        pass
+
+    def HH_SetSyncCFD(self, devidx, level, zerox):
+        pass
+
+    def HH_SetSyncChannelOffset(self, devidx, offset):
+        pass
+
+    def HH_SetInputCFD(self, devidx, channel, level, zerox):
+        pass
+
+    def HH_SetInputChannelOffset(self, devidx, channel, offset):
+        pass
+
+    def HH_SetOffset(self, devidx, offset):
+        pass
+
+    def HH_SetStopOverflow(self, devidx, stop, count):
+        pass
+
+    # Histogram settings and rates
+
+    def HH_SetHistoLen(self, devidx, lencode, actual):
+        self.histogram_length = 1024 * 2**lencode
+        self._write(actual, ctypes.c_int, self.histogram_length)
+
+    def HH_SetBinning(self, devidx, binning):
+        self.binning = binning
+
+    def HH_GetResolution(self, devidx, resolution):
+        self._write(resolution, ctypes.c_double, self.resolution)
+
+    def HH_GetSyncRate(self, devidx, rate):
+        self._write(rate, ctypes.c_int, int(self.sync_rate))
+
+    def HH_GetCountRate(self, devidx, channel, rate):
+        self._write(rate, ctypes.c_int, int(self.rates[channel]))
+
+    def HH_GetWarnings(self, devidx, warnings):
+        self._write(warnings, ctypes.c_int, 0)
+
+    def HH_GetWarningsText(self, devidx, text, warnings):
+        self._write_string(text, '', 16384)
+
+    def HH_GetFlags(self, devidx, flags):
+        self._write(flags, ctypes.c_int, 0)
+
+    @property
+    def resolution(self):
+        """ Resolution at the current binning in ps. """
+        return self.base_resolution * 2**self.binning
+
+    # Measurement
+
+    def HH_StartMeas(self, devidx, tacq):
+        self._start = time.monotonic()
+        self._end = self._start + tacq / 1000
+        self._cleared = None
+        self.measuring = True
+        self._pending = np.zeros(0, dtype=np.uint32)
+        self._next_block = None
+        self._exhausted = False
+        if self.mode in (2, 3):
+            self._blocks = self._replay() if self.records is not None else self._synthetic(tacq / 1000)
+
+    def HH_StopMeas(self, devidx):
+        if self.measuring:
+            self._acquired = self._acquisition_time()
+            self._cleared = None
+            self.measuring = False
+            self._blocks = None
+            self._exhausted = True
+
+    def HH_CTCStatus(self, devidx, status):
+        if self.mode in (2, 3) and not self.realtime:
+            ended = self._exhausted and not len(self._pending)
+        else:
+            ended = not self.measuring or time.monotonic() >= self._end
+        self._write(status, ctypes.c_int, int(ended))
+
+    def _acquisition_time(self):
+        # Acquisition time in s that is in the histograms now
+        if not self.measuring:
+            return self._acquired
+        now = min(time.monotonic(), self._end)
+        if self._cleared is not None:
+            return max(now - self._cleared, 0)
+        return self._acquired + now - self._start
+
+    # Histogram mode
+
+    def HH_ClearHistMem(self, devidx):
+        self._acquired = 0
+        self._cleared = time.monotonic() if self.measuring else None
+
+    def HH_GetHistogram(self, devidx, buffer, channel, clear):
+        # the counts are only computed again when they change (while measuring or after a change of the settings)
+        key = (channel, self._acquisition_time(), self.histogram_length, self.binning)
+        if self._counts is None or self._counts[0] != key:
+            shape = self.histogram_shape()
+            self._counts = (key, np.floor(shape * self.rates[channel] * key[1]).astype(np.uint32))
+        counts = self._counts[1]
+        ctypes.memmove(buffer, counts.ctypes.data, counts.nbytes)
+        if clear:
+            self.HH_ClearHistMem(devidx)
+
+    def histogram_shape(self):
+        """
+        Fraction of the counts in each bin of the histogram: an exponential decay after the sync (repeating every sync
+        period) on a background of 1%.
+
+        :rtype: numpy.ndarray
+        """
+        if self._shape is None or self._shape[:2] != (self.histogram_length, self.binning):
+            delay = np.arange(self.histogram_length) * self.resolution
+            period = 1e12 / self.sync_rate
+            shape = np.exp(-(delay % period) / self.lifetime) * (delay < period) + 0.01 / period * self.resolution
+            self._shape = (self.histogram_length, self.binning, shape / shape.sum())
+        return self._shape[2]
+
+    # T2 and T3 mode
+
+    def HH_ReadFiFo(self, devidx, buffer, count, nactual):
+        while len(self._pending) < count and not self._exhausted:
+            if self._next_block is None:
+                self._next_block = next(self._blocks, None)
+                if self._next_block is None:
+                    self._exhausted = True
+                    break
+            available, records = self._next_block
+            if self.realtime and time.monotonic() - self._start < available:
+                break
+            self._pending = np.concatenate((self._pending, records)) if len(self._pending) else records
+            self._next_block = None
+        number = min(count, len(self._pending))
+        if number:
+            ctypes.memmove(buffer, np.ascontiguousarray(self._pending[:number], dtype=np.uint32).ctypes.data, 4 * number)
+            self._pending = self._pending[number:]
+        self._write(nactual, ctypes.c_int, number)
+
+    def _replay(self):
+        # Generator of the recorded records (all available right away)
+        if isinstance(self.records, np.ndarray):
+            yield 0, self.records.astype(np.uint32, copy=False)
+        else:
+            for records in self.records:
+                yield 0, np.asarray(records, dtype=np.uint32)
+
+    def _synthetic(self, duration):
+        # Generator of blocks of synthetic records, each with the time (after the start) at which it's complete
+        from hyperion.controller.picoquant.hydraharp import encode_tttr
+        mode = 'T2' if self.mode == 2 else 'T3'
+        period = 1e12 / self.sync_rate       # in ps
+        previous = 0
+        start = 0
+        while start < duration:
+            end = min(start + self.block_time, duration)
+            numbers = self.rng.poisson(np.array(self.rates) * (end - start))
+            arrival = self.rng.uniform(start * 1e12, end * 1e12, numbers.sum())     # in ps
+            channel = np.repeat(np.arange(len(self.rates), dtype=np.uint8), numbers)
+            order = np.argsort(arrival, kind='stable')
+            arrival, channel = arrival[order], channel[order]
+            if mode == 'T2':
+                tags = (arrival / self.base_resolution).astype(np.int64)
+                records = encode_tttr(mode, tags, channel, previous=previous)
+            else:
+                # the photon arrives a decay time after the sync (the sync before the arrival time drawn above)
+                tags = (arrival // period).astype(np.int64)
+                delay = self.rng.exponential(self.lifetime, len(tags)) % period
+                dtime = np.minimum(delay / self.resolution, 32767).astype(np.uint16)
+                records = encode_tttr(mode, tags, channel, dtime=dtime, previous=previous)
+            if len(tags):
+                previous = int(tags[-1])
+            yield end, records
+            start = end
@@ -50,13 +50,18 @@ import sys
 from enum import Enum
 import time
 import yaml
+import queue
+import threading
 from hyperion import logging
 
 c_int_p = ctypes.POINTER(ctypes.c_int)
+c_uint_p = ctypes.POINTER(ctypes.c_uint)
 
 class Hydraharp(BaseController):
     """ | Hydraharp 400 controller
         | Initializes communication with Hydraharp400 device.
+        | The argument types of the library functions are set once when the library is loaded (see prototypes) and
+        | the histograms are read into buffers that are allocated once per channel.
 
         :param devidx: index of the device
         :type devidx: int
@@ -68,6 +73,36 @@ class Hydraharp(BaseController):
         :type clock: string
 
     """
+    # argtypes of the library functions that are used, they all return an error code (ctypes.c_int)
+    prototypes = {'HH_GetLibraryVersion': [ctypes.c_char_p],
+                  'HH_GetErrorString': [ctypes.c_char_p, ctypes.c_int],
+                  'HH_OpenDevice': [ctypes.c_int, ctypes.c_char_p],
+                  'HH_CloseDevice': [ctypes.c_int],
+                  'HH_Initialize': [ctypes.c_int, ctypes.c_int, ctypes.c_int],
+                  'HH_GetHardwareInfo': [ctypes.c_int, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p],
+                  'HH_GetNumOfInputChannels': [ctypes.c_int, c_int_p],
+                  'HH_Calibrate': [ctypes.c_int],
+                  'HH_SetSyncDiv': [ctypes.c_int, ctypes.c_int],
+                  'HH_SetSyncCFD': [ctypes.c_int, ctypes.c_int, ctypes.c_int],
+                  'HH_SetSyncChannelOffset': [ctypes.c_int, ctypes.c_int],
+                  'HH_SetInputCFD': [ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int],
+                  'HH_SetInputChannelOffset': [ctypes.c_int, ctypes.c_int, ctypes.c_int],
+                  'HH_SetHistoLen': [ctypes.c_int, ctypes.c_int, c_int_p],
+                  'HH_SetBinning': [ctypes.c_int, ctypes.c_int],
+                  'HH_SetOffset': [ctypes.c_int, ctypes.c_int],
+                  'HH_GetResolution': [ctypes.c_int, ctypes.POINTER(ctypes.c_double)],
+                  'HH_GetSyncRate': [ctypes.c_int, c_int_p],
+                  'HH_GetCountRate': [ctypes.c_int, ctypes.c_int, c_int_p],
+                  'HH_GetWarnings': [ctypes.c_int, c_int_p],
+                  'HH_GetWarningsText': [ctypes.c_int, ctypes.c_char_p, ctypes.c_int],
+                  'HH_SetStopOverflow': [ctypes.c_int, ctypes.c_int, ctypes.c_int],
+                  'HH_ClearHistMem': [ctypes.c_int],
+                  'HH_StartMeas': [ctypes.c_int, ctypes.c_int],
+                  'HH_StopMeas': [ctypes.c_int],
+                  'HH_CTCStatus': [ctypes.c_int, c_int_p],
+                  'HH_GetFlags': [ctypes.c_int, c_int_p],
+                  'HH_GetHistogram': [ctypes.c_int, c_uint_p, ctypes.c_int, ctypes.c_int],
+                  'HH_ReadFiFo': [ctypes.c_int, c_uint_p, ctypes.c_int, c_int_p]}
 
     def __init__(self, config ):
 
@@ -83,49 +118,77 @@ class Hydraharp(BaseController):
         self.settings = {}
         self.load_config()
 
+        # the index of the device is checked only here, it can't change
+        assert self.__devidx in range(self.settings['MAXDEVNUM']), "devidx should be a int in range 0 ... 8."
+
+        self._streams = []      # the TTTRStreams that were started, they're stopped before closing the device
+
         # loading dll
+        self.hhlib = self._load_library()
+        self._bind_prototypes()
+
+        self.logger.debug('Dll object: %s', self.hhlib)
+
+        self.error_code = 0  # current error code
+        self._histoLen = 65536  # default histogram length = 65536
+        self._histogram_buffer = None   # ctypes buffer that the histograms of all input channels are read into
+        self._histogram_rows = []       # ctypes arrays of the part of the buffer of every channel
+        self._histograms = np.zeros((0, 0), dtype=np.uint32)  # (channels, bins) numpy array sharing its memory
+        self._histogram_views = []      # numpy array of every row of _histograms
+        if self.library_version != self.settings['LIB_VERSION']:
+            self.logger.warning('Current code (version %s) may not be compatible with system library (version %s)',
+                                self.settings['LIB_VERSION'], self.library_version)
+
+        # open connetiom
+        self._open_device()  # initialize communication
+        self.initialize(mode=config['mode'], clock=config['clock'])  # initialize the instrument
+        self._input_channels = self.number_input_channels   # doesn't change, so it's asked only once
+
+        self.calibrate()  # calibrate it
+        self.histogram_length = self._histoLen
+        self._binning(0)  # default binning to 0
+        self._base_resolution = self.resolution  # base resolution of the device
+
+        self.logger.debug('Hydraharp controller fully created')
+     
+    def _load_library(self):
+        """ Loads the library of the device (hhlib) for this platform.
+
+        :return: the library
+        :rtype: ctypes.CDLL or ctypes.WinDLL
+        """
         if sys.platform == 'linux':
             try: 
-                self.hhlib = ctypes.CDLL("hhlib.so")
+                hhlib = ctypes.CDLL("hhlib.so")
             except OSError:
                 print("Import local library")
-                self.hhlib = ctypes.CDLL("./hhlib.so")
+                hhlib = ctypes.CDLL("./hhlib.so")
         elif sys.platform == 'win32':
             try:
-                self.hhlib = ctypes.WinDLL("hhlib.dll")
+                hhlib = ctypes.WinDLL("hhlib.dll")
             except OSError:
                 print("Import local library")
-                self.hhlib = ctypes.WinDLL("./hhlib.dll")
+                hhlib = ctypes.WinDLL("./hhlib.dll")
         elif sys.platform == 'win64':
             print('ik ben hier')
             try:
-                self.hhlib = ctypes.WinDLL("hhlib64.dll")
+                hhlib = ctypes.WinDLL("hhlib64.dll")
             except OSError:
                 print("Import local library")
-                self.hhlib = ctypes.WinDLL("./hhlib64.dll")
+                hhlib = ctypes.WinDLL("./hhlib64.dll")
         else:
             raise NotImplementedError("Not (yet) implemented on your system ({}).".format(sys.platform))
-        assert self.__devidx in range(self.settings['MAXDEVNUM']), "devidx should be a int in range 0 ... 8."
+        return hhlib
 
-        self.logger.debug('Dll object: {}'.format(self.hhlib))
-
-        self.error_code = 0  # current error code
-        self._histoLen = 65536  # default histogram length = 65536
-        assert self.library_version is not self.settings['LIB_VERSION'], \
-            "Current code (version {}) may not be compatible with system library " \
-            "(version {})".format(LIB_VERSION, self.library_version)
-
-        # open connetiom
-        self._open_device()  # initialize communication
-        self.initialize(mode=config['mode'], clock=config['clock'])  # initialize the instrument
-
-        self.calibrate()  # calibrate it
-        self.histogram_length = self._histoLen
-        self._binning(0)  # default binning to 0
-        self._base_resolution = self.resolution  # base resolution of the device
+    def _bind_prototypes(self):
+        """ Sets the argtypes and restype of the library functions in prototypes, once after loading the library.
+        The methods call the functions with python ints and ctypes buffers, ctypes converts them.
+        """
+        for name, argtypes in self.prototypes.items():
+            func = getattr(self.hhlib, name)
+            func.argtypes = argtypes
+            func.restype = ctypes.c_int
 
-        self.logger.debug('Hydraharp controller fully created')
-     
     def load_config(self, filename = None):
         """| Loads the yml configuration file of default instrument settings that probably nobody is going to change.
         | File are in folder /controller/picoquant/Hydraharp_controller.yml.
@@ -149,11 +212,8 @@ class Hydraharp(BaseController):
         """
         Version of the library.
         """
-        func = self.hhlib.HH_GetLibraryVersion
-        func.argtypes = [ctypes.c_char_p]
-        func.restype = ctypes.c_int
         data = ctypes.create_string_buffer(8)   
-        self.error_code = func(data)
+        self.error_code = self.hhlib.HH_GetLibraryVersion(data)
         if self.error_code == 0:
            return data.value.decode('utf-8')
         else:
@@ -163,15 +223,9 @@ class Hydraharp(BaseController):
         """
         Open the communication with the device and catch any error messages.
         """
-        self.logger.debug('Opening connection with device {}'.format(self.__devidx))
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        func = self.hhlib.HH_OpenDevice
-        func.argtypes = [ctypes.c_int, ctypes.c_char_p]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
+        self.logger.debug('Opening connection with device %s', self.__devidx)
         data2 = ctypes.create_string_buffer(8)   
-        self.error_code = func(data, data2)
+        self.error_code = self.hhlib.HH_OpenDevice(self.__devidx, data2)
         if self.error_code == 0:
            return data2.value
         else:
@@ -183,12 +237,8 @@ class Hydraharp(BaseController):
         Error messages.
         """
         self.logger.debug('Getting an error')
-        func = self.hhlib.HH_GetErrorString
-        func.argtypes = [ctypes.c_char_p, ctypes.c_int]
-        func.restype = ctypes.c_int
         data = ctypes.create_string_buffer(40)   
-        data2 = ctypes.c_int(self.error_code)
-        self.error_code = func(data, data2)
+        self.error_code = self.hhlib.HH_GetErrorString(data, self.error_code)
         return data.value.decode('utf-8')
    
     def initialize(self, mode='Histogram', clock='Internal'):
@@ -207,18 +257,12 @@ class Hydraharp(BaseController):
         self.logger.info('Initializing the correlator device.')
         self._is_initialized = True     # this is to prevent you to close the device connection if you
                                         # have not initialized it inside a with statement        
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
         assert mode in Measurement_mode._member_names_
         assert clock in Reference_clock._member_names_
-        func = self.hhlib.HH_Initialize
-        func.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        data2 = ctypes.c_int(Measurement_mode[mode].value)
-        data3 = ctypes.c_int(Reference_clock[clock].value)
-        self.error_code = func(data, data2, data3)
-        if self.error_code is not 0:
+        self.mode = mode
+        self.error_code = self.hhlib.HH_Initialize(self.__devidx, Measurement_mode[mode].value,
+                                                   Reference_clock[clock].value)
+        if self.error_code != 0:
             warnings.warn(self.error_string)
 
     @property
@@ -236,16 +280,10 @@ class Hydraharp(BaseController):
         #         version
         #              Hardware version (?) of the device
         # =============================================================================
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        func = self.hhlib.HH_GetHardwareInfo
-        func.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
         data2 = ctypes.create_string_buffer(16)   
         data3 = ctypes.create_string_buffer(8)   
         data4 = ctypes.create_string_buffer(8)   
-        self.error_code = func(data, data2, data3, data4)
+        self.error_code = self.hhlib.HH_GetHardwareInfo(self.__devidx, data2, data3, data4)
         if self.error_code == 0:
             return data2.value, data3.value, data4.value
         else:
@@ -256,14 +294,8 @@ class Hydraharp(BaseController):
         """
         Number of installed input channels, in our case should be two (plus sync).
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        func = self.hhlib.HH_GetNumOfInputChannels
-        func.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
         data2 = ctypes.c_int()
-        self.error_code = func(data, data2)
+        self.error_code = self.hhlib.HH_GetNumOfInputChannels(self.__devidx, data2)
         if self.error_code == 0:
             return data2.value
         else:
@@ -276,14 +308,8 @@ class Hydraharp(BaseController):
         :param devidx: Index of the device (default 0)
         :type devidx: int
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        func = self.hhlib.HH_Calibrate
-        func.argtypes = [ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        self.error_code = func(data)
-        if self.error_code is not 0:
+        self.error_code = self.hhlib.HH_Calibrate(self.__devidx)
+        if self.error_code != 0:
             warnings.warn(self.error_string)
    
    
@@ -303,16 +329,9 @@ class Hydraharp(BaseController):
         :type divider: int
 
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
         assert divider in 2**np.arange(np.log2(self.settings['SYNCDIVMIN']), np.log2(self.settings['SYNCDIVMAX'])+1), "Invalid value for SetSyncDiv"
-        func = self.hhlib.HH_SetSyncDiv
-        func.argtypes = [ctypes.c_int, ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        data2 = ctypes.c_int(divider)
-        self.error_code = func(data, data2)
-        if self.error_code is not 0:
+        self.error_code = self.hhlib.HH_SetSyncDiv(self.__devidx, int(divider))
+        if self.error_code != 0:
             warnings.warn(self.error_string)
       
     def sync_CFD(self, level=50, zerox=0):
@@ -327,18 +346,10 @@ class Hydraharp(BaseController):
         :param zerox: CFD zero cross level in millivolts
         :type zerox: int
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
         assert (level >= self.settings['DISCRMIN']) and (level <= self.settings['DISCRMAX'])
         assert (zerox >= self.settings['ZCMIN']) and (zerox <= self.settings['ZCMAX'])
-        func = self.hhlib.HH_SetSyncCFD
-        func.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        data2 = ctypes.c_int(level)
-        data3 = ctypes.c_int(zerox)
-        self.error_code = func(data, data2, data3)
-        if self.error_code is not 0:
+        self.error_code = self.hhlib.HH_SetSyncCFD(self.__devidx, level, zerox)
+        if self.error_code != 0:
             warnings.warn(self.error_string)
       
     def sync_offset(self, value=0):
@@ -347,16 +358,9 @@ class Hydraharp(BaseController):
         :param offset: time offset in ps -99999, ..., 99999
         :type offset: int
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
         assert (value >= self.settings['CHANOFFSMIN']) and (value <= self.settings['CHANOFFSMAX']), "SyncChannelOffset outside of valid values."
-        func = self.hhlib.HH_SetSyncChannelOffset
-        func.argtypes = [ctypes.c_int, ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        data2 = ctypes.c_int(value)
-        self.error_code = func(data, data2)
-        if self.error_code is not 0:
+        self.error_code = self.hhlib.HH_SetSyncChannelOffset(self.__devidx, value)
+        if self.error_code != 0:
             warnings.warn(self.error_string)
       
     def input_CFD(self, channel=0, level=50, zerox=0):
@@ -374,20 +378,11 @@ class Hydraharp(BaseController):
         :param zerox: CFD zero cross level in millivolts
         :type zerox: int
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        assert channel in range(self.number_input_channels), "SetInputCFD, Channel not valid."
+        assert channel in range(self._input_channels), "SetInputCFD, Channel not valid."
         assert (level >= self.settings['DISCRMIN']) and (level <= self.settings['DISCRMAX']), "SetInputCFD, Level not valid."
         assert (zerox >= self.settings['ZCMIN']) and (zerox <= self.settings['ZCMAX']), "SetInputCFD, ZeroCross not valid."
-        func = self.hhlib.HH_SetInputCFD
-        func.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        data2 = ctypes.c_int(channel)
-        data3 = ctypes.c_int(level)
-        data4 = ctypes.c_int(zerox)
-        self.error_code = func(data, data2, data3, data4)
-        if self.error_code is not 0:
+        self.error_code = self.hhlib.HH_SetInputCFD(self.__devidx, channel, level, zerox)
+        if self.error_code != 0:
             warnings.warn(self.error_string)
  
     def input_offset(self, channel=0, offset=0):
@@ -399,18 +394,10 @@ class Hydraharp(BaseController):
         :param offset: time offset in ps -99999, ..., 99999
         :type offset: int
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        assert channel in range(self.number_input_channels), "SetInputChannelOffset, Channel not valid."
+        assert channel in range(self._input_channels), "SetInputChannelOffset, Channel not valid."
         assert (offset >= self.settings['CHANOFFSMIN']) and (offset <= self.settings['CHANOFFSMAX']), "SetInputChannelOffset, Offset not valid."
-        func = self.hhlib.HH_SetInputChannelOffset
-        func.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        data2 = ctypes.c_int(channel)
-        data3 = ctypes.c_int(offset)
-        self.error_code = func(data, data2, data3)
-        if self.error_code is not 0:
+        self.error_code = self.hhlib.HH_SetInputChannelOffset(self.__devidx, channel, offset)
+        if self.error_code != 0:
             warnings.warn(self.error_string)
 
     @property
@@ -423,25 +410,26 @@ class Hydraharp(BaseController):
         | Set the histograms length (time bin count) of histograms.
         | actual_length = histogram_length(devidx, length).
         | The histogram length has to do with the resolution in ps; in the correlator software it's always 65536 (2^16).
+        | The buffer that the histograms of all input channels are read into is allocated here.
 
         :param length: array size of histogram, 1024, 2048, 4096, 8192, 16384, 32768 or 65536  (default 65536)
         :type length: int
 
         :return: actual_length
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
         lencode = int(np.log2(length/1024))
         assert (lencode >= 0) and (lencode <= self.settings['MAXLENCODE'])
-        func = self.hhlib.HH_SetHistoLen
-        func.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        data2 = ctypes.c_int(lencode)
         data3 = ctypes.c_int()
-        self.error_code = func(data, data2, data3)
+        self.error_code = self.hhlib.HH_SetHistoLen(self.__devidx, lencode, data3)
         self._histoLen = data3.value
         if self.error_code == 0:
+            if self._histograms.shape != (self._input_channels, self._histoLen):
+                row = ctypes.c_uint * self._histoLen
+                self._histogram_buffer = (row * self._input_channels)()
+                self._histogram_rows = list(self._histogram_buffer)
+                self._histograms = np.frombuffer(self._histogram_buffer, dtype=np.uint32).reshape(
+                    self._input_channels, self._histoLen)
+                self._histogram_views = list(self._histograms)
             return self._histoLen
         else:
             warnings.warn(self.error_string)
@@ -458,16 +446,9 @@ class Hydraharp(BaseController):
         :param binning: binning of the histograms, 0,1,...
         :type binning: integer
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
         assert (binning >= 0) and (binning <= self.settings['BINSTEPSMAX'])
-        func = self.hhlib.HH_SetBinning
-        func.argtypes = [ctypes.c_int, ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        data2 = ctypes.c_int(binning)
-        self.error_code = func(data, data2)
-        if self.error_code is not 0:
+        self.error_code = self.hhlib.HH_SetBinning(self.__devidx, binning)
+        if self.error_code != 0:
             warnings.warn(self.error_string)
    
     def histogram_offset(self, offset=0):
@@ -478,16 +459,9 @@ class Hydraharp(BaseController):
         :param offset: Histogram time offset in ps; 0, ... 500000
         :type offset: int
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
         assert (offset >= self.settings['OFFSETMIN']) and (offset <= self.settings['OFFSETMAX'])
-        func = self.hhlib.HH_SetOffset
-        func.argtypes = [ctypes.c_int, ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        data2 = ctypes.c_int(offset)
-        self.error_code = func(data, data2)
-        if self.error_code is not 0:
+        self.error_code = self.hhlib.HH_SetOffset(self.__devidx, offset)
+        if self.error_code != 0:
             warnings.warn(self.error_string)
    
     @property
@@ -497,14 +471,8 @@ class Hydraharp(BaseController):
 
         :return resolution: resolution in ps at current binning
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        func = self.hhlib.HH_GetResolution
-        func.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_double)]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
         data2 = ctypes.c_double()
-        self.error_code = func(data, data2)
+        self.error_code = self.hhlib.HH_GetResolution(self.__devidx, data2)
         if self.error_code == 0:
             return data2.value
         else:
@@ -527,14 +495,8 @@ class Hydraharp(BaseController):
 
         :return sync rate: measured counts per second on the sync input channel
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        func = self.hhlib.HH_GetSyncRate
-        func.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
         data2 = ctypes.c_int()
-        self.error_code = func(data, data2)
+        self.error_code = self.hhlib.HH_GetSyncRate(self.__devidx, data2)
         if self.error_code == 0:
             return data2.value
         else:
@@ -551,16 +513,9 @@ class Hydraharp(BaseController):
         return count rate: measured counts per second on one of the channels
         """
         time.sleep(0.1)
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        assert channel in range(self.number_input_channels), "SetInputChannelOffset, Channel not valid."
-        func = self.hhlib.HH_GetCountRate
-        func.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        data2 = ctypes.c_int(channel)
+        assert channel in range(self._input_channels), "SetInputChannelOffset, Channel not valid."
         data3 = ctypes.c_int()
-        self.error_code = func(data, data2, data3)
+        self.error_code = self.hhlib.HH_GetCountRate(self.__devidx, channel, data3)
         if self.error_code == 0:
             return data3.value
         else:
@@ -574,14 +529,8 @@ class Hydraharp(BaseController):
 
         :return warming: warning message
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        func = self.hhlib.HH_GetWarnings
-        func.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
         data2 = ctypes.c_int()
-        self.error_code = func(data, data2)
+        self.error_code = self.hhlib.HH_GetWarnings(self.__devidx, data2)
         self.warning_code = data2.value
         if self.error_code == 0:
             return data2.value
@@ -594,16 +543,9 @@ class Hydraharp(BaseController):
 
         :return warning: warning in readable text
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
         self.warnings  # Get the warning codes
-        func = self.hhlib.HH_GetWarningsText
-        func.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
         data2 = ctypes.create_string_buffer(16384)   
-        data3 = ctypes.c_int(self.warning_code)
-        self.error_code = func(data, data2, data3)
+        self.error_code = self.hhlib.HH_GetWarningsText(self.__devidx, data2, self.warning_code)
         if self.error_code == 0:
             return data2.value
         else:
@@ -620,32 +562,18 @@ class Hydraharp(BaseController):
         :type stop_count: int
         """
         stop_count = self.settings['STOPCNTMAX']
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
         assert isinstance(stop_at_overflow, bool), "stop_overflow, stop_at_overflow must be a bool."
         assert (stop_count >= self.settings['STOPCNTMIN']) and (stop_count <= self.settings['STOPCNTMAX']), "HH_SetStopOverflow, stopcount not valid."
-        func = self.hhlib.HH_SetStopOverflow
-        func.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        data2 = ctypes.c_int(stop_at_overflow)
-        data3 = ctypes.c_int(stop_count)
-        self.error_code = func(data, data2, data3)
-        if self.error_code is not 0:
+        self.error_code = self.hhlib.HH_SetStopOverflow(self.__devidx, stop_at_overflow, stop_count)
+        if self.error_code != 0:
             warnings.warn(self.error_string)
 
     def clear_histogram(self):
         """
         Clear histogram from memory
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        func = self.hhlib.HH_ClearHistMem
-        func.argtypes = [ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        self.error_code = func(data)
-        if self.error_code is not 0:
+        self.error_code = self.hhlib.HH_ClearHistMem(self.__devidx)
+        if self.error_code != 0:
             warnings.warn(self.error_string)
 
     def start_measurement(self, acquisition_time=1000):
@@ -656,29 +584,19 @@ class Hydraharp(BaseController):
         :type acquisition_time: int
         """
 
-        # devidx = self.__devidx
-        # assert devidx in range(self.settings['MAXDEVNUM'])
         # tacq = acquisition_time * ur('ms')# acquisition time in seconds(later it is converted to miliseconds)
         # #tacq = tacq.to('ms')
         # min_acqt = self.settings['ACQTMIN'] * ur('ms')
         # max_acqt = self.settings['ACQTMAX'] * ur('ms')
         # assert (float(tacq.magnitude) >= float(min_acqt.magnitude)) and (float(tacq.magnitude) <= float(max_acqt.magnitude)), "HH_StartMeas, tacq not valid."
 
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
         tacq = acquisition_time  # acquisition time in seconds(later it is converted to miliseconds)
         min_acqt = self.settings['ACQTMIN']
         max_acqt = self.settings['ACQTMAX']
         assert (tacq >= min_acqt) and (tacq <= max_acqt), "HH_StartMeas, tacq not valid."
 
-        func = self.hhlib.HH_StartMeas
-        func.argtypes = [ctypes.c_int, ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        data2 = ctypes.c_int(tacq)
-        self.error_code = func(data, data2)
-        #print(data, data2)
-        if self.error_code is not 0:
+        self.error_code = self.hhlib.HH_StartMeas(self.__devidx, tacq)
+        if self.error_code != 0:
             warnings.warn(self.error_string)
 
     @property
@@ -687,14 +605,8 @@ class Hydraharp(BaseController):
 
         :return status: False: acquisition time still running; True: acquisition time has ended
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        func = self.hhlib.HH_CTCStatus
-        func.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
         data2 = ctypes.c_int()
-        self.error_code = func(data, data2)
+        self.error_code = self.hhlib.HH_CTCStatus(self.__devidx, data2)
         if self.error_code == 0:
             return bool(data2.value)
         else:
@@ -705,21 +617,18 @@ class Hydraharp(BaseController):
         | Can be used before the acquisition time expires.
 
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        func = self.hhlib.HH_StopMeas
-        func.argtypes = [ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        self.error_code = func(data)
-        if self.error_code is not 0:
+        self.error_code = self.hhlib.HH_StopMeas(self.__devidx)
+        if self.error_code != 0:
             warnings.warn(self.error_string)
 
-    def histogram(self, channel=0, clear=True):
+    def histogram(self, channel=0, clear=True, out=None):
         """| Histogram of channel.
         | **Have to use this one only after starting a measurement!**
         | The histogram is always taken between one of the input channels and the sync channel.
         | To perform start-stop measurements, connect one of the photon detectors to the sync channel.
+        | Without out, the histogram is read into the row of the channel in the buffer of the histograms and the
+        | returned array shares its memory: it is overwritten by the next histogram of that channel, so copy it to keep it.
+        | To read the histograms of more channels of the same measurement, use histograms().
 
         :param channel: input channel index; in our case 0 or 1
         :type channel: int
@@ -727,38 +636,126 @@ class Hydraharp(BaseController):
         :param clear: denotes the action upon completing the reading process; False keeps the histogram in the acquisition buffer; True clears the buffer
         :type clear: bool
 
+        :param out: array to read the histogram into: numpy uint32, C-contiguous and of length histogram_length (defaults to None, the buffer of the channel)
+        :type out: numpy.ndarray
+
         :return histogram: array with the histogram data; size is determined by histogram_length, default 2^16
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        assert channel in range(self.number_input_channels), "HH_GetHistogram, Channel not valid."
+        assert channel in range(self._input_channels), "HH_GetHistogram, Channel not valid."
+        assert isinstance(clear, bool), "HH_GetHistogram, clear must be a bool."
+        if out is None:
+            buffer = self._histogram_rows[channel]
+            out = self._histogram_views[channel]
+        else:
+            assert out.dtype == np.uint32 and out.shape == (self._histoLen,) and out.flags.c_contiguous and \
+                out.flags.writeable, "HH_GetHistogram, out must be a writeable uint32 array of histogram_length."
+            buffer = type(self._histogram_rows[channel]).from_buffer(out)
+        self.error_code = self.hhlib.HH_GetHistogram(self.__devidx, buffer, channel, clear)
+        if self.error_code == 0:
+            return out
+        else:
+            warnings.warn(self.error_string)
+
+    def histograms(self, channels=None, clear=True, out=None):
+        """| Histograms of more input channels of the same measurement, as a 2D array (channels, bins).
+        | **Have to use this one only after starting a measurement!**
+        | The device measures the histograms of all channels at once, so this needs a single measurement.
+        | The histogram memory is only cleared (if clear) after the last channel is read, because it's shared.
+        | Without out, the histograms are read into the buffer of the histograms: for all channels the returned array
+        | shares its memory (it is overwritten by the next read, so copy it to keep it), for some it's a copy.
+
+        :param channels: input channel indices (defaults to None, all input channels)
+        :type channels: list of int
+
+        :param clear: False keeps the histograms in the acquisition buffer; True clears the buffer after reading them
+        :type clear: bool
+
+        :param out: array to read the histograms into: numpy uint32, C-contiguous and of shape (number of channels, histogram_length) (defaults to None)
+        :type out: numpy.ndarray
+
+        :return histograms: array with the histograms of the channels, one per row
+        """
+        channels = list(range(self._input_channels)) if channels is None else [int(channel) for channel in channels]
+        assert all(channel in range(self._input_channels) for channel in channels), "HH_GetHistogram, Channel not valid."
         assert isinstance(clear, bool), "HH_GetHistogram, clear must be a bool."
-        func = self.hhlib.HH_GetHistogram
-        func.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_uint), ctypes.c_int, ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        data2 = (ctypes.c_uint*self._histoLen)() 
-        data3 = ctypes.c_int(channel)
-        data4 = ctypes.c_int(clear)
-        self.error_code = func(data, data2, data3, data4)
+        if out is None:
+            buffers = [self._histogram_rows[channel] for channel in channels]
+        else:
+            assert out.dtype == np.uint32 and out.shape == (len(channels), self._histoLen) and out.flags.c_contiguous \
+                and out.flags.writeable, "HH_GetHistogram, out must be a writeable uint32 array of (channels, length)."
+            row = type(self._histogram_rows[0])
+            buffers = [row.from_buffer(out, index * ctypes.sizeof(row)) for index in range(len(channels))]
+        for index, (channel, buffer) in enumerate(zip(channels, buffers)):
+            self.error_code = self.hhlib.HH_GetHistogram(self.__devidx, buffer, channel,
+                                                         clear and index == len(channels) - 1)
+            if self.error_code != 0:
+                warnings.warn(self.error_string)
+                return
+        if out is not None:
+            return out
+        if channels == list(range(self._input_channels)):
+            return self._histograms
+        return self._histograms[channels]
+
+    def read_fifo(self, buffer, count=None):
+        """| Reads TTTR records from the FIFO of the device (only in T2 and T3 mode).
+        | Returns right away with the records that are available, which can be none.
+        | To read a stream of records while measuring, use stream().
+
+        :param buffer: array of ctypes.c_uint to read the records into; it can be reused for every read
+        :type buffer: ctypes array
+
+        :param count: maximum number of records to read, a multiple of TTREADMIN up to TTREADMAX (defaults to the length of buffer)
+        :type count: int
+
+        :return: number of records read
+        :rtype: int
+        """
+        if count is None:
+            count = len(buffer)
+        assert self.settings['TTREADMIN'] <= count <= min(len(buffer), self.settings['TTREADMAX']) and \
+            count % self.settings['TTREADMIN'] == 0, "HH_ReadFiFo, count not valid."
+        data4 = ctypes.c_int()
+        self.error_code = self.hhlib.HH_ReadFiFo(self.__devidx, buffer, count, data4)
         if self.error_code == 0:
-            return np.array(data2)
+            return data4.value
         else:
             warnings.warn(self.error_string)
 
+    def stream(self, acquisition_time=1000, queue_size=64, overflow='block'):
+        """| Starts a T2 or T3 measurement and returns the TTTRStream that reads the records on a background thread.
+        | Iterate over the stream to get the decoded records (TTTRChunk), until the measurement has ended:
+
+        .. code-block:: python
+
+            for chunk in hydraharp.stream(1000):
+                photons = chunk.photons(0)
+
+        :param acquisition_time: Acquisition time in ms
+        :type acquisition_time: int
+
+        :param queue_size: maximum number of decoded chunks waiting in the queue (defaults to 64)
+        :type queue_size: int
+
+        :param overflow: what to do when the queue is full: 'block', 'drop_oldest' or 'drop_new' (defaults to 'block')
+        :type overflow: str
+
+        :return: the running stream
+        :rtype: TTTRStream
+        """
+        assert self.mode in ('T2', 'T3'), "Streaming is only possible in T2 or T3 mode, not in {}".format(self.mode)
+        self._streams = [stream for stream in self._streams if stream.running]
+        stream = TTTRStream(self, queue_size, overflow)
+        self._streams.append(stream)
+        return stream.start(acquisition_time)
+
     @property
     def flags(self):
         """Use the predefined bit mask values in hhdefin.h (e.g. FLAG_OVERFLOW) to extract individual bits through a bitwise AND.
 
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        func = self.hhlib.HH_GetFlags
-        func.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
         data2 = ctypes.c_int()
-        self.error_code = func(data, data2)
+        self.error_code = self.hhlib.HH_GetFlags(self.__devidx, data2)
         if self.error_code == 0:
             return data2.value
         else:
@@ -766,18 +763,17 @@ class Hydraharp(BaseController):
 
     def finalize(self):
         """Closes and releases the device for use by other programs.
+        Streams that are still reading are stopped first, so their thread doesn't use the closed device.
         """
-        devidx = self.__devidx
-        assert devidx in range(self.settings['MAXDEVNUM'])
-        func = self.hhlib.HH_CloseDevice
-        func.argtypes = [ctypes.c_int]
-        func.restype = ctypes.c_int
-        data = ctypes.c_int(devidx)
-        self.error_code = func(data)
-        if self.error_code is not 0:
+        for stream in self._streams:
+            stream.stop()
+        self._streams = []
+        self.error_code = self.hhlib.HH_CloseDevice(self.__devidx)
+        if self.error_code != 0:
             warnings.warn(self.error_string)
 
         
+
 class Measurement_mode(Enum):
     Histogram = 0
     T2 = 2
@@ -788,6 +784,331 @@ class Reference_clock(Enum):
     Internal = 0
     External = 1
 
+
+FLAG_OVERFLOW = 0x0001      # flags of the device, see hhdefin.h
+FLAG_FIFOFULL = 0x0002
+
+# Layout of the TTTR records (HydraHarp V2 format), 32 bits each:
+#   T2: special (1 bit) | channel (6 bits) | timetag (25 bits)
+#   T3: special (1 bit) | channel (6 bits) | dtime (15 bits) | nsync (10 bits)
+# Special records with channel 63 are overflows: the time field is the number of wraparounds (0 means 1). Other
+# special records are markers (channel 1 to 15) and, in T2 mode, the sync (channel 0).
+TTTR_WRAPAROUND = {'T2': 33554432, 'T3': 1024}
+_OVERFLOW_CHANNEL = 63
+
+
+class TTTRChunk:
+    """
+    Decoded TTTR records, without the overflow records (see TTTRDecoder).
+
+    :ivar mode: 'T2' or 'T3'
+    :ivar time: T2: arrival time in units of the base resolution (ps); T3: number of the sync period (numpy int64)
+    :ivar channel: input channel of the photons, or the marker number (numpy uint8)
+    :ivar special: True for markers and (T2) sync events (numpy bool)
+    :ivar dtime: T3: time after the sync in units of the resolution (numpy uint16); T2: None
+    :ivar records: number of records read, including the overflow records
+    """
+    def __init__(self, mode, time, channel, special, dtime=None, records=0):
+        self.mode = mode
+        self.time = time
+        self.channel = channel
+        self.special = special
+        self.dtime = dtime
+        self.records = records
+
+    def __len__(self):
+        return len(self.time)
+
+    def _photon_mask(self, channel):
+        return (self.channel == channel) & ~self.special
+
+    def photons(self, channel):
+        """
+        Times of the photons on one input channel.
+
+        :param channel: input channel index; in our case 0 or 1
+        :type channel: int
+        :rtype: numpy.ndarray
+        """
+        return self.time[self._photon_mask(channel)]
+
+    def delays(self, channel):
+        """
+        T3 mode: times after the sync of the photons on one input channel, in units of the resolution.
+
+        :param channel: input channel index; in our case 0 or 1
+        :type channel: int
+        :rtype: numpy.ndarray
+        """
+        return self.dtime[self._photon_mask(channel)]
+
+    def syncs(self):
+        """ T2 mode: times of the sync events. """
+        return self.time[self.special & (self.channel == 0)]
+
+    def markers(self):
+        """
+        Markers (external signals on the marker inputs).
+
+        :return: marker numbers (1 to 15) and their times
+        :rtype: tuple of numpy.ndarray
+        """
+        mask = self.special & (self.channel > 0)
+        return self.channel[mask], self.time[mask]
+
+
+class TTTRDecoder:
+    """
+    Decodes the TTTR records of the Hydraharp into a TTTRChunk with vectorized numpy operations.
+    The decoder keeps the number of overflows, so the times continue from one call of decode() to the next.
+
+    :param mode: 'T2' or 'T3'
+    :type mode: str
+    """
+    def __init__(self, mode):
+        if mode not in TTTR_WRAPAROUND:
+            raise ValueError('mode should be one of {}, not {}'.format(tuple(TTTR_WRAPAROUND), mode))
+        self.mode = mode
+        self.wraparound = TTTR_WRAPAROUND[mode]
+        self.overflows = 0      # number of wraparounds of the time field so far
+
+    def decode(self, records):
+        """
+        Decodes records. The returned arrays are new, so the buffer of records can be reused right away.
+
+        :param records: TTTR records as read from the FIFO
+        :type records: numpy.ndarray of uint32
+        :rtype: TTTRChunk
+        """
+        records = np.asarray(records, dtype=np.uint32)
+        special = (records >> 31).astype(bool)
+        channel = ((records >> 25) & 0x3F).astype(np.uint8)
+        if self.mode == 'T2':
+            tag = records & 0x1FFFFFF
+            dtime = None
+        else:
+            tag = records & 0x3FF
+            dtime = ((records >> 10) & 0x7FFF).astype(np.uint16)
+        overflow = special & (channel == _OVERFLOW_CHANNEL)
+        periods = np.cumsum(np.where(overflow, np.maximum(tag, 1), 0), dtype=np.int64)
+        periods += self.overflows
+        if len(periods):
+            self.overflows = int(periods[-1])
+        keep = ~overflow
+        time = periods[keep] * self.wraparound + tag[keep]
+        return TTTRChunk(self.mode, time, channel[keep], special[keep], None if dtime is None else dtime[keep],
+                         len(records))
+
+
+def encode_tttr(mode, time, channel, special=None, dtime=None, previous=0):
+    """
+    Makes TTTR records like the Hydraharp does (the inverse of TTTRDecoder), with the overflow records added where
+    the time field wraps around. Used for fake and test streams.
+
+    :param mode: 'T2' or 'T3'
+    :type mode: str
+    :param time: sorted times (T2: in units of the base resolution, T3: sync numbers)
+    :type time: numpy.ndarray
+    :param channel: channel numbers
+    :type channel: numpy.ndarray
+    :param special: True for markers and sync events (defaults to None, meaning all photons)
+    :type special: numpy.ndarray or None
+    :param dtime: T3 mode: times after the sync in units of the resolution (defaults to None, meaning 0)
+    :type dtime: numpy.ndarray or None
+    :param previous: time of the record before these (defaults to 0, the start of the measurement)
+    :type previous: int
+    :return: records
+    :rtype: numpy.ndarray of uint32
+    """
+    wraparound = TTTR_WRAPAROUND[mode]
+    time = np.asarray(time, dtype=np.int64)
+    records = (np.asarray(channel, dtype=np.uint32) << 25) | (time % wraparound).astype(np.uint32)
+    if special is not None:
+        records |= np.asarray(special, dtype=np.uint32) << 31
+    if mode == 'T3' and dtime is not None:
+        records |= np.asarray(dtime, dtype=np.uint32) << 10
+    # overflow records before each event that is in a later period than the one before it; one record holds at most
+    # the maximum of the time field, so large jumps need more than one
+    jumps = np.diff(time // wraparound, prepend=previous // wraparound)
+    largest = wraparound - 1
+    number = -(-jumps // largest)
+    if not number.any():
+        return records
+    before = np.repeat(np.arange(len(time)), number)
+    index_in_jump = np.arange(len(before)) - np.repeat(np.cumsum(number) - number, number)
+    counts = np.minimum(np.repeat(jumps, number) - index_in_jump * largest, largest)
+    overflows = np.uint32(1 << 31 | _OVERFLOW_CHANNEL << 25) | counts.astype(np.uint32)
+    return np.insert(records, before, overflows)
+
+
+class TTTRStream:
+    """
+    Reads the FIFO of the Hydraharp in T2 or T3 mode on a background thread and puts the decoded records (TTTRChunk) on
+    a bounded queue. Normally made by Hydraharp.stream().
+    The records are read into one preallocated ctypes buffer of TTREADMAX records that is reused for every read.
+    The numpy array records is a view on it (no copy) and the decoder makes the arrays that go on the queue.
+
+    The thread stops when the acquisition time has ended and the FIFO is empty, when stop() is called or when an error
+    happens (e.g. the FIFO of the device ran full because the records were not read fast enough). The measurement is
+    then stopped and the end of the stream is put on the queue (None). The end never takes the place of a chunk: if the
+    queue is full, it waits for room ('block', until stop()) or is left out, and iterating ends when the thread has
+    finished and the queue is empty.
+    When the queue is full the overflow policy decides what happens (like BoundedQueueHandler in hyperion.core):
+
+    - 'block': wait until there's room in the queue (default, the records wait in the FIFO of the device)
+    - 'drop_oldest': the oldest chunk in the queue is dropped to make room
+    - 'drop_new': the new chunk is dropped
+
+    The number of dropped chunks is counted in dropped.
+
+    :param controller: the controller, initialized in T2 or T3 mode
+    :type controller: Hydraharp
+    :param queue_size: maximum number of chunks in the queue (defaults to 64)
+    :type queue_size: int
+    :param overflow: 'block', 'drop_oldest' or 'drop_new' (defaults to 'block')
+    :type overflow: str
+    """
+    overflow_policies = ('block', 'drop_oldest', 'drop_new')
+    idle_wait = 0.001       # time in s to wait after reading an empty FIFO
+
+    def __init__(self, controller, queue_size=64, overflow='block'):
+        if overflow not in self.overflow_policies:
+            raise ValueError('overflow should be one of {}, not {}'.format(self.overflow_policies, overflow))
+        self.logger = logging.getLogger(__name__)
+        self.controller = controller
+        self.decoder = TTTRDecoder(controller.mode)
+        self.overflow = overflow
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.buffer = (ctypes.c_uint * controller.settings['TTREADMAX'])()
+        self.records = np.ctypeslib.as_array(self.buffer)
+        self.total = 0          # number of records read
+        self.dropped = 0        # number of chunks dropped because the queue was full
+        self.error = None       # the exception that stopped the stream
+        self._stop = threading.Event()
+        self._ended = False     # the end of the stream was taken from the queue
+        self._thread = threading.Thread(target=self._reader, name='Hydraharp FIFO reader', daemon=True)
+
+    def start(self, acquisition_time):
+        """
+        Starts the measurement and the thread that reads it.
+
+        :param acquisition_time: Acquisition time in ms
+        :type acquisition_time: int
+        :return: the stream itself
+        :rtype: TTTRStream
+        """
+        self.controller.start_measurement(acquisition_time)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stops the measurement and waits for the thread to finish. The chunks in the queue can still be read. """
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    @property
+    def running(self):
+        """ True while the thread is reading. """
+        return self._thread.is_alive()
+
+    def __iter__(self):
+        """ Yields the chunks until the end of the stream. Raises the error that stopped the stream, if any. """
+        while not self._ended:
+            try:
+                chunk = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                # the end of the stream may not be on the queue (see _put_end())
+                if not self._thread.is_alive() and self.queue.empty():
+                    self._ended = True
+                continue
+            if chunk is None:
+                self._ended = True
+                break
+            yield chunk
+        if self.error is not None:
+            raise self.error
+
+    def _reader(self):
+        # Runs on the background thread
+        controller = self.controller
+        ended = False
+        try:
+            while not self._stop.is_set():
+                flags = controller.flags
+                if flags and flags & FLAG_FIFOFULL:
+                    raise RuntimeError('The FIFO of the Hydraharp ran full, records were lost')
+                number = controller.read_fifo(self.buffer)
+                if number:
+                    self.total += number
+                    self._put(self.decoder.decode(self.records[:number]))
+                elif ended:
+                    break
+                else:
+                    # the records that arrive before the end of the acquisition time are read in the next loop
+                    ended = controller.ctc_status
+                    if not ended:
+                        time.sleep(self.idle_wait)
+        except Exception as e:
+            self.error = e
+            self.logger.error('Reading the FIFO of the Hydraharp failed: {}'.format(e))
+        finally:
+            try:
+                controller.stop_measurement()
+            finally:
+                self._put_end()
+        self.logger.debug('Stream ended after %s records', self.total)
+
+    def _put(self, item):
+        # Puts a chunk on the queue following the overflow policy
+        if self.overflow == 'block':
+            while not self._stop.is_set():
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+            self.dropped += 1       # stopped while the queue was full
+            return
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                if self.overflow == 'drop_new':
+                    self.dropped += 1
+                    return
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+
+    def _put_end(self):
+        # Puts the end of the stream (None) on the queue without dropping chunks for it: in 'block' mode it waits for
+        # room until stop(), otherwise it's only put if there's room. __iter__ also ends without it.
+        while True:
+            try:
+                self.queue.put(None, timeout=0.1)
+                return
+            except queue.Full:
+                if self.overflow != 'block' or self._stop.is_set():
+                    return
+
+
+class HydraharpDummy(Hydraharp):
+    """
+    Hydraharp Dummy
+    ===============
+
+    Hydraharp controller that uses FakeHHLib (see hyperion.controller.picoquant.hhlib_fake) instead of the library of
+    the device. The options of FakeHHLib (e.g. the count rates, or TTTR records to replay) can be given in the config
+    as a dict under the key 'fake'.
+    """
+    def _load_library(self):
+        from hyperion.controller.picoquant.hhlib_fake import FakeHHLib
+        return FakeHHLib(**self._config.get('fake', {}))
+
    
 if __name__ == "__main__":
     
@@ -84,6 +84,31 @@ After creating a logger object you can still:
   logman.set_logger_stream_level(my_handler, 'WARNING')
   logman.set_logger_file_level(my_handler, logman.INFO)
 
+Logging in loops that run often:
+^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+The LoggingManager sets the level of each logger to the lowest level of its handlers (see update_levels()). So if the
+handlers don't print DEBUG, a call like logger.debug(...) returns immediately after a cached level check.
+To also avoid building the message, pass the arguments %-style instead of formatting the string yourself:
+logger.debug('Received message: %s', ans)          # ans is only converted to a string if the message is printed
+instead of logger.debug('Received message: {}'.format(ans)).
+For something expensive to compute, use: if logger.isEnabledFor(logman.DEBUG): logger.debug(...)
+
+Structured log file:
+^^^^^^^^^^^^^^^^^^^^
+
+For long measurements the regular log file (which is rotated at 5MB) may not be enough. An additional structured log
+file stores all records (by default at DEBUG level) compactly as JSON lines, written in batches:
+logman.set_structured_file()                     # hyperion.jsonl.gz in the default path
+To view it, filtered on time, logger and level, in the usual layout, run e.g.:
+python -m hyperion.tools.log_query hyperion.jsonl.gz --start "2020-03-04 01:00" --logger hyperion.controller --level INFO
+
+Recent records in memory:
+^^^^^^^^^^^^^^^^^^^^^^^^^
+
+logman.set_ring_buffer() keeps the last 100000 records in memory (see RingBufferHandler). The ExpGui shows them in a
+dock (Tools > Log) and the error dialogs write them to a file with logman.dump_ring_buffer().
+
 Finally, explanation of setting up the handlers:
 ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
@@ -95,13 +120,21 @@ The arguements in both set_stream and set_file are:
 
 - level                 If omitted, the default value is used
                         (default value can be set by logman.stream_level / logman.file_level)
-- reduce_duplicates     Enables a Filer that detect repeated log comments (that were in a loop) and reduces the number
-                        of lines printed. Defaults to True
+- reduce_duplicates     Enables a Filter (DuplicateFilter) that limits the number of lines printed by the same line of
+                        code (e.g. in a loop) and regularly prints how many were suppressed. Defaults to True
 - compact               A float between 0 and 1. A measure of how long or compact a line will be. 0 Means full length.
                         As the value of compact is increased the lines will become shorter. At 1 the line will be most
                         compact and it will be cut off at length maxwidth.
                         Default value for set_stream is 0.5, default value for set_file is 0
 - maxwidth              See description of compact. Default value is 119
+- use_queue             If True, the handler only puts the log records on a (bounded) queue and a background thread
+                        filters, formats and writes them. This keeps logging in fast loops cheap. Defaults to
+                        logman.use_queue (which is False). Use logman.flush() to wait until everything is written.
+                        logman.finalize() (which is called automatically at exit) writes what's left in the queues.
+- queue_size            Maximum number of records in the queue (only with use_queue). Defaults to 10000
+- overflow              What to do if the queue is full (only with use_queue): 'drop_new' (default) drops the new record,
+                        'drop_oldest' drops the oldest record in the queue and 'block' waits until there's room.
+                        The number of dropped records is reported in the log.
 
 Arguments only in set_stream:
 
@@ -199,9 +232,15 @@ example code 2:
 
 
 import os
+import copy
+import gzip
+import json
+import queue
+import atexit
 import logging
+from collections import deque
 import logging.handlers
-from time import time, sleep
+from time import time, sleep, strftime, localtime
 from datetime import datetime
 from sys import modules
 
@@ -377,32 +416,85 @@ class ANSIcolorFormat:
 # Setting up logging =================================================
 
 class DuplicateFilter(logging.Filter):
-    """ Adding this filter to a logging handler will reduce repeated log-prints"""
+    """
+    Adding this filter to a logging handler will reduce repeated log-prints.
+    It limits the number of records per call site (file and line number) with a token bucket: a call site can log burst
+    records in a row, after which it can log rate records per second. Records above that limit are suppressed and
+    counted. Every summary_interval seconds (when that call site logs again) a summary record like
+    'Suppressed 312 messages from this line in the last 20 s' is passed to handler. Summaries that are still pending are
+    passed by flush() (LoggingManager.flush() and finalize() call it).
+    Records at exempt_level or higher (by default warnings and errors) are never suppressed.
+    Records are not modified, so other handlers see the original message.
+
+    :param handler: the handler that the filter is added to (used to print the summaries). None prints no summaries.
+    :type handler: logging.Handler or None
+    :param rate: records per second per call site (on average) that are let through (defaults to 0.2)
+    :type rate: float
+    :param burst: number of records in a row a call site can log before it's limited (defaults to 10)
+    :type burst: int
+    :param summary_interval: minimum time in seconds between summaries of a call site (defaults to 20)
+    :type summary_interval: float
+    :param exempt_level: records at this level or higher are never suppressed (defaults to WARNING)
+    :type exempt_level: int
+    """
+    def __init__(self, handler=None, rate=0.2, burst=10, summary_interval=20, exempt_level=logging.WARNING):
+        super().__init__()
+        self.handler = handler
+        self.rate = rate
+        self.burst = burst
+        self.summary_interval = summary_interval
+        self.exempt_level = exempt_level
+        # (pathname, lineno) -> [tokens, time of last record, suppressed, time of last summary, last suppressed record]
+        self._buckets = {}
+
     def filter(self, record):
-        # Note to self. It appears the message from one handler is passed to the next one.
-        # This means that if one handler modifies the message, the next one gets the modified version.
-        self.repeat_message = ' > Logger message is being repeated...'
-        # First strip the repeat_message from the message if it is there:
-        replen = len(self.repeat_message)
-        if len(record.msg) > replen and record.msg[-replen:] == self.repeat_message:
-            record.msg = record.msg[:-replen]
-        # Combine filename, linenumber and (corrected) message to create a record to compare
-        current_record = (record.module, record.lineno, record.msg)
-        # Compare it to the last record stored (if that variable exists)
-        if current_record != getattr(self, "last_record", None):
-            self.last_record = current_record  # store the current record in last_record, to be able to compare it on the next call
-            self.last_unique_time = time()  # store the time of this message
-            self.repeating = False  # set repeating flag to False
-            return True  # Allow this record to be printed
-        else:
-            if not self.repeating:
-                self.repeating = True  # set repeating flag True
-            elif time() > self.last_unique_time + 20:  # if repeting==True AND 20 seconds have passed reset "timer"
-                self.last_unique_time = time()  # reset the last_unique_time to in order repeat occasionally
-            else:
-                return False  # prevent message from being printed during those 20 seconds
-            record.msg += self.repeat_message  # append repeat message
-            return True  # allow the message to be printed
+        if record.levelno >= self.exempt_level:
+            return True
+        now = record.created
+        bucket = self._buckets.get((record.pathname, record.lineno))
+        if bucket is None:
+            self._buckets[(record.pathname, record.lineno)] = [self.burst - 1, now, 0, now, None]
+            return True
+        tokens = bucket[0] + (now - bucket[1]) * self.rate
+        bucket[1] = now
+        if tokens > self.burst:
+            tokens = self.burst
+        allow = tokens >= 1
+        bucket[0] = tokens - 1 if allow else tokens
+        if not allow:
+            bucket[2] += 1
+            bucket[4] = record
+        if bucket[2] and now - bucket[3] >= self.summary_interval:
+            self._summarize(record, bucket[2], now - bucket[3])
+            bucket[2] = 0
+            bucket[3] = now
+        elif not bucket[2]:
+            bucket[3] = now
+        return allow
+
+    def _summarize(self, record, suppressed, interval):
+        """ Passes a record to the handler that says how many records of the call site of record were suppressed. """
+        if self.handler is None:
+            return
+        summary = logging.makeLogRecord({'name': record.name, 'levelno': record.levelno,
+                                         'levelname': record.levelname, 'pathname': record.pathname,
+                                         'module': record.module, 'lineno': record.lineno, 'funcName': record.funcName,
+                                         'msg': 'Suppressed {} messages from this line in the last {:.0f} s'.format(
+                                             suppressed, interval)})
+        self.handler.acquire()
+        try:
+            self.handler.emit(summary)
+        finally:
+            self.handler.release()
+
+    def flush(self):
+        """ Passes the summaries of all call sites that have suppressed records since their last summary. """
+        for bucket in list(self._buckets.values()):
+            if bucket[2]:
+                suppressed, bucket[2] = bucket[2], 0
+                self._summarize(bucket[4], suppressed, bucket[1] - bucket[3])
+                bucket[3] = bucket[1]
+
 
 class CustomFormatter(logging.Formatter):
     """
@@ -413,6 +505,8 @@ class CustomFormatter(logging.Formatter):
     The possible regular color schemes are: bright, dim, mixed, bg, universal. The optional additional secondary color
     schemes for Spyder are: spy_bright, spy_dim, spy_mixed, spy_bg, spy_universal.
     Specifying no color_scheme defaults to bright (and spy_bright if Spyder is detected).
+    The time is taken from the record (i.e. when it was logged, also if it's formatted later on another thread). The
+    layout and (colored) level names are precomputed and the truncated names are cached per module and function.
 
     :param compact: float from 0 for full length, to 1 for very compact (defaults to 0)
     :param maxwidth: integer indicating max line width when compact is 1. None (default) uses 119.
@@ -519,62 +613,375 @@ class CustomFormatter(logging.Formatter):
                 print('WARNING: invalid color_scheme(s). (using defaults instead)')
                 self.color_scheme = __default_scheme_spyder if __spyder else __default_scheme
 
-        if compact > 1:
-            self.compact = 1
-        if compact < 0:
-            self.compact = 0
-        else:
-            self.compact = compact
+        self.compact = min(max(compact, 0), 1)
         self.color = color
         self.short_names = {10: 'DEBUG', 20: 'INFO', 30: 'WARN', 40: 'ERROR', 50: 'CRIT'}
         self.ansicol = ANSIcolorFormat()
         if maxwidth is None: maxwidth = 119                     # default value goes here
         self.maxwidth = int(maxwidth if maxwidth>56 else 56)    # shorter then 53 might cause errors
         super(CustomFormatter, self).__init__()
+        self._build_layout()
 
-    def format(self, record):
-        module = record.name
-        func = record.funcName
-        if self.compact<=0.5:
-            lvl_str = '{:>8} '.format(record.levelname)
+    def _build_layout(self):
+        """
+        Precomputes everything that only depends on the settings: the widths, the line layout and the (colored) level
+        strings. Also clears the caches of timestamps and names.
+        Call this after changing compact, maxwidth, color or color_scheme of an existing formatter.
+        """
+        self._lmod = 50 if self.compact == 0 else int(50 - 33 * self.compact)  # >=14
+        self._lfun = 30 if self.compact == 0 else int(32 - 20 * self.compact)  # >=12
+        if self.compact <= 0.5:
+            self._layout = '{} |{} |{:>5} | {}|{}| {}'
+            self._time_format = '%Y-%m-%d %H:%M:%S' if self.compact == 0 else '%H:%M:%S'
         else:
-            lvl_str = '{:>5}'.format(self.short_names[record.levelno])
-        if self.color:
-            if record.levelno not in self.color_schemes[self.color_scheme]:
-                lvl_str = self.ansicol(lvl_str, self.color_schemes[self.color_scheme][None])
-            else:
-                lvl_str = self.ansicol(lvl_str, self.color_schemes[self.color_scheme][record.levelno])
-        if self.compact == 0:            # The full length version
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]  # show 3 out of 6 digits (i.e. milliseconds)
-            message = '{} |{:>50} |{:>5} | {:32}|{}| {}'.format(timestamp, module, record.lineno, func + '()', lvl_str, record.msg)
+            self._layout = '{} {} {:>4} {} {} {}'
+            self._time_format = '%H:%M:%S'
+        self._level_strings = {}
+        self._names = {}
+        self._last_second = None
+        self._last_timestamp = ''
+
+    def _level_string(self, record, colored):
+        """ Returns the (colored) level string of the record and remembers it for its level. """
+        if self.compact <= 0.5:
+            lvl_str = '{:>8} '.format(record.levelname)
         else:
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            # module = '.'.join(module.split('.')[1:])  # strip off the first word before '.'(i.e. hyperion)
-            lmod = int(50 - 33 * self.compact)  # >=14
-            lfun = int(32 - 20 * self.compact)  # >=12
+            lvl_str = '{:>5}'.format(self.short_names.get(record.levelno, record.levelname[:5]))
+        if colored:
+            scheme = self.color_schemes[self.color_scheme]
+            lvl_str = self.ansicol(lvl_str, scheme[record.levelno if record.levelno in scheme else None])
+        self._level_strings[(record.levelno, colored)] = lvl_str
+        return lvl_str
+
+    def _name_strings(self, name, func):
+        """ Returns the truncated and padded module and function name and remembers them for (name, func). """
+        lmod, lfun = self._lmod, self._lfun
+        module, function = name, func
+        if self.compact > 0:
             if len(module) > lmod:
                 module = '...' + module[-(lmod - 3):]  # truncate from the left
-            if len(func) > lfun:
-                func = func[:(lfun - 3)] + '...'
-
-            if self.compact <= 0.5:
-                message = '{} |{:>{mod_w}} |{:>5} | {:{fun_w}}|{}| {}'.format(timestamp, module, record.lineno,func + '()',
-                                                                              lvl_str, record.msg, mod_w=lmod, fun_w=lfun+2)
-            else:
-                if record.lineno > 9999:
-                    linenr = '>10k'
-                else:
-                    linenr = record.lineno
-                tmpmsg = record.msg.replace('\n',' ')
+            if len(function) > lfun:
+                function = function[:(lfun - 3)] + '...'
+        strings = ('{:>{}}'.format(module, lmod), '{:{}}'.format(function + '()', lfun + 2))
+        self._names[(name, func)] = strings
+        return strings
 
-                if self.compact==1 and len(tmpmsg) > (self.maxwidth-53):
-                    msg = tmpmsg[:(self.maxwidth-56)]+'...'
-                else:
-                    msg = record.msg
-                message = '{} {:>{mod_w}} {:>4} {:{fun_w}} {} {}'.format(timestamp, module, linenr, func + '()',
-                                                                          lvl_str, msg, mod_w=lmod, fun_w=lfun+2)
+    def format(self, record):
+        # The date and time (without milliseconds) only change once per second:
+        second = int(record.created)
+        if second != self._last_second:
+            self._last_second = second
+            self._last_timestamp = strftime(self._time_format, localtime(second))
+        if self.compact == 0:
+            timestamp = '{}.{:03d}'.format(self._last_timestamp, int(record.msecs))  # show milliseconds
+        else:
+            timestamp = self._last_timestamp
+
+        try:
+            module, func = self._names[(record.name, record.funcName)]
+        except KeyError:
+            module, func = self._name_strings(record.name, record.funcName)
+        colored = self.color and self.ansicol.enabled
+        try:
+            lvl_str = self._level_strings[(record.levelno, colored)]
+        except KeyError:
+            lvl_str = self._level_string(record, colored)
+
+        msg = record.getMessage()
+        if self.compact <= 0.5:
+            return self._layout.format(timestamp, module, record.lineno, func, lvl_str, msg)
+        linenr = '>10k' if record.lineno > 9999 else record.lineno
+        if self.compact == 1 and len(msg) > (self.maxwidth - 53):
+            msg = msg.replace('\n', ' ')[:(self.maxwidth - 56)] + '...'
+        return self._layout.format(timestamp, module, linenr, func, lvl_str, msg)
+
+class _QueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener that also reports records that were dropped by its BoundedQueueHandler (as a warning, just before
+    the next record is handled) and that can put its stop-sentinel on a full queue.
+    """
+    def __init__(self, owner):
+        super().__init__(owner.queue, owner.target)
+        self.owner = owner
+        self._reported = 0
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)      # blocking: the queue may be full
+
+    def handle(self, record):
+        dropped = self.owner.dropped
+        if dropped > self._reported:
+            msg = '{} log records were dropped (queue of {} records was full)'.format(dropped - self._reported,
+                                                                                   self.queue.maxsize)
+            self._reported = dropped
+            self.owner.target.handle(logging.makeLogRecord({'name': __name__, 'msg': msg, 'levelno': logging.WARNING,
+                                                            'levelname': 'WARNING', 'funcName': 'handle',
+                                                            'lineno': 0, 'module': 'core'}))
+        super().handle(record)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Handler that puts log records on a bounded queue. A background thread (a QueueListener) takes them off the queue and
+    passes them to the target handler, which does the filtering, formatting and writing. The thread that logs only
+    merges the message with its arguments.
+    When the queue is full the overflow policy decides what happens:
+
+    - 'drop_new': the new record is dropped (default, never blocks)
+    - 'drop_oldest': the oldest record in the queue is dropped to make room
+    - 'block': wait until there's room in the queue
+
+    The number of dropped records is counted in dropped and reported in the log.
+    If the listener is not running (e.g. after LoggingManager.finalize()) records are passed to the target directly.
+
+    :param target: handler that does the actual work (e.g. a StreamHandler or RotatingFileHandler)
+    :type target: logging.Handler
+    :param queue_size: maximum number of records in the queue (defaults to 10000)
+    :type queue_size: int
+    :param overflow: 'drop_new', 'drop_oldest' or 'block' (defaults to 'drop_new')
+    :type overflow: str
+    """
+    overflow_policies = ('drop_new', 'drop_oldest', 'block')
+
+    def __init__(self, target, queue_size=10000, overflow='drop_new'):
+        if overflow not in self.overflow_policies:
+            raise ValueError('overflow should be one of {}, not {}'.format(self.overflow_policies, overflow))
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.target = target
+        self.overflow = overflow
+        self.dropped = 0
+        self.listener = _QueueListener(self)
+        self.running = False
+
+    def start(self):
+        """ Starts the background thread. """
+        if not self.running:
+            self.listener.start()
+            self.running = True
+
+    def stop(self):
+        """ Handles all records that are still in the queue, stops the background thread and flushes the target. """
+        if self.running:
+            self.running = False
+            self.listener.stop()
+        self.target.flush()
+
+    def flush(self):
+        """ Waits until all records in the queue are handled and flushes the target. """
+        if self.running:
+            self.queue.join()
+        self.target.flush()
+
+    def prepare(self, record):
+        # Unlike QueueHandler.prepare() this does not format the record, that is done by the target. Like it, it works on
+        # a copy, because other handlers of the logger get the same record.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.overflow == 'block':
+            self.queue.put(record)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                if self.overflow == 'drop_new':
+                    self.dropped += 1
+                    return
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+
+    def emit(self, record):
+        if self.running:
+            super().emit(record)
+        else:
+            self.target.handle(record)
+
+
+def _json_default(obj):
+    """ Converts objects that json can't store: numpy scalars to python numbers, anything else to a string. """
+    if type(obj).__module__ == 'numpy' and hasattr(obj, 'item'):
+        try:
+            return obj.item()
+        except ValueError:      # an array with more than one element
+            pass
+    return str(obj)
+
+
+class StructuredFileHandler(logging.Handler):
+    """
+    Handler that stores log records as JSON lines (one dict per record) instead of formatted text, to keep long logs
+    (e.g. a night at DEBUG level) small and searchable. Each line holds the time, level, logger name, module, function,
+    line number, thread, the message (template) and its arguments. The message is not formatted (i.e. the arguments
+    not merged) when the record is stored.
+    Records are collected in memory and appended to the file in batches: when batch_size records are waiting, when a
+    record comes in more than flush_interval seconds after the last write, and on flush() and close().
+    If the filename ends with .gz each batch is appended as a gzip member, which gzip (and log_query) reads as one file.
+    Use hyperion.tools.log_query to filter the file and print it in the CustomFormatter layout.
+
+    :param filename: full file path
+    :type filename: str
+    :param batch_size: maximum number of records in memory (defaults to 1000)
+    :type batch_size: int
+    :param flush_interval: maximum time in seconds between writes while records come in (defaults to 5)
+    :type flush_interval: float
+    """
+    def __init__(self, filename, batch_size=1000, flush_interval=5):
+        super().__init__()
+        self.filename = filename
+        self.compress = filename.endswith('.gz')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._batch = []
+        self._last_write = time()
+
+    def emit(self, record):
+        try:
+            entry = {'time': record.created, 'level': record.levelno, 'logger': record.name, 'module': record.module,
+                     'func': record.funcName, 'lineno': record.lineno, 'thread': record.threadName,
+                     'msg': record.msg if type(record.msg) is str else str(record.msg)}
+            if record.args:
+                entry['args'] = record.args
+            if record.exc_info:
+                entry['exc'] = logging.Formatter().formatException(record.exc_info)
+            # Converted right away, so (mutable) arguments are stored as they are when the record is logged:
+            self._batch.append(self._dumps(entry))
+            if len(self._batch) >= self.batch_size or record.created - self._last_write > self.flush_interval:
+                self._write()
+        except Exception:
+            self.handleError(record)
+
+    def _write(self):
+        """ Appends the records in memory to the file. """
+        self._last_write = time()
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        data = ''.join(line + '\n' for line in batch).encode('utf-8')
+        with open(self.filename, 'ab') as f:
+            f.write(gzip.compress(data) if self.compress else data)
+
+    @staticmethod
+    def _dumps(entry):
+        # The JSON line of entry; arguments that json can't store (e.g. a circular list) are stored as their repr
+        try:
+            return json.dumps(entry, default=_json_default)
+        except ValueError:
+            args = entry['args']
+            entry['args'] = [repr(arg) for arg in args] if type(args) is tuple else repr(args)
+            return json.dumps(entry, default=_json_default)
+
+    def flush(self):
+        self.acquire()
+        try:
+            self._write()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Handler that keeps the last capacity log records in memory, as compact tuples:
+    (created, levelno, name, funcName, lineno, msg, args). The message is formatted when the record is stored (so
+    later changes to mutable arguments don't change it) and args is None.
+    Appending is done without the handler lock (a deque with maxlen is thread safe), so it's cheap to keep it running.
+    The gui (see hyperion.view.log_viewer) shows the records, and they can be written to a file with dump().
+
+    If follow_levels is True, the handler doesn't lower the levels of the loggers (see LoggingManager.update_levels()),
+    so it keeps the records that the other handlers of the logger receive, and logging stays as cheap as without it.
+
+    :param capacity: number of records to keep (defaults to 100000)
+    :type capacity: int
+    :param follow_levels: whether the handler is left out when the levels of the loggers are determined
+    :type follow_levels: bool
+    """
+    fields = ('created', 'levelno', 'name', 'funcName', 'lineno', 'msg', 'args')
+
+    def __init__(self, capacity=100000, follow_levels=False):
+        super().__init__()
+        self.buffer = deque(maxlen=capacity)
+        self.follow_levels = follow_levels
+        self.total = 0      # number of records received (also counting the ones that dropped out of the buffer)
+
+    def handle(self, record):
+        # Unlike logging.Handler.handle() this doesn't acquire the lock
+        if self.filter(record):
+            self.emit(record)
+        return True
+
+    def emit(self, record):
+        try:
+            msg = record.getMessage()
+        except Exception:       # e.g. arguments that don't match the message
+            msg = '{} {}'.format(record.msg, record.args)
+        self.buffer.append((record.created, record.levelno, record.name, record.funcName, record.lineno, msg, None))
+        self.total += 1
+
+    def records(self, level=logging.DEBUG, logger=None):
+        """
+        Returns (a copy of) the records in the buffer at level or higher, optionally only those whose logger name
+        contains the string logger.
+
+        :param level: minimum level (defaults to DEBUG)
+        :type level: int
+        :param logger: part of the logger name (None for all)
+        :type logger: str or None
+        :return: list of tuples, see fields
+        """
+        records = list(self.buffer)
+        if level > logging.DEBUG:
+            records = [r for r in records if r[1] >= level]
+        if logger:
+            records = [r for r in records if logger in r[2]]
+        return records
+
+    @staticmethod
+    def to_log_record(entry):
+        """ Converts a tuple from the buffer into a logging.LogRecord (e.g. to pass it to a formatter). """
+        created, levelno, name, func, lineno, msg, args = entry
+        return logging.makeLogRecord({'created': created, 'msecs': (created % 1) * 1000, 'levelno': levelno,
+                                      'levelname': logging.getLevelName(levelno), 'name': name, 'funcName': func,
+                                      'lineno': lineno, 'msg': msg, 'args': args})
+
+    def dump(self, filename, formatter=None):
+        """
+        Writes all records in the buffer to a text file.
+
+        :param filename: full file path
+        :type filename: str
+        :param formatter: formatter to use (defaults to CustomFormatter())
+        :type formatter: logging.Formatter or None
+        """
+        if formatter is None:
+            formatter = CustomFormatter()
+        with open(filename, 'w', encoding='utf-8') as f:
+            for entry in list(self.buffer):
+                try:
+                    line = formatter.format(self.to_log_record(entry))
+                except Exception:       # e.g. arguments that don't match the message
+                    line = '{} {}'.format(entry[5], entry[6])
+                f.write(line + '\n')
+
+
+def _handler_type(handler):
+    """ Returns the type of the handler, or of its target handler if it's a BoundedQueueHandler. """
+    return type(handler.target) if isinstance(handler, BoundedQueueHandler) else type(handler)
 
-        return message
 
 class LoggingManager(metaclass=Singleton):
     """
@@ -586,6 +993,7 @@ class LoggingManager(metaclass=Singleton):
     :ivar enable_file:   (bool) If true, the file handler is passed to newly created logger objects (default is True)
     :ivar default_path:  (str) Default path for logfile when file handler is created without specifying path (default hyperion.log_path)
     :ivar default_name:  (str) Default filename for logfile when file handler is created without specifying filename (default 'hyperion.log;)
+    :ivar use_queue:     (bool) Default for the use_queue argument of set_stream() and set_file() (default is False)
     """
     CRITICAL = logging.CRITICAL
     ERROR = logging.ERROR
@@ -602,13 +1010,20 @@ class LoggingManager(metaclass=Singleton):
         self.default_name = default_name
         self._default_stream_level = logging.DEBUG
         self._default_file_level = logging.DEBUG
+        self.use_queue = False
+        self._loggers = {}          # name -> logger object, of all loggers created by getLogger (see update_levels)
+        self._queue_handlers = []   # BoundedQueueHandlers that were started (see finalize)
         temp = CustomFormatter()  # Without this line it seems to cause a bug
         self.set_stream()
         self.file_handler = None    # don't create it until it's necessary
         self.enable_stream = True   # add streamhandler to new logger objects, default value
         self.enable_file = True     # add filehandler to new logger objects, default value
+        self.structured_handler = None  # see set_structured_file
+        self.ring_buffer = None         # see set_ring_buffer
+        self._last_dump = (0, None)     # time and filename of the last dump_ring_buffer()
 
-    def set_stream(self, color=True, level = None, compact=0.5, reduce_duplicates=True, maxwidth=None, color_scheme=None, **kwargs):
+    def set_stream(self, color=True, level = None, compact=0.5, reduce_duplicates=True, maxwidth=None, color_scheme=None,
+                   use_queue=None, queue_size=10000, overflow='drop_new', **kwargs):
         """
         Sets (replaces) the stream handler in the logging manager object.
 
@@ -618,19 +1033,26 @@ class LoggingManager(metaclass=Singleton):
         :param maxwidth: see CustomFormatter
         :param reduce_duplicates: (bool) (defaults to True)
         :param color_scheme: (str or (str,str) ) color scheme to use, see above for possible values
+        :param use_queue: (bool or None) format and print on a background thread, see BoundedQueueHandler. None (default) uses object.use_queue
+        :param queue_size: (int) maximum number of records waiting in the queue (defaults to 10000)
+        :param overflow: (str) what to do when the queue is full: 'drop_new' (default), 'drop_oldest' or 'block'
         :param **kwargs: additional keyword arguments are passed into logging.StreamHandler()
         :return:
         """
         self.enable_stream = True
-        self.stream_handler = logging.StreamHandler(**kwargs)
-        self.stream_handler.setFormatter(CustomFormatter(compact=compact, color=color, color_scheme=color_scheme, maxwidth=maxwidth))
+        handler = logging.StreamHandler(**kwargs)
+        handler.setFormatter(CustomFormatter(compact=compact, color=color, color_scheme=color_scheme, maxwidth=maxwidth))
+        if reduce_duplicates:
+            handler.addFilter(DuplicateFilter(handler))
+        old_handler = getattr(self, 'stream_handler', None)
+        self.stream_handler = self._wrap(handler, use_queue, queue_size, overflow)
         if level is None:
             level = self._default_stream_level
         self.stream_handler.setLevel(level)  # default level for stream handler
-        if reduce_duplicates:
-            self.stream_handler.addFilter(DuplicateFilter())
+        self._replace_handler(old_handler, self.stream_handler, add=False)
 
-    def set_file(self, pathname=None, level = None, compact=0, reduce_duplicates=True, maxwidth=None, maxBytes=(5 * 1024 * 1024), backupCount=9, **kwargs):
+    def set_file(self, pathname=None, level = None, compact=0, reduce_duplicates=True, maxwidth=None, maxBytes=(5 * 1024 * 1024), backupCount=9,
+                 use_queue=None, queue_size=10000, overflow='drop_new', **kwargs):
         """
         Sets (replaces) the file handler in the logging manager object.
 
@@ -641,6 +1063,9 @@ class LoggingManager(metaclass=Singleton):
         :param reduce_duplicates: (bool) (defaults to True)
         :param maxBytes: see logging.handlers.RotatingFileHandler() (defaults to 5 * 1024 * 1024)
         :param backupCount: see logging.handlers.RotatingFileHandler() (defaults to 9)
+        :param use_queue: (bool or None) format and write on a background thread, see BoundedQueueHandler. None (default) uses object.use_queue
+        :param queue_size: (int) maximum number of records waiting in the queue (defaults to 10000)
+        :param overflow: (str) what to do when the queue is full: 'drop_new' (default), 'drop_oldest' or 'block'
         :param **kwargs: additional keyword arguments are passed into logging.handlers.RotatingFileHandler()
         """
         self.enable_file = True
@@ -655,13 +1080,144 @@ class LoggingManager(metaclass=Singleton):
         # make the directory if it doesn't exist yet:
         if not os.path.isdir(log_path):
             os.makedirs(log_path)
-        self.file_handler = logging.handlers.RotatingFileHandler(filename=os.path.join(log_path,log_name), maxBytes=maxBytes,
-                                                                 backupCount=backupCount, **kwargs)
-        self.file_handler.setFormatter(CustomFormatter(compact=compact, maxwidth=maxwidth))
+        handler = logging.handlers.RotatingFileHandler(filename=os.path.join(log_path,log_name), maxBytes=maxBytes,
+                                                       backupCount=backupCount, **kwargs)
+        handler.setFormatter(CustomFormatter(compact=compact, maxwidth=maxwidth))
+        if reduce_duplicates:
+            handler.addFilter(DuplicateFilter(handler))
+        old_handler = self.file_handler
+        self.file_handler = self._wrap(handler, use_queue, queue_size, overflow)
         if level is None: level = self._default_file_level
         self.file_handler.setLevel(level)
-        if reduce_duplicates:
-            self.file_handler.addFilter(DuplicateFilter())
+        self._replace_handler(old_handler, self.file_handler, add=False)
+        if old_handler is not None:
+            getattr(old_handler, 'target', old_handler).close()
+
+    def _wrap(self, handler, use_queue, queue_size, overflow):
+        """ Returns handler, or a started BoundedQueueHandler around it if use_queue (or object.use_queue if None). """
+        if use_queue is None:
+            use_queue = self.use_queue
+        if not use_queue:
+            return handler
+        queue_handler = BoundedQueueHandler(handler, queue_size=queue_size, overflow=overflow)
+        queue_handler.start()
+        self._queue_handlers.append(queue_handler)
+        return queue_handler
+
+    def set_structured_file(self, pathname=None, level=None, batch_size=1000, flush_interval=5):
+        """
+        Sets (replaces) the structured file handler (see StructuredFileHandler) and adds it to all loggers created by the
+        manager (and to the ones created later). Unlike the stream and file handler, it is not enabled by default.
+        It can run at DEBUG level during long measurements: the records are stored compactly, are not formatted and are
+        written in batches. To read the file, use hyperion.tools.log_query.
+
+        :param pathname: path or filename or full file-path. If only a path is given the name is the default name with
+                         extension .jsonl.gz. A name ending in .gz is compressed.
+        :param level: logging level (defaults to DEBUG)
+        :param batch_size: (int) maximum number of records kept in memory before writing (defaults to 1000)
+        :param flush_interval: (float) maximum time in seconds between writes while records come in (defaults to 5)
+        """
+        if pathname is None or os.path.dirname(pathname)=='':
+            log_path = self.default_path
+        else:
+            log_path = os.path.dirname(pathname)
+        if pathname is None or os.path.basename(pathname)=='':
+            log_name = os.path.splitext(self.default_name)[0] + '.jsonl.gz'
+        else:
+            log_name = os.path.basename(pathname)
+        if not os.path.isdir(log_path):
+            os.makedirs(log_path)
+        old_handler = self.structured_handler
+        self.structured_handler = StructuredFileHandler(os.path.join(log_path, log_name), batch_size=batch_size,
+                                                        flush_interval=flush_interval)
+        self.structured_handler.setLevel(logging.DEBUG if level is None else level)
+        self._replace_handler(old_handler, self.structured_handler)
+        if old_handler is not None:
+            old_handler.close()
+
+    def set_ring_buffer(self, capacity=100000, level=None):
+        """
+        Sets (replaces) the ring buffer handler (see RingBufferHandler), which keeps the last capacity records in
+        memory, and adds it to all loggers created by the manager (and to the ones created later).
+        It is not enabled by default; ExpGui enables it to show the log in a dock.
+
+        :param capacity: (int) number of records to keep (defaults to 100000)
+        :param level: logging level. None (default) keeps the records that the stream and file handlers receive, without
+                      lowering the levels of the loggers. A level below those (e.g. DEBUG) makes all loggers log at that
+                      level, which costs time for every debug call.
+        """
+        old_handler = self.ring_buffer
+        self.ring_buffer = RingBufferHandler(capacity, follow_levels=level is None)
+        self.ring_buffer.setLevel(logging.DEBUG if level is None else level)
+        self._replace_handler(old_handler, self.ring_buffer)
+
+    def dump_ring_buffer(self, pathname=None, min_interval=10):
+        """
+        Writes the records in the ring buffer to a text file (e.g. when an error occurs). If the buffer was dumped less
+        than min_interval seconds ago it doesn't dump again (to avoid a file for every repetition of an error).
+
+        :param pathname: full file-path. None (default) uses the default path and a name with the date and time.
+        :param min_interval: (float) minimum time in seconds between dumps (defaults to 10)
+        :return: (str or None) the filename (of the last dump), or None if there's no ring buffer
+        """
+        if self.ring_buffer is None:
+            return None
+        if time() - self._last_dump[0] < min_interval:
+            return self._last_dump[1]
+        if pathname is None:
+            if not os.path.isdir(self.default_path):
+                os.makedirs(self.default_path)
+            pathname = os.path.join(self.default_path, '{}_ringbuffer_{}.log'.format(
+                os.path.splitext(self.default_name)[0], datetime.now().strftime('%Y%m%d_%H%M%S')))
+        self.ring_buffer.dump(pathname)
+        self._last_dump = (time(), pathname)
+        return pathname
+
+    def _replace_handler(self, old_handler, new_handler, add=True):
+        """
+        Replaces old_handler (if not None) with new_handler in all loggers created by the manager. If add is False,
+        new_handler is only added to the loggers that had old_handler.
+        If old_handler is a BoundedQueueHandler, its background thread is stopped (after handling its queue).
+        """
+        for logger in self._loggers.values():
+            if old_handler in logger.handlers:
+                logger.removeHandler(old_handler)
+            elif not add:
+                continue
+            logger.addHandler(new_handler)
+        if old_handler in self._queue_handlers:
+            self._queue_handlers.remove(old_handler)
+            old_handler.stop()
+        self.update_levels()
+
+    def flush(self):
+        """
+        Waits until the background threads have handled all queued log records (if use_queue is enabled), passes the
+        pending summaries of suppressed records (see DuplicateFilter) and flushes the handlers.
+        """
+        for h in self._queue_handlers:
+            h.flush()
+        for h in (self.stream_handler, self.file_handler, self.structured_handler):
+            if h is None:
+                continue
+            try:
+                for f in getattr(h, 'target', h).filters:
+                    if isinstance(f, DuplicateFilter):
+                        f.flush()
+                h.flush()
+            except ValueError:      # the stream was closed already (e.g. sys.stdout replaced by pytest at exit)
+                pass
+
+    def finalize(self):
+        """
+        Handles all queued log records, stops the background threads and flushes the handlers.
+        Logging remains possible afterwards, but the records are then handled directly by the thread that logs.
+        This is called automatically when python exits.
+        """
+        for h in self._queue_handlers:
+            h.stop()
+        self._queue_handlers = []
+        self.flush()
 
     @property
     def stream_level(self):
@@ -675,6 +1231,7 @@ class LoggingManager(metaclass=Singleton):
     def stream_level(self, number_or_string):
         self._default_stream_level = number_or_string
         self.stream_handler.setLevel(number_or_string)
+        self.update_levels()
 
     @property
     def file_level(self):
@@ -689,6 +1246,29 @@ class LoggingManager(metaclass=Singleton):
         self._default_file_level = number_or_string
         if self.file_handler is not None:
             self.file_handler.setLevel(number_or_string)
+        self.update_levels()
+
+    def update_levels(self):
+        """
+        Sets the level of all loggers created by getLogger() to the lowest level of the handlers they (or their parents)
+        pass records to (except handlers with follow_levels, like the ring buffer by default). That way a logger.debug() call returns right away (after a cached level check) if none of its
+        handlers prints DEBUG, and %-style arguments (e.g. logger.debug('Received: %s', ans)) are not even converted to
+        strings.
+        This is done automatically by the methods of the LoggingManager that change levels or add handlers. If you change
+        the level of a handler directly or add a handler to a logger yourself, call this method afterwards.
+        """
+        for logger in self._loggers.values():
+            levels = []
+            current = logger
+            while current is not None:
+                levels += [h.level for h in current.handlers if not getattr(h, 'follow_levels', False)]
+                if not current.propagate:
+                    break
+                current = current.parent
+            # Without handlers python uses logging.lastResort, which prints WARNING and up
+            level = max(min(levels), logging.DEBUG) if levels else logging.WARNING
+            if logger.level != level:
+                logger.setLevel(level)
 
     def getLogger(self, name, add_stream=None, add_file=None):
         """
@@ -700,7 +1280,8 @@ class LoggingManager(metaclass=Singleton):
         :return: logger object
         """
         logger = logging.getLogger(name)
-        logger.setLevel(logging.DEBUG)      # this is necessary for some reason
+        self._loggers[name] = logger
+        logger.setLevel(logging.DEBUG)      # necessary because the default is the level of the root logger (WARNING)
         logger.handlers = []                # to avoid duplicate handlers, remove all existing
         if add_stream or (add_stream is None and self.enable_stream):
             self.stream_level = self._default_stream_level      # assert the level in case it was changed externally
@@ -710,6 +1291,11 @@ class LoggingManager(metaclass=Singleton):
                 self.set_file()
             self.file_level = self._default_file_level          # assert the level in case it was changed externally
             logger.addHandler(self.file_handler)
+        if self.structured_handler is not None:
+            logger.addHandler(self.structured_handler)
+        if self.ring_buffer is not None:
+            logger.addHandler(self.ring_buffer)
+        self.update_levels()
         return logger
 
     def __call__(self,*args, **kwargs):
@@ -726,7 +1312,7 @@ class LoggingManager(metaclass=Singleton):
         """
         r = None
         for i, h in enumerate(logger.handlers):
-            if type(h) is logging.StreamHandler:
+            if _handler_type(h) is logging.StreamHandler:
                 r = h
                 del logger.handlers[i]
         return h
@@ -740,7 +1326,7 @@ class LoggingManager(metaclass=Singleton):
         """
         r = None
         for i, h in enumerate(logger.handlers):
-            if type(h) is logging.handlers.RotatingFileHandler:
+            if _handler_type(h) is logging.handlers.RotatingFileHandler:
                 r = h
                 del logger.handlers[i]
         return h
@@ -752,6 +1338,7 @@ class LoggingManager(metaclass=Singleton):
         :param logger: a logger object
         """
         logger.addHandler(self.stream_handler)
+        self.update_levels()
 
     def add_file_handler(self, logger):
         """
@@ -760,6 +1347,7 @@ class LoggingManager(metaclass=Singleton):
         :param logger: a logger object
         """
         logger.addHandler(self.file_handler)
+        self.update_levels()
 
     def set_logger_stream_level(self, logger, level):
         """
@@ -770,8 +1358,9 @@ class LoggingManager(metaclass=Singleton):
         :param level: string like 'WARNING' or level like logman.WARNING
         """
         for h in logger.handlers:
-            if type(h) is logging.StreamHandler:
+            if _handler_type(h) is logging.StreamHandler:
                 h.setLevel(level)
+        self.update_levels()
 
     def get_logger_stream_level(self, logger):
         """
@@ -780,7 +1369,7 @@ class LoggingManager(metaclass=Singleton):
         :param logger: existing logger object
         """
         for h in logger.handlers:
-            if type(h) is logging.StreamHandler:
+            if _handler_type(h) is logging.StreamHandler:
                 return h.level
         return None
 
@@ -793,8 +1382,9 @@ class LoggingManager(metaclass=Singleton):
         :param level: string like 'WARNING' or level like logman.WARNING
         """
         for h in logger.handlers:
-            if type(h) is logging.handlers.RotatingFileHandler:
+            if _handler_type(h) is logging.handlers.RotatingFileHandler:
                 h.setLevel(level)
+        self.update_levels()
 
     def get_logger_file_level(self, logger):
         """
@@ -803,12 +1393,13 @@ class LoggingManager(metaclass=Singleton):
         :param logger: existing logger object
         """
         for h in logger.handlers:
-            if type(h) is logging.handlers.RotatingFileHandler:
+            if _handler_type(h) is logging.handlers.RotatingFileHandler:
                 return h.level
         return None
 
 # Initialize LoggingManager object. Import this in other modules inside this package.
 logman = LoggingManager(default_path=log_path, default_name='hyperion.log')
+atexit.register(logman.finalize)
 
 if __name__ == '__main__':
     # ansicol = ANSIcolorFormat()
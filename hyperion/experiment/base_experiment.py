@@ -11,6 +11,14 @@
     - DefaultDict
     - ActionDict
     - valid_python
+    - sweep_axes
+    - CompiledAction
+    - ActionPlan
+    - WriteBehindBuffer
+    - LiveVariable
+    - ActionProfiler
+    - ScanEstimator
+    - AdaptiveGrid
     - DataManager
 
 """
@@ -20,13 +28,21 @@ import yaml
 import importlib
 import hyperion
 import time
+import threading
+import queue
+import heapq
+import itertools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import OrderedDict
 from hyperion.tools.saving_tools import name_incrementer
 from hyperion.tools.loading import get_class
+from hyperion.tools.array_tools import length_from_settings_dict, array_from_settings_dict, traversal_order
 # from hyperion.tools.saver import Saver
 import copy
+from functools import lru_cache, partial
 # import h5py
 import numpy as np
-from netCDF4 import Dataset
+# Note: netCDF4 is imported by the DataManager when it's needed, because importing it takes a considerable time
 
 
 class DefaultDict(dict):
@@ -124,20 +140,892 @@ class ActionDict(DefaultDict):
         super().__init__(actiondict, actiontype, ReturnNoneForMissingKey=True)
 
 
+_illegal_python_chars = str.maketrans(' `~!@#$%^&*()-+=[]\{\}|\\;:\'",.<>/?', '_' * 34)
+
+
+@lru_cache(maxsize=1024)
 def valid_python(name):
     """
     Converts all illegal characters for python object names to underscore.
     Also adds underscore prefix if the name starts with a number.
+    Results are cached, because the same few names are converted over and over again during a measurement.
 
     :param name: input string
     :type name: str
     :return: corrected string
     :rtype: str
     """
-    __illegal = str.maketrans(' `~!@#$%^&*()-+=[]\{\}|\\;:\'",.<>/?', '_' * 34)
     if name[0].isdigit():
         name = '_'+name
-    return name.translate(__illegal)
+    return name.translate(_illegal_python_chars)
+
+
+def sweep_axes(actiondict):
+    """
+    Returns the axes of a sweep Action.
+    An Action can sweep several axes at once (e.g. to scan a 2D grid in a spiral, see BaseExperiment.traverse()). Then
+    it contains a key axes with a list of sweep dicts, each with a Name (or _store_name) and start, stop and step or
+    num. Otherwise, if the Action contains start and stop, the Action itself is the sweep dict of a single axis.
+    The nested Actions get a dimension for every axis.
+
+    :param actiondict: the (Action)dict of the Action
+    :type actiondict: dict or ActionDict
+    :return: list of (store name, sweep dict) for every axis (empty if the Action isn't a sweep)
+    :rtype: list of tuple
+    """
+    axes = actiondict.get('axes')
+    if axes:
+        return [(valid_python(axis.get('_store_name') or axis['Name']), axis) for axis in axes]
+    if actiondict.get('start') is not None and actiondict.get('stop') is not None:
+        return [(valid_python(actiondict.get('_store_name') or actiondict['Name']), actiondict)]
+    return []
+
+
+def _do_nothing(*args, **kwargs):
+    """ The "do nothing" nesting function passed to Actions that don't have nested Actions. """
+    return None
+
+
+class CompiledAction:
+    """
+    A single Action of an ActionPlan. Created by BaseExperiment.compile_actionlist(), not intended to be created by the
+    user. Everything that used to be worked out on every iteration of perform_actionlist() is resolved once:
+
+    - actiondict: the ActionDict (actiondict merged with its ActionType), which is passed to the action method
+    - name: the Name of the Action
+    - method: the bound action method of the experiment
+    - store_name: the (valid python) name under which the DataManager stores this Action (_store_name or Name)
+    - nested: the ActionPlan of the nested Actions (or None)
+    - nesting: the nesting function that is passed to the action method
+
+    Note that the actiondict still refers to the original dictionary from the config, so toggling '_disabled' (e.g. by
+    the checkboxes of the AutoMeasurementGui) still has effect while measuring.
+    """
+    __slots__ = ('actiondict', 'name', 'method', 'store_name', 'nested', 'nesting')
+
+    def __init__(self, actiondict, method, store_name, nested=None, nesting=_do_nothing):
+        object.__setattr__(self, 'actiondict', actiondict)
+        object.__setattr__(self, 'name', actiondict['Name'])
+        object.__setattr__(self, 'method', method)
+        object.__setattr__(self, 'store_name', store_name)
+        object.__setattr__(self, 'nested', nested)
+        object.__setattr__(self, 'nesting', nesting)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('CompiledAction is immutable')
+
+    def __repr__(self):
+        return 'CompiledAction({!r}, nested={})'.format(self.name, self.nested is not None)
+
+
+class ActionPlan:
+    """
+    Immutable tree of CompiledActions, the result of BaseExperiment.compile_actionlist().
+    Can be passed to BaseExperiment.perform_actionlist() instead of a regular actionlist.
+
+    :ivar actions: (tuple of CompiledAction) the Actions at this nesting level
+    :ivar parents: (list of str) store names of the nesting parents of this level (this list should not be modified)
+    """
+    __slots__ = ('actions', 'parents')
+
+    def __init__(self, actions, parents):
+        object.__setattr__(self, 'actions', tuple(actions))
+        object.__setattr__(self, 'parents', parents)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('ActionPlan is immutable')
+
+    def __iter__(self):
+        return iter(self.actions)
+
+    def __len__(self):
+        return len(self.actions)
+
+    def __repr__(self):
+        return 'ActionPlan({!r}, parents={})'.format(self.actions, self.parents)
+
+
+class _StagedBlock:
+    """ Private helper class of WriteBehindBuffer. A block of datapoints that is being filled in memory. """
+    __slots__ = ('name', 'start', 'data', 'mask', 'count', 'fill')
+
+    def __init__(self, name, start, data, mask, fill):
+        self.name = name        # name of the netCDF4 Variable
+        self.start = start      # indices of the first element of this block in the Variable
+        self.data = data        # the datapoints (including extra dimensions)
+        self.mask = mask        # boolean array indicating which points have been written (only the scanning dimensions)
+        self.count = 0          # number of points that have been written
+        self.fill = fill        # fill value of the Variable
+
+
+class WriteBehindBuffer:
+    """
+    Write-behind buffer for the DataManager.
+    Datapoints of automated scanning are staged in memory in numpy blocks that have the shape of the chunks of the
+    netCDF4 Variable. A block is handed over to a background writer thread as soon as it's complete, so the HDF5 writing
+    happens in whole chunks and not on the measurement thread.
+    Incomplete blocks are written when the buffered memory exceeds max_bytes (oldest first) or when flush() is called.
+    Other writes to the file (e.g. appending a coordinate value or meta data) can be queued with call(), so they're
+    done in order with the blocks and the measurement thread doesn't wait for the writing of large blocks.
+    If the writer fails, the exception is raised again by the next call of put(), call(), flush() or stop().
+
+    Not intended to be used directly, it's created by DataManager.open_file() when write_behind is enabled.
+
+    :param datman: the DataManager to write to (its _lock is used to guard the netCDF4 Dataset)
+    :type datman: DataManager
+    :param max_bytes: upper bound on the memory used for staged and queued blocks (in bytes)
+    :type max_bytes: int
+    """
+    def __init__(self, datman, max_bytes=64 * 1024**2):
+        self.logger = logging.getLogger(__name__)
+        self.datman = datman
+        self.max_bytes = max_bytes
+        self._blocks = OrderedDict()    # (name, block index) -> _StagedBlock
+        self._staged_bytes = 0
+        self._queued_bytes = 0
+        self._queue = queue.Queue()
+        self._condition = threading.Condition()
+        self.errors = 0
+        self._error = None
+        self._thread = threading.Thread(target=self._writer, name='DataManager writer', daemon=True)
+        self._thread.start()
+
+    def put(self, name, chunk, sizes, indices, data, dtype=float, fill=np.nan):
+        """
+        Stage a single datapoint.
+
+        :param name: name of the Variable
+        :type name: str
+        :param chunk: chunk shape of the scanning dimensions of the Variable
+        :type chunk: tuple of int
+        :param sizes: sizes of the scanning dimensions (None for unlimited dimensions)
+        :type sizes: tuple of int or None
+        :param indices: indices of the datapoint in the scanning dimensions
+        :type indices: list of int
+        :param data: the datapoint (number or array for the extra dimensions)
+        :param dtype: datatype of the Variable (defaults to float)
+        :param fill: fill value of the Variable, used for points that are not written (defaults to NaN)
+        """
+        self._raise_error()
+        block_index = tuple(i // c for i, c in zip(indices, chunk))
+        key = (name, block_index)
+        block = self._blocks.get(key)
+        if block is None:
+            start = tuple(b * c for b, c in zip(block_index, chunk))
+            shape = tuple(c if s is None else min(c, s - st) for c, s, st in zip(chunk, sizes, start))
+            npdata = np.asarray(data)
+            block = _StagedBlock(name, start, np.full(shape + npdata.shape, fill, dtype=dtype),
+                                 np.zeros(shape, dtype=bool), fill)
+            self._blocks[key] = block
+            self._staged_bytes += block.data.nbytes + block.mask.nbytes
+        local = tuple(i - st for i, st in zip(indices, block.start))
+        block.data[local] = data
+        if not block.mask[local]:
+            block.mask[local] = True
+            block.count += 1
+        if block.count == block.mask.size:
+            self._enqueue(key)
+        while self._blocks and self._staged_bytes + self._queued_bytes > self.max_bytes:
+            self._enqueue(next(iter(self._blocks)))  # hand over the oldest (incomplete) block
+
+    def call(self, function, *args, **kwargs):
+        """
+        Queue a function that writes to the file. The writer thread calls it (holding the _lock of the DataManager)
+        after the blocks that were handed over before.
+
+        :param function: function to call
+        :param *args: positional arguments for the function
+        :param **kwargs: keyword arguments for the function
+        """
+        self._raise_error()
+        self._queue.put(partial(function, *args, **kwargs))
+
+    def _raise_error(self):
+        # Raises the exception of the writer thread (only once).
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _enqueue(self, key):
+        # Moves a staged block to the queue of the writer thread. Blocks if the queue holds too much data.
+        block = self._blocks.pop(key)
+        nbytes = block.data.nbytes + block.mask.nbytes
+        self._staged_bytes -= nbytes
+        with self._condition:
+            while self._queued_bytes and self._queued_bytes + nbytes > self.max_bytes:
+                self._condition.wait()
+            self._queued_bytes += nbytes
+        self._queue.put(block)
+
+    def _writer(self):
+        # Runs on the background thread
+        while True:
+            block = self._queue.get()
+            try:
+                if block is None:
+                    return
+                with self.datman._lock:
+                    if isinstance(block, _StagedBlock):
+                        self._write_block(block)
+                    else:
+                        block()
+            except Exception as e:
+                self.errors += 1
+                if self._error is None:
+                    self._error = e
+                what = 'block of ' + block.name if isinstance(block, _StagedBlock) else block.func.__name__
+                self.logger.error('DataManager writer failed to write {}: {}'.format(what, e))
+            finally:
+                if isinstance(block, _StagedBlock):
+                    with self._condition:
+                        self._queued_bytes -= block.data.nbytes + block.mask.nbytes
+                        self._condition.notify_all()
+                self._queue.task_done()
+
+    def _write_block(self, block):
+        # Writes a block into the netCDF4 Variable (only the region that was touched if it's incomplete)
+        variable = self.datman.root.variables[block.name]
+        if block.count == block.mask.size:
+            variable[tuple(slice(st, st + n) for st, n in zip(block.start, block.mask.shape))] = block.data
+            return
+        touched = np.nonzero(block.mask)
+        local = tuple(slice(t.min(), t.max() + 1) for t in touched)
+        region = tuple(slice(st + l.start, st + l.stop) for st, l in zip(block.start, local))
+        data = block.data[local]
+        mask = block.mask[local]
+        if not mask.all():
+            # Don't overwrite points that were written by an earlier (incomplete) block at the same location:
+            existing = np.ma.filled(np.ma.asarray(variable[region]), block.fill)
+            old = np.full(data.shape, block.fill, dtype=data.dtype)
+            old[tuple(slice(0, n) for n in existing.shape)] = existing
+            data = np.where(mask.reshape(mask.shape + (1,) * (data.ndim - mask.ndim)), data, old)
+        variable[region] = data
+
+    def flush(self):
+        """ Hands over all staged blocks to the writer thread and waits until everything is written. """
+        while self._blocks:
+            self._enqueue(next(iter(self._blocks)))
+        self._queue.join()
+        self._raise_error()
+
+    def stop(self):
+        """ Flushes and stops the writer thread (also if writing fails). """
+        try:
+            self.flush()
+        finally:
+            self._queue.put(None)
+            self._thread.join()
+
+
+class _MemoryBudget:
+    """ Private helper class of the DataManager. Keeps track of the memory used by all LiveVariables together. """
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, nbytes):
+        """ Reserves nbytes (which may be negative). Returns False (and reserves nothing) if that exceeds limit. """
+        with self._lock:
+            if nbytes > 0 and self.used + nbytes > self.limit:
+                return False
+            self.used += nbytes
+            return True
+
+
+class LiveVariable:
+    """
+    In-memory copy of a Variable of the DataManager, intended for plotting during a measurement.
+    It doesn't depend on the netCDF4 file, so it also works when saving is disabled.
+
+    All datapoints are kept in a preallocated numpy array (data) that has the scanning dimensions followed by the
+    dimensions of a single datapoint. Scanning dimensions of unknown length grow (by doubling) when needed.
+    Every update increments version and records the indices that were written, so a gui can cheaply check for new data
+    and read it without copying (view() and latest are numpy views, not copies).
+    If the whole array would exceed max_bytes (or the memory left in the budget shared by all LiveVariables), only the
+    latest datapoint is kept (data is None).
+    Single whole numbers are kept as floating point (with NaN for points that are not measured), only integer numpy
+    arrays keep their datatype. If floating point data is stored in an integer LiveVariable, it's converted to floating
+    point.
+    update() is called by the measurement thread. Read the attributes (e.g. data, latest, filled) and call view() while
+    holding lock (view() and touched() acquire it themselves) to get a consistent state.
+
+    Not intended to be created directly, the DataManager creates them in var(). Use DataManager.live_var() to get one.
+
+    :param name: name of the Variable
+    :type name: str
+    :param sizes: sizes of the scanning dimensions (None for unknown length)
+    :type sizes: tuple of int or None
+    :param datapoint: the first datapoint (used for shape and datatype)
+    :param max_bytes: upper bound on the memory of data (in bytes)
+    :type max_bytes: int
+    :param budget: memory budget shared with the other LiveVariables (None for no limit)
+    :type budget: _MemoryBudget or None
+
+    :Example:
+
+    live = datman.live_var('Spectrum')
+    if live is not None and live.version != last_version:
+        with live.lock:
+            last_version = live.version
+            curve.setData(live.latest)
+    """
+    def __init__(self, name, sizes, datapoint, max_bytes, budget=None):
+        npdata = np.asarray(datapoint)
+        self.name = name
+        if npdata.dtype.kind in 'biu' and not isinstance(datapoint, np.ndarray) or npdata.dtype.kind not in 'biufc':
+            self.dtype = np.dtype(float)
+        else:
+            self.dtype = npdata.dtype
+        self.fill = np.nan if self.dtype.kind in 'fc' else 0
+        self.point_shape = npdata.shape
+        self.max_bytes = max_bytes
+        self.budget = budget
+        shape = tuple(8 if s is None else s for s in sizes) + self.point_shape
+        if not self._reserve(np.prod(shape, dtype=float) * self.dtype.itemsize):
+            self.data = None
+            self.latest = np.full(self.point_shape, self.fill, dtype=self.dtype)
+        else:
+            self.data = np.full(shape, self.fill, dtype=self.dtype)
+            self.latest = self.data[(0,) * len(sizes)]
+        self.filled = [0] * len(sizes)   # number of used elements along each scanning dimension
+        self.version = 0                 # incremented on every update
+        self.last_indices = None         # indices of the latest datapoint
+        self._touched = []               # indices written since the last call to touched()
+        self.lock = threading.Lock()
+
+    def _reserve(self, nbytes, current=0):
+        # Returns whether data can grow from current to nbytes bytes (within max_bytes and the budget).
+        if nbytes > self.max_bytes:
+            return False
+        return self.budget is None or self.budget.reserve(int(nbytes) - current)
+
+    def release(self):
+        """ Returns the memory of data to the budget (the DataManager calls this when it discards the LiveVariable). """
+        with self.lock:
+            if self.data is not None:
+                self._release_data()
+
+    def update(self, indices, datapoint):
+        """
+        Store a datapoint.
+
+        :param indices: indices of the datapoint in the scanning dimensions
+        :type indices: tuple of int
+        :param datapoint: number or array with the shape of the first datapoint
+        """
+        with self.lock:
+            if self.dtype.kind in 'biu' and np.asarray(datapoint).dtype.kind in 'fc':
+                self._promote(np.result_type(self.dtype, np.asarray(datapoint).dtype, np.float64))
+            if self.data is not None and self._grow(indices):
+                self.data[indices] = datapoint
+                self.latest = self.data[indices]
+            else:
+                # a new array, so a reader that holds the previous one doesn't see it change
+                self.latest = np.array(datapoint, dtype=self.dtype)
+            self.filled = [max(f, i + 1) for f, i in zip(self.filled, indices)]
+            self.last_indices = indices
+            self._touched.append(indices)
+            self.version += 1
+
+    def _promote(self, dtype):
+        # Converts the integer data to floating point dtype (points that are not measured become NaN).
+        self.dtype = np.dtype(dtype)
+        self.fill = np.nan
+        if self.data is None:
+            self.latest = self.latest.astype(self.dtype)
+            return
+        if not self._reserve(self.data.size * self.dtype.itemsize, self.data.nbytes):
+            logging.getLogger(__name__).warning('LiveVariable {} would exceed the memory limit as floating point, '
+                                                'only keeping the latest datapoint'.format(self.name))
+            self.latest = np.array(self.latest, dtype=self.dtype)
+            self._release_data()
+            return
+        data = np.full(self.data.shape, self.fill, dtype=self.dtype)
+        filled = tuple(slice(0, f) for f in self.filled)
+        data[filled] = self.data[filled]
+        self.data = data
+        if self.last_indices is not None:
+            self.latest = self.data[self.last_indices]
+
+    def _release_data(self):
+        # Discards data (holding the lock) and returns its memory to the budget, only the latest datapoint is kept.
+        if self.budget is not None:
+            self.budget.reserve(-self.data.nbytes)
+        self.data = None
+
+    def _grow(self, indices):
+        # Enlarges data (doubling the scanning dimensions that are too small) if indices fall outside it.
+        # Returns False (and from then on only keeps the latest datapoint) if that would exceed max_bytes or the budget.
+        shape = self.data.shape[:len(indices)]
+        if all(i < s for i, s in zip(indices, shape)):
+            return True
+        new_shape = tuple(s if i < s else max(2 * s, i + 1) for i, s in zip(indices, shape))
+        nbytes = np.prod(new_shape + self.point_shape, dtype=float) * self.dtype.itemsize
+        if not self._reserve(nbytes, self.data.nbytes):
+            logging.getLogger(__name__).warning('LiveVariable {} would exceed the memory limit, only keeping the '
+                                                'latest datapoint'.format(self.name))
+            self.latest = np.array(self.latest)
+            self._release_data()
+            return False
+        data = np.full(new_shape + self.point_shape, self.fill, dtype=self.dtype)
+        data[tuple(slice(0, s) for s in shape)] = self.data
+        self.data = data
+        return True
+
+    def view(self):
+        """
+        Returns the part of data that is filled so far (a view, not a copy) or the latest datapoint if only that is kept.
+        Note that points that are not measured yet are NaN (or 0 for integer data).
+        """
+        with self.lock:
+            data = self.data
+            if data is None:
+                return self.latest
+            return data[tuple(slice(0, f) for f in self.filled)]
+
+    def touched(self):
+        """ Returns the list of indices that were written since the previous call (and clears it). """
+        with self.lock:
+            touched, self._touched = self._touched, []
+        return touched
+
+
+class ActionProfiler:
+    """
+    Measures where the time goes during a measurement. Used by BaseExperiment.perform_measurement() if profiling is
+    enabled (see BaseExperiment.profiling); not intended to be created by the user.
+
+    For every action (by Name) it records the number of calls, the wall time and the cpu time (of the measurement
+    thread), and splits the wall time in time spent in nesting() (i.e. in the nested actions), time spent in the
+    DataManager (var, dim_coord, meta), time spent in controller methods (all public methods of the controllers of the
+    loaded instruments, but not properties) and the remaining "self" time.
+    Calls to the DataManager and controllers from other threads (e.g. the gui) are not counted.
+
+    The results are available as a table (table()), as collapsed stacks for flame graph tools like flamegraph.pl or
+    speedscope (collapsed_stacks()) and as a dict of meta attributes for the datafile (meta()).
+
+    :param experiment: the experiment object
+    :type experiment: BaseExperiment
+    """
+    columns = ('calls', 'wall_s', 'cpu_s', 'self_s', 'nested_s', 'datamanager_s', 'controller_s')
+
+    def __init__(self, experiment):
+        self.experiment = experiment
+        self.logger = logging.getLogger(__name__)
+        self.stats = OrderedDict()  # action name -> [method, calls, wall, cpu, nested, datamanager, controller]
+        self.io_calls = {}          # label (e.g. 'DataManager.var') -> [calls, time]
+        self.stacks = {}            # tuple of names -> self time in seconds
+        self.filename = None        # name of the datafile that was open during the measurement (if any)
+        self.root = ()
+        self._stack = []            # [name, nested time, {label: time}] of the running actions
+        self._patched = []          # (object, attribute name) of the wrapped methods
+        self._io_depth = 0
+        self._thread = None
+
+    def start(self, measurement_name):
+        """ Starts profiling: wraps the DataManager and controller methods. """
+        self.root = (measurement_name,)
+        self._thread = threading.get_ident()
+        for attr in ('var', 'dim_coord', 'meta'):
+            self._wrap(self.experiment.datman, attr, 'DataManager.' + attr)
+        for instance in self.experiment.instruments_instances.values():
+            controller = getattr(instance, 'controller', None)
+            if controller is None:
+                continue
+            for attr in dir(type(controller)):
+                if attr.startswith('_') or attr in vars(controller):
+                    continue
+                if callable(getattr(type(controller), attr, None)) and not isinstance(getattr(type(controller), attr), type):
+                    self._wrap(controller, attr, '{}.{}'.format(type(controller).__name__, attr))
+
+    def stop(self):
+        """ Stops profiling: removes the wrappers. """
+        for obj, attr in reversed(self._patched):
+            try:
+                delattr(obj, attr)
+            except AttributeError:
+                pass
+        self._patched = []
+
+    def _wrap(self, obj, attr, label):
+        """ Replaces method attr of obj (on the object itself, not on its class) by a timed version. """
+        method = getattr(obj, attr)
+
+        def timed(*args, **kwargs):
+            if self._io_depth or not self._stack or threading.get_ident() != self._thread:
+                return method(*args, **kwargs)
+            self._io_depth += 1
+            t0 = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - t0
+                self._io_depth -= 1
+                io = self._stack[-1][2]
+                io[label] = io.get(label, 0) + duration
+                calls = self.io_calls.setdefault(label, [0, 0.0])
+                calls[0] += 1
+                calls[1] += duration
+        try:
+            setattr(obj, attr, timed)
+            self._patched.append((obj, attr))
+        except Exception as e:
+            self.logger.debug('Could not profile %s: %s', label, e)
+
+    def call(self, action):
+        """
+        Performs the (not disabled) CompiledAction action, like perform_actionlist() does, and records its timing.
+
+        :param action: the action to perform
+        :type action: CompiledAction
+        """
+        frame = [action.name, 0.0, {}]
+
+        def nesting(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return action.nesting(*args, **kwargs)
+            finally:
+                frame[1] += time.perf_counter() - t0
+
+        path = self.root + tuple(f[0] for f in self._stack) + (action.name,)
+        self._stack.append(frame)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            action.method(action.actiondict, nesting)
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            self._stack.pop()
+            nested, io = frame[1], frame[2]
+            datman = sum(t for label, t in io.items() if label.startswith('DataManager.'))
+            controller = sum(io.values()) - datman
+            stats = self.stats.setdefault(action.name, [action.actiondict['_method'], 0, 0.0, 0.0, 0.0, 0.0, 0.0])
+            stats[1] += 1
+            stats[2] += wall
+            stats[3] += cpu
+            stats[4] += nested
+            stats[5] += datman
+            stats[6] += controller
+            self.stacks[path] = self.stacks.get(path, 0) + wall - nested - datman - controller
+            for label, duration in io.items():
+                self.stacks[path + (label,)] = self.stacks.get(path + (label,), 0) + duration
+            if self.experiment.datman.filename:
+                self.filename = self.experiment.datman.filename
+
+    def totals(self):
+        """
+        Returns the totals per action.
+
+        :return: action name -> dict with method and the values of columns (self_s is wall_s minus the other times)
+        :rtype: OrderedDict
+        """
+        totals = OrderedDict()
+        for name, (method, calls, wall, cpu, nested, datman, controller) in self.stats.items():
+            totals[name] = OrderedDict([('method', method), ('calls', calls), ('wall_s', wall), ('cpu_s', cpu),
+                                        ('self_s', wall - nested - datman - controller), ('nested_s', nested),
+                                        ('datamanager_s', datman), ('controller_s', controller)])
+        return totals
+
+    def table(self):
+        """ Returns the totals per action and the DataManager and controller calls as a text table. """
+        lines = ['{:<30} {:<24} {:>8} {:>10} {:>10} {:>10} {:>10} {:>13} {:>12}'.format(
+            'action', 'method', *self.columns)]
+        for name, total in self.totals().items():
+            lines.append('{:<30} {:<24} {:>8} {:10.3f} {:10.3f} {:10.3f} {:10.3f} {:13.3f} {:12.3f}'.format(
+                name, *total.values()))
+        lines.append('')
+        lines.append('{:<40} {:>8} {:>10} {:>12}'.format('DataManager / controller call', 'calls', 'total_s', 'per_call_ms'))
+        for label, (calls, duration) in sorted(self.io_calls.items(), key=lambda item: -item[1][1]):
+            lines.append('{:<40} {:>8} {:10.3f} {:12.3f}'.format(label, calls, duration, 1e3 * duration / calls))
+        return '\n'.join(lines)
+
+    def collapsed_stacks(self):
+        """
+        Returns the self times in the collapsed stack format of flamegraph.pl (one line per stack, names separated by
+        ';', followed by the time in microseconds).
+        """
+        return '\n'.join('{} {}'.format(';'.join(path), int(round(1e6 * duration)))
+                         for path, duration in self.stacks.items() if duration > 0)
+
+    def meta(self):
+        """
+        Returns the totals per action as meta attributes: profile_columns with the column names and for every action
+        profile_<store name> with the values.
+        """
+        meta = {'profile_columns': ', '.join(self.columns)}
+        for name, total in self.totals().items():
+            meta['profile_' + valid_python(name)] = [float(value) for key, value in total.items() if key != 'method']
+        return meta
+
+    def save(self, basename):
+        """
+        Writes the table to basename_profile.txt and the collapsed stacks to basename_profile.folded.
+
+        :param basename: full path without extension
+        :type basename: str
+        :return: the two filenames
+        :rtype: (str, str)
+        """
+        table_file, stacks_file = basename + '_profile.txt', basename + '_profile.folded'
+        with open(table_file, 'w') as f:
+            f.write(self.table() + '\n')
+        with open(stacks_file, 'w') as f:
+            f.write(self.collapsed_stacks() + '\n')
+        return table_file, stacks_file
+
+
+class ScanEstimator:
+    """
+    Estimates the progress and the remaining time of a measurement. Used by BaseExperiment.perform_measurement(); the
+    gui can poll BaseExperiment.progress() and BaseExperiment.eta().
+
+    The number of times each action will be performed is determined by walking through the compiled actionlist: an
+    action with nested actions performs them once for every point of its sweep dict (see length_from_settings_dict())
+    or once if it doesn't have one. The duration of each action (excluding the time spent in its nested actions and
+    the time paused) is learned while measuring, as an exponentially weighted moving average. The remaining time is the
+    sum over all actions of the number of remaining calls times that average. Actions that haven't been performed yet
+    count as 0 s, unless their duration is known from a previous run (timings).
+
+    A "point" is a pass through an innermost actionlist (which has no nested actions itself).
+
+    :param plan: the compiled actionlist of the measurement
+    :type plan: ActionPlan
+    :param timings: durations in seconds per action name (e.g. from a previous run), used as initial averages (optional)
+    :type timings: dict
+    :param alpha: weight of a new duration in the moving average (defaults to 0.2)
+    :type alpha: float
+    """
+    def __init__(self, plan, timings=None, alpha=0.2):
+        self.alpha = alpha
+        self.expected = {}          # action name -> number of calls
+        self._point_actions = []    # names of the first action of each innermost actionlist
+        self._walk(plan, 1)
+        timings = timings or {}
+        # All keys are created here, so the dicts can be read safely from another thread while measuring:
+        self.done = {name: 0 for name in self.expected}
+        self.durations = {name: timings.get(name) for name in self.expected}
+        self.total_points = sum(self.expected[name] for name in self._point_actions)
+        self._stack = []            # [start time, time spent in nested actions or paused] of the running actions
+
+    def _walk(self, plan, calls):
+        """ Adds the number of calls of the actions in plan (which is performed calls times) to self.expected. """
+        innermost = all(action.nested is None for action in plan)
+        for action in plan:
+            disabled = action.actiondict['_disabled']
+            if not disabled:
+                self.expected[action.name] = self.expected.get(action.name, 0) + calls
+                if innermost:
+                    self._point_actions.append(action.name)
+                    innermost = False   # only count the first action of the list
+            if action.nested is not None:
+                iterations = 1
+                if disabled:
+                    pass
+                elif action.actiondict['order'] == 'adaptive':
+                    iterations = action.actiondict['budget'] or 1   # at most
+                else:
+                    for _, axis in sweep_axes(action.actiondict):
+                        iterations *= length_from_settings_dict(axis) or 1
+                self._walk(action.nested, calls * iterations)
+
+    def start_action(self):
+        """ Called just before an action is performed. """
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def finish_action(self, name, learn=True):
+        """
+        Called just after action name is performed. Updates its average duration.
+
+        :param name: name of the action
+        :type name: str
+        :param learn: False if the action didn't complete (e.g. it raised), its duration is then not used for the average
+        :type learn: bool
+        """
+        start, excluded = self._stack.pop()
+        duration = time.perf_counter() - start
+        if self._stack:
+            self._stack[-1][1] += duration
+        duration -= excluded
+        if learn:
+            average = self.durations[name]
+            self.durations[name] = duration if average is None else average + self.alpha * (duration - average)
+        self.done[name] += 1
+
+    def skip_action(self, name):
+        """ Counts action name as done without performing it (used when resuming a measurement). """
+        self.done[name] += 1
+
+    def exclude(self, duration):
+        """ Excludes duration (e.g. the time paused) from the duration of the running action. """
+        if self._stack:
+            self._stack[-1][1] += duration
+
+    def points_done(self):
+        """ Returns the number of points that are started. """
+        return sum(self.done[name] for name in self._point_actions)
+
+    def remaining(self):
+        """ Returns the estimated remaining time in seconds (None if no durations are known yet). """
+        if all(duration is None for duration in self.durations.values()):
+            return None
+        return sum(max(self.expected[name] - self.done[name], 0) * duration
+                   for name, duration in self.durations.items() if duration is not None)
+
+    def progress(self):
+        """
+        Returns the fraction of the measurement that is done (0 to 1), weighted by the durations of the actions. If no
+        durations are known yet, it's the fraction of the action calls that is done.
+        """
+        total = done = 0
+        for name, expected in self.expected.items():
+            weight = self.durations[name] or 0
+            total += expected * weight
+            done += min(self.done[name], expected) * weight
+        if not total:
+            total = sum(self.expected.values())
+            done = sum(min(self.done[name], expected) for name, expected in self.expected.items())
+        return done / total if total else 1.0
+
+    def predicted_duration(self):
+        """ Returns the estimated duration of the complete measurement in seconds (None if no durations are known). """
+        if all(duration is None for duration in self.durations.values()):
+            return None
+        return sum(self.expected[name] * duration for name, duration in self.durations.items() if duration is not None)
+
+    def unknown(self):
+        """ Returns the names of the actions of which the duration is not known (yet). """
+        return [name for name, duration in self.durations.items() if duration is None]
+
+
+class AdaptiveGrid:
+    """
+    Chooses the points of an adaptive (refining) scan. Used by BaseExperiment.traverse() for Actions with order
+    adaptive; not intended to be used directly.
+
+    It starts with a coarse grid. The grid is divided in cells (squares in 2D) between neighbouring points. Every cell
+    gets a score from the values measured on its corners (see metric). The cell with the highest score is refined: the
+    points halfway (its center and the middle of its edges in 2D) are measured, which makes 2**ndim smaller cells.
+    This continues until the number of points reaches the budget, all scores are at or below the threshold, or the
+    cells can't be divided anymore (after levels refinements).
+
+    Points are indices in the fine grid, the grid of the smallest cells, in which coarse point i has index i * 2**levels.
+
+    :param shape: number of points of the coarse grid in every dimension
+    :type shape: tuple of int
+    :param budget: maximum total number of points (including the coarse grid)
+    :type budget: int
+    :param levels: maximum number of times a cell can be divided (defaults to 3)
+    :type levels: int
+    :param metric: score of a cell from the values on its corners: 'gradient' (default, the difference between the
+                   highest and lowest value), 'intensity' (the highest value), or a function that takes the array of
+                   corner values and returns the score
+    :type metric: str or callable
+    :param threshold: cells with a score at or below this are not refined (None (default) for no threshold)
+    :type threshold: float or None
+    """
+    def __init__(self, shape, budget, levels=3, metric='gradient', threshold=None):
+        self.shape = tuple(shape)
+        self.ndim = len(self.shape)
+        self.budget = budget
+        self.levels = levels
+        self.scale = 2 ** levels
+        self.fine_shape = tuple((n - 1) * self.scale + 1 for n in self.shape)
+        if metric == 'gradient':
+            self.metric = lambda corners: corners.max() - corners.min()
+        elif metric == 'intensity':
+            self.metric = lambda corners: corners.max()
+        elif callable(metric):
+            self.metric = metric
+        else:
+            raise ValueError('unknown metric: {}'.format(metric))
+        self.threshold = threshold
+        self.values = {}        # point -> value
+        self.points = []        # points in the order they are measured
+        self.point_levels = []  # refinement level of each point (0 for the coarse grid)
+        self._cells = []        # heap of (-score, -size, counter, corner, size)
+        self._leaves = set()    # (corner, size) of the cells that are not divided
+        self._counter = itertools.count()
+        self._refined = None    # the cell that was divided last
+        self.current_level = 0  # refinement level of the points returned last
+
+    def coarse_points(self):
+        """ Returns the points of the coarse grid (in serpentine order). """
+        return [tuple(int(i) * self.scale for i in point) for point in traversal_order(self.shape, 'serpentine')]
+
+    def set_value(self, point, value):
+        """ Stores the (scalar) value measured at point (one of the points returned by coarse_points() or refine()). """
+        if point not in self.values:
+            self.points.append(point)
+            self.point_levels.append(self.current_level)
+        self.values[point] = float(value)
+
+    def _corners(self, corner, size):
+        return [tuple(c + size * o for c, o in zip(corner, offset)) for offset in itertools.product((0, 1), repeat=self.ndim)]
+
+    def _push(self, corner, size):
+        # Adds a cell (the corners have to be measured)
+        corners = [self.values.get(p, np.nan) for p in self._corners(corner, size)]
+        score = float(self.metric(np.array(corners)))
+        self._leaves.add((corner, size))
+        if size > 1 and np.isfinite(score) and (self.threshold is None or score > self.threshold):
+            heapq.heappush(self._cells, (-score, -size, next(self._counter), corner, size))
+
+    def refine(self):
+        """
+        Returns the points to measure next: the new points of the cell with the highest score. The values of all
+        points returned before must have been set. Returns an empty list when the scan is finished.
+
+        :return: list of points
+        :rtype: list of tuple
+        """
+        if self._refined is None:
+            # First call: make the cells of the coarse grid
+            if not self._leaves:
+                for corner in itertools.product(*[range(0, f - 1, self.scale) for f in self.fine_shape]):
+                    self._push(corner, self.scale)
+        else:
+            corner, size = self._refined
+            half = size // 2
+            for offset in itertools.product((0, 1), repeat=self.ndim):
+                self._push(tuple(c + half * o for c, o in zip(corner, offset)), half)
+        while self._cells:
+            _, _, _, corner, size = heapq.heappop(self._cells)
+            half = size // 2
+            new = [tuple(c + half * o for c, o in zip(corner, offset))
+                   for offset in itertools.product((0, 1, 2), repeat=self.ndim)]
+            new = [p for p in new if p not in self.values]
+            if len(self.points) + len(new) > self.budget:
+                break
+            self._leaves.discard((corner, size))
+            self._refined = (corner, size)
+            self.current_level = self.levels - int(np.log2(size)) + 1
+            return new
+        self._cells = []
+        return []
+
+    def regrid(self):
+        """
+        Returns the values on the fine grid: measured points have their measured value, the other points are
+        interpolated (multilinear) between the corners of the smallest cell they are in.
+
+        :rtype: numpy.ndarray
+        """
+        grid = np.full(self.fine_shape, np.nan)
+        offsets = np.array(list(itertools.product((0, 1), repeat=self.ndim)))
+        for corner, size in sorted(self._leaves, key=lambda cell: -cell[1]):
+            corners = np.array([self.values.get(p, np.nan) for p in self._corners(corner, size)])
+            t = np.meshgrid(*[np.linspace(0, 1, size + 1)] * self.ndim, indexing='ij')
+            cell = np.zeros(t[0].shape)
+            for value, offset in zip(corners, offsets):
+                weight = np.ones(t[0].shape)
+                for dim, o in enumerate(offset):
+                    weight *= t[dim] if o else 1 - t[dim]
+                cell += value * weight
+            grid[tuple(slice(c, c + size + 1) for c in corner)] = cell
+        for point, value in self.values.items():
+            grid[point] = value
+        return grid
 
 
 class DataManager:
@@ -149,6 +1037,28 @@ class DataManager:
     :type experiment: BaseExperiment
     :param lowercase: if True, all names in Dataset will be lowercase (optional, defaults to False)
     :type lowercase: bool
+    :param write_behind: if True, datapoints of automated scanning are buffered in memory and written in whole chunks by
+                         a background thread (see WriteBehindBuffer) (optional, defaults to False)
+    :type write_behind: bool
+    :param chunk_shape: chunk shape of the scanning dimensions of Variables. A tuple applies to the
+                        innermost scanning dimensions (outer ones get chunk size 1), a dict maps Variable names to
+                        tuples. None (default) uses chunk size 1 for outer dimensions and the whole (or 64 for
+                        unlimited) inner dimension.
+    :type chunk_shape: tuple or dict or None
+    :param max_buffer_bytes: upper bound on the memory used by the write_behind buffer (optional, defaults to 64MB)
+    :type max_buffer_bytes: int
+    :param preallocate: if True, scanning dimensions of which the length is known beforehand are created with fixed
+                        size instead of unlimited size (optional, defaults to True)
+    :type preallocate: bool
+    :param keep_live: if True, var() also keeps the data in memory (see LiveVariable and live_var()) for plotting
+                      (optional, defaults to True)
+    :type keep_live: bool
+    :param max_live_bytes: upper bound on the memory of a single LiveVariable. Larger Variables only keep their latest
+                           datapoint in memory (optional, defaults to 256MB)
+    :type max_live_bytes: int
+    :param max_live_total_bytes: upper bound on the memory of all LiveVariables together. Variables that don't fit
+                                 anymore only keep their latest datapoint in memory (optional, defaults to 1GB)
+    :type max_live_total_bytes: int
 
     :Example:
 
@@ -165,23 +1075,50 @@ class DataManager:
 
     datman.meta('spectrum', dic={'model': 'aaa'})
     datman.meta('spectrum', dic={'model': 'aaa'})
+
+    The datatype, compression and chunking of a Variable are determined when it's created. They can be specified as
+    arguments of var() or as keys _dtype, _zlib, _complevel, _shuffle and _chunksizes in the ActionDict (or meta dict).
+    Otherwise the defaults in storage_defaults for the kind of data (see data_kind()) are used.
+
+    For plotting, var() also keeps the data in memory, independent of the file (so also when saving is disabled).
+    Use live_var() to get the LiveVariable, which holds the data as a numpy array together with a version counter.
     """
-    def __init__(self, experiment, lowercase=False):
+
+    # Default storage settings per kind of data (see data_kind()). A dtype of None keeps the datatype of the data
+    # (except for single integers and lists of integers, which are stored as f8, see __storage_options()).
+    # Integer counts compress very well, floating point data (with noise) hardly, so that isn't compressed by default.
+    storage_defaults = {
+        'scalar':   {'dtype': 'f8', 'zlib': False, 'complevel': 1, 'shuffle': True},
+        'count':    {'dtype': None, 'zlib': True, 'complevel': 1, 'shuffle': True},
+        'spectrum': {'dtype': None, 'zlib': False, 'complevel': 1, 'shuffle': True},
+        'image':    {'dtype': None, 'zlib': False, 'complevel': 1, 'shuffle': True},
+    }
+    def __init__(self, experiment, lowercase=False, write_behind=False, chunk_shape=None, max_buffer_bytes=64 * 1024**2,
+                 preallocate=True, keep_live=True, max_live_bytes=256 * 1024**2, max_live_total_bytes=1024**3):
         self.logger = logging.getLogger(__name__)
         self.experiment = experiment
         self.filename = None
         self._is_open = False
         self.lowercase = lowercase
+        self.write_behind = write_behind
+        self.chunk_shape = chunk_shape
+        self.max_buffer_bytes = max_buffer_bytes
+        self.preallocate = preallocate
+        self.keep_live = keep_live
+        self.max_live_bytes = max_live_bytes
+        self.max_live_total_bytes = max_live_total_bytes
+        self.live_store = {}        # Variable name -> LiveVariable
+        self._live_budget = _MemoryBudget(max_live_total_bytes)
+        self._warned_no_new_data_flag = False
+        self._coord_filled = {}     # Coordinate name -> number of values appended (for preallocated Coordinates)
+        self._coord_size = {}       # Coordinate name -> its size (number of values appended for unlimited Coordinates)
+        self._buffer = None
+        self._buffered_vars = {}    # Variable name -> (chunk, sizes) of the scanning dimensions, dtype, fill value
+        self._lossy_warned = set()  # Variable names for which a lossy cast to integers has been warned about
+        self._lock = threading.RLock()  # guards the netCDF4 Dataset, which is shared with the writer thread
         self._version = 0.1
-        self.__reset_flags_and_indices()  ########################################################## MAYBY THIS SHOULD BE REMOVED
 
-    ########################################################## MAYBY THIS SHOULD BE REMOVED
-    def __reset_flags_and_indices(self):
-        # These flags can be used to signal whomever takes carer of plotting that there's new data:
-        self.new_data_flags = DefaultDict({}, {}, ReturnNoneForMissingKey=True)
-        self.new_data_indices = DefaultDict({}, {}, ReturnNoneForMissingKey=True)
-
-    def open_file(self, filename, write_mode='w', **kwargs):
+    def open_file(self, filename, write_mode='w', write_behind=None, **kwargs):
         """
         Opens a file and creates a netCDF4 Dataset.
         Already adds any meta arguments present in experiment._saving_meta dictionary.
@@ -190,20 +1127,29 @@ class DataManager:
         :type filename: str
         :param write_mode: file access mode ('w', 'a', 'r+') (defaults to 'w')
         :type write_mode: str
+        :param write_behind: Overrides the write_behind setting of the DataManager (None (default) keeps the setting)
+        :type write_behind: bool or None
         :param **kwargs: any additional keyword arguments are passed along to netCDF4.Dataset()
         """
         self.filename = filename
+        if write_behind is not None:
+            self.write_behind = write_behind
         if not self._is_open:
             self.logger.info('Opening datafile: {}'.format(filename))
+            from netCDF4 import Dataset
             self.root = Dataset(filename, write_mode, format='NETCDF4', **kwargs)
             self._is_open = True
+            self._buffered_vars = {}
+            self._coord_filled = {}
+            self._coord_size = {}
+            if self.write_behind:
+                self._buffer = WriteBehindBuffer(self, self.max_buffer_bytes)
             self.meta(dic=self.experiment._saving_meta)
             self.meta(DataManager=self._version)
             self.sync_hdd()
 
         else:
             self.logger.warning('A file is already open')
-        self.__reset_flags_and_indices()  ########################################################## MAYBY THIS SHOULD BE REMOVED
 
     def __check_not_open(self):
         # Private helper function
@@ -243,11 +1189,12 @@ class DataManager:
         """
         if self.__check_not_open(): return
         name = self.__name_or_dict(name_or_dict)
-        if name not in self.root.dimensions:
-            self.logger.info('DataManager: Creating Dimension: {}'.format(name))
-            self.root.createDimension(name, length)
+        with self._lock:
+            if name not in self.root.dimensions:
+                self.logger.info('DataManager: Creating Dimension: {}'.format(name))
+                self.root.createDimension(name, length)
 
-    def dim_coord(self, name_or_dict, array_or_value=None, meta=None, **kwargs):
+    def dim_coord(self, name_or_dict, array_or_value=None, meta=None, dtype=None, **kwargs):
         """
         Create or append coordinates.
         Also creates dimension to hold the coordinates.
@@ -255,7 +1202,10 @@ class DataManager:
         If Dimension does not exist it is created.
         If Coordinate does not exist it is created.
         If an array is passed, those values are put in the Coordinates. The Dimension is of fixed size.
-        If a value (int or float) is passed, Dimension is of unlimited size and the value is appended to the Coordinates.
+        If a value (int or float) is passed, the value is appended to the Coordinates. If the experiment knows the length
+        of the scanning dimension beforehand (see BaseExperiment.scan_lengths()), the Dimension is created with that
+        fixed size and the Coordinates are pre-filled with NaN. Otherwise (or if preallocate is False) the Dimension is
+        of unlimited size and grows as values are appended.
         Note that values are only appended during the first iteration of a parent loops
         Optionally meta parameters can passed as meta={} or as keyword arguments.
         Note that the name is converted to a valid python object name by replacing illegal characters to '_'.
@@ -266,33 +1216,76 @@ class DataManager:
         :type array_or_value: np.ndarray or int or float
         :param meta: dictionary holding meta arguments(Optional)
         :type meta: dict
+        :param dtype: datatype of the Coordinate. None (default) uses the datatype of the array, or 'f8' for values.
+        :type dtype: str or numpy.dtype
         :param **kwargs: additional unknown keyword arguments are added as meta attributes
         """
 
         if self.__check_not_open(): return
         name = self.__name_or_dict(name_or_dict)
         if name not in self.root.dimensions:
-            self.logger.info('DataManager: Creating Dimension and Coordinate: {}'.format(name))
-            length = None if type(array_or_value) is not np.ndarray else len(array_or_value)
-            self.root.createDimension(name, length)
-            self.root.createVariable(name, 'f8', name)
-            if length is not None:
-                self.root.variables[name][:] = array_or_value
-            if meta is not None or len(kwargs):
-                self.meta(name, meta, **kwargs)
+            with self._lock:
+                if type(array_or_value) is np.ndarray:
+                    self.logger.info('DataManager: Creating Dimension and Coordinate: {}'.format(name))
+                    self.root.createDimension(name, len(array_or_value))
+                    if dtype is None:
+                        dtype = array_or_value.dtype if array_or_value.dtype.kind in 'iuf' else 'f8'
+                    self.root.createVariable(name, dtype, name)
+                    self.root.variables[name][:] = array_or_value
+                else:
+                    length = self.__scan_length(name)
+                    if length is None:
+                        self.logger.info('DataManager: Creating Dimension and unlimited Coordinate: {}'.format(name))
+                        self.root.createDimension(name, None)
+                        self.root.createVariable(name, dtype or 'f8', name)
+                    else:
+                        self.logger.info('DataManager: Creating Dimension and preallocated Coordinate: {} (length {})'.format(name, length))
+                        self.root.createDimension(name, length)
+                        dtype = np.dtype(dtype or 'f8')
+                        self.root.createVariable(name, dtype, name, fill_value=np.nan if dtype.kind == 'f' else None)
+                        self._coord_filled[name] = 0
+                if meta is not None or len(kwargs):
+                    self.meta(name, meta, **kwargs)
 
         if type(array_or_value) is not np.ndarray:
             if name in self.experiment._nesting_parents:
                 indx = 1+ self.experiment._nesting_indices[self.experiment._nesting_parents.index(name)]
             else:
                 indx = 0
-            if indx >= self.root.variables[name].size:
-                self.root.variables[name][indx] = array_or_value
-        ### old alternative to the 7 lines above
-        # if type(array_or_value) is not np.ndarray:
-        #     if (len(self.experiment._nesting_indices) == 0 or len(self.experiment._nesting_indices)<len(self.experiment._nesting_parents)):
-        #         self.root.variables[name][self.root.variables[name].size] = array_or_value
+            if name not in self._coord_size:
+                with self._lock:
+                    self._coord_size[name] = self.root.variables[name].size
+            filled = self._coord_filled.get(name)
+            if filled is None:
+                filled = self._coord_size[name]
+            if indx >= filled:
+                if name in self._coord_filled:
+                    if indx >= self._coord_size[name]:
+                        self.logger.error('DataManager: more values than preallocated for Coordinate: {}'.format(name))
+                        return
+                    self._coord_filled[name] = indx + 1
+                else:
+                    self._coord_size[name] = indx + 1
+                if self._buffer is not None:
+                    # in write_behind mode the writer thread writes it, so this doesn't wait for the writing of data
+                    self._buffer.call(self.__write_coord, name, indx, array_or_value)
+                else:
+                    with self._lock:
+                        self.__write_coord(name, indx, array_or_value)
 
+    def __write_coord(self, name, indx, value):
+        # Private helper function for dim_coord(). Writes a value of a Coordinate (holding the _lock).
+        self.root.variables[name][indx] = value
+
+    def __scan_length(self, name):
+        # Private helper function. Returns the length of a scanning dimension if the experiment knows it beforehand
+        # (see BaseExperiment.scan_lengths()), otherwise None.
+        if not self.preallocate:
+            return None
+        lengths = getattr(self.experiment, '_scan_lengths', {})
+        if self.lowercase:
+            lengths = {key.lower(): value for key, value in lengths.items()}
+        return lengths.get(name)
 
     def __attach_meta(self, attach, dic):
         """
@@ -318,7 +1311,8 @@ class DataManager:
             except:
                 self.logger.warning('unsupported {} in dict: {}: {}'.format(type(value), key, value))
 
-    def var(self, name_or_dict, data, indices=None, dims=None, extra_dims=None, meta=None, no_new_data_flag=False, **kwargs):
+    def var(self, name_or_dict, data, indices=None, dims=None, extra_dims=None, meta=None, no_live=False,
+            dtype=None, zlib=None, complevel=None, shuffle=None, chunksizes=None, no_new_data_flag=None, **kwargs):
         """
         Add or update a Variable.
         Can automatically deduce dimensions and indices if used in automated scanning (i.e. perform_actionlist() of BaseExperiment.)
@@ -326,7 +1320,13 @@ class DataManager:
         in automated scanning you have to create those extra dimensions yourself.
         Optionally meta parameters can passed as meta={} or as keyword arguments.
         Note that the name is converted to a valid python object name by replacing illegal characters to '_'.
-        Note: will store data as float (f8).
+        The datatype, compression and chunking are determined when the Variable is created: from the arguments below,
+        otherwise from the keys _dtype, _zlib, _complevel, _shuffle, _chunksizes of the ActionDict or meta, otherwise
+        from storage_defaults for the kind of data (e.g. 16 bit camera frames are stored as 16 bit compressed integers,
+        single numbers (also whole ones, unless dtype is passed) as f8).
+        Note: in write_behind mode, datapoints of automated scanning are buffered and written by a background thread.
+        They're only guaranteed to be in the file after sync_hdd() or close().
+        The data is also stored in memory for plotting (see live_var()), even if no file is open.
 
         :param name_or_dict: name (as string) or ActionDict (uses ['_store_name'] of otherwise ['Name'])
         :type name_or_dict: str or ActionDict
@@ -340,44 +1340,254 @@ class DataManager:
         :type extra_dims: tuple or list of strings
         :param meta: dictionary holding meta arguments (Optional)
         :type meta: dict
-        :param no_new_data_flag: prevents setting the new_data_flag for plotting when True (Optional, defaults to False)
+        :param no_live: prevents storing the data in memory for plotting when True (Optional, defaults to False)
+        :type no_live: bool
+        :param dtype: datatype to store the data as, e.g. 'u2' or 'f4' (Optional)
+        :type dtype: str or numpy.dtype
+        :param zlib: whether to compress the data (Optional)
+        :type zlib: bool
+        :param complevel: compression level 1 (fastest) to 9 (smallest) (Optional)
+        :type complevel: int
+        :param shuffle: whether to apply the HDF5 shuffle filter before compressing (Optional)
+        :type shuffle: bool
+        :param chunksizes: chunk shape of the whole Variable, including extra dimensions (Optional)
+        :type chunksizes: tuple of int
+        :param no_new_data_flag: deprecated, use no_live
         :type no_new_data_flag: bool
         :param **kwargs: additional unknown keyword arguments are added as meta attributes
         """
 
         name = self.__name_or_dict(name_or_dict)
 
-        ########################################################## MAYBY THIS SHOULD BE REMOVED
-        # Set new data available flag (for plotting)
-        if not no_new_data_flag:
-            self.new_data_flags[name] = True
-            self.new_data_indices[name] = indices
-
-        if self.__check_not_open(): return
+        if no_new_data_flag is not None:
+            if not self._warned_no_new_data_flag:
+                self._warned_no_new_data_flag = True
+                self.logger.warning('DataManager: the no_new_data_flag argument of var() is deprecated, use no_live')
+            no_live = no_new_data_flag
 
         if indices is None:
             indices = self.experiment._nesting_indices
+        elif isinstance(indices, (int, np.integer)):
+            indices = [indices]
 
-        if name not in self.root.variables:
-            self.logger.info('DataManager: Creating Variable: {}'.format(name))
-            if dims is None:
-                dims = tuple(self.experiment._nesting_parents)  # automatically get dims
-            # For higher dimensional data:
-            if extra_dims is not None:
-                if type(extra_dims) is str:
-                    dims = dims + (extra_dims,)
-                else:
-                    dims = dims + tuple(extra_dims)
-            self.root.createVariable(name, 'f8', dims)
-            if meta is not None or len(kwargs):
-                self.meta(name, meta, **kwargs)
-        # if extra_dims is None:
-        if len(indices):
-            npdata = np.array(data)
-            npdata = npdata.reshape(tuple([1] * len(indices)) + npdata.shape)
-            self.root.variables[name][tuple(indices)] = npdata
+        if self.keep_live and not no_live:
+            self.__update_live(name, data, indices, dims)
+
+        if self.__check_not_open(): return
+
+        if self._buffer is not None and len(indices):
+            if name not in self._buffered_vars:
+                options = self.__storage_options(data, name_or_dict, meta, dtype=dtype, zlib=zlib, complevel=complevel,
+                                                 shuffle=shuffle, chunksizes=chunksizes)
+                self.__create_buffered_var(name, len(indices), dims, extra_dims, meta, options, **kwargs)
+            self.__check_cast(name, self._buffered_vars[name][2], data)
+            self._buffer.put(name, *self._buffered_vars[name][:2], indices, data, *self._buffered_vars[name][2:])
+            return
+
+        with self._lock:
+            if name not in self.root.variables:
+                options = self.__storage_options(data, name_or_dict, meta, dtype=dtype, zlib=zlib, complevel=complevel,
+                                                 shuffle=shuffle, chunksizes=chunksizes)
+                self.__create_var(name, len(indices), dims, extra_dims, meta, options, **kwargs)
+            self.__check_cast(name, self.root.variables[name].dtype, data)
+            # if extra_dims is None:
+            if len(indices):
+                npdata = np.array(data)
+                npdata = npdata.reshape(tuple([1] * len(indices)) + npdata.shape)
+                self.root.variables[name][tuple(indices)] = npdata
+            else:
+                self.root.variables[name][:] = data
+
+    def __update_live(self, name, data, indices, dims):
+        # Private helper function for var(). Stores the datapoint in the LiveVariable (creating it if necessary).
+        indices = tuple(indices)
+        live = self.live_store.get(name)
+        try:
+            if live is None or live.point_shape != np.shape(data) or len(live.filled) != len(indices):
+                if live is not None:
+                    live.release()
+                live = LiveVariable(name, self.__live_sizes(dims, len(indices)), data, self.max_live_bytes,
+                                    self._live_budget)
+                self.live_store[name] = live
+            live.update(indices, data)
+        except Exception as e:
+            self.logger.warning('DataManager: could not store {} in memory: {}'.format(name, e))
+
+    def __live_sizes(self, dims, n_scan_dims):
+        # Private helper function. Returns the sizes of the scanning dimensions of a new LiveVariable as far as they're
+        # known (from the file or from BaseExperiment.scan_lengths()), None otherwise.
+        if dims is None:
+            dims = self.experiment._nesting_parents
+        dims = [self.__name_or_dict(d) for d in list(dims)[:n_scan_dims]]
+        dims += [None] * (n_scan_dims - len(dims))
+        lengths = getattr(self.experiment, '_scan_lengths', {})
+        if self.lowercase:
+            lengths = {key.lower(): value for key, value in lengths.items()}
+        sizes = []
+        for dim in dims:
+            size = lengths.get(dim)
+            if size is None and self._is_open and dim in self.root.dimensions \
+                    and not self.root.dimensions[dim].isunlimited():
+                size = len(self.root.dimensions[dim])
+            sizes.append(size)
+        return tuple(sizes)
+
+    def live_var(self, name_or_dict):
+        """
+        Returns the in-memory copy of a Variable (see LiveVariable), or None if there's no data for it (yet).
+        This works independent of the file, so also when saving is disabled.
+        The measurement thread keeps updating it, so read its attributes while holding its lock (view() and touched()
+        acquire the lock themselves).
+
+        :param name_or_dict: name (as string) or ActionDict (uses ['_store_name'] of otherwise ['Name'])
+        :type name_or_dict: str or ActionDict
+        :rtype: LiveVariable or None
+        """
+        return self.live_store.get(self.__name_or_dict(name_or_dict))
+
+    def reset_live(self):
+        """ Discards all data kept in memory (BaseExperiment.perform_measurement() calls this at the start). """
+        for live in self.live_store.values():
+            live.release()
+        self.live_store = {}
+
+    def __var_dims(self, dims, extra_dims):
+        # Private helper function for var(). Returns the tuple of dimension names of a new Variable.
+        if dims is None:
+            dims = tuple(self.experiment._nesting_parents)  # automatically get dims
+        # For higher dimensional data:
+        if extra_dims is not None:
+            if type(extra_dims) is str:
+                dims = tuple(dims) + (extra_dims,)
+            else:
+                dims = tuple(dims) + tuple(extra_dims)
+        return tuple(dims)
+
+    @staticmethod
+    def data_kind(data):
+        """
+        Classifies data to choose default storage settings (see storage_defaults).
+
+        Only numpy arrays of integers (e.g. camera frames) count as 'count'. Single numbers and lists are 'scalar',
+        'spectrum' or 'image', so a Variable whose first datapoint happens to be a whole number is stored as f8.
+
+        :param data: a single datapoint (number or array)
+        :return: 'count' for integer arrays, 'image' for 2D (or higher) data, 'spectrum' for 1D data, 'scalar' otherwise
+        :rtype: str
+        """
+        npdata = np.asarray(data)
+        if isinstance(data, np.ndarray) and npdata.ndim and npdata.dtype.kind in 'iub':
+            return 'count'
+        elif npdata.ndim >= 2:
+            return 'image'
+        elif npdata.ndim == 1:
+            return 'spectrum'
+        else:
+            return 'scalar'
+
+    def __storage_options(self, data, name_or_dict, meta, **options):
+        """
+        Private helper function for var().
+        Determines datatype, compression and chunking of a new Variable. Arguments that are not None take precedence,
+        then keys starting with '_' (e.g. _dtype) in the ActionDict or meta, then storage_defaults for the kind of data.
+
+        :return: dictionary with keys dtype, zlib, complevel, shuffle, chunksizes
+        :rtype: dict
+        """
+        for dic in (name_or_dict, meta):
+            if dic is None or type(dic) is str:
+                continue
+            for key in options:
+                if options[key] is None and '_' + key in dic:
+                    options[key] = dic['_' + key]
+        defaults = self.storage_defaults[self.data_kind(data)]
+        for key, value in defaults.items():
+            if options[key] is None:
+                options[key] = value
+        npdata = np.asarray(data)
+        if options['dtype'] is None:
+            if npdata.dtype.kind == 'b':
+                options['dtype'] = 'u1'
+            elif npdata.dtype.kind in 'iu' and not isinstance(data, np.ndarray):
+                options['dtype'] = 'f8'
+            else:
+                options['dtype'] = npdata.dtype
+        options['dtype'] = np.dtype(options['dtype'])
+        return options
+
+    def __check_cast(self, name, dtype, data):
+        # Private helper function for var(). Warns (once per Variable) when floating point data is stored in an integer
+        # Variable, because the fractional part is lost.
+        if dtype.kind in 'iub' and name not in self._lossy_warned and np.asarray(data).dtype.kind in 'fc':
+            self._lossy_warned.add(name)
+            self.logger.warning('DataManager: storing floating point data in {} {} truncates it. Pass dtype= (or '
+                                '_dtype in the ActionDict) to choose the datatype.'.format(dtype, name))
+
+    def __dim_sizes(self, dims):
+        # Private helper function. Returns the sizes of the dimensions (None for unlimited dimensions).
+        return tuple(None if self.root.dimensions[d].isunlimited() else len(self.root.dimensions[d]) for d in dims)
+
+    def __chunk_shape(self, name, sizes):
+        """
+        Private helper function. Returns the chunk shape of the scanning dimensions of a Variable.
+
+        :param name: name of the Variable
+        :param sizes: sizes of the scanning dimensions (None for unlimited)
+        :return: chunk shape
+        :rtype: tuple of int
+        """
+        chunk = self.chunk_shape
+        if type(chunk) is dict:
+            chunk = chunk.get(name)
+        if chunk is None:
+            # default: whole innermost dimension (or 64 points if it's unlimited) and 1 for the outer dimensions
+            chunk = (64 if sizes[-1] is None else sizes[-1],) if len(sizes) else ()
+        chunk = tuple(chunk)[-len(sizes):] if len(sizes) else ()
+        chunk = (1,) * (len(sizes) - len(chunk)) + chunk
+        return tuple(max(1, c if s is None else min(c, s)) for c, s in zip(chunk, sizes))
+
+    def __create_var(self, name, n_scan_dims, dims, extra_dims, meta, options, **kwargs):
+        """
+        Private helper function for var(). Creates a new Variable with the storage options (see __storage_options()).
+        Variables of automated scanning (n_scan_dims > 0) are chunked (see chunk_shape) and floating point Variables
+        are pre-filled with NaN, so points that are not measured (yet) are NaN.
+        """
+        dims = self.__var_dims(dims, extra_dims)
+        dtype = options['dtype']
+        chunksizes = options['chunksizes']
+        if chunksizes is None and n_scan_dims:
+            chunk = self.__chunk_shape(name, self.__dim_sizes(dims[:n_scan_dims]))
+            chunksizes = chunk + tuple(max(1, size or 1) for size in self.__dim_sizes(dims[n_scan_dims:]))
+        fill_value = np.nan if dtype.kind == 'f' and n_scan_dims else None
+        self.logger.info('DataManager: Creating Variable: {} ({}, zlib={}, chunks {})'.format(name, dtype, options['zlib'], chunksizes))
+        if chunksizes is None and not options['zlib']:
+            variable = self.root.createVariable(name, dtype, dims)
         else:
-            self.root.variables[name][:] = data
+            variable = self.root.createVariable(name, dtype, dims, zlib=bool(options['zlib']),
+                                                complevel=options['complevel'], shuffle=bool(options['shuffle']),
+                                                chunksizes=chunksizes, fill_value=fill_value)
+        if meta is not None or len(kwargs):
+            self.meta(name, meta, **kwargs)
+        return variable
+
+    def __create_buffered_var(self, name, n_scan_dims, dims, extra_dims, meta, options, **kwargs):
+        # Private helper function for var() in write_behind mode. Creates the (chunked) Variable if it doesn't exist
+        # and stores the chunk shape and sizes of its scanning dimensions, its datatype and its fill value.
+        with self._lock:
+            if name in self.root.variables:
+                variable = self.root.variables[name]
+            else:
+                variable = self.__create_var(name, n_scan_dims, dims, extra_dims, meta, options, **kwargs)
+            sizes = self.__dim_sizes(variable.dimensions[:n_scan_dims])
+            chunking = variable.chunking()
+            if chunking == 'contiguous':
+                chunk = self.__chunk_shape(name, sizes)
+            else:
+                chunk = tuple(chunking[:n_scan_dims])
+            dtype = variable.dtype
+            from netCDF4 import default_fillvals
+            fill = getattr(variable, '_FillValue', default_fillvals.get(dtype.str[1:], 0))
+            self._buffered_vars[name] = (chunk, sizes, dtype, fill)
 
     def meta(self, attach_to=None, dic=None, only_once=False, *args, **kwargs):
         """
@@ -422,6 +1632,15 @@ class DataManager:
         # Skip if only_once is True and parent loops are not in first iteration:
         if only_once and not sum(self.experiment._nesting_indices): return
         attach_to = self.__name_or_dict(attach_to)
+        if self._buffer is not None:
+            # in write_behind mode the writer thread attaches them, so this doesn't wait for the writing of data
+            self._buffer.call(self.__meta, attach_to, dic, args, kwargs)
+            return
+        with self._lock:
+            self.__meta(attach_to, dic, args, kwargs)
+
+    def __meta(self, attach_to, dic, args, kwargs):
+        # Private helper function for meta(). Attaches the attributes (holding the _lock).
         # add attributes to set of variable
         attach = self.root
         if attach_to in self.root.variables:
@@ -435,19 +1654,96 @@ class DataManager:
         self.__attach_meta(attach, kwargs)
 
     def sync_hdd(self):
-        """ Update file on hdd with data in memory. """
+        """ Update file on hdd with data in memory. In write_behind mode it first waits for the buffer to be written. """
+        if self.__check_not_open(): return
+        if self._buffer is not None:
+            self._buffer.flush()
+        with self._lock:
+            self.root.sync()
+
+    def read_point(self, name_or_dict, indices):
+        """
+        Reads a datapoint of a Variable back from the file (in write_behind mode it first waits for the buffer to be
+        written).
+
+        :param name_or_dict: name (as string) or ActionDict (uses ['_store_name'] of otherwise ['Name'])
+        :type name_or_dict: str or ActionDict
+        :param indices: indices in the scanning dimensions
+        :type indices: list of int
+        :return: the datapoint (None if the file is not open or doesn't contain the Variable)
+        """
         if self.__check_not_open(): return
-        self.root.sync()
+        name = self.__name_or_dict(name_or_dict)
+        if self._buffer is not None:
+            self._buffer.flush()
+        with self._lock:
+            if name not in self.root.variables:
+                return None
+            return np.ma.filled(np.ma.asarray(self.root.variables[name][tuple(indices)]), np.nan)
+
+    def file_state(self):
+        """
+        Returns what's needed to reopen the current file and continue writing to it (see reopen()), as a dict of
+        plain python types (so it can be stored in yaml). The filename is None if no file is open.
+        Note that the data is only guaranteed to be in the file after sync_hdd().
+
+        :rtype: dict
+        """
+        chunk_shape = self.chunk_shape
+        if type(chunk_shape) is dict:
+            chunk_shape = {name: list(chunk) for name, chunk in chunk_shape.items()}
+        elif chunk_shape is not None:
+            chunk_shape = list(chunk_shape)
+        coordinates = []
+        if self._is_open:
+            with self._lock:
+                coordinates = [name for name in self.root.dimensions if name in self.root.variables]
+        return {'filename': self.filename if self._is_open else None,
+                'lowercase': self.lowercase,
+                'write_behind': self.write_behind,
+                'chunk_shape': chunk_shape,
+                'coordinates': coordinates,
+                'coord_filled': dict(self._coord_filled)}
+
+    def reopen(self, state):
+        """
+        Reopens a file in append mode with the state returned by file_state(), e.g. to continue a measurement that
+        crashed (see BaseExperiment.resume_measurement()).
+
+        :param state: the state returned by file_state()
+        :type state: dict
+        """
+        if state['filename'] is None:
+            return
+        self.lowercase = state['lowercase']
+        self.chunk_shape = state['chunk_shape']
+        self.open_file(state['filename'], write_mode='a', write_behind=state['write_behind'])
+        # Preallocated Coordinates that were not completely filled yet:
+        self._coord_filled.update(state['coord_filled'])
+        # The file may contain Coordinates that were created after the state was stored. Fixed size ones are treated
+        # as preallocated and not filled, so the values are written again:
+        with self._lock:
+            for name in self.root.dimensions:
+                if name in self.root.variables and name not in state['coordinates'] \
+                        and not self.root.dimensions[name].isunlimited():
+                    self._coord_filled[name] = 0
 
     def close(self):
         """
         Closes the file. ( First applies sync_hdd() )
+        In write_behind mode the file is also closed if writing the buffer fails (the exception is raised afterwards).
         """
-        if self._is_open and self.root.isopen():
-            self.root.sync()        # Don't know if this is necessary
-            self.root.close()
-        self._is_open = False
-        self.filename = None
+        buffer, self._buffer = self._buffer, None
+        try:
+            if buffer is not None:
+                buffer.stop()
+        finally:
+            if self._is_open and self.root.isopen():
+                with self._lock:
+                    self.root.sync()        # Don't know if this is necessary
+                    self.root.close()
+            self._is_open = False
+            self.filename = None
 
 
 class BaseExperiment:
@@ -468,6 +1764,7 @@ class BaseExperiment:
         # properly close connections with them at the end
         self.instruments_instances = {}
         self.meta_instr_instances = {}
+        self.instrument_load_times = {}  # load_instruments() stores the time it took to load each instrument here
 
         # This variable will be overwritten by the gui:
         self._gui_parent = None
@@ -476,7 +1773,12 @@ class BaseExperiment:
         self.config_filename = None  # load_config(filename) stores the config filename here
 
         # Measurement status flags:
-        # They can be set externally to control the flow of a measurement:
+        # They can be set externally (e.g. from the gui thread) to control the flow of a measurement.
+        # They're backed by threading.Events, so a paused measurement waits without using cpu (see request_pause()):
+        self._pause_event = threading.Event()
+        self._break_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._flow_condition = threading.Condition()  # notified whenever one of the flags changes
         self.apply_pause = False   # used for temporarily interrupting a measurement
         self.apply_break = False   # used for a soft stop (e.g. stop after current loop iteration)
         self.apply_stop =  False   # used for a hard stop
@@ -493,7 +1795,26 @@ class BaseExperiment:
         # These are parameters that will be updated and used by automated scanning and saving
         self._nesting_indices = []
         self._nesting_parents = []
+        self._scan_lengths = {}   # lengths of the scanning dimensions, determined by scan_lengths() before measuring
+        self._traverse_passes = {}  # number of times traverse() went through each sweep (for serpentine order)
         self._measurement_name = ''
+        # Set to True (or add profile: True to the measurement in the config) to profile the actions of measurements:
+        self.profiling = False
+        self._profiler = None
+        self.last_profile = None     # the ActionProfiler of the last profiled measurement
+        self._estimator = None       # ScanEstimator of the running measurement (see progress() and eta())
+        # File in which the durations of the actions are stored after each measurement (None for
+        # measurement_timings.yml in the log folder), used by estimate_measurement() and as a start for eta():
+        self.timings_filename = None
+        # Set to a number of seconds (or add checkpoint_interval to the measurement in the config) to periodically
+        # store a checkpoint from which a crashed measurement can be resumed (see checkpoint() and resume_measurement()):
+        self.checkpoint_interval = None
+        self._checkpoint_interval = None
+        self._checkpoint_file = None
+        self._next_checkpoint = float('inf')
+        self._action_count = 0       # number of actions started in the running measurement
+        self._skip_count = 0         # when resuming: actions (without nested actions) up to this number are skipped
+        self._resume_state = None
         self.measurement_message = ''  # overwrite this during your measurement and ExpGui will display it in the statusbar
         self.datman = DataManager(self)
         self._finalize_measurement_method = lambda *args, **kwargs: None
@@ -515,6 +1836,95 @@ class BaseExperiment:
     #             msg += ': '+message
     #     self._gui_parent.statusBar().showMessage(msg)
 
+    def _set_flow_flag(self, event, value):
+        # Private helper function. Sets or clears one of the measurement status events and wakes up waiting threads.
+        with self._flow_condition:
+            if value:
+                event.set()
+            else:
+                event.clear()
+            self._flow_condition.notify_all()
+
+    @property
+    def apply_pause(self):
+        """ Flag to temporarily interrupt a measurement. Setting it is the same as request_pause(). """
+        return self._pause_event.is_set()
+
+    @apply_pause.setter
+    def apply_pause(self, value):
+        self._set_flow_flag(self._pause_event, value)
+
+    @property
+    def apply_break(self):
+        """ Flag for a soft stop (e.g. stop after current loop iteration). Setting it is the same as request_break(). """
+        return self._break_event.is_set()
+
+    @apply_break.setter
+    def apply_break(self, value):
+        self._set_flow_flag(self._break_event, value)
+
+    @property
+    def apply_stop(self):
+        """ Flag for a hard stop. Setting it is the same as request_stop(). """
+        return self._stop_event.is_set()
+
+    @apply_stop.setter
+    def apply_stop(self, value):
+        self._set_flow_flag(self._stop_event, value)
+
+    def request_pause(self, pause=True):
+        """
+        Pause (or continue) the measurement. Thread safe, intended to be called from the gui.
+        The measurement pauses at the next call to pause_measurement() (which perform_actionlist() calls between actions).
+
+        :param pause: True to pause, False to continue (defaults to True)
+        :type pause: bool
+        """
+        self.apply_pause = pause
+
+    def request_break(self):
+        """ Request a soft stop (see break_measurement()). Thread safe, intended to be called from the gui. """
+        self.apply_break = True
+
+    def request_stop(self):
+        """ Request a hard stop (see stop_measurement()). Thread safe, intended to be called from the gui. Also ends a pause. """
+        self.apply_stop = True
+
+    def wait_while_paused(self, timeout=None):
+        """
+        Blocks (without using cpu) while the measurement is paused, until it's continued or stopped.
+
+        :param timeout: maximum time to wait in seconds (None (default) waits indefinitely)
+        :type timeout: float or None
+        :return: True if the measurement is still paused (i.e. the timeout expired)
+        :rtype: bool
+        """
+        with self._flow_condition:
+            if self.apply_pause and self._estimator is not None:
+                # Don't count the time paused as time spent by the running actions:
+                t0 = time.perf_counter()
+                self._flow_condition.wait_for(lambda: not self.apply_pause or self.apply_stop, timeout)
+                self._estimator.exclude(time.perf_counter() - t0)
+            else:
+                self._flow_condition.wait_for(lambda: not self.apply_pause or self.apply_stop, timeout)
+            return self.apply_pause and not self.apply_stop
+
+    def wait_for_stop(self, timeout):
+        """
+        Interruptible alternative to time.sleep() for use inside action methods: waits timeout seconds, but returns
+        immediately if stop is requested.
+
+        :Example:
+
+        if self.wait_for_stop(5): return    # wait 5 seconds, unless Stop is pressed
+
+        :param timeout: time to wait in seconds
+        :type timeout: float
+        :return: True if stop is requested
+        :rtype: bool
+        """
+        return self._stop_event.wait(timeout)
+
     def reset_measurement_flags(self):
         """ Reset measurement flags (at the end of a measurement or when it's stopped). """
         self.apply_pause = False   # used for temporarily interrupting a measurement
@@ -606,14 +2016,15 @@ class BaseExperiment:
     @check_pause  # This decorator makes sure the method is only executed if self.apply_pause is True
     def pause_measurement(self):
         """
-        Halts the flow of the measurement. While waiting it checks if checks if "Stop" signal is given.
+        Halts the flow of the measurement. It waits (without using cpu) until the measurement is continued or "Stop" is
+        given.
         :return: (boolean) If measurement is "Stopped" while pausing it returns True
         """
         self.logger.info('Custom pause method. Override if you like, but use @check_pause decorator')
-        while self.apply_pause:
-            # While in pause mode: check if stop is "pressed":
-            if self.stop_measurement():
-                return True        # in that case return True
+        self.wait_while_paused()
+        # Check if stop is "pressed" while pausing:
+        if self.stop_measurement():
+            return True        # in that case return True
 
     @property
     def exit_status(self):
@@ -807,7 +2218,7 @@ class BaseExperiment:
                     return act
         return None
 
-    def perform_measurement(self, measurement_name):
+    def perform_measurement(self, measurement_name, dry_run=False):
         """
         Run an experiment (by name).
 
@@ -815,10 +2226,16 @@ class BaseExperiment:
         Prepares some meta data like hyperion version and measurement name. This can be used by the default_saver when
         creating a new datafile.
         Runs the actionlist specified in the config file.
+        While running, the progress and remaining time can be requested with progress() and eta().
 
         :param measurement_name: The name of the measurement to run (specified in config file)
         :param measurement_name: str
+        :param dry_run: If True, the measurement is not performed, but its duration is estimated (see estimate_measurement())
+        :type dry_run: bool
+        :return: if dry_run is True: the estimated duration in seconds and the number of points
         """
+        if dry_run:
+            return self.estimate_measurement(measurement_name)
         self._measurement_name = measurement_name  # Store the name for later use
 
         if measurement_name in self.properties['Measurements']:
@@ -841,7 +2258,45 @@ class BaseExperiment:
             if self._gui_parent is not None:
                 self._gui_parent.lock_instruments(True, measurement_name)
 
-            self.perform_actionlist(self.properties['Measurements'][measurement_name]['automated_actionlist'])
+            self.datman.reset_live()
+            # Compile the actionlist once, so the (nested) loops don't have to repeat that work on every iteration:
+            plan = self.compile_actionlist(self.properties['Measurements'][measurement_name]['automated_actionlist'])
+            # Look ahead at the lengths of the sweeps, so the DataManager can create fixed size dimensions:
+            self._scan_lengths = self.scan_lengths(plan)
+            self._traverse_passes = {}
+            if self.profiling or self.properties['Measurements'][measurement_name].get('profile', False):
+                self._profiler = ActionProfiler(self)
+                self._profiler.start(measurement_name)
+            self._estimator = ScanEstimator(plan, self.load_timings(measurement_name))
+            self._action_count = 0
+            self._checkpoint_interval = self.properties['Measurements'][measurement_name].get(
+                'checkpoint_interval', self.checkpoint_interval)
+            if self._checkpoint_interval is not None:
+                self._next_checkpoint = time.monotonic() + self._checkpoint_interval
+            try:
+                self.perform_actionlist(plan)
+            except Exception:
+                if self._checkpoint_file is not None:
+                    self.logger.error('Measurement failed. Continue it with resume_measurement({!r})'.format(
+                        self._checkpoint_file))
+                    self._checkpoint_file = None
+                raise
+            finally:
+                self._scan_lengths = {}
+                # Also after a failure, the next measurement shouldn't be profiled (unless it's enabled for it):
+                profiler, self._profiler = self._profiler, None
+                if profiler is not None:
+                    profiler.stop()
+                    self.last_profile = profiler
+                estimator, self._estimator = self._estimator, None
+                self._next_checkpoint = float('inf')
+            self.save_timings(measurement_name, estimator)
+            if self._checkpoint_file is not None:
+                if os.path.isfile(self._checkpoint_file):
+                    os.remove(self._checkpoint_file)
+                self._checkpoint_file = None
+            if profiler is not None:
+                self.save_profile(profiler)
 
             self.reset_measurement_flags()
             self.logger.info('Measurement finished')
@@ -865,27 +2320,426 @@ class BaseExperiment:
         self._measurement_name = ''
         self.measurement_message = ''
 
-    def perform_actionlist(self, actionlist, parents=[]):
+    def progress(self):
+        """
+        Returns the fraction (0 to 1) of the running measurement that is done, or None if no measurement is running.
+        It's cheap enough to be polled by a gui timer.
+        """
+        estimator = self._estimator
+        return None if estimator is None else estimator.progress()
+
+    def eta(self):
+        """
+        Returns the estimated remaining time (in seconds) of the running measurement, or None if no measurement is
+        running or nothing is known about the durations of its actions yet.
+        It's cheap enough to be polled by a gui timer.
+        """
+        estimator = self._estimator
+        return None if estimator is None else estimator.remaining()
+
+    @property
+    def resuming(self):
+        """
+        True while a resumed measurement is skipping the points that were completed before the crash (see
+        resume_measurement()). Actions with nested actions (e.g. loops) are performed during that time, so they can
+        use this to skip slow things like moving a stage.
+        """
+        return self._action_count < self._skip_count
+
+    def checkpoint(self):
+        """
+        Stores the state of the running measurement, so it can be continued with resume_measurement() if it crashes.
+        It syncs the datafile to disk and stores the measurement name, the config, the number of actions performed,
+        the nesting indices and parents and the state of the DataManager in a yaml file next to the datafile
+        (<datafile>_checkpoint.yml) or, if no file is open, in the log folder.
+        perform_actionlist() calls this between actions if checkpoint_interval is set. The checkpoint file is removed
+        when the measurement finishes.
+        """
+        if self._action_count < self._skip_count:
+            return
+        if self._checkpoint_interval is not None:
+            self._next_checkpoint = time.monotonic() + self._checkpoint_interval
+        if self.datman._is_open:
+            self.datman.sync_hdd()
+        state = {'measurement': self._measurement_name,
+                 'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                 'actions_done': self._action_count,
+                 'nesting_indices': list(self._nesting_indices),
+                 'nesting_parents': list(self._nesting_parents),
+                 'config_file': self.config_filename,
+                 'config': self.properties,
+                 'datamanager': self.datman.file_state()}
+        if self._checkpoint_file is None:
+            if self.datman._is_open:
+                self._checkpoint_file = os.path.splitext(self.datman.filename)[0] + '_checkpoint.yml'
+            else:
+                self._checkpoint_file = os.path.join(logging.default_path,
+                                                     valid_python(self._measurement_name) + '_checkpoint.yml')
+            self.logger.info('Storing checkpoints in {}'.format(self._checkpoint_file))
+        try:
+            # Write to a temporary file first, so a crash while writing doesn't destroy the previous checkpoint:
+            with open(self._checkpoint_file + '.tmp', 'w') as f:
+                yaml.safe_dump(state, f, default_flow_style=False)
+            os.replace(self._checkpoint_file + '.tmp', self._checkpoint_file)
+        except (OSError, yaml.YAMLError) as e:
+            self.logger.warning('Could not store checkpoint: {}'.format(e))
+
+    def resume_measurement(self, checkpoint_file):
+        """
+        Continues a measurement that crashed, from the last checkpoint (see checkpoint()).
+        The config is restored from the checkpoint, the datafile is opened in append mode and the actionlist is
+        performed again, but the actions without nested actions are skipped until the point where the checkpoint was
+        made. Actions with nested actions (e.g. loops) are performed, in order to get to that point (see resuming).
+        This requires that the measurement goes through the same points in the same order, i.e. that the sweeps only
+        depend on the config.
+
+        :param checkpoint_file: the checkpoint file (<datafile>_checkpoint.yml)
+        :type checkpoint_file: str
+        """
+        with open(checkpoint_file, 'r') as f:
+            state = yaml.safe_load(f)
+        self.logger.info('Resuming {} from checkpoint of {} ({} actions done)'.format(
+            state['measurement'], state['time'], state['actions_done']))
+        self.load_config(state['config_file'], use_dict=state['config'])
+        self.datman.reopen(state['datamanager'])
+        self._checkpoint_file = checkpoint_file
+        self._skip_count = state['actions_done']
+        self._resume_state = state
+        try:
+            self.perform_measurement(state['measurement'])
+        finally:
+            self._skip_count = 0
+            self._resume_state = None
+
+    def _check_resumed_state(self):
+        # Called by perform_actionlist() when a resumed measurement reaches the checkpoint.
+        state = self._resume_state
+        if state is None:
+            return
+        if state['nesting_indices'] != list(self._nesting_indices) \
+                or state['nesting_parents'] != list(self._nesting_parents):
+            self.logger.warning('Resumed measurement is at {} {}, but the checkpoint was made at {} {}'.format(
+                self._nesting_parents, self._nesting_indices, state['nesting_parents'], state['nesting_indices']))
+        else:
+            self.logger.info('Resuming at {} {}'.format(self._nesting_parents, self._nesting_indices))
+
+    def estimate_measurement(self, measurement_name):
+        """
+        Estimates the duration of a measurement without performing it (dry run), using the durations of the actions
+        stored after previous runs of the same measurement (see save_timings()).
+        Actions of which the duration isn't known are reported in a warning and count as 0 s.
+
+        :param measurement_name: The name of the measurement (specified in config file)
+        :type measurement_name: str
+        :return: the estimated duration in seconds (None if nothing is known) and the number of points
+        :rtype: (float, int)
+        """
+        plan = self.compile_actionlist(self.properties['Measurements'][measurement_name]['automated_actionlist'])
+        estimator = ScanEstimator(plan, self.load_timings(measurement_name))
+        duration = estimator.predicted_duration()
+        if estimator.unknown():
+            self.logger.warning('Duration unknown for: {}'.format(', '.join(estimator.unknown())))
+        if duration is not None:
+            self.logger.info('Estimated duration of {}: {:.1f} s for {} points'.format(measurement_name, duration,
+                                                                                     estimator.total_points))
+        return duration, estimator.total_points
+
+    def _timings_file(self):
+        """ Returns the name of the file in which the durations of the actions are stored. """
+        if self.timings_filename:
+            return self.timings_filename
+        return os.path.join(logging.default_path, 'measurement_timings.yml')
+
+    def load_timings(self, measurement_name):
+        """
+        Returns the durations of the actions (in seconds) stored by previous runs of the measurement.
+
+        :param measurement_name: The name of the measurement
+        :type measurement_name: str
+        :return: action name -> duration in seconds (empty if nothing is stored)
+        :rtype: dict
+        """
+        try:
+            with open(self._timings_file(), 'r') as f:
+                timings = yaml.safe_load(f) or {}
+        except OSError:
+            return {}
+        except yaml.YAMLError as e:
+            self.logger.warning('Could not read {}: {}'.format(self._timings_file(), e))
+            return {}
+        return timings.get(self.__class__.__name__, {}).get(measurement_name, {})
+
+    def save_timings(self, measurement_name, estimator):
+        """
+        Stores the average durations of the actions of a measurement (under the name of the experiment class and the
+        measurement), so they can be used to estimate the next run (see estimate_measurement()).
+
+        :param measurement_name: The name of the measurement
+        :type measurement_name: str
+        :param estimator: the estimator used during the measurement
+        :type estimator: ScanEstimator
+        """
+        durations = {name: float(duration) for name, duration in estimator.durations.items() if duration is not None}
+        if not durations:
+            return
+        filename = self._timings_file()
+        try:
+            timings = {}
+            if os.path.isfile(filename):
+                with open(filename, 'r') as f:
+                    timings = yaml.safe_load(f) or {}
+            timings.setdefault(self.__class__.__name__, {}).setdefault(measurement_name, {}).update(durations)
+            with open(filename, 'w') as f:
+                yaml.safe_dump(timings, f, default_flow_style=False)
+        except (OSError, yaml.YAMLError) as e:
+            self.logger.warning('Could not store the durations of the actions in {}: {}'.format(filename, e))
+
+    def save_profile(self, profiler):
+        """
+        Stores the results of a profiled measurement: the totals per action are logged and saved as a table, the self
+        times are saved as collapsed stacks (for flame graph tools) and the totals per action are attached to the
+        datafile as meta attributes.
+        The files are named after the datafile (<datafile>_profile.txt and <datafile>_profile.folded), or after the
+        measurement in the log folder if nothing was saved.
+
+        :param profiler: the profiler used during the measurement
+        :type profiler: ActionProfiler
+        """
+        self.logger.info('Profile of {}:\n{}'.format(self._measurement_name, profiler.table()))
+        if profiler.filename:
+            basename = os.path.splitext(profiler.filename)[0]
+        else:
+            basename = os.path.join(logging.default_path, valid_python(self._measurement_name))
+        try:
+            table_file, stacks_file = profiler.save(basename)
+            self.logger.info('Saved profile to {} and {}'.format(table_file, stacks_file))
+        except OSError as e:
+            self.logger.warning('Could not save profile: {}'.format(e))
+        if not profiler.filename:
+            return
+        if self.datman._is_open and self.datman.filename == profiler.filename:
+            self.datman.meta(dic=profiler.meta())
+        else:
+            # The file may have been closed already by the finalize method of the experiment
+            try:
+                from netCDF4 import Dataset
+                with Dataset(profiler.filename, 'a') as root:
+                    root.setncatts(profiler.meta())
+            except OSError as e:
+                self.logger.warning('Could not add profile to {}: {}'.format(profiler.filename, e))
+
+    def compile_actionlist(self, actionlist, parents=[]):
+        """
+        Turns an actionlist into an ActionPlan.
+        This does all the work that doesn't change during a measurement only once: creating the ActionDicts (merged with
+        their ActionTypes), looking up the action methods, determining the store names of nesting parents and creating
+        the nesting functions.
+        Note that the actionlist should be valid (see _validate_actionlist()).
+
+        :param actionlist: the actionlist to compile
+        :type actionlist: list of ActionDicts
+        :param parents: List of store names of the nesting parents. Used by recursion. Keep it empty when calling.
+        :type parents: list of str
+        :return: the compiled actionlist
+        :rtype: ActionPlan
+        """
+        compiled = []
+        for actiondictionary in actionlist:
+            actiondict = ActionDict(actiondictionary, exp=self)
+            if '_method' not in actiondict:
+                raise KeyError('No _method found in actiondict or actiontype')
+            else:
+                try:
+                    method = getattr(self, actiondict['_method'])
+                except AttributeError:
+                    raise AttributeError('method {} not found in experiment object'.format(actiondict['_method']))
+            if '_store_name' in actiondict:
+                store_name = valid_python(actiondict['_store_name'])
+            else:
+                store_name = valid_python(actiondict['Name'])
+            if '~nested' in actiondict:
+                # An Action that sweeps several axes adds a dimension for every axis (see sweep_axes()):
+                if actiondict['axes'] and actiondict['order'] != 'adaptive':
+                    dims = [name for name, _ in sweep_axes(actiondict)]
+                else:
+                    dims = [store_name]
+                nested = self.compile_actionlist(actiondict['~nested'], parents + dims)
+                nesting = lambda index=None, plan=nested: self.perform_actionlist(plan, index=index)
+                compiled.append(CompiledAction(actiondict, method, store_name, nested, nesting))
+            else:
+                compiled.append(CompiledAction(actiondict, method, store_name))
+        return ActionPlan(compiled, parents)
+
+    def scan_lengths(self, plan):
+        """
+        Looks ahead through a compiled actionlist and determines the number of points of the nested sweeps.
+        An Action with nested Actions counts as a sweep if its actiondict contains start, stop and step or num (see
+        array_from_settings_dict()), or a list of those under axes (see sweep_axes()). Disabled Actions are skipped.
+
+        :param plan: the compiled actionlist
+        :type plan: ActionPlan
+        :return: dictionary with the store names of the sweeps as keys and their number of points as values
+        :rtype: dict
+        """
+        lengths = {}
+        for action in plan:
+            if action.nested is None:
+                continue
+            if not action.actiondict['_disabled'] and action.actiondict['order'] != 'adaptive':
+                for name, axis in sweep_axes(action.actiondict):
+                    length = length_from_settings_dict(axis)
+                    if length is not None:
+                        lengths[name] = length
+            lengths.update(self.scan_lengths(action.nested))
+        return lengths
+
+    def traverse(self, actiondict):
+        """
+        Generator of the points of a sweep Action, in the traversal order given by the key order of the actiondict:
+
+        - raster (default): the regular order
+        - serpentine: a single axis goes back and forth on consecutive passes (use it for the inner loop of nested
+          sweeps, so the stage doesn't fly back on every step of the outer loop); an Action with several axes goes
+          through its grid like a snake
+        - spiral: outwards from the center (Action with 2 axes only)
+        - hilbert: along a Hilbert space-filling curve (Action with 2 axes only)
+        - adaptive: starts with the grid and then measures more points where the measured values change a lot (or are
+          high), until a budget of points is used, see AdaptiveGrid. The nested Actions are stored along a single
+          dimension (the points, named after the Action). The positions are stored in Variables named after the axes
+          and the refinement level in <Action>_level. The actiondict should contain:
+
+          - metric_variable: Name of the (nested) Variable the refinement is based on (arrays are summed)
+          - budget: the maximum number of points
+          - metric (optional): gradient (default), intensity, or the name of an experiment method that takes the
+            array of values on the corners of a cell and returns its score
+          - threshold (optional): cells with a score at or below this are not refined
+          - refine_levels (optional): how many times the grid spacing can be halved (defaults to 3)
+          - regrid (optional): if True, metric_variable is also stored interpolated on the finest grid as
+            <metric_variable>_regridded, with Coordinates <axis>_regridded
+
+        See sweep_axes() for the sweep dicts of an Action (with one or several axes) and traversal_order() in
+        hyperion.tools.array_tools for the orders. It creates the Coordinates of the axes (with the values in the
+        regular order) in the DataManager. Pass the indices to nesting(), so the DataManager stores the data of the
+        nested Actions at the right place in the regular grid.
+
+        :Example:
+
+        def scan_xy(self, actiondict, nesting):
+            for indices, (x, y) in self.traverse(actiondict):
+                self.stage.move_to(x, y)
+                nesting(indices)
+
+        :param actiondict: the actiondict of the sweep Action
+        :type actiondict: ActionDict
+        :return: yields the indices in the regular grid (tuple of int) and the values of the axes (tuple of float, in
+                 the unit of start)
+        """
+        axes = sweep_axes(actiondict)
+        if not axes:
+            raise KeyError('{} is not a sweep (it needs start and stop, or axes)'.format(actiondict['Name']))
+        arrays, units = zip(*[array_from_settings_dict(axis) for _, axis in axes])
+        order = actiondict['order'] or 'raster'
+        if order == 'adaptive':
+            yield from self._traverse_adaptive(actiondict, axes, arrays, units)
+            return
+        if self.datman._is_open:
+            for (name, _), arr, unit in zip(axes, arrays, units):
+                self.datman.dim_coord(name, arr, meta={'units': str(unit)})
+        points = traversal_order([len(arr) for arr in arrays], order)
+        if len(axes) == 1 and order == 'serpentine':
+            passes = self._traverse_passes.get(actiondict['Name'], 0)
+            self._traverse_passes[actiondict['Name']] = passes + 1
+            if passes % 2:
+                points = points[::-1]
+        for point in points.tolist():
+            yield tuple(point), tuple(arr[i] for arr, i in zip(arrays, point))
+
+    def _traverse_adaptive(self, actiondict, axes, arrays, units):
+        """ Helper generator for traverse() with adaptive order. """
+        store_name = valid_python(actiondict['_store_name'] or actiondict['Name'])
+        metric = actiondict['metric'] or 'gradient'
+        if metric not in ('gradient', 'intensity'):
+            metric = getattr(self, metric)
+        grid = AdaptiveGrid([len(arr) for arr in arrays], actiondict['budget'], actiondict['refine_levels'] or 3,
+                            metric, actiondict['threshold'])
+        # Positions on the fine grid (the coarse grid is the one of the sweep dicts):
+        positions = [np.interp(np.arange(n) / grid.scale, np.arange(len(arr)), arr)
+                     for n, arr in zip(grid.fine_shape, arrays)]
+        # The points are stored along a single dimension, inside the loops this Action is in:
+        dims = list(self._nesting_parents) + [store_name]
+        outer = list(self._nesting_indices)
+        if self.datman._is_open:
+            self.datman.dim(store_name)
+        number = 0
+        points = grid.coarse_points()
+        try:
+            while points:
+                for point in points:
+                    values = tuple(float(pos[i]) for pos, i in zip(positions, point))
+                    if self.datman._is_open:
+                        for (name, _), value, unit in zip(axes, values, units):
+                            self.datman.var(name, value, indices=outer + [number], dims=dims, units=str(unit))
+                        self.datman.var(store_name + '_level', grid.current_level, indices=outer + [number],
+                                        dims=dims, dtype='i1')
+                    yield (number,), values
+                    grid.set_value(point, self._adaptive_value(actiondict['metric_variable'], outer + [number]))
+                    number += 1
+                points = grid.refine()
+        finally:
+            self.logger.info('Adaptive scan {}: {} points'.format(actiondict['Name'], number))
+            if actiondict['regrid'] and grid.values and self.datman._is_open:
+                regrid_dims = []
+                for (name, _), pos, unit in zip(axes, positions, units):
+                    self.datman.dim_coord(name + '_regridded', pos, units=str(unit))
+                    regrid_dims.append(name + '_regridded')
+                name = valid_python(actiondict['metric_variable']) + '_regridded'
+                self.datman.var(name, grid.regrid(), indices=outer, dims=dims[:-1], extra_dims=regrid_dims)
+
+    def _adaptive_value(self, metric_variable, indices):
+        # Helper for _traverse_adaptive(). Returns the (summed) value of metric_variable at indices.
+        live = self.datman.live_var(metric_variable)
+        if live is not None and live.last_indices == tuple(indices):
+            return np.sum(live.latest)
+        value = self.datman.read_point(metric_variable, indices) if self.datman._is_open else None
+        if value is None:
+            self.logger.warning('No value of {} at {} for adaptive scanning'.format(metric_variable, indices))
+            return np.nan
+        return np.sum(value)
+
+    def perform_actionlist(self, actionlist, parents=[], index=None):
         """
         Used to perform a measurement based on the actionlist.
         Usually the user would call perform_measurement
         This method is designed to be called recursively.
+        If a regular actionlist is passed, it is compiled first (see compile_actionlist()).
 
         :param actionlist: the actionlist to be performed
-        :type actionlist: list of ActionDicts
-        :param parents: List to keep track of nesting parents. Used by recursion. Keep it empty when calling.
-        :type parents: list if int
+        :type actionlist: list of ActionDicts or ActionPlan
+        :param parents: List to keep track of nesting parents. Only used when actionlist is not compiled yet. Keep it empty when calling.
+        :type parents: list of str
+        :param index: Index (or tuple of indices for an Action with several axes) in the dimension(s) of the parent.
+                      This is what nesting(index) passes. None (default) means the next index (i.e. the number of
+                      times the actionlist was performed in the current pass of the parent).
+        :type index: int or tuple of int or None
         """
+        if type(actionlist) is ActionPlan:
+            plan = actionlist
+        else:
+            plan = self.compile_actionlist(actionlist, parents)
+        parents = plan.parents
 
         # if self.stop_measurement(): return
         if self.pause_measurement(): return  #: return     # Use this line to check for pause
 
-        if parents == []:
+        if not parents:
             self._nesting_indices = []
 
-
-        if len(parents) > len(self._nesting_indices):
-            self._nesting_indices += [0]
+        if index is not None:
+            # The parent passes the (logical) indices, e.g. when it doesn't sweep in the regular order:
+            index = list(index) if isinstance(index, (tuple, list)) else [index]
+            self._nesting_indices[len(parents) - len(index):] = index
+        elif len(parents) > len(self._nesting_indices):
+            self._nesting_indices.extend([0] * (len(parents) - len(self._nesting_indices)))
         elif len(parents) == len(self._nesting_indices):
             if len(self._nesting_indices):
                 self._nesting_indices[-1] += 1
@@ -894,43 +2748,44 @@ class BaseExperiment:
 
         # typically used on the whole list
         # In a an action that has nested Actions
-        for actiondictionary in actionlist:
-            actiondict = ActionDict(actiondictionary, exp=self)
-            actionname = actiondict['Name']
-
-            if '_method' not in actiondict:
-                raise KeyError('No _method found in actiondict or actiontype')
-            else:
-                try:
-                    method = getattr(self, actiondict['_method'])
-                except AttributeError:
-                    raise AttributeError('method {} not found in experiment object'.format(actiondict['_method']))
+        for action in plan.actions:
             self._nesting_parents = parents  # to make it available outside
-            if '~nested' in actiondict:
-                # without error checking for now:
-                # else:
-                #     indices += [0]  # append 0 to list  current_values
-                if '_store_name' in actiondict:
-                    new_parent = valid_python(actiondict['_store_name'])
-                else:
-                    new_parent = valid_python(actionname)
-                nesting = lambda : self.perform_actionlist(actiondict['~nested'], parents+[new_parent])
-                # store = lambda *args, **kwargs: self._datman.coord(*args, **kwargs, actiondict=actiondict, parents=parents, indices=self._nesting_indices)
-            else:
-                nesting = lambda *args, **kwargs: None        # a "do nothing" function
-                # nesting = lambda *args, **kwargs: self.check_pause()  # a "do nothing" function
-            if '_disabled' not in actiondict or not actiondict['_disabled']:
+            if not action.actiondict['_disabled']:
+                self._action_count += 1
+                if self._action_count <= self._skip_count and action.nested is None:
+                    # Resuming: this action was completed before the checkpoint (see resume_measurement())
+                    if self._estimator is not None:
+                        self._estimator.skip_action(action.name)
+                    if self._action_count == self._skip_count:
+                        self._check_resumed_state()
+                    continue
                 # Normal operation:
-                method(actiondict, nesting)
+                estimator = self._estimator
+                if estimator is not None:
+                    estimator.start_action()
+                try:
+                    if self._profiler is None:
+                        action.method(action.actiondict, action.nesting)
+                    else:
+                        self._profiler.call(action)
+                except BaseException:
+                    # Keep the estimator consistent, in case a parent action handles the exception and continues:
+                    if estimator is not None:
+                        estimator.finish_action(action.name, learn=False)
+                    raise
+                if estimator is not None:
+                    estimator.finish_action(action.name)
             else:
                 # If the action is disabled, only run nested() (those actions should occur once then)
-                nesting()
+                action.nesting()
 
             # Check for stop and pause before continuing to the next action:
             if self.pause_measurement(): return  #: return     # Use this line to check for pause
+            if time.monotonic() >= self._next_checkpoint:
+                self.checkpoint()
 
         if len(parents) < len(self._nesting_indices):
-            del self._nesting_indices[-1]
+            del self._nesting_indices[len(parents):]
 
     def default_saver(self, actiondict, nesting):
         """
@@ -946,7 +2801,7 @@ class BaseExperiment:
             existing_files = os.listdir(actiondict['folder'])
             basename = name_incrementer(actiondict['basename'], existing_files)
         filename_complete = os.path.join(folder, basename)
-        self.datman.open_file(filename_complete, lowercase=True)
+        self.datman.open_file(filename_complete, write_behind=actiondict['write_behind'], lowercase=True)
         if actiondict['comment']:  # This will not add comment if it's empty or non-existing
             self.datman.meta(dic={'comment':actiondict['comment']})
         if actiondict['store_properties']:
@@ -1039,6 +2894,7 @@ class BaseExperiment:
         self.logger.debug('Closing open datafiles if there are any.')
         self.datman.close()
         self.logger.debug('Experiment object finalized.')
+        logging.flush()
 
     def close_all_instruments(self):
         """ Closes all instruments in self.instrument_instances"""
@@ -1081,7 +2937,7 @@ class BaseExperiment:
             return
         instr_class = get_class(self.properties['Instruments'][name]['instrument'])
         if instr_class is None:
-            self.warning("Couldn't load instrument class: {}".format(self.properties['Instruments'][name]['instrument']))
+            self.logger.warning("Couldn't load instrument class: {}".format(self.properties['Instruments'][name]['instrument']))
             return None
         instance = instr_class(self.properties['Instruments'][name])  # added this line
         self.instruments_instances[name] = instance
@@ -1122,7 +2978,7 @@ class BaseExperiment:
             return
         instr_class = get_class(meta_dict['meta_instr'])
         if instr_class is None:
-            self.warning(
+            self.logger.warning(
                 "Couldn't load instrument class: {}".format(self.properties['MetaInstruments'][name]['meta_instr']))
             return None
         instance = instr_class(meta_dict, inst_dict)#self.properties['Instruments'][name])  # added this line
@@ -1130,39 +2986,143 @@ class BaseExperiment:
         self.logger.debug('MetaInstrument: {} has been loaded and added to meta_instrument_instances'.format(name))
         return instance
 
-    def load_instruments(self):
+    def _timed_load(self, load_method, name):
+        """
+        Private helper function for load_instruments().
+        Calls load_method(name) and stores the time it took in self.instrument_load_times. Exceptions are logged (so a
+        failing instrument doesn't prevent the other instruments from loading) and None is returned in that case.
+        """
+        t0 = time.perf_counter()
+        try:
+            instance = load_method(name)
+        except Exception as e:
+            self.logger.exception('Failed to load {}: {}'.format(name, e))
+            instance = None
+        self.instrument_load_times[name] = time.perf_counter() - t0
+        return instance
+
+    def load_instruments(self, parallel=None, max_workers=8):
         """
         Load all instruments specified in the config file. First regular Instruments and then MetaInstruments if applicable.
+
+        Instruments (and MetaInstruments) can be loaded (and initialized) concurrently in a pool of threads, because
+        many instruments spend most of their startup time waiting for the device (e.g. serial devices that reset on
+        connect). Not every driver can be used from another thread (e.g. because of COM), so by default only the ones
+        that specify load_parallel: True in their config are loaded in the pool. The others are loaded one after another
+        in the calling thread (while the pool runs). With parallel=True all of them are loaded in the pool, except the
+        ones that specify load_in_main_thread: True. With parallel=False all of them are loaded one after another.
+        A MetaInstrument is loaded as soon as all the instruments it uses (listed under its 'instruments' key) are
+        loaded.
+
+        Instruments that are already loaded are skipped (and logged as such).
+        An instrument that fails to load doesn't prevent other instruments from loading. The error is logged and the name
+        is returned in the list of failed instruments. The time it took to load each instrument is logged and stored
+        in self.instrument_load_times.
+
+        :param parallel: True to load all instruments concurrently, False to load them one after another, None (default)
+                         to only load the ones with load_parallel: True concurrently
+        :type parallel: bool or None
+        :param max_workers: maximum number of instruments that load simultaneously (defaults to 8)
+        :type max_workers: int
+        :return: names of the instruments and MetaInstruments that failed to load
+        :rtype: list of str
         """
         # NOTE: In the previous version adding instruments to self.instrument_instances was done here, but that has
         # moved to load_instrument
         if 'Instruments' not in self.properties:
             self.logger.error('No Instruments in config file')
-            return
-        else:
-            self.logger.info('Loading all regular Instruments')
-            for instrument in self.properties['Instruments']:
-                self.load_instrument(instrument)  # this method from base_experiment adds intrument instance to self.instrument_instances dictionary
-
+            return []
+        self.instrument_load_times = {}
         if 'MetaInstruments' not in self.properties:
             self.logger.warning('No MetaInstruments in config file')
+            meta_names = []
         else:
+            meta_names = list(self.properties['MetaInstruments'])
+        skipped = [name for name in self.properties['Instruments'] if name in self.instruments_instances]
+        skipped += [name for name in meta_names if name in self.meta_instr_instances]
+        instruments = [name for name in self.properties['Instruments'] if name not in skipped]
+        meta_instruments = [name for name in meta_names if name not in skipped]
+        in_pool = {name for name in instruments if self.__load_in_pool('Instruments', name, parallel)}
+        in_pool |= {name for name in meta_instruments if self.__load_in_pool('MetaInstruments', name, parallel)}
+        t0 = time.perf_counter()
+
+        if not in_pool:
+            self.logger.info('Loading all regular Instruments')
+            results = {name: self._timed_load(self.load_instrument, name) for name in instruments}
             self.logger.info('Loading all MetaInstruments')
-            for meta_instr in self.properties['MetaInstruments']:
-                self.load_meta_instrument(meta_instr)  # this method from base_experiment adds intrument instance to self.instrument_instances dictionary
-
-        #     for meta_inst_name, meta_inst_dict in self.properties['MetaInstruments'].items():
-        #         if 'instruments' not in meta_inst_dict:
-        #             self.logger.error('No instruments key in MetaInstrument; {}'.format(meta_inst_name))
-        #             continue
-        #         for
-        # self.instrument_gui_outputs = {}
-        # self.instrument_guis = {}
-        # for name in self.experiment.instruments_instances:
-        #     self.load_instrument_gui(name)
-
+            results.update({name: self._timed_load(self.load_meta_instrument, name) for name in meta_instruments})
+        else:
+            self.logger.info('Loading {} of the Instruments and MetaInstruments concurrently'.format(len(in_pool)))
+            results = self.__load_instruments_concurrently(instruments, meta_instruments, in_pool, max_workers)
+
+        failed = [name for name in instruments + meta_instruments if results.get(name) is None]
+        for name in instruments + meta_instruments:
+            self.logger.info('Loading {:<25} took {:6.2f} s{}'.format(name, self.instrument_load_times.get(name, 0),
+                                                                      ' (FAILED)' if name in failed else ''))
+        for name in skipped:
+            self.logger.info('Skipped {:<25} (already loaded)'.format(name))
+        self.logger.info('Loaded {} of {} instruments in {:.2f} s (sum of individual times: {:.2f} s){}'.format(
+            len(instruments) + len(meta_instruments) - len(failed), len(instruments) + len(meta_instruments),
+            time.perf_counter() - t0, sum(self.instrument_load_times.values()),
+            ', skipped {} that were already loaded'.format(len(skipped)) if skipped else ''))
+        return failed
+
+    def __load_in_pool(self, section, name, parallel):
+        # Private helper function for load_instruments(). Returns whether the (Meta)Instrument is loaded in the pool.
+        settings = self.properties[section][name]
+        if type(settings) is not dict:
+            return False
+        if parallel is None:
+            return bool(settings.get('load_parallel'))
+        return parallel and not settings.get('load_in_main_thread')
 
+    def __load_instruments_concurrently(self, instruments, meta_instruments, in_pool, max_workers):
+        """
+        Private helper function for load_instruments(). Loads the instruments in in_pool in a thread pool (and the
+        others one after another in the calling thread) and loads each MetaInstrument as soon as the instruments it
+        depends on are done.
 
+        :return: name -> instance (None if it failed)
+        :rtype: dict
+        """
+        results = {}
+        dependencies = {}
+        for name in meta_instruments:
+            meta_dict = self.properties['MetaInstruments'][name]
+            used = meta_dict['instruments'].values() if type(meta_dict.get('instruments')) is dict else []
+            # only wait for instruments that are actually going to be loaded (missing ones are reported on loading)
+            dependencies[name] = set(used) & set(instruments)
+        main_thread = [name for name in instruments if name not in in_pool]
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='load_instrument') as pool:
+            futures = {pool.submit(self._timed_load, self.load_instrument, name): name
+                       for name in instruments if name not in main_thread}
+            done = set()
+            pending = dict(dependencies)
+
+            def submit_ready_meta_instruments():
+                # Submits the MetaInstruments of which all instruments are done (or loads them right away if they're not
+                # loaded in the pool) and returns the futures
+                ready = [meta_name for meta_name, used in pending.items() if used <= done]
+                for meta_name in ready:
+                    del pending[meta_name]
+                    if meta_name in in_pool:
+                        futures[pool.submit(self._timed_load, self.load_meta_instrument, meta_name)] = meta_name
+                    else:
+                        results[meta_name] = self._timed_load(self.load_meta_instrument, meta_name)
+                return {future for future, name in futures.items() if name in ready}
+
+            for name in main_thread:
+                results[name] = self._timed_load(self.load_instrument, name)
+                done.add(name)
+                submit_ready_meta_instruments()
+            not_done = set(futures) | submit_ready_meta_instruments()
+            while not_done:
+                finished, not_done = wait(not_done, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    results[futures[future]] = future.result()
+                    done.add(futures[future])
+                not_done |= submit_ready_meta_instruments()
+        return results
 
 
 if __name__ == '__main__':
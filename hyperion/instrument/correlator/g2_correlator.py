@@ -0,0 +1,376 @@
+"""
+=============
+g2 correlator
+=============
+
+Incremental second order (cross) correlation g(2)(tau) of the photon arrival times on two channels, e.g. the time
+tags of the Hydraharp in T2 mode (see Hydraharp.stream() in hyperion.controller.picoquant.hydraharp).
+
+The times are given in chunks. Only the tail of each channel that is within the largest lag of the last time is kept,
+so the stream is never held in memory. Each chunk correlates the new times of channel a with the tail and new times of
+channel b, and the tail of a with the new times of b, so every pair is counted once.
+The pairs are found without comparing all times: np.searchsorted gives for every time of a the range of times of b
+within the lags, and the pairs in those ranges are made and binned at once (np.repeat and np.bincount).
+
+There are two kinds of lag bins:
+
+- linear: bins of bin_width from -max_lag to max_lag, with the exact time differences
+- multi-tau: 2 * points bins of bin_width around zero, then for every next level points / 2 bins on each side that are
+  twice as wide, up to points * bin_width * 2**(levels - 1). The first levels use the exact time differences, as long
+  as there are a few pairs per time. At the next levels k the times are rounded down to multiples of
+  bin_width * 2**k and times in the same bin are merged into one with a weight, so the number of times (and the
+  work) doesn't grow with the lag. When the times fill the bins, the count traces (counts per bin) are correlated
+  with dot products, and each next level adds pairs of bins. These lags are accurate to a bin width of the level.
+
+g2 normalizes the counts with the count rates: g2 = counts / (rate_a * rate_b * bin width * (duration - abs(lag))), so
+uncorrelated (Poisson) light gives 1.
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+import numpy as np
+from hyperion import logging
+
+
+_max_pairs = 2**22      # number of pairs that _count_pairs handles at once
+
+
+def _count_pairs(x, y, lo, hi, width, counts, wx=None, wy=None, table=None):
+    """
+    Adds the pairs with y - x in [lo, hi) to counts, in bins of width.
+
+    :param x: times
+    :type x: numpy.ndarray
+    :param y: sorted times
+    :type y: numpy.ndarray
+    :param lo: smallest lag
+    :type lo: int
+    :param hi: largest lag (excluded)
+    :type hi: int
+    :param width: bin width
+    :type width: int
+    :param counts: histogram to add to
+    :type counts: numpy.ndarray
+    :param wx: weights of x (defaults to None, meaning 1)
+    :type wx: numpy.ndarray or None
+    :param wy: weights of y (defaults to None, meaning 1)
+    :type wy: numpy.ndarray or None
+    :param table: index in counts for each bin of width (defaults to None, meaning counts has bins of width)
+    :type table: numpy.ndarray or None
+    """
+    if not len(x) or not len(y):
+        return
+    start = np.searchsorted(y, x + lo)
+    number = np.searchsorted(y, x + hi) - start
+    ends = np.cumsum(number)
+    # all pairs at once: every time of x repeated for the times of y in its range, in parts of at most max_pairs
+    first = 0
+    while first < len(x):
+        last = max(int(np.searchsorted(ends, ends[first] - number[first] + _max_pairs, side='right')), first + 1)
+        part = slice(first, last)
+        total = int(ends[last - 1] - ends[first] + number[first])
+        if total:
+            repeats = number[part]
+            index = np.arange(total) + np.repeat(start[part] - (ends[part] - repeats - ends[first] + number[first]),
+                                                 repeats)
+            bins = (y[index] - np.repeat(x[part], repeats) - lo) // width
+            if table is not None:
+                bins = table[bins]
+            weights = None if wx is None else np.repeat(wx[part], repeats) * wy[index]
+            counts += np.bincount(bins, weights, minlength=len(counts))
+        first = last
+
+
+def _count_dense(x, y, first, last, lo, hi, counts):
+    """
+    Adds the correlation of the count traces x and y for the lags in [lo, hi) to counts (one bin per lag).
+    Only x[first:last + 1] is used, the rest of x should be 0.
+    """
+    size = len(y)
+    for bin_index, lag in enumerate(range(lo, hi)):
+        begin = max(first, -lag)
+        end = min(last + 1, size - lag)
+        if end > begin:
+            counts[bin_index] += np.dot(x[begin:end], y[begin + lag:end + lag])
+
+
+def _coarsen(times, weights=None, shift=1):
+    """
+    Lowers the resolution of times (in units of a bin width) by 2**shift and merges equal times.
+
+    :param times: sorted times
+    :type times: numpy.ndarray
+    :param weights: weights of the times (defaults to None, meaning 1)
+    :type weights: numpy.ndarray or None
+    :return: unique times and their summed weights
+    :rtype: tuple of numpy.ndarray
+    """
+    times = times >> shift
+    if not len(times):
+        return times, np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], times[1:] != times[:-1])))
+    if weights is None:
+        return times[starts], np.diff(np.append(starts, len(times)))
+    return times[starts], np.add.reduceat(weights, starts)
+
+
+class _DenseTraces:
+    """
+    Count traces (counts per bin, all bins) of the times of both sets of a chunk, at a coarse level.
+    Used instead of the times when there are more times than bins; going to the next level adds pairs of bins.
+
+    :param coarse: times and weights of the sets (x1, y1, x2, y2) at the level
+    :type coarse: list of tuple
+    """
+    def __init__(self, coarse):
+        used = [t for t, w in coarse if len(t)]
+        self.base = min(int(t[0]) for t in used)
+        size = max(int(t[-1]) for t in used) - self.base + 1
+        self.traces = np.zeros((len(coarse), size))
+        for trace, (times, weights) in zip(self.traces, coarse):
+            if len(times):
+                trace[:] = np.bincount(times - self.base, weights, minlength=size)
+        # first and last time of x1 and x2 (None if empty), only those parts of the traces are multiplied
+        self.limits = [(int(t[0]), int(t[-1])) if len(t) else None for t, w in coarse[::2]]
+
+    def halve(self):
+        """ Goes to the next level. """
+        # bin i goes to (base + i) // 2 - base // 2
+        traces = self.traces
+        shift = self.base % 2
+        halved = np.zeros((len(traces), (traces.shape[1] + shift + 1) // 2))
+        same = traces[:, shift::2]
+        halved[:, shift:shift + same.shape[1]] += same
+        other = traces[:, 1 - shift::2]
+        halved[:, :other.shape[1]] += other
+        self.traces = halved
+        self.base //= 2
+        self.limits = [None if limit is None else (limit[0] >> 1, limit[1] >> 1) for limit in self.limits]
+
+    def count(self, lo, hi, counts):
+        """ Adds the pairs of both sets with lags in [lo, hi) to counts. """
+        for index, limit in enumerate(self.limits):
+            if limit is not None:
+                _count_dense(self.traces[2 * index], self.traces[2 * index + 1], limit[0] - self.base,
+                             limit[1] - self.base, lo, hi, counts)
+
+
+class G2Correlator:
+    """
+    Streaming g(2) correlator of two channels, see the module docstring.
+    Give the times with add() (or add_chunk() for the TTTRChunks of the Hydraharp) and read counts or g2 at any time.
+    Times and lags are integers in the same unit, e.g. ps.
+
+    With multi-tau bins, the lags of the first levels are calculated from the exact time differences, as long as a time
+    has few times of the other channel within those lags (decided on the first chunk, or set with exact_levels).
+    The coarse levels after that use the rounded times, or count traces once there are more times than bins.
+
+    :param bin_width: width of the (smallest) lag bins
+    :type bin_width: int
+    :param max_lag: linear bins: the largest lag (defaults to None)
+    :type max_lag: int or None
+    :param levels: multi-tau bins: the number of levels (defaults to None, meaning linear bins)
+    :type levels: int or None
+    :param points: multi-tau bins: number of bins per level, even (defaults to 16)
+    :type points: int
+    :param exact_levels: multi-tau bins: the levels after level 0 that use the exact time differences (defaults to
+                         None, meaning the levels within which a time has one time of the other channel on average)
+    :type exact_levels: int or None
+    """
+    exact_pairs = 8         # exact time differences are used up to the lag with this many pairs per time on average
+    dense_factor = 2        # count traces are used when they have at most this many bins per time
+    max_table = 2**20       # largest lookup table of exact lags to multi-tau bins
+
+    def __init__(self, bin_width, max_lag=None, levels=None, points=16, exact_levels=None):
+        self.logger = logging.getLogger(__name__)
+        self.bin_width = int(bin_width)
+        self.points = points
+        if levels is None:
+            if max_lag is None:
+                raise ValueError('G2Correlator needs max_lag (linear bins) or levels (multi-tau bins)')
+            bins = -(-int(max_lag) // self.bin_width)
+            levels = 1
+            self.multi_tau = False
+        else:
+            if points % 2:
+                raise ValueError('points should be even, not {}'.format(points))
+            bins = points
+            self.multi_tau = True
+        self.levels = levels
+        self.exact_levels = exact_levels
+        # bins of every level: (lo, hi) lags in bins of bin_width (level 0) or of 1 in units of the bin width of the
+        # level (coarse levels), in the order of the lags
+        ranges = [(0, -bins * self.bin_width, bins * self.bin_width)]
+        for level in range(1, levels):
+            ranges.insert(0, (level, -points, -points // 2))
+            ranges.append((level, points // 2, points))
+        edges, widths = [], []
+        self._levels = [(level, self.bin_width * 2**level, []) for level in range(levels)]
+        for level, lo, hi in ranges:
+            scale, width = (1, self.bin_width) if level == 0 else (self.bin_width * 2**level, 1)
+            start = len(widths)
+            edges.extend(range(lo * scale, hi * scale, width * scale))
+            widths.extend([width * scale] * ((hi - lo) // width))
+            self._levels[level][2].append((lo, hi, slice(start, len(widths))))
+        self.edges = np.array(edges, dtype=np.int64)        # left edges of the lag bins
+        self.widths = np.array(widths, dtype=np.int64)      # widths of the lag bins
+        self.max_lag = int(self.edges[-1] + self.widths[-1])
+        # times further back than this can't pair with later ones (also at the coarse levels, which round down)
+        self._reach = self.max_lag + 2 * int(self.widths.max())
+        self.reset()
+
+    def reset(self):
+        """ Clears the counts and the tails. """
+        self.counts = np.zeros(len(self.edges))
+        self.total_a = 0
+        self.total_b = 0
+        self.start = None       # first time given
+        self.horizon = None     # time up to which all times are given
+        self._tail_a = np.zeros(0, dtype=np.int64)
+        self._tail_b = np.zeros(0, dtype=np.int64)
+        self._exact = None      # (number of exact levels, lo, hi, lookup table, slice of the bins)
+
+    def _set_exact(self, rate):
+        # Sets the levels that use the exact time differences, for times with rate (per unit of time)
+        exact = 0
+        if self.multi_tau:
+            if self.exact_levels is not None:
+                exact = min(self.exact_levels, self.levels - 1)
+            else:
+                pairs = rate * 2 * self.points * self.bin_width     # pairs per time at the first level
+                while exact + 1 < self.levels and pairs * 2**(exact + 1) <= self.exact_pairs:
+                    exact += 1
+            while 2 * self.points * 2**exact > self.max_table:
+                exact -= 1
+        ranges = self._levels[exact][2]
+        bins = slice(ranges[0][2].start, ranges[-1][2].stop)
+        lo = int(self.edges[bins.start])
+        hi = int(self.edges[bins.stop - 1] + self.widths[bins.stop - 1])
+        table = None
+        if exact:
+            table = np.searchsorted(self.edges[bins], np.arange(lo, hi, self.bin_width), side='right') - 1
+        self._exact = (exact, lo, hi, table, bins)
+        self.logger.debug('Exact time differences up to %s (%s levels)', hi, exact)
+
+    @property
+    def lags(self):
+        """ Centers of the lag bins. """
+        return self.edges + self.widths / 2
+
+    @property
+    def duration(self):
+        """ Time span of the times given so far. """
+        return 0 if self.start is None else self.horizon - self.start
+
+    @property
+    def rates(self):
+        """ Mean count rates of channel a and b (per unit of time). """
+        duration = self.duration
+        if not duration:
+            return 0.0, 0.0
+        return self.total_a / duration, self.total_b / duration
+
+    @property
+    def g2(self):
+        """ The counts normalized by the count rates, so uncorrelated light gives 1 (NaN where there's no data). """
+        rate_a, rate_b = self.rates
+        expected = rate_a * rate_b * self.widths * (self.duration - np.abs(self.lags))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(expected > 0, self.counts / expected, np.nan)
+
+    def add(self, a, b, horizon=None):
+        """
+        Adds the next times of both channels to the correlation.
+
+        :param a: sorted times of channel a, not earlier than the horizon of the previous call
+        :type a: numpy.ndarray
+        :param b: sorted times of channel b, not earlier than the horizon of the previous call
+        :type b: numpy.ndarray
+        :param horizon: time up to which all times are given (defaults to None, meaning the last of a and b)
+        :type horizon: int or None
+        """
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        if horizon is None:
+            last = [t[-1] for t in (a, b) if len(t)]
+            if not last:
+                return
+            horizon = max(last) if self.horizon is None else max(last + [self.horizon])
+        if self.start is None:
+            self.start = min([int(t[0]) for t in (a, b) if len(t)], default=int(horizon))
+        if self._exact is None:
+            if not len(a) and not len(b):
+                return
+            self._set_exact(max(len(a), len(b)) / max(horizon - self.start, 1))
+        old_a, old_b = self._tail_a, self._tail_b
+        all_a = self._join(old_a, a)
+        all_b = self._join(old_b, b)
+        # the sets of times to correlate: (new a with all b) and (old a with new b)
+        sets = [(a, all_b), (old_a, b)]
+        exact, lo, hi, table, bins = self._exact
+        for x, y in sets:
+            _count_pairs(x, y, lo, hi, self.bin_width, self.counts[bins], table=table)
+        coarse = None   # level and the times and weights of the sets at that level
+        dense = None    # count traces, once they are smaller than the times
+        for level, scale, ranges in self._levels[exact + 1:]:
+            if dense is None:
+                if coarse is None:
+                    coarse = [level, [_coarsen(t // self.bin_width, shift=level) for s in sets for t in s]]
+                while coarse[0] < level:
+                    coarse = [coarse[0] + 1, [_coarsen(*t) for t in coarse[1]]]
+                used = [t for t, w in coarse[1] if len(t)]
+                if not used:
+                    break
+                span = max(int(t[-1]) for t in used) - min(int(t[0]) for t in used) + 1
+                if span <= self.dense_factor * sum(len(t) for t in used):
+                    dense = _DenseTraces(coarse[1])
+            else:
+                dense.halve()
+            for lo, hi, bins in ranges:
+                if dense is not None:
+                    dense.count(lo, hi, self.counts[bins])
+                    continue
+                (x1, w1), (y1, v1), (x2, w2), (y2, v2) = coarse[1]
+                _count_pairs(x1, y1, lo, hi, 1, self.counts[bins], w1, v1)
+                _count_pairs(x2, y2, lo, hi, 1, self.counts[bins], w2, v2)
+        self.total_a += len(a)
+        self.total_b += len(b)
+        self.horizon = int(horizon)
+        keep_after = self.horizon - self._reach
+        self._tail_a = all_a[np.searchsorted(all_a, keep_after):]
+        self._tail_b = all_b[np.searchsorted(all_b, keep_after):]
+
+    @staticmethod
+    def _join(old, new):
+        # The tail and the new times, sorted (new times can be a bit earlier than the last old one in T3 mode)
+        joined = np.concatenate((old, new))
+        if len(old) and len(new) and new[0] < old[-1]:
+            joined.sort(kind='mergesort')
+        return joined
+
+    def add_chunk(self, chunk, channels=(0, 1), sync_period=None, resolution=None):
+        """
+        Adds the photons in a chunk of decoded TTTR records of the Hydraharp (see TTTRChunk).
+        In T2 mode the times are in units of the base resolution (ps); in T3 mode they are calculated from the sync
+        number and the time after the sync, which needs sync_period and resolution.
+
+        :param chunk: decoded records
+        :type chunk: TTTRChunk
+        :param channels: the input channels of a and b (defaults to (0, 1))
+        :type channels: tuple of int
+        :param sync_period: T3 mode: the period of the sync in ps
+        :type sync_period: int
+        :param resolution: T3 mode: the resolution in ps
+        :type resolution: int
+        """
+        if not len(chunk):
+            return
+        if chunk.mode == 'T2':
+            self.add(chunk.photons(channels[0]), chunk.photons(channels[1]), chunk.time[-1])
+            return
+        if sync_period is None or resolution is None:
+            raise ValueError('T3 records need the sync_period and resolution to calculate the times')
+        times = [chunk.photons(c) * int(sync_period) + chunk.delays(c).astype(np.int64) * int(resolution)
+                 for c in channels]
+        # photons arrive after their sync, so the next chunk starts at least at the sync of the last record
+        self.add(np.sort(times[0]), np.sort(times[1]), chunk.time[-1] * int(sync_period))
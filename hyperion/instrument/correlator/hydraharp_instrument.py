@@ -10,12 +10,179 @@ from hyperion import logging
 import yaml           #for the configuration file
 import os             #for playing with files in operation system
 import time
+import threading
+from concurrent.futures import Future
 from hyperion import root_dir, ur
 import matplotlib.pyplot as plt
 import numpy as np
 
 from hyperion.instrument.base_instrument import BaseInstrument
 
+class HistogramAcquisition:
+    """
+    | A histogram measurement of the Hydraharp that runs on its own thread, started by HydraInstrument.start_histogram().
+    | It polls ctc_status with intervals that get shorter towards the expected end (half the remaining time, between
+    | poll_min and poll_max), so it finishes within a few ms of the end instead of up to a second late.
+    | Intermediate histograms are only read for subscribers (see subscribe()), at the interval each of them chooses.
+    | The state goes from 'running' to 'finished', 'stopped' (by stop()) or 'failed' (an exception).
+    | The final histogram is the result of future (a concurrent.futures.Future), so you can wait for it or get a
+    | callback when it's done:
+
+    .. code-block:: python
+
+        acquisition = instrument.start_histogram(5 * ur('s'), 0)
+        acquisition.subscribe(lambda histogram, time_passed: print(time_passed, histogram.sum()), interval=1)
+        acquisition.add_done_callback(lambda future: print('done', future.result().sum()))
+        histogram = acquisition.result()     # blocks until it's done
+
+    In asyncio code, await asyncio.wrap_future(acquisition.future).
+
+    :param controller: the Hydraharp controller
+    :type controller: Hydraharp
+    :param integration_time: acquisition time of the histogram
+    :type integration_time: pint quantity
+    :param channel: input channel of the histogram, 0 or 1, or a list of channels to get their histograms of the same
+                    measurement as a 2D array (channels, bins)
+    :type channel: int or list of int
+    :param poll_min: shortest interval in s between the status polls (defaults to 0.002)
+    :type poll_min: float
+    :param poll_max: longest interval in s between the status polls (defaults to 0.5)
+    :type poll_max: float
+    """
+    def __init__(self, controller, integration_time, channel, poll_min=0.002, poll_max=0.5):
+        self.logger = logging.getLogger(__name__)
+        self.controller = controller
+        self.integration_time = integration_time
+        self.channel = int(channel) if np.ndim(channel) == 0 else [int(number) for number in channel]
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        self.state = 'running'
+        self.polls = 0                      # number of ctc_status polls
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()     # it's stopped with stop(), not cancelled
+        self._subscribers = []              # [callback, interval, next preview time] of every subscriber
+        self._lock = threading.Lock()       # guards _subscribers
+        self._stop_event = threading.Event()
+        self._start = None
+        self._end = None
+        self._thread = threading.Thread(target=self._run, name='Hydraharp histogram', daemon=True)
+
+    def start(self):
+        """ Starts the measurement and the thread that follows it. Returns itself. """
+        try:
+            self.controller.start_measurement(int(self.integration_time.m_as('ms')))
+        except Exception as e:
+            self.state = 'failed'
+            self.future.set_exception(e)
+            raise
+        self._start = time.monotonic()
+        self._end = self._start + self.integration_time.m_as('s')
+        self._thread.start()
+        return self
+
+    @property
+    def time_passed(self):
+        """ Time since the start, up to the integration time (pint quantity in s). """
+        if self._start is None:
+            return 0 * ur('s')
+        return (min(time.monotonic(), self._end) - self._start) * ur('s')
+
+    def subscribe(self, callback, interval=1):
+        """
+        | Asks for intermediate histograms: callback(histogram, time_passed) is called every interval seconds while
+        | the measurement runs (on the thread of the acquisition). The histogram is a copy, the callback can keep it.
+
+        :param callback: function that gets the histogram (numpy array) and the time passed (pint quantity)
+        :type callback: callable
+        :param interval: time in s between the previews (defaults to 1)
+        :type interval: float
+        """
+        with self._lock:
+            self._subscribers.append([callback, interval, time.monotonic() + interval])
+
+    def unsubscribe(self, callback):
+        """ Stops the previews of callback. """
+        with self._lock:
+            self._subscribers = [subscriber for subscriber in self._subscribers if subscriber[0] is not callback]
+
+    def stop(self):
+        """ Stops the measurement before the integration time has passed; the result is the histogram so far. """
+        self._stop_event.set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """
+        Waits for the end of the measurement and returns the histogram (see concurrent.futures.Future.result).
+        Unlike the future, it also waits for the done callbacks (they run on the thread of the acquisition).
+        """
+        histogram = self.future.result(timeout)
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+        return histogram
+
+    def add_done_callback(self, callback):
+        """ callback(future) is called when the acquisition is done (right away if it's done already). """
+        self.future.add_done_callback(callback)
+
+    def _run(self):
+        try:
+            after_end = 0       # number of polls after the expected end
+            while True:
+                if self._stop_event.is_set():
+                    self.controller.stop_measurement()
+                    self.state = 'stopped'
+                    break
+                self.polls += 1
+                ended = self.controller.ctc_status
+                if ended is None:
+                    raise RuntimeError('could not read the status of the Hydraharp')
+                if ended:
+                    self.state = 'finished'
+                    break
+                now = time.monotonic()
+                wait = self._previews(now)
+                remaining = self._end - now
+                if remaining > 0:
+                    wait = min(wait, max(remaining / 2, self.poll_min), self.poll_max)
+                else:
+                    wait = min(wait, self.poll_min * 2**after_end, self.poll_max)
+                    after_end += 1
+                self._stop_event.wait(max(wait, 0))
+            histogram = self._read(True)
+            if histogram is None:
+                raise RuntimeError('could not read the histogram of the Hydraharp')
+            self.logger.debug('Histogram %s after %s polls', self.state, self.polls)
+            self.future.set_result(histogram.copy())
+        except Exception as e:
+            self.state = 'failed'
+            self.logger.exception('The histogram measurement failed')
+            self.future.set_exception(e)
+
+    def _read(self, clear):
+        # Reads the histogram of the channel, or the histograms of the list of channels
+        if isinstance(self.channel, list):
+            return self.controller.histograms(self.channel, clear)
+        return self.controller.histogram(self.channel, clear)
+
+    def _previews(self, now):
+        # Reads the histogram once for the subscribers that are due and returns the time in s until the next one
+        with self._lock:
+            subscribers = list(self._subscribers)
+        due = [subscriber for subscriber in subscribers if subscriber[2] <= now]
+        if due:
+            histogram = self._read(False).copy()
+            time_passed = self.time_passed
+            for subscriber in due:
+                subscriber[2] = now + subscriber[1]
+                try:
+                    subscriber[0](histogram, time_passed)
+                except Exception:
+                    self.logger.exception('Preview callback %s failed', subscriber[0])
+        return min([subscriber[2] for subscriber in subscribers], default=float('inf')) - now
+
+
 class HydraInstrument(BaseInstrument):
     """
     A class for the Hydraharp instrument.
@@ -35,7 +202,7 @@ class HydraInstrument(BaseInstrument):
         self.hist = []
         self.initialize()
 
-        self.stop = False
+        self.acquisition = None     # the last HistogramAcquisition
         self.hist_ended = False
         #self.remaining_time = 0*ur('s')
         self.time_passed = 0*ur('s')
@@ -49,7 +216,7 @@ class HydraInstrument(BaseInstrument):
 
     def configurate(self, filename = None):
         """ | Loads the yml configuration file of default instrument settings that probably nobody is going to change.
-        | File in folder \instrument\correlator\HydrahaInstrument_config.yml.
+        | File in folder /instrument/correlator/HydraInstrument_config.yml.
         
         :param filename: the name of the configuration file
         :type filename: string
@@ -68,7 +235,7 @@ class HydraInstrument(BaseInstrument):
             self.settings[key] = ur(self.settings[key])
 
         self.logger.info('Status info:')
-        self.logger.info('number of input channels: ' + str(self.controller.number_input_channels))
+        self.logger.info('number of input channels: %s', self.controller.number_input_channels)
         
         self.controller.sync_divider(self.settings['sync_div'])
         self.controller.sync_CFD(self.settings['sync_disc'].m_as('mV'),self.settings['sync_zero'].m_as('mV'))#.m_as('mV'))
@@ -121,96 +288,114 @@ class HydraInstrument(BaseInstrument):
         self.controller.resolution = res.m_as('ps')
         self.logger.debug('Set the parameters for taking a histogram')
     
-    def make_histogram(self, integration_time, count_channel):
-        """ | Does the histogram measurement, checking for the status, saving the histogram.
-        | **You need to start the measurement and than you could collect the histogram.**
-        | This communicates with the controller method start_measurement and than goes to the wait_till_finished method. 
-        
-        :param count_channel: number of channel that is correlated with the sync channel, 1 or 2
-        :type count_channel: int
+    def start_histogram(self, integration_time, count_channel, on_done=None):
+        """ | Starts a histogram measurement and returns right away with the HistogramAcquisition that follows it.
+        | When it's done, the histogram is put in self.hist and self.hist_ended is set, then on_done is called.
+        | Subscribe to the acquisition for intermediate histograms.
+        | With a list of channels, the histograms of all of them are measured at once (2D array (channels, bins)).
 
         :param integration_time: acquisition time of the histogram; **(please don't use the word time)**
         :type integration_time: pint quantity
 
-        :return: array containing the histogram
-        :rtype: array
-        """
-        #self.logger.info('Remaining time: ' + str(self.prepare_to_take_histogram(tijd)))
-        #self.prepare_to_take_histogram(tijd)
+        :param count_channel: number of channel that is correlated with the sync channel, 0 or 1, or a list of them
+        :type count_channel: int or list of int
 
-        self.logger.debug('Start the histogram measurement')
-        self.controller.start_measurement(int(integration_time.m_as('ms')))
-
-        self.wait_till_finished(integration_time, count_channel)
-        self.logger.debug('Time passed: ' + str(self.time_passed))
-
-        self.hist = self.controller.histogram(int(count_channel), True)     #Last time, put the histogram memory to 0
-
-        self.logger.debug('Collect the histogram after taking it.')
+        :param on_done: called with the future of the acquisition when it's done (defaults to None)
+        :type on_done: callable
 
+        :return: the running acquisition
+        :rtype: HistogramAcquisition
+        """
+        if self.acquisition is not None and not self.acquisition.done():
+            raise RuntimeError('A histogram measurement is running already')
+        self.logger.debug('Start the histogram measurement')
         self.hist_ended = False
-        return self.hist
+        self.time_passed = 0 * ur('s')
+        self.acquisition = HistogramAcquisition(self.controller, integration_time, count_channel)
+        self.acquisition.add_done_callback(self._histogram_done)
+        if on_done is not None:
+            self.acquisition.add_done_callback(on_done)
+        return self.acquisition.start()
+
+    def _histogram_done(self, future):
+        self.time_passed = self.acquisition.time_passed
+        self.logger.debug('Time passed: %s', self.time_passed)
+        if future.exception() is None:
+            self.hist = future.result()
+        self.hist_ended = True
 
-    def show_time_passed(self, integration_time, time_passed):
-        self.time_passed = time_passed
-        #print(self.time_passed)
-        remaining_time = integration_time - time_passed
-        return self.time_passed
+    def make_histogram(self, integration_time, count_channel):
+        """ | Does the histogram measurement and waits until it's finished (see start_histogram to not wait).
 
-    def wait_till_finished(self, integration_time, count_channel):
-        """| This method should ask the device its status and keep asking until it's finished.
-        | However, the remaining time is printed but not shown with the timer in the gui.
-        | The loop breaks if self.stop is put to True, which could be done in a higher level with a thread.
+        :param count_channel: number of channel that is correlated with the sync channel, 0 or 1
+        :type count_channel: int
 
-        :param integration_time: integration time of histogram **(please don't use the word time)**
+        :param integration_time: acquisition time of the histogram; **(please don't use the word time)**
         :type integration_time: pint quantity
 
-        :param count_channel: number of channel that is correlated with the sync channel, 1 or 2
-        :type count_channel: int
+        :return: array containing the histogram
+        :rtype: array
+        """
+        return self.start_histogram(integration_time, count_channel).result()
 
-        :return: remaining time in seconds
-        :rtype: pint quantity
+    def make_histograms(self, integration_time, channels=None):
+        """ | Measures the histograms of more channels at once and waits until it's finished.
+        | The device histograms all channels during the same measurement, so this takes as long as make_histogram.
 
-        """
-        # ended = self.hist_ended
-        #t = round(float(tijd.magnitude) / 20)
+        :param integration_time: acquisition time of the histograms
+        :type integration_time: pint quantity
 
-        t = 1       # in s
-        total_time_passed = ur('0s')
+        :param channels: channels that are correlated with the sync channel (defaults to None, all input channels)
+        :type channels: list of int
 
-        self.logger.debug('Ended?: ' + str(self.hist_ended))
-        total_time_passed += t * ur('s')
+        :return: array containing the histograms, one row per channel
+        :rtype: numpy.ndarray
+        """
+        if channels is None:
+            channels = list(range(self.controller.number_input_channels))
+        return self.start_histogram(integration_time, list(channels)).result()
 
-        self.logger.debug('time passed: {}'.format(self.show_time_passed(integration_time, total_time_passed)))
+    def histogram_delays(self):
+        """ Delays after the sync of the bins of the histograms, at the current resolution and length.
 
-        time.sleep(1)
+        :return: delay of every bin
+        :rtype: pint quantity (numpy array in ps)
+        """
+        return np.arange(self.controller.histogram_length) * self.controller.resolution * ur('ps')
 
-        while self.hist_ended == False:
-            self.hist_ended = self.controller.ctc_status
-            self.logger.debug('Is the histogram finished? ' + str(self.hist_ended))
+    def store_histograms(self, datman, name, histograms, channels=None, **kwargs):
+        """ | Stores histograms of make_histograms() as a Variable of the DataManager with two extra dimensions:
+        | name_channel (the channel numbers) and name_delay (the delays of the bins in ps). The Coordinates are made the
+        | first time, so it can be called at every point of a scan (pass indices and dims like for DataManager.var()).
 
-            total_time_passed += t * ur('s')
-            #this line returns a pint quantity which tells the user how much time the program needs before it can collect the histogram
-            self.logger.debug('time passed ' + str(total_time_passed))
+        :param datman: the DataManager of the experiment
+        :type datman: DataManager
 
-            self.show_time_passed(integration_time, total_time_passed)
-            self.logger.debug('time_passed value: {}'.format(self.time_passed))
+        :param name: name of the Variable
+        :type name: str
 
-            self.hist = self.controller.histogram(int(count_channel), False)        #Dont let the histogram memory be cleared
-            time.sleep(t)
+        :param histograms: histograms, one row per channel
+        :type histograms: numpy.ndarray
 
-            if self.stop:
-                self.logger.info('Stopping the histogram')
-                self.stop = False
-                break
+        :param channels: channel of every row (defaults to None, 0, 1, ...)
+        :type channels: list of int
 
-        self.logger.debug('Time passed: ' + str(self.show_time_passed(integration_time, total_time_passed)))
-        self.logger.debug('Ended? ' + str(self.hist_ended))
+        :param kwargs: passed on to DataManager.var() (e.g. indices, dims, meta)
+        """
+        if channels is None:
+            channels = range(len(histograms))
+        datman.dim_coord(name + '_channel', np.array(channels, dtype='i4'))
+        datman.dim_coord(name + '_delay', self.histogram_delays().m_as('ps'), units='ps')
+        datman.var(name, histograms, extra_dims=(name + '_channel', name + '_delay'), **kwargs)
 
     def stop_histogram(self):
         """| This method stops taking the histogram, could be used in higher levels with a thread.
+        | The histogram so far becomes the result of the acquisition.
         """
-        self.controller.stop_measurement()
+        if self.acquisition is not None and not self.acquisition.done():
+            self.acquisition.stop()
+        else:
+            self.controller.stop_measurement()
 
     def finalize(self):
         """ This method is to close connection to the device."""
@@ -10,7 +10,6 @@ Here we group some array tools that we use in the project.
 """
 from hyperion import logging
 import numpy as np
-from hyperion import Q_
 
 def array_from_pint_quantities(start, stop, step=None, num=None):
     """
@@ -68,6 +67,7 @@ def array_from_string_quantities(start, stop, step=None, num=None):
     Arguments start, stop and step should be strings, num could be integer (or string of integer).
     See array_from_pint_quantities() for further details.
     """
+    from hyperion import Q_     # imported here, because the unit registry is only created when it's first used
     sta = Q_(start)
     sto = Q_(stop)
     if step == None:
@@ -98,3 +98,89 @@ def array_from_settings_dict(sweep_dict):
         return array_from_string_quantities(sweep_dict['start'], sweep_dict['stop'], num=sweep_dict['num'])
     else:
         return array_from_string_quantities(sweep_dict['start'], sweep_dict['stop'])
+
+def length_from_settings_dict(sweep_dict):
+    """
+    Returns the number of points of the array that array_from_settings_dict() generates for sweep_dict.
+    Returns None if sweep_dict doesn't contain start and stop or if the array can't be generated.
+    Useful to look ahead at the size of a sweep before it's performed.
+
+    :param sweep_dict: Dictionary containing start and stop keys and either step or num key
+    :return: number of points (or None)
+    :rtype: int
+    """
+    if 'start' not in sweep_dict or 'stop' not in sweep_dict:
+        return None
+    if sweep_dict['start'] is None or sweep_dict['stop'] is None:
+        return None
+    try:
+        return len(array_from_settings_dict(sweep_dict)[0])
+    except Exception:
+        return None
+
+traversal_orders = ('raster', 'serpentine', 'spiral', 'hilbert')
+
+def traversal_order(shape, order='raster'):
+    """
+    Returns the order in which to visit the points of a (multi dimensional) grid, as an array of indices.
+    Useful for scanning a stage over a grid with less travel than the regular (raster) order, in which the stage flies
+    back to the start of the inner axis on every step of the outer axis.
+
+    - raster: the regular order (the last index changes fastest)
+    - serpentine: like raster, but every other pass of an inner axis goes backwards (boustrophedon). Consecutive
+      points are always neighbours.
+    - spiral: (2D only) rectangular spiral outwards from the center of the grid. Consecutive points are always
+      neighbours.
+    - hilbert: (2D only) Hilbert space-filling curve (on the smallest power of 2 square that covers the grid), which
+      keeps points that are close in the order close in space
+
+    :param shape: number of points in every dimension
+    :type shape: tuple of int
+    :param order: one of 'raster' (default), 'serpentine', 'spiral', 'hilbert'
+    :type order: str
+    :return: array of shape (number of points, number of dimensions) with the indices in the order to visit them
+    :rtype: numpy.ndarray
+    """
+    shape = tuple(int(n) for n in shape)
+    if order not in traversal_orders:
+        raise ValueError('unknown traversal order: {} (use one of {})'.format(order, ', '.join(traversal_orders)))
+    if order in ('spiral', 'hilbert') and len(shape) != 2:
+        raise ValueError('{} order is only possible for 2 dimensions'.format(order))
+    grid = np.indices(shape).reshape(len(shape), -1).T
+    if order == 'raster' or not len(grid):
+        return grid
+    if order == 'serpentine':
+        # Reverse an index if the sum of the (serpentine) indices of the dimensions outside it is odd
+        snake = grid.copy()
+        for dim in range(1, len(shape)):
+            odd = snake[:, :dim].sum(axis=1) % 2 == 1
+            snake[odd, dim] = shape[dim] - 1 - grid[odd, dim]
+        return snake
+    if order == 'spiral':
+        # Walk a spiral outwards. The legs along the longest axis are longer by the difference in length of the axes,
+        # so the spiral fills the grid ring by ring and every ring starts next to the end of the previous one.
+        rows, cols = sorted(shape)
+        steps = [np.full((1, 2), (rows - 1) // 2)]
+        for leg in range(2 * rows + 2):
+            direction = ((0, 1), (1, 0), (0, -1), (-1, 0))[leg % 4]
+            steps.append(np.repeat([direction], leg // 2 + 1 + (cols - rows if direction[1] else 0), axis=0))
+        path = np.cumsum(np.concatenate(steps), axis=0)
+        path = path[(path >= 0).all(axis=1) & (path < (rows, cols)).all(axis=1)]
+        return path if shape[1] >= shape[0] else path[:, ::-1]
+    # hilbert: distance along the curve of every point (vectorized version of the well known xy2d algorithm)
+    size = 1 << max(0, int(np.ceil(np.log2(max(shape)))))
+    x, y = grid[:, 0].copy(), grid[:, 1].copy()
+    distance = np.zeros(len(grid), dtype=np.int64)
+    s = size // 2
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        distance += s * s * ((3 * rx) ^ ry)
+        # rotate the quadrant:
+        flip = ~ry & rx
+        x = np.where(flip, s - 1 - x, x)
+        y = np.where(flip, s - 1 - y, y)
+        swap = ~ry
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s //= 2
+    return grid[np.argsort(distance, kind='stable')]
@@ -1,15 +1,45 @@
+"""
+=======
+Loading
+=======
+
+Tools to resolve classes from strings like 'hyperion.controller.example_controller/ExampleController' (as used in the
+config files for instruments, controllers and guis).
+
+Resolved classes are kept in a registry, so every class string is only interpreted (and its module imported) once.
+LazyClass is a proxy that postpones importing the module until the class is actually used (e.g. instantiated), and
+prewarm() can import a list of classes on a background thread, e.g. while the instruments are connecting.
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
 from hyperion.core import logman
 import importlib
+import threading
 
-def get_class(string):
+_registry = {}                      # class string -> class
+_registry_lock = threading.Lock()
+
+
+def get_class(string, lazy=False):
     """
     Returns class by interpreting input string as module path and class name.
     Module path should be separated by dots as usual. Separate class name from module by '/'.
     Example: my_class = get_class('hyperion.controller.example_controller/ExampleController')
 
+    Classes are remembered, so the module is only imported (and the string only interpreted) the first time.
+
     :param string: string containing module path and class name separated by '/'
+    :param lazy: if True, a LazyClass is returned that only imports the module when it's used (defaults to False)
+    :type lazy: bool
     :return: class
     """
+    if lazy:
+        return LazyClass(string)
+    try:
+        return _registry[string]
+    except KeyError:
+        pass
     logger = logman.getLogger(__name__)
     if '/' not in string:
         logger.error("The string is not properly formatted. Use '/' to separate module path from classname. String is: {}".format(string))
@@ -27,5 +57,130 @@ def get_class(string):
     except:
         logger.error("Unexpected error while loading {}".format(string))
         raise
-
+    with _registry_lock:
+        _registry[string] = temp_class
     return temp_class
+
+
+def register_class(string, cls):
+    """
+    Adds a class to the registry, so get_class(string) returns it without importing anything.
+
+    :param string: class string (module path and class name separated by '/')
+    :type string: str
+    :param cls: the class
+    """
+    with _registry_lock:
+        _registry[string] = cls
+
+
+def clear_registry():
+    """ Forgets all resolved classes (e.g. after reloading a module during development). """
+    with _registry_lock:
+        _registry.clear()
+
+
+class LazyClass:
+    """
+    Proxy for a class that is only imported when it's needed: when it's called (instantiated) or when one of its
+    attributes is accessed. Use get_class(string, lazy=True) to create one.
+
+    :param string: string containing module path and class name separated by '/'
+    :type string: str
+    """
+    __slots__ = ('string',)
+
+    def __init__(self, string):
+        self.string = string
+
+    def resolve(self):
+        """ Returns the actual class (importing its module if that didn't happen yet). """
+        return get_class(self.string)
+
+    @property
+    def is_resolved(self):
+        """ True if the class is already imported. """
+        return self.string in _registry
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __repr__(self):
+        return 'LazyClass({!r})'.format(self.string)
+
+
+def class_strings(properties):
+    """
+    Collects all class strings in an experiment config: instrument, controller, meta_instr and view keys of
+    Instruments, MetaInstruments, VisualizationGuis and Measurements, graphView keys and the _view keys of ActionTypes
+    and Actions.
+
+    :param properties: experiment config (as loaded by BaseExperiment.load_config())
+    :type properties: dict
+    :return: class strings (without duplicates, in order of appearance)
+    :rtype: list of str
+    """
+    strings = []
+
+    def add(dic, keys):
+        for key in keys:
+            if type(dic) is dict and type(dic.get(key)) is str and '/' in dic[key] and dic[key] not in strings:
+                strings.append(dic[key])
+
+    def add_actions(actionlist):
+        for action in actionlist:
+            add(action, ('_view',))
+            if type(action) is dict and '~nested' in action:
+                add_actions(action['~nested'])
+
+    for section, keys in [('Instruments', ('instrument', 'controller', 'view', 'graphView')),
+                          ('MetaInstruments', ('meta_instr', 'view', 'graphView')),
+                          ('VisualizationGuis', ('view',)),
+                          ('ActionTypes', ('_view',)),
+                          ('Measurements', ('view',))]:
+        for dic in (properties.get(section) or {}).values():
+            add(dic, keys)
+    for measurement in (properties.get('Measurements') or {}).values():
+        if type(measurement) is dict and 'automated_actionlist' in measurement:
+            add_actions(measurement['automated_actionlist'])
+    return strings
+
+
+def prewarm(strings, background=True):
+    """
+    Imports the classes in strings, so later calls to get_class() return immediately. Classes that fail to import are
+    skipped (with a warning); get_class() raises the error again when the class is actually needed.
+
+    :Example:
+
+    experiment.load_config(config_file)
+    prewarm(class_strings(experiment.properties))   # import the guis while the instruments are connecting
+    experiment.load_instruments()
+
+    :param strings: class strings (module path and class name separated by '/')
+    :type strings: list of str
+    :param background: if True (default), the imports are done on a background (daemon) thread
+    :type background: bool
+    :return: the thread doing the imports (None if background is False)
+    :rtype: threading.Thread or None
+    """
+    logger = logman.getLogger(__name__)
+    strings = list(strings)
+
+    def import_all():
+        for string in strings:
+            try:
+                get_class(string)
+            except Exception as e:
+                logger.warning('Prewarm could not import {}: {}'.format(string, e))
+        logger.debug('Prewarm done: {} classes'.format(len(strings)))
+
+    if not background:
+        import_all()
+        return None
+    thread = threading.Thread(target=import_all, name='prewarm classes', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,162 @@
+"""
+=========
+Log query
+=========
+
+Reads log files written by the StructuredFileHandler (see LoggingManager.set_structured_file() in hyperion.core),
+filters the records on time, logger and level and prints them in the layout of the CustomFormatter.
+
+Use it from the command line:
+
+    python -m hyperion.tools.log_query hyperion.jsonl.gz --start "2020-03-04 01:00" --end 02:30 --level INFO
+    python -m hyperion.tools.log_query hyperion.jsonl.gz --logger hyperion.controller.picoquant --compact 0.5
+
+Times can be a date and time, or only a time (which refers to the first day in the file, or to the next day if that
+time is earlier than the first record).
+Use --help to see all options.
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+import sys
+import gzip
+import json
+import zlib
+import logging
+import argparse
+from datetime import datetime, time, timedelta
+from hyperion.core import CustomFormatter
+
+
+def read_records(filename):
+    """
+    Generator of the records in a structured log file, as dicts (see StructuredFileHandler).
+    An incomplete or damaged last batch (e.g. after a crash while writing) is skipped.
+
+    :param filename: full file path (a name ending in .gz is decompressed)
+    :type filename: str
+    """
+    opener = gzip.open if filename.endswith('.gz') else open
+    with opener(filename, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        except (EOFError, gzip.BadGzipFile, zlib.error):
+            return
+
+
+def to_log_record(entry):
+    """
+    Converts a dict from read_records() to a logging.LogRecord, with the arguments merged into the message.
+
+    :param entry: a record as stored by the StructuredFileHandler
+    :type entry: dict
+    :rtype: logging.LogRecord
+    """
+    msg = entry['msg']
+    args = entry.get('args')
+    if args:
+        try:
+            msg = msg % (tuple(args) if type(args) is list else args)
+        except (TypeError, ValueError, KeyError):
+            msg = '{} {}'.format(msg, args)
+    if 'exc' in entry:
+        msg = '{}\n{}'.format(msg, entry['exc'])
+    return logging.makeLogRecord({'name': entry['logger'], 'levelno': entry['level'],
+                                  'levelname': logging.getLevelName(entry['level']), 'module': entry['module'],
+                                  'funcName': entry['func'], 'lineno': entry['lineno'],
+                                  'threadName': entry.get('thread'), 'msg': msg, 'args': None,
+                                  'created': entry['time'], 'msecs': (entry['time'] % 1) * 1000})
+
+
+def parse_time(string, first_time):
+    """
+    Interprets string as a date and time, or as a time on the day of first_time (or the next day, if that's before
+    first_time).
+
+    :param string: e.g. '2020-03-04 01:00' or '01:00:30'
+    :type string: str
+    :param first_time: timestamp of the first record in the file
+    :type first_time: float
+    :return: timestamp
+    :rtype: float
+    """
+    try:
+        return datetime.fromisoformat(string).timestamp()
+    except ValueError:
+        pass
+    first = datetime.fromtimestamp(first_time)
+    moment = datetime.combine(first.date(), time.fromisoformat(string))
+    if moment < first.replace(microsecond=0):
+        moment += timedelta(days=1)
+    return moment.timestamp()
+
+
+def filter_records(entries, start=None, end=None, loggers=None, level=logging.DEBUG):
+    """
+    Generator of the entries between start and end, of the loggers, at level or higher.
+
+    :param entries: records as dicts (see read_records())
+    :param start: timestamp (None for no limit)
+    :type start: float or None
+    :param end: timestamp (None for no limit)
+    :type end: float or None
+    :param loggers: logger names; a record matches if its logger is one of these or a child (None for all)
+    :type loggers: list of str or None
+    :param level: minimum level (defaults to DEBUG)
+    :type level: int
+    """
+    prefixes = None if not loggers else tuple(loggers)
+    for entry in entries:
+        if entry['level'] < level:
+            continue
+        if start is not None and entry['time'] < start:
+            continue
+        if end is not None and entry['time'] > end:
+            continue
+        if prefixes is not None and not any(entry['logger'] == p or entry['logger'].startswith(p + '.')
+                                            for p in prefixes):
+            continue
+        yield entry
+
+
+def main(argv=None):
+    """ Command line interface, see module docstring and --help. """
+    parser = argparse.ArgumentParser(prog='python -m hyperion.tools.log_query',
+                                     description='Filter and print a structured hyperion log file.')
+    parser.add_argument('filename', help='structured log file (.jsonl or .jsonl.gz)')
+    parser.add_argument('--start', help='show records from this time, e.g. "2020-03-04 01:00" or 01:00')
+    parser.add_argument('--end', help='show records until this time')
+    parser.add_argument('--logger', action='append', help='only this logger (and its children), can be repeated')
+    parser.add_argument('--level', default='DEBUG', help='minimum level, e.g. INFO (defaults to DEBUG)')
+    parser.add_argument('--compact', type=float, default=0, help='see CustomFormatter (defaults to 0)')
+    parser.add_argument('--color', action='store_true', help='print the levels in color')
+    args = parser.parse_args(argv)
+
+    entries = iter(read_records(args.filename))
+    first = next(entries, None)
+    if first is None:
+        return
+    start = None if args.start is None else parse_time(args.start, first['time'])
+    end = None if args.end is None else parse_time(args.end, first['time'])
+    level = logging.getLevelName(args.level.upper())
+    if type(level) is not int:
+        parser.error('unknown level: {}'.format(args.level))
+    formatter = CustomFormatter(compact=args.compact, color=args.color)
+
+    def all_entries():
+        yield first
+        yield from entries
+
+    try:
+        for entry in filter_records(all_entries(), start, end, args.logger, level):
+            print(formatter.format(to_log_record(entry)))
+    except BrokenPipeError:     # e.g. piped into head
+        sys.stderr.close()
+
+
+if __name__ == '__main__':
+    main()
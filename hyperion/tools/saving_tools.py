@@ -13,13 +13,12 @@ used along hyperion.
 """
 import os
 import yaml
-import netCDF4
 import datetime as dt
 import numpy as np
-import matplotlib.pyplot as plt
-import xarray as xr
 from hyperion.core import logman
-from hyperion import __version__, ur, Q_
+from hyperion import __version__
+# Note: netCDF4, matplotlib and xarray are imported inside the functions that need them, because importing them takes
+# a considerable time and this module is imported by base_experiment.
 
 logger = logman.getLogger(__name__)
 
@@ -192,6 +191,7 @@ def save_netCDF4(filename, detectors, data, axes, axes_name, errors=None, extra_
             assert np.shape(e)==np.shape(data[index])
         logger.info('Checked the errors dimensions: OK')
 
+    import netCDF4
     with netCDF4.Dataset(filename, "w", format="NETCDF4") as rootgrp:
 
         # add an attribute to indicate the presence of errors
@@ -261,6 +261,8 @@ def save_netCDF4(filename, detectors, data, axes, axes_name, errors=None, extra_
 def read_netcdf4_and_plot_all(filename):
     """Reads the file in filename and plots all the detectors """
 
+    import matplotlib.pyplot as plt
+    import xarray as xr
     # handle errors to plot with errors
     _error = False
     # read the dataset
@@ -304,6 +306,7 @@ if __name__ == '__main__':
     
     import os
     import hyperion
+    from hyperion import ur
 
     # uncomment the next line according to the test you would like to run.
     m = 'write and read'
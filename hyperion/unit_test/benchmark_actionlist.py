@@ -0,0 +1,117 @@
+"""
+====================================
+Benchmark of automated scanning loop
+====================================
+
+This script measures the overhead per measurement point that the automated scanning engine of BaseExperiment adds,
+on a deeply nested dummy measurement where the action methods themselves do (almost) nothing.
+
+It compares the compiled execution plan (BaseExperiment.compile_actionlist() followed by perform_actionlist()) with
+the way perform_actionlist() used to work before, where every Action was re-interpreted on every iteration
+(creating a new ActionDict, looking up the _method and creating a nesting function).
+
+Run it as a script:
+
+    python -m hyperion.unit_test.benchmark_actionlist
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+from time import perf_counter
+from hyperion import logging
+from hyperion.experiment.base_experiment import BaseExperiment, ActionDict, ActionPlan, valid_python
+
+
+class DummyExperiment(BaseExperiment):
+    """ Experiment with a do-nothing loop and a do-nothing measurement, to expose the overhead of the scanning engine."""
+    def __init__(self):
+        super().__init__()
+        self.points = 0
+
+    def loop(self, actiondict, nesting):
+        for indx in range(actiondict['num']):
+            nesting()
+
+    def point(self, actiondict, nesting):
+        self.points += 1
+        nesting()
+
+
+class LegacyDummyExperiment(DummyExperiment):
+    """
+    Same as DummyExperiment, but uses the (uncompiled) perform_actionlist of before. The plan of perform_measurement()
+    is only used for the estimate of the remaining time (see ScanEstimator), the actionlist itself is interpreted.
+    """
+    def scan_lengths(self, plan):
+        return {}
+
+    def perform_actionlist(self, actionlist, parents=[]):
+        if type(actionlist) is ActionPlan:
+            actionlist = self.properties['Measurements'][self._measurement_name]['automated_actionlist']
+        if self.pause_measurement(): return
+        if parents == []:
+            self._nesting_indices = []
+        if len(parents) > len(self._nesting_indices):
+            self._nesting_indices += [0]
+        elif len(parents) == len(self._nesting_indices):
+            if len(self._nesting_indices):
+                self._nesting_indices[-1] += 1
+        for actiondictionary in actionlist:
+            actiondict = ActionDict(actiondictionary, exp=self)
+            actionname = actiondict['Name']
+            method = getattr(self, actiondict['_method'])
+            self._nesting_parents = parents
+            if '~nested' in actiondict:
+                if '_store_name' in actiondict:
+                    new_parent = valid_python(actiondict['_store_name'])
+                else:
+                    new_parent = valid_python(actionname)
+                nesting = lambda : self.perform_actionlist(actiondict['~nested'], parents+[new_parent])
+            else:
+                nesting = lambda *args, **kwargs: None
+            if '_disabled' not in actiondict or not actiondict['_disabled']:
+                method(actiondict, nesting)
+            else:
+                nesting()
+            if self.pause_measurement(): return
+        if len(parents) < len(self._nesting_indices):
+            del self._nesting_indices[-1]
+
+
+def nested_config(depth=4, num=10):
+    """
+    Creates a config dictionary with a measurement of depth nested loops of num iterations each. The inner loop
+    performs two measurement actions per iteration.
+    """
+    actionlist = [{'Name': 'point a', 'Type': 'point'}, {'Name': 'point b', 'Type': 'point'}]
+    for level in range(depth, 0, -1):
+        actionlist = [{'Name': 'loop {}'.format(level), 'Type': 'loop', 'num': num, '~nested': actionlist}]
+    return {'ActionTypes': {'loop': {'_method': 'loop', 'num': 1, 'defaults': list(range(20))},
+                            'point': {'_method': 'point', 'exposuretime': '1s', 'defaults': list(range(20))}},
+            'Measurements': {'nested': {'automated_actionlist': actionlist}}}
+
+
+def time_measurement(experiment_class, depth, num):
+    """ Returns (number of points, total time in seconds) of running the nested dummy measurement. """
+    with experiment_class() as e:
+        e.load_config('_benchmark_', nested_config(depth, num))
+        t0 = perf_counter()
+        e.perform_measurement('nested')
+        duration = perf_counter() - t0
+        return e.points, duration
+
+
+if __name__ == '__main__':
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+
+    depth, num = 4, 10
+    print('Nested dummy measurement: {} loops of {} iterations, 2 actions per point'.format(depth, num))
+    results = {}
+    for label, cls in [('before (interpreted)', LegacyDummyExperiment), ('after (compiled)', DummyExperiment)]:
+        points, duration = time_measurement(cls, depth, num)
+        results[label] = duration / points
+        print('{:>22}: {:7d} actions in {:6.3f} s  ->  {:8.2f} us per action'.format(label, points, duration,
+                                                                                    1e6 * duration / points))
+    print('Speed-up: {:.1f}x'.format(results['before (interpreted)'] / results['after (compiled)']))
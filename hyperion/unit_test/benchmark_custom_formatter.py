@@ -0,0 +1,107 @@
+"""
+==============================
+Benchmark of the log formatter
+==============================
+
+This script measures how many log records per second CustomFormatter (hyperion.core) formats, for each compact
+setting, with and without colors. It compares the way format() used to work (datetime.now().strftime(), truncating the
+names and coloring the level for every record) with the current one (record.created with the date and time cached per
+second, names cached per module and function and precomputed colored level strings).
+
+Run it as a script:
+
+    python -m hyperion.unit_test.benchmark_custom_formatter
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import logging as std_logging
+from time import perf_counter
+from datetime import datetime
+from hyperion import logging
+from hyperion.core import CustomFormatter
+
+
+class OldCustomFormatter(CustomFormatter):
+    """ CustomFormatter with the format() method it used to have. """
+    def format(self, record):
+        module = record.name
+        func = record.funcName
+        if self.compact<=0.5:
+            lvl_str = '{:>8} '.format(record.levelname)
+        else:
+            lvl_str = '{:>5}'.format(self.short_names[record.levelno])
+        if self.color:
+            if record.levelno not in self.color_schemes[self.color_scheme]:
+                lvl_str = self.ansicol(lvl_str, self.color_schemes[self.color_scheme][None])
+            else:
+                lvl_str = self.ansicol(lvl_str, self.color_schemes[self.color_scheme][record.levelno])
+        if self.compact == 0:
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+            message = '{} |{:>50} |{:>5} | {:32}|{}| {}'.format(timestamp, module, record.lineno, func + '()', lvl_str, record.msg)
+        else:
+            timestamp = datetime.now().strftime('%H:%M:%S')
+            lmod = int(50 - 33 * self.compact)
+            lfun = int(32 - 20 * self.compact)
+            if len(module) > lmod:
+                module = '...' + module[-(lmod - 3):]
+            if len(func) > lfun:
+                func = func[:(lfun - 3)] + '...'
+            if self.compact <= 0.5:
+                message = '{} |{:>{mod_w}} |{:>5} | {:{fun_w}}|{}| {}'.format(timestamp, module, record.lineno,func + '()',
+                                                                              lvl_str, record.msg, mod_w=lmod, fun_w=lfun+2)
+            else:
+                if record.lineno > 9999:
+                    linenr = '>10k'
+                else:
+                    linenr = record.lineno
+                tmpmsg = record.msg.replace('\n',' ')
+                if self.compact==1 and len(tmpmsg) > (self.maxwidth-53):
+                    msg = tmpmsg[:(self.maxwidth-56)]+'...'
+                else:
+                    msg = record.msg
+                message = '{} {:>{mod_w}} {:>4} {:{fun_w}} {} {}'.format(timestamp, module, linenr, func + '()',
+                                                                          lvl_str, msg, mod_w=lmod, fun_w=lfun+2)
+        return message
+
+
+def make_records(number):
+    """ Returns number log records from a few modules, functions and levels (like a scan with DEBUG logging). """
+    sources = [('hyperion.instrument.correlator.hydraharp_instrument', 'wait_till_finished', 211),
+               ('hyperion.controller.generic.generic_serial_contr', 'query', 148),
+               ('hyperion.experiment.base_experiment', 'var', 1288),
+               ('__main__', 'my_measurement_with_a_long_name', 63)]
+    levels = [std_logging.DEBUG, std_logging.DEBUG, std_logging.INFO, std_logging.WARNING]
+    records = []
+    for indx in range(number):
+        name, func, lineno = sources[indx % len(sources)]
+        records.append(std_logging.LogRecord(name, levels[indx % len(levels)], name.replace('.', '/') + '.py', lineno,
+                                             'Status at point {} is {}'.format(indx, 'busy'), None, None, func))
+    return records
+
+
+def records_per_second(formatter, records, repeat=3):
+    """ Returns the number of records per second formatter formats (the fastest of repeat runs). """
+    times = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        for record in records:
+            formatter.format(record)
+        times.append(perf_counter() - t0)
+    return len(records) / min(times)
+
+
+if __name__ == '__main__':
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+
+    records = make_records(20000)
+    print('{:>8} | {:>6} | {:>14} | {:>14} | {:>7}'.format('compact', 'color', 'before (rec/s)', 'after (rec/s)',
+                                                            'speedup'))
+    for compact in [0, 0.25, 0.5, 0.75, 1]:
+        for color in [False, True]:
+            before = records_per_second(OldCustomFormatter(compact=compact, color=color), records)
+            after = records_per_second(CustomFormatter(compact=compact, color=color), records)
+            print('{:>8} | {!s:>6} | {:14.0f} | {:14.0f} | {:6.1f}x'.format(compact, color, before, after,
+                                                                            after / before))
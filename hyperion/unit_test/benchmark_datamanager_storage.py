@@ -0,0 +1,82 @@
+"""
+===========================================
+Benchmark of DataManager storage settings
+===========================================
+
+This script compares file size and write throughput of the DataManager for typical kinds of measurement data:
+
+- 16 bit CCD frames (like the ones from WinspecInstr)
+- 32 bit unsigned HydraHarp histograms
+- floating point spectra
+
+Each kind is stored the way the DataManager used to store everything (uncompressed f8), in its own datatype without
+compression and with the automatic storage settings (see DataManager.storage_defaults).
+The write throughput is expressed in MB of the original data per second.
+
+Run it as a script:
+
+    python -m hyperion.unit_test.benchmark_datamanager_storage
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import os
+import tempfile
+from time import perf_counter
+import numpy as np
+from hyperion import logging
+from hyperion.experiment.base_experiment import BaseExperiment
+
+
+def fake_data(kind, number, rng):
+    """ Returns a list of number fake datapoints of the specified kind. """
+    if kind == 'CCD frames (u2)':
+        return [rng.poisson(600, (256, 1024)).astype('u2') for _ in range(number)]
+    elif kind == 'histograms (u4)':
+        hist = lambda: np.bincount(rng.exponential(3000, 20000).astype(int), minlength=65536)[:65536].astype('u4')
+        return [hist() for _ in range(number)]
+    else:
+        wav = np.linspace(-1, 1, 1340)
+        return [1000 * np.exp(-wav**2 / 0.01) + rng.normal(0, 5, wav.shape) for _ in range(number)]
+
+
+def write_file(filename, data, **options):
+    """
+    Writes the list of datapoints to a new file using the DataManager and returns the time it took (in seconds).
+    Additional keyword arguments (e.g. dtype, zlib) are passed to DataManager.var()
+    """
+    with BaseExperiment() as e:
+        datman = e.datman
+        datman.open_file(filename)
+        datman.dim('point', len(data))
+        extra_dims = []
+        for axis, length in enumerate(data[0].shape):
+            datman.dim('axis_{}'.format(axis), length)
+            extra_dims.append('axis_{}'.format(axis))
+        t0 = perf_counter()
+        for indx, datapoint in enumerate(data):
+            datman.var('data', datapoint, indices=[indx], dims=('point',), extra_dims=extra_dims, **options)
+        datman.close()
+        return perf_counter() - t0
+
+
+if __name__ == '__main__':
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+
+    rng = np.random.default_rng(0)
+    folder = tempfile.mkdtemp()
+    print('{:>18} | {:>22} | {:>10} | {:>12}'.format('data', 'storage', 'size (MB)', 'write (MB/s)'))
+    for kind, number in [('CCD frames (u2)', 20), ('histograms (u4)', 50), ('spectra (f8)', 500)]:
+        data = fake_data(kind, number, rng)
+        raw_mb = sum(d.nbytes for d in data) / 1024**2
+        for label, options in [('f8 uncompressed (old)', {'dtype': 'f8', 'zlib': False}),
+                               ('native uncompressed', {'zlib': False}),
+                               ('automatic', {})]:
+            filename = os.path.join(folder, 'benchmark.nc')
+            duration = write_file(filename, data, **options)
+            size_mb = os.path.getsize(filename) / 1024**2
+            os.remove(filename)
+            print('{:>18} | {:>22} | {:10.2f} | {:12.1f}'.format(kind, label, size_mb, raw_mb / duration))
+    os.rmdir(folder)
@@ -0,0 +1,91 @@
+"""
+==============================
+Benchmark of the g2 correlator
+==============================
+
+This script feeds synthetic time tags (in ps) of two detectors to the G2Correlator
+(hyperion.instrument.correlator.g2_correlator) in chunks of 20 ms, like the Hydraharp stream delivers them, and prints
+the throughput in time tags per second (on one core) for linear and multi-tau bins.
+The streams:
+
+- Poisson: two independent channels of 1 Mcps each, so g2 should be 1 at all lags
+- antibunched: a single emitter (excitation in 20 ns on average, lifetime 2 ns) behind a 50:50 beamsplitter, detected
+  with 5% efficiency and 50 ps jitter, so g2(0) should be close to 0 and g2 = 1 - exp(-|tau| / 1.8 ns)
+
+It also prints g2 near zero and far from zero lag, to check the normalization.
+
+Run it as a script:
+
+    python -m hyperion.unit_test.benchmark_g2_correlator
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+from time import perf_counter
+import numpy as np
+from hyperion import logging
+from hyperion.instrument.correlator.g2_correlator import G2Correlator
+
+
+def poisson_stream(duration, rate, rng):
+    """ Returns the sorted times (in ps) of a Poisson process with rate (in counts per s) during duration (in s). """
+    return np.sort(rng.integers(0, int(duration * 1e12), rng.poisson(rate * duration)))
+
+
+def antibunched_streams(duration, rng, excitation=20e3, lifetime=2e3, efficiency=0.05, jitter=50):
+    """
+    Returns the times (in ps) of the photons of a single emitter on the two detectors behind a beamsplitter.
+    The emitter is excited after an exponential time (mean excitation) and emits after its lifetime (exponential).
+    """
+    number = int(duration * 1e12 / (excitation + lifetime))
+    emitted = np.cumsum(rng.exponential(excitation, number) + rng.exponential(lifetime, number))
+    detected = emitted[rng.random(number) < efficiency]
+    detected = detected + rng.normal(0, jitter, len(detected))
+    detector = rng.random(len(detected)) < 0.5
+    return np.sort(detected[detector]).astype(np.int64), np.sort(detected[~detector]).astype(np.int64)
+
+
+def correlate(correlator, a, b, chunk_time=20e9):
+    """ Feeds a and b to the correlator in chunks of chunk_time (in ps) and returns the time it took (in s). """
+    horizons = np.arange(chunk_time, max(a[-1], b[-1]) + chunk_time, chunk_time).astype(np.int64)
+    cuts_a = np.searchsorted(a, horizons)
+    cuts_b = np.searchsorted(b, horizons)
+    t0 = perf_counter()
+    start_a = start_b = 0
+    for horizon, stop_a, stop_b in zip(horizons, cuts_a, cuts_b):
+        correlator.add(a[start_a:stop_a], b[start_b:stop_b], horizon)
+        start_a, start_b = stop_a, stop_b
+    return perf_counter() - t0
+
+
+def g2_at(correlator, lag_from, lag_to):
+    """ Mean g2 of the bins with their center between lag_from and lag_to (in ps). """
+    lags = np.abs(correlator.lags)
+    return np.nanmean(correlator.g2[(lags >= lag_from) & (lags < lag_to)])
+
+
+if __name__ == '__main__':
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+
+    rng = np.random.default_rng(0)
+    duration = 2       # in s
+    streams = [('Poisson', (poisson_stream(duration, 1e6, rng), poisson_stream(duration, 1e6, rng))),
+               ('antibunched', antibunched_streams(duration, rng))]
+    settings = [('linear 100 ps, +-100 ns', {'bin_width': 100, 'max_lag': 100000}),
+                ('linear 10 ps, +-1 us', {'bin_width': 10, 'max_lag': 1000000}),
+                ('multi-tau 100 ps, 20 levels', {'bin_width': 100, 'levels': 20, 'points': 16})]
+
+    print('{:>12} | {:>28} | {:>10} | {:>8} | {:>14} | {:>14}'.format('stream', 'bins', 'max lag', 'M tags/s',
+                                                                      'g2(|t|<0.5ns)', 'g2(|t|>20ns)'))
+    for name, (a, b) in streams:
+        for label, options in settings:
+            times = []
+            for _ in range(3):
+                correlator = G2Correlator(**options)
+                times.append(correlate(correlator, a, b))
+            tags = len(a) + len(b)
+            print('{:>12} | {:>28} | {:>7.2f} us | {:8.1f} | {:14.3f} | {:14.3f}'.format(
+                name, label, correlator.max_lag / 1e6, tags / min(times) / 1e6, g2_at(correlator, 0, 500),
+                g2_at(correlator, 20e3, correlator.max_lag)))
@@ -0,0 +1,136 @@
+"""
+=============================
+Benchmark of class resolution
+=============================
+
+This script measures the effect of the class registry of hyperion.tools.loading on the example project
+(examples/example_project_with_automated_scanning):
+
+- the cost of a single get_class() call, before (interpreting the string and calling importlib every time) and after
+  (registry lookup)
+- loading (and reconnecting) all instruments of the example project, before and after
+- the startup of a fresh interpreter (after importing hyperion) that waits for the instruments (simulated by a 0.5 s
+  sleep) and then needs all classes of the config, without and with prewarm() importing them during the wait.
+  Note that classes that can't be imported on this machine (e.g. guis if PyQt5 is not installed) are left out.
+
+Run it as a script:
+
+    python -m hyperion.unit_test.benchmark_get_class
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import os
+import sys
+import subprocess
+import importlib
+from time import perf_counter
+import hyperion
+from hyperion import logging
+from hyperion.core import logman
+from hyperion.tools import loading
+from hyperion.experiment import base_experiment
+from hyperion.instrument import base_instrument
+from examples.example_project_with_automated_scanning.my_experiment import MyExperiment
+
+config_file = os.path.join(hyperion.repository_path, 'examples', 'example_project_with_automated_scanning',
+                           'my_experiment.yml')
+
+# The startup of a fresh interpreter. The sleep simulates waiting for the instruments to connect.
+startup_script = """
+import sys, time
+from hyperion import logging
+logging.stream_level = 'CRITICAL'
+logging.enable_file = False
+from hyperion.tools.loading import get_class, prewarm, class_strings
+strings = sys.argv[2:]
+t0 = time.perf_counter()
+if sys.argv[1] == 'prewarm':
+    prewarm(strings)
+time.sleep(0.5)
+for string in strings:
+    get_class(string)
+print(time.perf_counter() - t0)
+"""
+
+
+def uncached_get_class(string):
+    """ The way get_class() used to work: interpret the string and call importlib every time. """
+    logger = logman.getLogger(loading.__name__)
+    module_name, class_name = string.split('/')
+    logger.debug('Retrieving class {} from module {}'.format(class_name, module_name))
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def importable_class_strings(experiment):
+    """ Returns the class strings in the config of experiment that can be imported on this machine. """
+    strings = []
+    for string in loading.class_strings(experiment.properties):
+        try:
+            uncached_get_class(string)
+            strings.append(string)
+        except Exception:
+            pass
+    return strings
+
+
+def time_lookups(get_class, strings, repeat=2000):
+    """ Returns the average time of a get_class() call in seconds. """
+    t0 = perf_counter()
+    for _ in range(repeat):
+        for string in strings:
+            get_class(string)
+    return (perf_counter() - t0) / (repeat * len(strings))
+
+
+def time_load_instruments(experiment, get_class, repeat=20):
+    """ Returns the average time to load all instruments (like 'Reconnect Instruments' in ExpGui) in seconds. """
+    base_experiment.get_class = get_class
+    base_instrument.get_class = get_class
+    try:
+        t0 = perf_counter()
+        for _ in range(repeat):
+            experiment.load_instruments(parallel=False)
+            experiment.remove_all_instruments()
+        return (perf_counter() - t0) / repeat
+    finally:
+        base_experiment.get_class = loading.get_class
+        base_instrument.get_class = loading.get_class
+
+
+def time_startup(mode, strings, repeat=3):
+    """ Returns the fastest startup time (in seconds) of a fresh interpreter after importing hyperion (see startup_script). """
+    env = dict(os.environ, PYTHONPATH=hyperion.repository_path)
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', startup_script, mode] + strings, env=env, capture_output=True,
+                             text=True, check=True)
+        times.append(float(out.stdout.split()[-1]))
+    return min(times)
+
+
+if __name__ == '__main__':
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+
+    with MyExperiment() as e:
+        e.load_config(config_file)
+        strings = importable_class_strings(e)
+        print('{} of {} class strings in the example config can be imported here'.format(
+            len(strings), len(loading.class_strings(e.properties))))
+
+        before, after = time_lookups(uncached_get_class, strings), time_lookups(loading.get_class, strings)
+        print('get_class() call:       before {:8.2f} us   after {:8.2f} us   ({:.0f}x)'.format(
+            1e6 * before, 1e6 * after, before / after))
+
+        logging.stream_level = 'ERROR'   # loading instruments logs warnings about the example instruments
+        before = time_load_instruments(e, uncached_get_class)
+        after = time_load_instruments(e, loading.get_class)
+        logging.stream_level = 'WARNING'
+        print('load_instruments():     before {:8.2f} ms   after {:8.2f} ms   ({:.1f}x)'.format(
+            1e3 * before, 1e3 * after, before / after))
+
+    before, after = time_startup('plain', strings), time_startup('prewarm', strings)
+    print('startup (0.5 s wait):   before {:8.3f} s    after {:8.3f} s    (prewarm saves {:.0f} ms)'.format(
+        before, after, 1e3 * (before - after)))
@@ -0,0 +1,79 @@
+"""
+===========================================
+Benchmark of the Hydraharp library bindings
+===========================================
+
+This script times the calls that are polled during alignment (histogram, ctc_status and flags) on HydraharpDummy, whose
+library is the fake hhlib (hyperion.controller.picoquant.hhlib_fake), so it measures the overhead of the controller
+and ctypes, not the device. Every call is compared with the way it was done before the prototypes were bound once:
+setting argtypes and restype, checking devidx and, for the histogram, allocating a new buffer and copying it with
+np.array on every call. The histogram is read with the buffer of the controller and with out=.
+
+Run it as a script:
+
+    python -m hyperion.unit_test.benchmark_hydraharp_ctypes
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import ctypes
+from timeit import repeat
+import numpy as np
+from hyperion import logging
+from hyperion.controller.picoquant.hydraharp import HydraharpDummy
+
+devidx = 0
+
+
+def histogram_per_call(hydraharp, channel=0, clear=False):
+    """ Histogram read like before: prototype, checks and buffer on every call. """
+    assert devidx in range(hydraharp.settings['MAXDEVNUM'])
+    assert channel in range(hydraharp.number_input_channels)
+    func = hydraharp.hhlib.HH_GetHistogram
+    func.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_uint), ctypes.c_int, ctypes.c_int]
+    func.restype = ctypes.c_int
+    data2 = (ctypes.c_uint * hydraharp.histogram_length)()
+    hydraharp.error_code = func(ctypes.c_int(devidx), data2, ctypes.c_int(channel), ctypes.c_int(clear))
+    return np.array(data2)
+
+
+def status_per_call(hydraharp, name='HH_CTCStatus'):
+    """ Status (ctc_status or flags) read like before. """
+    assert devidx in range(hydraharp.settings['MAXDEVNUM'])
+    func = getattr(hydraharp.hhlib, name)
+    func.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
+    func.restype = ctypes.c_int
+    data2 = ctypes.c_int()
+    hydraharp.error_code = func(ctypes.c_int(devidx), data2)
+    return data2.value
+
+
+def best_time(statement, number):
+    """ Best time per call in us of 5 repeats of number calls. """
+    return min(repeat(statement, number=number, repeat=5)) / number * 1e6
+
+
+if __name__ == '__main__':
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+
+    settings = {'devidx': devidx, 'mode': 'Histogram', 'clock': 'Internal', 'fake': {'rates': (1e5, 1e5)}}
+    with HydraharpDummy(settings) as hydraharp:
+        hydraharp.start_measurement(100)
+        while not hydraharp.ctc_status:
+            pass
+        print('{:>24} | {:>14} | {:>14} | {:>8}'.format('call', 'per call (us)', 'bound (us)', 'speedup'))
+        for length in [1024, 65536]:
+            hydraharp.histogram_length = length
+            out = np.zeros(length, dtype=np.uint32)
+            assert np.array_equal(histogram_per_call(hydraharp), hydraharp.histogram(0, False))
+            before = best_time(lambda: histogram_per_call(hydraharp), 2000)
+            for label, statement in [('histogram {}'.format(length), lambda: hydraharp.histogram(0, False)),
+                                     ('histogram {} out='.format(length), lambda: hydraharp.histogram(0, False, out))]:
+                after = best_time(statement, 2000)
+                print('{:>24} | {:14.2f} | {:14.2f} | {:8.1f}'.format(label, before, after, before / after))
+        for label, name in [('ctc_status', 'HH_CTCStatus'), ('flags', 'HH_GetFlags')]:
+            before = best_time(lambda: status_per_call(hydraharp, name), 20000)
+            after = best_time(lambda: getattr(hydraharp, label), 20000)
+            print('{:>24} | {:14.2f} | {:14.2f} | {:8.1f}'.format(label, before, after, before / after))
@@ -0,0 +1,68 @@
+"""
+=============================
+Benchmark of disabled logging
+=============================
+
+This script measures what debug logging costs in the hot path of a controller when DEBUG is not printed, using 10000
+queries to the GenericSerialControllerDummy. It compares the way it used to be (loggers at level DEBUG, so every
+debug call is passed on to the handlers, and messages built with '...'.format() before calling logger.debug) with the
+current way (the LoggingManager sets the level of the loggers to the level of their handlers and the messages are
+passed %-style, so nothing is formatted).
+
+Run it as a script:
+
+    python -m hyperion.unit_test.benchmark_lazy_logging
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+from time import perf_counter
+from hyperion import logging
+from hyperion.controller.generic.generic_serial_contr import GenericSerialControllerDummy
+
+
+class OldGenericSerialControllerDummy(GenericSerialControllerDummy):
+    """ GenericSerialControllerDummy with the logging the way it used to be ('...'.format() in the debug calls). """
+    def write(self, message):
+        if not self._is_initialized:
+            raise Warning('Trying to write to DUMMY {} before initializing'.format(self.name))
+        self.logger.debug('Adding message to internal buffer:')
+        self.logger.debug(message)
+        self._buffer += message.encode(self._encoding)
+
+    def query(self, message):
+        if not self._is_initialized:
+            raise Warning('Trying to query DUMMY {} before initializing.'.format(self.name))
+        self._empty_buffer()
+        self.write(message)
+        self.logger.debug('Sent message: {}.'.format(message))
+        ans = self.read_lines()
+        self.logger.debug('Received message: {}.'.format(ans))
+        return ans
+
+
+def time_queries(controller, number):
+    """ Returns the time per query in seconds. """
+    t0 = perf_counter()
+    for indx in range(number):
+        controller.query('CH{}?'.format(indx % 4))
+    return (perf_counter() - t0) / number
+
+
+if __name__ == '__main__':
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+
+    number = 10000
+    settings = {'port': 'COM8', 'baudrate': 9600, 'write_termination': '\n'}
+    with OldGenericSerialControllerDummy(settings) as old_dev, GenericSerialControllerDummy(settings) as dev:
+        old_dev.initialize()
+        dev.initialize()
+        old_dev.logger.setLevel(logging.DEBUG)      # what getLogger() used to do
+        before = min(time_queries(old_dev, number) for _ in range(3))
+        logging.update_levels()
+        after = min(time_queries(dev, number) for _ in range(3))
+    print('{} queries to GenericSerialControllerDummy, stream level WARNING, no file'.format(number))
+    print('before {:8.2f} us per query   after {:8.2f} us per query   ({:.1f}x)'.format(1e6 * before, 1e6 * after,
+                                                                                      before / after))
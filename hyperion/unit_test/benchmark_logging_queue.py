@@ -0,0 +1,96 @@
+"""
+=================================
+Benchmark of asynchronous logging
+=================================
+
+This script compares a log-heavy loop (like the debug prints while polling an instrument or writing datapoints) with
+the regular logging handlers and with the queue mode of the LoggingManager (use_queue=True), in which the records are
+filtered, formatted and written by a background thread.
+Both the stream handler (writing to os.devnull) and the file handler (writing to a temporary file) are used.
+The loop is run without waiting (pure python, the background thread competes for the GIL) and with a 0.5 ms wait per
+iteration, like waiting for an instrument to reply (the background thread uses that time).
+
+For every setting it prints:
+
+- the time per debug print on the measurement thread
+- the total time per record, i.e. including waiting for the background thread to write what's left (logman.flush())
+- the number of records that were dropped because the queue was full
+
+Run it as a script:
+
+    python -m hyperion.unit_test.benchmark_logging_queue
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import os
+import tempfile
+from time import perf_counter, sleep
+from hyperion import logging
+
+
+def log_loop(logger, number, wait):
+    """
+    A loop like the one polling an instrument: waiting wait seconds and a debug print per iteration.
+    Returns the time spent in the debug prints (in seconds).
+    """
+    total = 0
+    spent = 0
+    for indx in range(number):
+        if wait:
+            sleep(wait)
+        total += indx % 7
+        t0 = perf_counter()
+        logger.debug('Polling status: point {} of {}, counts = {}'.format(indx, number, total))
+        spent += perf_counter() - t0
+    return spent
+
+
+def time_logging(filename, number, wait, **options):
+    """
+    Sets the stream and file handler of the LoggingManager with the options (e.g. use_queue), runs the log loop and
+    returns the time spent in the debug prints, the time until everything is written (in seconds) and the number of
+    dropped records.
+    """
+    with open(os.devnull, 'w') as devnull:
+        logging.set_stream(stream=devnull, level='DEBUG', **options)
+        logging.set_file(filename, level='DEBUG', **options)
+        logger = logging.getLogger('benchmark')
+        spent = log_loop(logger, number, wait)
+        t0 = perf_counter()
+        logging.flush()
+        flush = perf_counter() - t0
+        dropped = sum(getattr(h, 'dropped', 0) for h in logger.handlers)
+        logging.finalize()
+        for h in logger.handlers:
+            getattr(h, 'target', h).close()
+    return spent, spent + flush, dropped
+
+
+if __name__ == '__main__':
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+
+    repeat = 3      # the fastest of repeat runs is shown
+    folder = tempfile.mkdtemp()
+    filename = os.path.join(folder, 'benchmark.log')
+    print('debug prints to stream (os.devnull) and file')
+    print('{:>10} | {:>28} | {:>13} | {:>10} | {:>8}'.format('wait', 'mode', 'in call (us)', 'total (us)', 'dropped'))
+    for number, wait in [(20000, 0), (4000, 0.5e-3)]:
+        for label, options in [('direct (off)', {'use_queue': False}),
+                               ('queue, drop_new', {'use_queue': True}),
+                               ('queue of 1000, drop_new', {'use_queue': True, 'queue_size': 1000}),
+                               ('queue of 1000, drop_oldest', {'use_queue': True, 'queue_size': 1000,
+                                                               'overflow': 'drop_oldest'}),
+                               ('queue of 1000, block', {'use_queue': True, 'queue_size': 1000, 'overflow': 'block'})]:
+            runs = []
+            for _ in range(repeat):
+                runs.append(time_logging(filename, number, wait, **options))
+                os.remove(filename)
+            loop, total, dropped = min(runs)
+            print('{:>7} ms | {:>28} | {:13.2f} | {:10.2f} | {:8}'.format(1e3 * wait, label, 1e6 * loop / number,
+                                                                        1e6 * total / number, dropped))
+    os.rmdir(folder)
+
+    logging.set_stream(level='WARNING')
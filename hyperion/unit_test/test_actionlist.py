@@ -0,0 +1,135 @@
+"""
+===================
+Compiled actionlist
+===================
+
+Tests of the compiled execution plan (BaseExperiment.compile_actionlist() and ActionPlan): performing it should call
+the same actions in the same order, with the same nesting indices and parents, as the way perform_actionlist() used to
+interpret the actionlist (LegacyDummyExperiment of benchmark_actionlist). That includes disabled Actions (only their
+nested Actions are performed, once) and Actions that are disabled while measuring.
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_actionlist
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import copy
+from hyperion import logging
+from hyperion.experiment.base_experiment import ActionPlan, CompiledAction
+from hyperion.unit_test.benchmark_actionlist import DummyExperiment, LegacyDummyExperiment, nested_config
+
+
+class RecordingExperiment(DummyExperiment):
+    """
+    DummyExperiment that records every action it performs: (Name, nesting indices, nesting parents).
+    The action with disable_after: n disables the Action named in disable after it's performed n times.
+    """
+    def __init__(self):
+        super().__init__()
+        self.performed = []
+
+    def record(self, actiondict):
+        self.performed.append((actiondict['Name'], tuple(self._nesting_indices), tuple(self._nesting_parents)))
+        if 'disable_after' in actiondict and self.points == actiondict['disable_after']:
+            actionlist = self.properties['Measurements']['nested']['automated_actionlist']
+            find_action(actionlist, actiondict['disable'])['_disabled'] = True
+
+    def loop(self, actiondict, nesting):
+        self.record(actiondict)
+        super().loop(actiondict, nesting)
+
+    def point(self, actiondict, nesting):
+        self.record(actiondict)
+        super().point(actiondict, nesting)
+
+
+class LegacyRecordingExperiment(LegacyDummyExperiment, RecordingExperiment):
+    """ RecordingExperiment that performs the actionlist the way it used to be done, without compiling it. """
+
+
+def find_action(actionlist, name):
+    """ Returns the (nested) actiondict called name. """
+    for actiondict in actionlist:
+        if actiondict['Name'] == name:
+            return actiondict
+        found = find_action(actiondict.get('~nested', []), name)
+        if found is not None:
+            return found
+
+
+def perform(experiment_class, config):
+    """ Performs the nested measurement of config and returns the actions that were performed. """
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    with experiment_class() as e:
+        e.load_config('_test_', copy.deepcopy(config))
+        e.perform_measurement('nested')
+        return e.performed
+
+
+def check_same_as_legacy(config):
+    performed = perform(RecordingExperiment, config)
+    assert performed, 'no actions were performed'
+    assert performed == perform(LegacyRecordingExperiment, config)
+    return performed
+
+
+def test_same_as_legacy():
+    performed = check_same_as_legacy(nested_config(depth=3, num=3))
+    assert len(performed) == 1 + 3 + 9 + 27 * 2
+    assert performed[:4] == [('loop 1', (), ()), ('loop 2', (0,), ('loop_1',)),
+                             ('loop 3', (0, 0), ('loop_1', 'loop_2')),
+                             ('point a', (0, 0, 0), ('loop_1', 'loop_2', 'loop_3'))]
+    assert performed[-1] == ('point b', (2, 2, 2), ('loop_1', 'loop_2', 'loop_3'))
+
+
+def test_disabled_actions():
+    config = nested_config(depth=3, num=3)
+    actionlist = config['Measurements']['nested']['automated_actionlist']
+    find_action(actionlist, 'loop 2')['_disabled'] = True
+    find_action(actionlist, 'point b')['_disabled'] = True
+    find_action(actionlist, 'loop 3')['_store_name'] = 'inner'
+    performed = check_same_as_legacy(config)
+    names = [name for name, _, _ in performed]
+    assert names == ['loop 1'] + ['loop 3'] + ['point a'] * 3 + ['loop 3'] + ['point a'] * 3 + ['loop 3'] + \
+        ['point a'] * 3, 'the nested Actions of a disabled Action should be performed once'
+    assert performed[-1] == ('point a', (2, 0, 2), ('loop_1', 'loop_2', 'inner'))
+
+
+def test_disabled_while_measuring():
+    config = nested_config(depth=2, num=3)
+    find_action(config['Measurements']['nested']['automated_actionlist'], 'point a').update(
+        {'disable_after': 2, 'disable': 'point b'})
+    performed = check_same_as_legacy(config)
+    assert [name for name, _, _ in performed].count('point b') == 1, 'disabling should have effect right away'
+
+
+def test_plan_is_immutable():
+    config = nested_config(depth=2, num=3)
+    with RecordingExperiment() as e:
+        e.load_config('_test_', config)
+        plan = e.compile_actionlist(config['Measurements']['nested']['automated_actionlist'])
+        assert type(plan) is ActionPlan and len(plan) == 1
+        action = plan.actions[0]
+        assert type(action) is CompiledAction and action.store_name == 'loop_1'
+        assert action.nested.parents == ['loop_1'] and [a.name for a in action.nested] == ['loop 2']
+        for obj, attribute in [(plan, 'actions'), (action, 'method')]:
+            try:
+                setattr(obj, attribute, None)
+            except AttributeError:
+                pass
+            else:
+                assert False, '{} should be immutable'.format(type(obj).__name__)
+        e.perform_actionlist(plan)
+        assert e.points == 3 * 3 * 2
+
+
+if __name__ == '__main__':
+    test_same_as_legacy()
+    test_disabled_actions()
+    test_disabled_while_measuring()
+    test_plan_is_immutable()
+    print('Actionlist tests passed')
@@ -0,0 +1,117 @@
+"""
+=============
+Adaptive grid
+=============
+
+Tests of the adaptive (refining) scan: AdaptiveGrid should stay within the budget, stop refining when all scores are
+at or below the threshold, refine where the values change and regrid() should return the measured values at the
+measured points (and be exact for linear data). A dummy measurement with an adaptive Action (see
+BaseExperiment.traverse()) should store the positions, levels and data of the points and the regridded data.
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_adaptive_grid
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+from hyperion import logging
+from hyperion.experiment.base_experiment import AdaptiveGrid
+from hyperion.unit_test.test_traversal import TraversalExperiment, signal
+
+
+def scan(grid, function):
+    """ Performs the adaptive scan of grid, measuring function(point), and returns the grid. """
+    points = grid.coarse_points()
+    while points:
+        for point in points:
+            grid.set_value(point, function(point))
+        points = grid.refine()
+    return grid
+
+
+def step(point):
+    """ Step along the first dimension (at 5/16 of the fine grid of a coarse grid of 5 points with 3 levels). """
+    return 100.0 if point[0] > 10 else 0.0
+
+
+def test_budget():
+    for budget in (25, 30, 60, 200):
+        grid = scan(AdaptiveGrid((5, 5), budget), step)
+        assert 25 <= len(grid.points) <= budget
+        assert len(set(grid.points)) == len(grid.points) == len(grid.values)
+    assert set(AdaptiveGrid((5, 5), 25).coarse_points()) <= set(grid.points)
+
+
+def test_refines_where_values_change():
+    grid = scan(AdaptiveGrid((5, 5), 200, threshold=0), step)
+    refined = [point for point, level in zip(grid.points, grid.point_levels) if level > 0]
+    assert refined and max(grid.point_levels) == 3
+    assert all(8 <= point[0] <= 16 for point in refined), 'only the cells across the step should be refined'
+
+
+def test_threshold():
+    flat = scan(AdaptiveGrid((5, 5), 200, threshold=0), lambda point: 1.0)
+    assert len(flat.points) == 25, 'cells with a score at the threshold should not be refined'
+    grid = scan(AdaptiveGrid((5, 5), 1000, threshold=50), lambda point: point[0] * 10.0)
+    assert sorted(grid.points) == [(x, y) for x in range(0, 33, 4) for y in range(0, 33, 4)], \
+        'cells should be refined until their score is at or below the threshold'
+
+
+def test_regrid():
+    grid = scan(AdaptiveGrid((5, 5), 60), step)
+    regridded = grid.regrid()
+    assert regridded.shape == grid.fine_shape == (33, 33)
+    for point, value in grid.values.items():
+        assert regridded[point] == value
+    linear = scan(AdaptiveGrid((4, 3), 40), lambda point: 2.0 * point[0] - point[1])
+    x, y = np.indices(linear.fine_shape)
+    assert np.allclose(linear.regrid(), 2.0 * x - y), 'linear data should be interpolated exactly'
+
+
+def test_traverse_adaptive():
+    from netCDF4 import Dataset
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    folder = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(folder, 'adaptive.nc')
+        axes = [{'Name': 'x', 'start': 0, 'stop': 4, 'num': 5}, {'Name': 'y', 'start': 0, 'stop': 30, 'num': 4}]
+        actionlist = [{'Name': 'Saving', '_method': 'save', 'filename': filename},
+                      {'Name': 'xy', '_method': 'scan', 'order': 'adaptive', 'axes': axes, 'budget': 40,
+                       'metric_variable': 'signal', 'refine_levels': 2, 'regrid': True,
+                       '~nested': [{'Name': 'signal', '_method': 'measure'}]},
+                      {'Name': 'Finish', '_method': 'finish'}]
+        experiment = TraversalExperiment()
+        experiment.load_config('dummy_config.yml', use_dict={
+            'ActionTypes': {}, 'Measurements': {'Adaptive': {'automated_actionlist': actionlist}}})
+        experiment.perform_measurement('Adaptive')
+        with Dataset(filename) as root:
+            data = {name: variable[:] for name, variable in root.variables.items()}
+            dims = {name: variable.dimensions for name, variable in root.variables.items()}
+    finally:
+        shutil.rmtree(folder)
+    number = len(experiment.visited['xy'])
+    assert 20 < number <= 40
+    assert experiment.visited['xy'] == [(i,) for i in range(number)]
+    for name in ('x', 'y', 'xy_level', 'signal'):
+        assert dims[name] == ('xy',) and len(data[name]) == number, name
+    assert np.allclose(data['signal'], signal(data['x'], data['y'])), 'data should be stored with its positions'
+    assert data['xy_level'][:20].tolist() == [0] * 20 and data['xy_level'].max() > 0
+    assert dims['signal_regridded'] == ('x_regridded', 'y_regridded')
+    x, y = np.meshgrid(data['x_regridded'], data['y_regridded'], indexing='ij')
+    assert np.allclose(data['signal_regridded'], signal(x, y))
+
+
+if __name__ == '__main__':
+    test_budget()
+    test_refines_where_values_change()
+    test_threshold()
+    test_regrid()
+    test_traverse_adaptive()
+    print('Adaptive grid tests passed')
@@ -0,0 +1,137 @@
+"""
+==========================
+Checkpoint and resume test
+==========================
+
+Runs a dummy measurement (a 2D grid scan storing a value and a spectrum per point) with checkpoints after every
+action, kills it halfway (the process exits without closing the datafile, like a crash) and continues it with
+BaseExperiment.resume_measurement(). The data in the resumed file should be bitwise identical to the data of a
+measurement that ran without interruption. This is checked with and without the write_behind buffer.
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_checkpoint
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+import hyperion
+from hyperion import logging
+from hyperion.experiment.base_experiment import BaseExperiment
+from hyperion.tools.array_tools import array_from_settings_dict
+
+grid_size = (5, 7)      # number of x and y points of the dummy measurement
+
+
+def config(filename, write_behind):
+    """ Returns the config of the dummy measurement, saving to filename. """
+    actionlist = [{'Name': 'Saving', '_method': 'save', 'filename': filename, 'write_behind': write_behind},
+                  {'Name': 'x', '_method': 'sweep', 'start': '0um', 'stop': '4um', 'num': grid_size[0], '~nested': [
+                      {'Name': 'y', '_method': 'sweep', 'start': '0um', 'stop': '3um', 'num': grid_size[1], '~nested': [
+                          {'Name': 'signal', '_method': 'measure'}]}]},
+                  {'Name': 'Finish', '_method': 'finish'}]
+    return {'ActionTypes': {}, 'Measurements': {'Grid': {'checkpoint_interval': 0, 'automated_actionlist': actionlist}}}
+
+
+class DummyExperiment(BaseExperiment):
+    """
+    Experiment with a fake measurement that only depends on the position in the grid.
+
+    :param kill_after: the process exits abruptly halfway this point (None (default) for never)
+    :type kill_after: int or None
+    """
+    def __init__(self, kill_after=None):
+        super().__init__()
+        self.kill_after = kill_after
+        self.points = 0     # number of points measured by this object
+
+    def save(self, actiondict, nesting):
+        self.datman.open_file(actiondict['filename'], write_behind=actiondict['write_behind'])
+
+    def sweep(self, actiondict, nesting):
+        for value in array_from_settings_dict(actiondict)[0]:
+            self.datman.dim_coord(actiondict, value)
+            nesting()
+
+    def measure(self, actiondict, nesting):
+        x, y = self._nesting_indices
+        self.points += 1
+        self.datman.var(actiondict, np.sin(x + 0.1 * y))
+        if self.points == self.kill_after:
+            os._exit(1)     # like a crash: no cleanup and the file is not closed
+        self.datman.dim_coord('wavelength', np.linspace(500, 600, 11))
+        self.datman.var('spectrum', np.arange(11, dtype='u2') * x + y, extra_dims=('wavelength',))
+
+    def finish(self, actiondict, nesting):
+        self.datman.close()
+
+
+def run(filename, write_behind, kill_after=None):
+    """ Performs the dummy measurement. """
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    experiment = DummyExperiment(kill_after)
+    experiment.load_config('dummy_config.yml', use_dict=config(filename, write_behind))
+    experiment.perform_measurement('Grid')
+
+
+def read_data(filename):
+    """ Returns the raw bytes, dimensions and datatype of every Variable in the file. """
+    from netCDF4 import Dataset
+    with Dataset(filename) as root:
+        root.set_auto_mask(False)
+        return {name: (variable.dimensions, variable.dtype, variable[:].tobytes())
+                for name, variable in root.variables.items()}
+
+
+def check_resume(write_behind, kill_after):
+    """ Crashes the dummy measurement after kill_after points, resumes it and compares it with a complete run. """
+    folder = tempfile.mkdtemp()
+    try:
+        reference = os.path.join(folder, 'reference.nc')
+        crashed = os.path.join(folder, 'crashed.nc')
+        checkpoint = os.path.join(folder, 'crashed_checkpoint.yml')
+        run(reference, write_behind)
+
+        env = dict(os.environ, PYTHONPATH=hyperion.repository_path)
+        code = 'from hyperion.unit_test.test_checkpoint import run; run({!r}, {}, {})'.format(crashed, write_behind,
+                                                                                             kill_after)
+        out = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True)
+        assert out.returncode == 1, 'the measurement should have been killed:\n' + out.stderr
+        assert os.path.isfile(checkpoint), 'no checkpoint was stored'
+
+        experiment = DummyExperiment()
+        experiment.resume_measurement(checkpoint)
+        assert not os.path.isfile(checkpoint), 'the checkpoint should be removed after finishing'
+        # The point that was interrupted is measured again, the ones before are skipped:
+        assert experiment.points == grid_size[0] * grid_size[1] - kill_after + 1
+
+        expected, resumed = read_data(reference), read_data(crashed)
+        assert sorted(expected) == sorted(resumed)
+        for name in expected:
+            assert expected[name] == resumed[name], 'data of {} differs'.format(name)
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_resume_after_crash():
+    check_resume(write_behind=False, kill_after=17)
+
+
+def test_resume_after_crash_write_behind():
+    check_resume(write_behind=True, kill_after=17)
+
+
+if __name__ == '__main__':
+    for write_behind in [False, True]:
+        for kill_after in [1, 7, 17, 35]:
+            check_resume(write_behind, kill_after)
+            print('write_behind={!s:<5} killed at point {:>2}: resumed data is identical'.format(write_behind,
+                                                                                            kill_after))
@@ -0,0 +1,198 @@
+"""
+=================
+DataManager tests
+=================
+
+Tests of the storage of Variables by the DataManager of BaseExperiment: the datatype a Variable is created with, the
+write_behind buffer (the file should be identical to one written directly, the measurement thread shouldn't wait for
+the writer and errors of the writer should be raised) and the in-memory copy for plotting (LiveVariable).
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_datamanager
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+import numpy as np
+from hyperion import logging
+from hyperion.experiment.base_experiment import BaseExperiment, DataManager
+from hyperion.unit_test.test_checkpoint import run, read_data
+
+
+def store(points, **options):
+    """
+    Stores the list of datapoints as Variable 'data' along dimension 'point' in a new file and returns the Variable
+    as read back from the file (as masked array) and the warnings the DataManager logged.
+    Additional keyword arguments (e.g. dtype) are passed to DataManager.var()
+    """
+    from netCDF4 import Dataset
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    folder = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(folder, 'data.nc')
+        with BaseExperiment() as e:
+            e.datman.open_file(filename)
+            e.datman.dim('point', len(points) + 1)
+            if np.ndim(points[0]):
+                e.datman.dim('axis', len(points[0]))
+                options['extra_dims'] = ('axis',)
+            with mock.patch.object(e.datman.logger, 'warning') as warning:
+                for indx, point in enumerate(points):
+                    e.datman.var('data', point, indices=[indx], dims=('point',), **options)
+            e.datman.close()
+        with Dataset(filename) as root:
+            return root.variables['data'][:], [call[0][0] for call in warning.call_args_list]
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_whole_first_number_is_not_truncated():
+    data, warnings = store([1, 2.7])
+    assert data.dtype == np.float64
+    assert data[1] == 2.7
+    assert data.mask[2], 'points that are not measured should be masked (NaN)'
+    assert not warnings
+
+
+def test_integer_arrays_keep_their_datatype():
+    data, warnings = store([np.arange(3, dtype='u2'), np.arange(3, dtype='u2') + 1])
+    assert data.dtype == np.uint16
+    assert not warnings
+
+
+def test_explicit_integer_dtype():
+    data, warnings = store([1, 2.7], dtype='i4')
+    assert data.dtype == np.int32
+    assert len(warnings) == 1 and 'truncates' in warnings[0], 'lossy cast should be warned about once'
+
+
+def test_write_behind_is_identical():
+    folder = tempfile.mkdtemp()
+    try:
+        direct, buffered = os.path.join(folder, 'direct.nc'), os.path.join(folder, 'buffered.nc')
+        run(direct, write_behind=False)
+        run(buffered, write_behind=True)
+        expected, data = read_data(direct), read_data(buffered)
+        assert sorted(expected) == sorted(data)
+        for name in expected:
+            assert expected[name] == data[name], 'data of {} differs'.format(name)
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_write_behind_does_not_wait_for_writer():
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    folder = tempfile.mkdtemp()
+    try:
+        with BaseExperiment() as e:
+            e.datman.open_file(os.path.join(folder, 'data.nc'), write_behind=True)
+            e.datman.dim_coord('x', 0.0)
+            writing, release = threading.Event(), threading.Event()
+
+            def large_write():      # holds the lock like the writer does while it writes a large block
+                with e.datman._lock:
+                    writing.set()
+                    release.wait()
+
+            writer = threading.Thread(target=large_write)
+            writer.start()
+            writing.wait()
+            measurement = threading.Thread(target=lambda: (e.datman.dim_coord('x', 1.0), e.datman.meta('x', unit='um')))
+            measurement.start()
+            measurement.join(5)
+            blocked = measurement.is_alive()
+            release.set()
+            writer.join()
+            measurement.join()
+            assert not blocked, 'dim_coord() and meta() should not wait for the writer'
+            e.datman.sync_hdd()
+            assert e.datman.root.variables['x'].unit == 'um'
+            e.datman.close()
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_write_behind_error_is_raised():
+    logging.stream_level = 'CRITICAL'
+    logging.enable_file = False
+    folder = tempfile.mkdtemp()
+    try:
+        with BaseExperiment() as e:
+            e.datman.open_file(os.path.join(folder, 'data.nc'), write_behind=True)
+            e.datman.dim('point', 4)
+            buffer = e.datman._buffer
+            with mock.patch.object(buffer, '_write_block', side_effect=OSError('disk full')):
+                e.datman.var('data', 1.5, indices=[0], dims=('point',))
+                try:
+                    e.datman.sync_hdd()
+                except OSError as error:
+                    assert 'disk full' in str(error)
+                else:
+                    assert False, 'the error of the writer should be raised'
+            assert buffer.errors == 1
+            e.datman.close()
+            assert not buffer._thread.is_alive(), 'the writer thread should be stopped'
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_live_whole_first_number_is_not_truncated():
+    with BaseExperiment() as e:
+        e.datman.var('x', 1, indices=[0], dims=('point',))
+        e.datman.var('x', 2.7, indices=[1], dims=('point',))
+        assert e.datman.live_var('x').view().tolist() == [1.0, 2.7]
+        frames = [np.arange(3, dtype='u2'), np.arange(3) + 0.5]
+        for indx, frame in enumerate(frames):
+            e.datman.var('frame', frame, indices=[indx], dims=('point',))
+        live = e.datman.live_var('frame')
+        assert live.dtype.kind == 'f', 'an integer LiveVariable should be converted when floats are stored'
+        assert np.array_equal(live.view(), np.array(frames))
+
+
+def test_live_no_new_data_flag():
+    logging.stream_level = 'CRITICAL'
+    with BaseExperiment() as e:
+        with mock.patch.object(e.datman.logger, 'warning') as warning:
+            e.datman.var('x', 1.5, indices=[0], dims=('point',), no_new_data_flag=True)
+            e.datman.var('x', 1.5, indices=[1], dims=('point',), no_new_data_flag=True)
+        assert e.datman.live_var('x') is None, 'no_new_data_flag should work like no_live'
+        assert len([call for call in warning.call_args_list if 'deprecated' in call[0][0]]) == 1
+
+
+def test_live_total_memory():
+    logging.stream_level = 'CRITICAL'
+    with BaseExperiment() as e:
+        datman = DataManager(e, max_live_total_bytes=1000)
+        datman.var('a', np.zeros(10), indices=[0], dims=('point',))     # 8 points of 10 floats (640 bytes)
+        datman.var('b', np.ones(10), indices=[0], dims=('point',))
+        assert datman.live_var('a').data is not None
+        assert datman.live_var('b').data is None, 'the total memory should be limited'
+        assert np.array_equal(datman.live_var('b').view(), np.ones(10))
+        datman.var('a', np.zeros(10), indices=[8], dims=('point',))     # would grow to 16 points
+        assert datman.live_var('a').data is None
+        assert datman._live_budget.used == 0
+        datman.reset_live()
+        datman.var('b', np.ones(10), indices=[0], dims=('point',))
+        assert datman.live_var('b').data is not None
+
+
+if __name__ == '__main__':
+    test_whole_first_number_is_not_truncated()
+    test_integer_arrays_keep_their_datatype()
+    test_explicit_integer_dtype()
+    test_write_behind_is_identical()
+    test_write_behind_does_not_wait_for_writer()
+    test_write_behind_error_is_raised()
+    test_live_whole_first_number_is_not_truncated()
+    test_live_no_new_data_flag()
+    test_live_total_memory()
+    print('DataManager tests passed')
@@ -0,0 +1,122 @@
+"""
+==============
+Scan estimator
+==============
+
+Tests of the ScanEstimator of a measurement (BaseExperiment.progress(), eta() and the dry run): the number of points
+should follow from the sweeps of the actionlist (without disabled Actions), the progress should go up to 1 and the
+remaining time down while measuring. An action that raises should not be learned from, and should leave the estimator
+consistent if a parent action handles the exception. The durations of a run should predict the next one.
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_estimator
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import os
+import time
+import shutil
+import tempfile
+from hyperion import logging
+from hyperion.experiment.base_experiment import BaseExperiment
+
+
+class EstimatedExperiment(BaseExperiment):
+    """
+    Experiment with sweeps and a measurement of 5 ms that records the progress and remaining time. The measurement
+    raises ValueError at the calls listed in fail_at, a sweep with catch: True continues after that.
+    """
+    def __init__(self):
+        super().__init__()
+        self.readings = []      # (progress, eta) at every measurement
+        self.measured = 0
+        self.estimator = None   # the estimator of the last measurement
+
+    def scan(self, actiondict, nesting):
+        for indices, values in self.traverse(actiondict):
+            try:
+                nesting(indices)
+            except ValueError:
+                if not actiondict['catch']:
+                    raise
+
+    def measure(self, actiondict, nesting):
+        self.estimator = self._estimator
+        self.measured += 1
+        if self.measured in (actiondict['fail_at'] or []):
+            raise ValueError('measurement failed')
+        time.sleep(0.005)
+        self.readings.append((self.progress(), self.eta()))
+
+
+def measure(actionlist, dry_run=False, timings_filename=None):
+    """ Performs (or estimates) the measurement of actionlist and returns the experiment and what it returned. """
+    logging.stream_level = 'CRITICAL'
+    logging.enable_file = False
+    e = EstimatedExperiment()
+    e.load_config('dummy_config.yml', use_dict={
+        'ActionTypes': {}, 'Measurements': {'Estimated': {'automated_actionlist': actionlist}}})
+    e.timings_filename = timings_filename
+    return e, e.perform_measurement('Estimated', dry_run=dry_run)
+
+
+def grid(catch=False, fail_at=None):
+    """ Returns an actionlist that sweeps x (4 points) and y (3 points) and measures at every point. """
+    return [{'Name': 'x', '_method': 'scan', 'start': 0, 'stop': 3, 'num': 4, '~nested': [
+        {'Name': 'y', '_method': 'scan', 'start': 0, 'stop': 2, 'num': 3, 'catch': catch, '~nested': [
+            {'Name': 'Signal', '_method': 'measure', 'fail_at': fail_at},
+            {'Name': 'Skipped', '_method': 'measure', '_disabled': True}]}]}]
+
+
+def test_progress_and_eta():
+    folder = tempfile.mkdtemp()
+    try:
+        e, _ = measure(grid(), timings_filename=os.path.join(folder, 'timings.yml'))
+    finally:
+        shutil.rmtree(folder)
+    estimator = e.estimator
+    assert estimator.total_points == 12 and estimator.expected == {'x': 1, 'y': 4, 'Signal': 12}
+    assert estimator.done == estimator.expected and estimator.points_done() == 12
+    progress, etas = zip(*e.readings)
+    assert all(a <= b for a, b in zip(progress, progress[1:])) and 0 <= progress[0] < progress[-1] <= 1
+    assert etas[0] is None, 'nothing is known about the durations before the first action is finished'
+    assert etas[-1] < etas[1], 'the remaining time should go down'
+    assert e.progress() is None and e.eta() is None, 'nothing should be estimated after the measurement'
+
+
+def test_failed_action():
+    folder = tempfile.mkdtemp()
+    try:
+        e, _ = measure(grid(catch=True, fail_at=[1, 5]), timings_filename=os.path.join(folder, 'timings.yml'))
+    finally:
+        shutil.rmtree(folder)
+    estimator = e.estimator
+    assert e.measured == 12 and not estimator._stack, 'the actions that raised should be finished'
+    assert estimator.done == estimator.expected
+    assert estimator.durations['Signal'] >= 0.005, 'the duration of the failed actions should not be used'
+
+
+def test_dry_run():
+    folder = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(folder, 'timings.yml')
+        e, nothing = measure(grid(), dry_run=True, timings_filename=filename)
+        assert nothing == (None, 12) and e.measured == 0
+        e, _ = measure(grid(), timings_filename=filename)
+        durations = e.estimator.durations
+        e, (duration, points) = measure(grid(), dry_run=True, timings_filename=filename)
+        assert points == 12 and e.measured == 0
+        assert abs(duration - (12 * durations['Signal'] + 4 * durations['y'] + durations['x'])) < 1e-6
+        assert duration >= 12 * 0.005
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    test_progress_and_eta()
+    test_failed_action()
+    test_dry_run()
+    print('Estimator tests passed')
@@ -0,0 +1,117 @@
+"""
+==================
+G2 correlator test
+==================
+
+Compares the histograms of the streaming G2Correlator, fed in chunks, with the histograms of all time differences
+computed at once, for linear and multi-tau bins: bin by bin at the exact levels as well as at the coarse levels (with
+the rounded times, and with the count traces).
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_g2_correlator
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import numpy as np
+from hyperion import logging
+from hyperion.instrument.correlator.g2_correlator import G2Correlator
+
+
+def correlate_in_chunks(correlator, a, b, duration, chunks=13, seed=1):
+    """ Feeds a and b to the correlator in chunks with random boundaries. """
+    horizons = list(np.sort(np.random.default_rng(seed).integers(0, duration, chunks - 1))) + [duration]
+    start = 0
+    for horizon in horizons:
+        correlator.add(a[(a >= start) & (a < horizon)], b[(b >= start) & (b < horizon)], horizon)
+        start = horizon
+
+
+def all_differences(a, b):
+    """ Returns the differences b - a of all pairs. """
+    return np.subtract.outer(b, a).ravel()
+
+
+def binned_differences(correlator, a, b, part=1000):
+    """
+    Returns the counts the correlator should have for a and b, from the differences of all pairs: at the exact levels
+    binned in the lag bins, at the coarse levels the differences of the times rounded down to the bin width of the
+    level (in units of that bin width, one bin per difference).
+    """
+    counts = np.zeros(len(correlator.edges))
+    exact = correlator._exact[0]
+    for first in range(0, len(a), part):
+        x = a[first:first + part]
+        differences = np.subtract.outer(b, x)
+        for level, scale, ranges in correlator._levels:
+            for lo, hi, bins in ranges:
+                if level <= exact:
+                    edges = correlator.edges[bins]
+                    inside = (differences >= edges[0]) & (differences < edges[-1] + correlator.widths[bins.stop - 1])
+                    counts[bins] += np.bincount(np.searchsorted(edges, differences[inside], 'right') - 1,
+                                                minlength=len(edges))
+                else:
+                    coarse = np.subtract.outer(b // scale, x // scale)
+                    counts[bins] += np.bincount(coarse[(coarse >= lo) & (coarse < hi)] - lo, minlength=hi - lo)
+    return counts
+
+
+def streams(number=2000, duration=10**8, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.integers(0, duration, number)), np.sort(rng.integers(0, duration, number)), duration
+
+
+def test_linear():
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    a, b, duration = streams()
+    correlator = G2Correlator(bin_width=1000, max_lag=300000)
+    correlate_in_chunks(correlator, a, b, duration)
+    edges = np.append(correlator.edges, correlator.edges[-1] + correlator.widths[-1])
+    assert np.array_equal(correlator.counts, np.histogram(all_differences(a, b), edges)[0])
+    assert correlator.duration == duration - min(a[0], b[0])
+
+
+def test_multi_tau_exact():
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    a, b, duration = streams()
+    correlator = G2Correlator(bin_width=1000, levels=6, points=8, exact_levels=5)
+    correlate_in_chunks(correlator, a, b, duration)
+    edges = np.append(correlator.edges, correlator.edges[-1] + correlator.widths[-1])
+    assert np.all(np.diff(edges) == np.append(correlator.widths[:-1], correlator.widths[-1]))
+    assert np.array_equal(correlator.counts, np.histogram(all_differences(a, b), edges)[0])
+
+
+def test_multi_tau_coarse():
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    a, b, duration = streams(number=3000)
+    for options in ({'exact_levels': 0}, {'exact_levels': 2}, {}):
+        correlator = G2Correlator(bin_width=1000, levels=8, points=8, **options)
+        correlate_in_chunks(correlator, a, b, duration)
+        assert np.array_equal(correlator.counts, binned_differences(correlator, a, b)), options
+
+
+def test_multi_tau_dense():
+    # with these rates the last levels have more times than bins, so they correlate the count traces
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    a, b, duration = streams(number=5000)
+    correlator = G2Correlator(bin_width=100, levels=14, points=8, exact_levels=3)
+    correlate_in_chunks(correlator, a, b, duration)
+    assert np.array_equal(correlator.counts, binned_differences(correlator, a, b))
+    a, b, duration = streams(number=20000)
+    correlator = G2Correlator(bin_width=100, levels=14, points=8, exact_levels=0)
+    correlate_in_chunks(correlator, a, b, duration)
+    assert abs(np.nanmean(correlator.g2) - 1) < 0.01
+
+
+if __name__ == '__main__':
+    test_linear()
+    test_multi_tau_exact()
+    test_multi_tau_coarse()
+    test_multi_tau_dense()
+    print('all g2 correlator tests passed')
@@ -0,0 +1,90 @@
+"""
+===============================
+Hydraharp histogram acquisition
+===============================
+
+Tests the HistogramAcquisition of the HydraInstrument with the dummy controller (fake library): it should finish
+after the integration time without polling all the time, read intermediate histograms only for subscribers and stop
+on request. The asserts are on the number of polls and the state rather than on the wall clock. The
+histograms of both channels are measured at once and stored with the DataManager.
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_hydraharp_acquisition
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import os
+import time
+import shutil
+import tempfile
+from unittest import mock
+import numpy as np
+from hyperion import logging, ur
+from hyperion.experiment.base_experiment import BaseExperiment
+from hyperion.instrument.correlator.hydraharp_instrument import HydraInstrument
+
+settings = {'devidx': 0, 'mode': 'Histogram', 'clock': 'Internal', 'dummy': True,
+            'controller': 'hyperion.controller.picoquant.hydraharp/Hydraharp'}
+
+
+def test_acquisition():
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    with HydraInstrument(dict(settings)) as hydra:
+        hydra.set_histogram(4096, 8 * ur('ps'))
+
+        done = []
+        acquisition = hydra.start_histogram(0.5 * ur('s'), 0, on_done=done.append)
+        histogram = acquisition.result(timeout=5)
+        assert acquisition.state == 'finished' and acquisition.time_passed == 0.5 * ur('s')
+        assert 2 <= acquisition.polls < 50, 'the status should be polled more often towards the end, not all the time'
+        assert done == [acquisition.future] and hydra.hist_ended and hydra.hist is histogram
+        assert histogram.sum() > 0
+
+        previews = []
+        acquisition = hydra.start_histogram(0.5 * ur('s'), 1)
+        acquisition.subscribe(lambda histogram, time_passed: previews.append(time_passed), interval=0.1)
+        acquisition.result(timeout=5)
+        assert 1 <= len(previews) <= 5
+        assert all((b - a).m_as('s') > 0.09 for a, b in zip(previews, previews[1:])), 'previews should be 0.1 s apart'
+
+        acquisition = hydra.start_histogram(10 * ur('s'), 0)
+        time.sleep(0.1)
+        hydra.stop_histogram()
+        assert acquisition.result(timeout=1).sum() > 0
+        assert acquisition.state == 'stopped' and acquisition.time_passed < 10 * ur('s')
+
+
+def test_histograms_of_all_channels():
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    folder = tempfile.mkdtemp()
+    try:
+        with HydraInstrument(dict(settings)) as hydra:
+            hydra.set_histogram(1024, 8 * ur('ps'))
+            controller = hydra.controller
+            with mock.patch.object(controller, 'start_measurement', wraps=controller.start_measurement) as start:
+                histograms = hydra.make_histograms(0.2 * ur('s'))
+            assert start.call_count == 1, 'both channels should be histogrammed in one measurement'
+            assert histograms.shape == (2, 1024) and np.all(histograms.sum(axis=1) > 0)
+
+            experiment = BaseExperiment()
+            experiment.datman.open_file(os.path.join(folder, 'histograms.nc'))
+            hydra.store_histograms(experiment.datman, 'histograms', histograms)
+            experiment.datman.close()
+        from netCDF4 import Dataset
+        with Dataset(os.path.join(folder, 'histograms.nc')) as root:
+            assert root.variables['histograms'].dimensions == ('histograms_channel', 'histograms_delay')
+            assert np.array_equal(root.variables['histograms'][:], histograms)
+            assert np.array_equal(root.variables['histograms_delay'][:], np.arange(1024) * 8)
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    test_acquisition()
+    test_histograms_of_all_channels()
+    print('all acquisition tests passed')
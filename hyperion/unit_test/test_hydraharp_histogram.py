@@ -0,0 +1,72 @@
+"""
+===========================
+Hydraharp histogram readout
+===========================
+
+Tests reading histograms from the Hydraharp controller with the fake library of HydraharpDummy: into the buffer of
+the channel (the returned array shares its memory), into an array given with out= and of all channels at once into a
+(channels, bins) array.
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_hydraharp_histogram
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import numpy as np
+from hyperion import logging
+from hyperion.controller.picoquant.hydraharp import HydraharpDummy
+
+
+def test_histogram_buffers():
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    settings = {'devidx': 0, 'mode': 'Histogram', 'clock': 'Internal', 'fake': {'rates': (1e6, 2e6)}}
+    with HydraharpDummy(settings) as hydraharp:
+        hydraharp.histogram_length = 4096
+        hydraharp.start_measurement(20)
+        while not hydraharp.ctc_status:
+            pass
+        first = hydraharp.histogram(0, False)
+        assert first.dtype == np.uint32 and len(first) == 4096 and first.sum() > 0
+        assert hydraharp.histogram(0, False) is first        # the same buffer every time, no copies
+        second = hydraharp.histogram(1, False)
+        assert second is not first and second.sum() > first.sum()
+
+        out = np.zeros(4096, dtype=np.uint32)
+        assert hydraharp.histogram(1, False, out=out) is out
+        assert np.array_equal(out, second)
+
+        hydraharp.histogram_length = 1024
+        assert len(hydraharp.histogram(0, True)) == 1024
+        assert hydraharp.histogram(0, False).sum() == 0
+
+
+def test_histograms_of_all_channels():
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    settings = {'devidx': 0, 'mode': 'Histogram', 'clock': 'Internal', 'fake': {'rates': (1e6, 2e6)}}
+    with HydraharpDummy(settings) as hydraharp:
+        hydraharp.histogram_length = 2048
+        hydraharp.start_measurement(20)
+        while not hydraharp.ctc_status:
+            pass
+        separate = [hydraharp.histogram(channel, False).copy() for channel in range(2)]
+        both = hydraharp.histograms(clear=False)
+        assert both.shape == (2, 2048) and both.dtype == np.uint32
+        assert np.array_equal(both, separate)
+        assert np.shares_memory(both, hydraharp.histogram(1, False))    # one buffer for all channels
+        assert np.array_equal(hydraharp.histograms([1], False), both[1:])
+
+        out = np.zeros((2, 2048), dtype=np.uint32)
+        assert hydraharp.histograms(clear=True, out=out) is out
+        assert np.array_equal(out, separate)            # the memory is only cleared after the last channel
+        assert hydraharp.histograms(clear=False).sum() == 0
+
+
+if __name__ == '__main__':
+    test_histogram_buffers()
+    test_histograms_of_all_channels()
+    print('all histogram tests passed')
@@ -0,0 +1,106 @@
+"""
+==================================
+Hydraharp TTTR decoding and stream
+==================================
+
+Tests the encoding and decoding of T2 and T3 records (including the overflow records) and the TTTRStream of the
+Hydraharp controller, with the fake library of HydraharpDummy replaying a known stream.
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_hydraharp_tttr
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+from time import sleep
+import numpy as np
+from hyperion import logging
+from hyperion.controller.picoquant.hydraharp import HydraharpDummy, TTTRDecoder, encode_tttr
+
+
+def random_events(mode, number, span, seed=0):
+    """ Returns sorted times, channels and (T3) dtimes of number events spread over span. """
+    rng = np.random.default_rng(seed)
+    time = np.sort(rng.integers(0, span, number))
+    channel = rng.integers(0, 2, number).astype(np.uint8)
+    dtime = rng.integers(0, 2**15, number).astype(np.uint16) if mode == 'T3' else None
+    return time, channel, dtime
+
+
+def test_encode_decode():
+    # T3 with a span that needs overflow records holding more than the 10 bit time field
+    for mode, span in [('T2', 10**12), ('T3', 10**9)]:
+        time, channel, dtime = random_events(mode, 20000, span)
+        records = encode_tttr(mode, time, channel, dtime=dtime)
+        assert len(records) > len(time)
+        decoder = TTTRDecoder(mode)
+        chunks = [decoder.decode(part) for part in np.array_split(records, 7)]
+        assert np.array_equal(np.concatenate([chunk.time for chunk in chunks]), time)
+        assert np.array_equal(np.concatenate([chunk.channel for chunk in chunks]), channel)
+        if mode == 'T3':
+            assert np.array_equal(np.concatenate([chunk.dtime for chunk in chunks]), dtime)
+
+
+def test_markers():
+    records = encode_tttr('T2', [5, 10, 40000000], [0, 3, 1], special=[True, True, False])
+    chunk = TTTRDecoder('T2').decode(records)
+    assert list(chunk.syncs()) == [5]
+    assert [list(a) for a in chunk.markers()] == [[3], [10]]
+    assert list(chunk.photons(1)) == [40000000]
+
+
+def test_stream_replay():
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    time, channel, _ = random_events('T2', 500000, 10**12)
+    records = encode_tttr('T2', time, channel)
+    settings = {'devidx': 0, 'mode': 'T2', 'clock': 'Internal', 'fake': {'records': records, 'realtime': False}}
+    with HydraharpDummy(settings) as hydraharp:
+        stream = hydraharp.stream(1000, queue_size=2)
+        # a consumer that lags: the queue is full every time a chunk is taken, also at the end of the stream
+        chunks = []
+        for chunk in stream:
+            chunks.append(chunk)
+            while stream.running and not stream.queue.full():
+                sleep(0.001)
+    assert stream.error is None and stream.dropped == 0
+    assert stream.total == len(records)
+    assert max(len(chunk) for chunk in chunks) <= len(stream.records)
+    assert np.array_equal(np.concatenate([chunk.photons(1) for chunk in chunks]), time[channel == 1])
+
+
+def test_stream_drop_new():
+    # the queue is full when the stream ends, the end of the stream doesn't replace a chunk
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    time, channel, _ = random_events('T2', 500000, 10**12)
+    settings = {'devidx': 0, 'mode': 'T2', 'clock': 'Internal',
+                'fake': {'records': encode_tttr('T2', time, channel), 'realtime': False}}
+    with HydraharpDummy(settings) as hydraharp:
+        stream = hydraharp.stream(1000, queue_size=2, overflow='drop_new')
+        while stream.running:
+            sleep(0.001)
+        chunks = list(stream)
+    assert len(chunks) == 2 and stream.dropped > 0
+    assert np.array_equal(np.concatenate([chunk.time for chunk in chunks]), time[:sum(map(len, chunks))])
+
+
+def test_close_stops_stream():
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    settings = {'devidx': 0, 'mode': 'T2', 'clock': 'Internal', 'fake': {'rates': (1e4, 1e4)}}
+    with HydraharpDummy(settings) as hydraharp:
+        stream = hydraharp.stream(60000)
+        assert stream.running
+    assert not stream.running
+
+
+if __name__ == '__main__':
+    test_encode_decode()
+    test_markers()
+    test_stream_replay()
+    test_stream_drop_new()
+    test_close_stops_stream()
+    print('all TTTR tests passed')
@@ -0,0 +1,80 @@
+"""
+================
+Import time test
+================
+
+Checks that importing hyperion (and the base experiment) stays fast, using the output of python -X importtime in a
+fresh interpreter. Heavy packages (lantz/pint unit registry, matplotlib, xarray, netCDF4) should only be imported
+when they're used.
+
+Run it with pytest or as a script (which also prints the slowest imports):
+
+    python -m hyperion.unit_test.test_import_time
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import os
+import sys
+import subprocess
+import hyperion
+
+# Budgets in seconds (cumulative import time, fastest of a few runs). They're generous, to allow for slow machines.
+budgets = {'hyperion': 0.3,
+           'hyperion.experiment.base_experiment': 1.0}
+
+# Packages that should not be imported by just importing hyperion or the base experiment
+deferred = ['lantz', 'pint', 'matplotlib', 'xarray', 'netCDF4']
+
+
+def import_times(module):
+    """
+    Imports module in a fresh interpreter with -X importtime.
+
+    :param module: name of the module to import
+    :type module: str
+    :return: cumulative import time (in seconds) of every module that got imported
+    :rtype: dict
+    """
+    env = dict(os.environ, PYTHONPATH=hyperion.repository_path)
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)], env=env,
+                         capture_output=True, text=True, check=True)
+    times = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative_us) * 1e-6
+    return times
+
+
+def fastest_import_time(module, repeat=3):
+    """ Returns the fastest of repeat cumulative import times of module (in seconds) and the imported modules. """
+    runs = [import_times(module) for _ in range(repeat)]
+    return min(run[module] for run in runs), runs[0]
+
+
+def test_import_time_budget():
+    for module, budget in budgets.items():
+        duration, _ = fastest_import_time(module)
+        assert duration < budget, 'importing {} took {:.3f} s (budget {} s)'.format(module, duration, budget)
+
+
+def test_heavy_imports_are_deferred():
+    for module in budgets:
+        imported = import_times(module)
+        heavy = [name for name in imported if name.split('.')[0] in deferred]
+        assert not heavy, 'importing {} also imports {}'.format(module, ', '.join(sorted(heavy)[:5]))
+
+
+if __name__ == '__main__':
+    for module, budget in budgets.items():
+        duration, imported = fastest_import_time(module)
+        print('{:<40} {:6.3f} s  (budget {} s)  {}'.format(module, duration, budget,
+                                                          'OK' if duration < budget else 'TOO SLOW'))
+        slowest = sorted(((t, name) for name, t in imported.items() if name != module), reverse=True)[:5]
+        for t, name in slowest:
+            print('    {:<36} {:6.3f} s'.format(name, t))
+    test_heavy_imports_are_deferred()
+    print('Heavy packages ({}) are not imported'.format(', '.join(deferred)))
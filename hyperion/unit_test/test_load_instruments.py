@@ -0,0 +1,113 @@
+"""
+===================
+Loading instruments
+===================
+
+Tests of BaseExperiment.load_instruments() with fake instruments (defined in this module): by default only the
+instruments with load_parallel: True in their config are loaded in the pool of threads, parallel=True loads all of them
+there (except the ones with load_in_main_thread: True) and parallel=False none. A MetaInstrument is loaded after the
+instruments it uses. Instruments that fail are returned, instruments that are already loaded are skipped.
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_load_instruments
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import threading
+from time import sleep
+from hyperion import logging
+from hyperion.experiment.base_experiment import BaseExperiment
+
+module = 'hyperion.unit_test.test_load_instruments'
+
+
+class FakeInstrument:
+    """
+    Instrument that takes settings['delay'] seconds to load (or raises RuntimeError if settings['fail'] is True).
+    It remembers the name of the thread that created it and counts the number of instances.
+    """
+    created = 0
+
+    def __init__(self, settings):
+        sleep(settings.get('delay', 0))
+        if settings.get('fail'):
+            raise RuntimeError('could not connect')
+        self.settings = settings
+        self.thread = threading.current_thread().name
+        FakeInstrument.created += 1
+
+    def finalize(self):
+        pass
+
+
+class FakeMetaInstrument:
+    """ MetaInstrument that remembers the instruments it got and the name of the thread that created it. """
+    def __init__(self, settings, instruments):
+        self.instruments = instruments
+        self.thread = threading.current_thread().name
+
+
+def experiment():
+    """
+    Returns an experiment with instruments a (load_parallel), b (load_in_main_thread), c (fails) and d and a
+    MetaInstrument m that uses a and d.
+    """
+    logging.stream_level = 'CRITICAL'
+    logging.enable_file = False
+    instrument = lambda **settings: dict({'instrument': module + '/FakeInstrument', 'delay': 0.05}, **settings)
+    config = {'Instruments': {'a': instrument(load_parallel=True), 'b': instrument(load_in_main_thread=True),
+                              'c': instrument(fail=True), 'd': instrument()},
+              'MetaInstruments': {'m': {'meta_instr': module + '/FakeMetaInstrument',
+                                        'instruments': {'first': 'a', 'second': 'd'}}}}
+    e = BaseExperiment()
+    e.load_config('dummy_config.yml', use_dict=config)
+    return e
+
+
+def loaded_in_pool(e):
+    """ Returns the names of the (Meta)Instruments that were created by the pool of threads. """
+    instances = dict(e.instruments_instances, **e.meta_instr_instances)
+    return {name for name, instance in instances.items() if instance.thread.startswith('load_instrument')}
+
+
+def check_loading(parallel, expected_in_pool):
+    e = experiment()
+    failed = e.load_instruments(parallel=parallel) if parallel is not None else e.load_instruments()
+    assert failed == ['c']
+    assert sorted(e.instruments_instances) == ['a', 'b', 'd'] and list(e.meta_instr_instances) == ['m']
+    meta = e.meta_instr_instances['m']
+    assert meta.instruments == {'first': e.instruments_instances['a'], 'second': e.instruments_instances['d']}
+    assert loaded_in_pool(e) == expected_in_pool
+    assert set(e.instrument_load_times) == {'a', 'b', 'c', 'd', 'm'}
+
+
+def test_only_opted_in_instruments_in_pool():
+    check_loading(None, {'a'})
+
+
+def test_parallel():
+    check_loading(True, {'a', 'd', 'm'})
+
+
+def test_not_parallel():
+    check_loading(False, set())
+
+
+def test_already_loaded_are_skipped():
+    e = experiment()
+    e.load_instruments(parallel=True)
+    created = FakeInstrument.created
+    assert e.load_instruments(parallel=True) == ['c'], 'instruments that are already loaded are not failures'
+    assert FakeInstrument.created == created, 'instruments that are already loaded should not be loaded again'
+    assert set(e.instrument_load_times) == {'c'}
+
+
+if __name__ == '__main__':
+    test_only_opted_in_instruments_in_pool()
+    test_parallel()
+    test_not_parallel()
+    test_already_loaded_are_skipped()
+    print('load_instruments tests passed')
@@ -0,0 +1,125 @@
+"""
+==========================
+Structured log and queries
+==========================
+
+Tests of the StructuredFileHandler (hyperion.core), which stores log records as JSON lines in batches, and of
+hyperion.tools.log_query, which reads, filters and prints them: the records should be read back with their arguments
+(also numpy numbers and exceptions) as they were when they were logged, and an incomplete or damaged last batch (e.g. after a crash) should be skipped.
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_log_query
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import io
+import os
+import gzip
+import shutil
+import tempfile
+import contextlib
+import logging as std_logging
+import numpy as np
+from hyperion.core import StructuredFileHandler
+from hyperion.tools.log_query import read_records, to_log_record, filter_records, main
+
+
+def write_log(filename, batch_size=2):
+    """ Logs some records (of two loggers, one with an exception) with a StructuredFileHandler to filename. """
+    handler = StructuredFileHandler(filename, batch_size=batch_size)
+    loggers = [std_logging.getLogger('hyperion.unit_test.query.' + name) for name in ('a', 'b')]
+    for logger in loggers:
+        logger.propagate = False
+        logger.setLevel(std_logging.DEBUG)
+        logger.addHandler(handler)
+    try:
+        loggers[0].debug('point %s of %s', np.int64(1), 3)
+        loggers[1].info('position: %s', [1.5, 2.5])
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            loggers[0].exception('failed')
+        circular = []
+        circular.append(circular)
+        loggers[1].warning('circular: %s', circular)
+    finally:
+        for logger in loggers:
+            logger.removeHandler(handler)
+        handler.close()
+
+
+def check_log(filename):
+    entries = list(read_records(filename))
+    assert [to_log_record(entry).getMessage().split('\n')[0] for entry in entries] == \
+        ['point 1 of 3', 'position: [1.5, 2.5]', 'failed', 'circular: [[...]]']
+    assert 'ZeroDivisionError' in to_log_record(entries[2]).getMessage()
+    assert [entry['logger'][-1] for entry in filter_records(entries, level=std_logging.INFO)] == ['b', 'a', 'b']
+    assert len(list(filter_records(entries, loggers=['hyperion.unit_test.query.a']))) == 2
+    assert not list(filter_records(entries, loggers=['hyperion.unit_test.que']))
+    assert not list(filter_records(entries, start=entries[-1]['time'] + 1))
+    return entries
+
+
+def test_structured_file():
+    folder = tempfile.mkdtemp()
+    try:
+        for name in ('log.jsonl', 'log.jsonl.gz'):
+            filename = os.path.join(folder, name)
+            write_log(filename)
+            check_log(filename)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                main([filename, '--level', 'WARNING'])
+            lines = output.getvalue().splitlines()
+            assert any('failed' in line for line in lines) and not any('point 1' in line for line in lines)
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_incomplete_last_batch_is_skipped():
+    folder = tempfile.mkdtemp()
+    try:
+        batch = gzip.compress(b'{"msg": "lost"}\n')
+        damaged = batch[:12] + bytes(255 - b for b in batch[12:-8]) + batch[-8:]
+        for name, tail in [('truncated.jsonl.gz', batch[:-10]), ('garbage.jsonl.gz', b'garbage'),
+                           ('damaged.jsonl.gz', damaged), ('truncated.jsonl', b'{"msg": "los')]:
+            filename = os.path.join(folder, name)
+            write_log(filename)
+            with open(filename, 'ab') as f:
+                f.write(tail)
+            assert len(check_log(filename)) == 4, name
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_changed_arguments():
+    folder = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(folder, 'log.jsonl')
+        handler = StructuredFileHandler(filename, batch_size=10)
+        logger = std_logging.getLogger('hyperion.unit_test.query.c')
+        logger.propagate = False
+        logger.setLevel(std_logging.DEBUG)
+        logger.addHandler(handler)
+        try:
+            position = [0, 0]
+            for indx in range(3):
+                position[0] = indx
+                logger.debug('position %s', position)
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+        assert [to_log_record(entry).getMessage() for entry in read_records(filename)] == \
+            ['position [0, 0]', 'position [1, 0]', 'position [2, 0]'], 'the arguments should be stored when logged'
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    test_structured_file()
+    test_incomplete_last_batch_is_skipped()
+    test_changed_arguments()
+    print('Structured log tests passed')
@@ -0,0 +1,189 @@
+"""
+=============
+Logging tests
+=============
+
+Tests of the handlers of the LoggingManager (hyperion.core): the ring buffer shouldn't lower the levels of the loggers
+(unless a level is passed) and should store the message as it was when it was logged. The DuplicateFilter shouldn't
+suppress warnings and errors, and should pass the pending summaries when it's flushed. Replacing a queued handler
+should stop its background thread, and the queue handler shouldn't modify records that other handlers also get.
+The levels of the loggers should follow the levels of their handlers, so disabled debug calls return right away.
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_logging
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import io
+import logging as std_logging
+from unittest import mock
+from hyperion import logging
+from hyperion.core import DuplicateFilter, BoundedQueueHandler
+
+
+def remove_ring_buffer():
+    """ Removes the ring buffer from all loggers (the LoggingManager is shared by all tests). """
+    for logger in logging._loggers.values():
+        logger.removeHandler(logging.ring_buffer)
+    logging.ring_buffer = None
+    logging.update_levels()
+
+
+def get_logger():
+    """ Returns a logger with only the stream handler (at WARNING) and not propagating to e.g. handlers of pytest. """
+    logging.enable_file = False
+    logging.stream_level = 'WARNING'
+    logger = logging.getLogger('hyperion.unit_test.ring_buffer')
+    logger.propagate = False
+    logging.update_levels()
+    return logger
+
+
+def test_ring_buffer_follows_levels():
+    logger = get_logger()
+    try:
+        logging.set_ring_buffer()
+        assert logger.getEffectiveLevel() == logging.WARNING, 'the ring buffer should not lower the level'
+        logger.debug('not kept')
+        logger.warning('kept')
+        assert [entry[5] for entry in logging.ring_buffer.records()] == ['kept']
+
+        logging.set_ring_buffer(level='DEBUG')
+        assert logger.getEffectiveLevel() == logging.DEBUG, 'an explicit level should be used'
+        logger.debug('kept')
+        assert len(logging.ring_buffer.records()) == 1
+    finally:
+        remove_ring_buffer()
+    assert logger.getEffectiveLevel() == logging.WARNING
+
+
+def test_ring_buffer_stores_message_when_logged():
+    logger = get_logger()
+    try:
+        logging.set_ring_buffer()
+        values = [1, 2]
+        logger.warning('values: %s', values)
+        values.append(3)
+        entries = logging.ring_buffer.records()
+        assert entries[0][5] == 'values: [1, 2]'
+        assert logging.ring_buffer.to_log_record(entries[0]).getMessage() == 'values: [1, 2]'
+    finally:
+        remove_ring_buffer()
+
+
+class ListHandler(std_logging.Handler):
+    """ Handler that keeps the messages of the records it receives in a list. """
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def log_repeatedly(level, number):
+    """ Passes number records of the same call site through a DuplicateFilter and returns the ListHandler. """
+    handler = ListHandler()
+    handler.addFilter(DuplicateFilter(handler, burst=10))
+    for i in range(number):
+        handler.handle(std_logging.LogRecord('test', level, 'test.py', 1, 'message %s', (i,), None))
+    return handler
+
+
+def test_duplicate_filter_suppresses_debug():
+    handler = log_repeatedly(logging.DEBUG, 50)
+    assert handler.messages == ['message {}'.format(i) for i in range(10)]
+    handler.filters[0].flush()
+    assert handler.messages[-1].startswith('Suppressed 40 messages from this line')
+    handler.filters[0].flush()
+    assert len(handler.messages) == 11, 'a summary should only be passed once'
+
+
+def test_duplicate_filter_passes_errors():
+    for level in (logging.WARNING, logging.ERROR, logging.CRITICAL):
+        assert len(log_repeatedly(level, 50).messages) == 50
+
+
+def test_replaced_queue_handler_is_stopped():
+    logger = get_logger()
+    streams = [io.StringIO(), io.StringIO()]
+    try:
+        logging.set_stream(use_queue=True, stream=streams[0], color=False)
+        old_handler = logging.stream_handler
+        assert old_handler in logger.handlers
+        logger.warning('first')
+        logging.set_stream(use_queue=True, stream=streams[1], color=False)
+        assert not old_handler.running and old_handler.listener._thread is None, 'the old thread should be stopped'
+        assert old_handler not in logger.handlers and logging.stream_handler in logger.handlers
+        logger.warning('second')
+        logging.flush()
+        assert 'first' in streams[0].getvalue() and 'second' not in streams[0].getvalue()
+        assert 'second' in streams[1].getvalue()
+    finally:
+        logging.set_stream(use_queue=False)
+    assert not logging._queue_handlers
+
+
+def test_queue_handler_does_not_modify_record():
+    values = [1, 2]
+    record = std_logging.LogRecord('test', logging.WARNING, 'test.py', 1, 'values: %s', (values,), None)
+    prepared = BoundedQueueHandler(ListHandler()).prepare(record)
+    assert prepared.msg == 'values: [1, 2]' and prepared.args is None
+    assert record.msg == 'values: %s' and record.args == (values,)
+
+
+class Costly:
+    """ Argument of a log call that counts how often it's converted to a string. """
+    def __init__(self):
+        self.conversions = 0
+
+    def __str__(self):
+        self.conversions += 1
+        return 'costly'
+
+
+def test_levels_follow_handlers():
+    logger = get_logger()
+    stream = io.StringIO()
+    try:
+        logging.set_stream(use_queue=False, stream=stream, color=False)
+        assert logger.level == logging.WARNING and not logger.isEnabledFor(logging.DEBUG)
+        argument = Costly()
+        logger.debug('not printed: %s', argument)
+        logger.warning('printed: %s', argument)
+        assert argument.conversions == 1, 'arguments of disabled debug calls should not be converted'
+        logging.stream_level = 'DEBUG'
+        assert logger.level == logging.DEBUG
+        logger.debug('printed: %s', argument)
+        assert argument.conversions == 2 and 'printed: costly' in stream.getvalue()
+    finally:
+        logging.set_stream(use_queue=False)
+        logging.stream_level = 'WARNING'
+    assert logger.level == logging.WARNING
+
+
+def test_disabled_debug_in_controller_returns_early():
+    from hyperion.controller.generic.generic_serial_contr import GenericSerialControllerDummy
+    get_logger()
+    controller = GenericSerialControllerDummy({'port': 'COM10', 'dummy': True})
+    controller.logger.propagate = False
+    logging.update_levels()
+    controller.initialize()
+    with mock.patch.object(controller.logger, 'handle') as handle:
+        assert controller.query('*IDN?') == ['*IDN?']
+    assert not handle.called, 'debug calls should return before a record is made'
+
+
+if __name__ == '__main__':
+    test_ring_buffer_follows_levels()
+    test_ring_buffer_stores_message_when_logged()
+    test_duplicate_filter_suppresses_debug()
+    test_duplicate_filter_passes_errors()
+    test_replaced_queue_handler_is_stopped()
+    test_queue_handler_does_not_modify_record()
+    test_levels_follow_handlers()
+    test_disabled_debug_in_controller_returns_early()
+    print('Logging tests passed')
@@ -0,0 +1,128 @@
+"""
+================
+Measurement flow
+================
+
+Tests of pausing and stopping a measurement (BaseExperiment.request_pause(), request_stop() and wait_for_stop()) from
+another thread, like the buttons of the AutoMeasurementGui do, and of the decorator of the GenericSerialController that
+keeps its methods from running at the same time. Waiting should be done on events, so it shouldn't use cpu.
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_measurement_flow
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import time
+import threading
+from hyperion import logging
+from hyperion.controller.generic.generic_serial_contr import GenericSerialController, GenericSerialControllerDummy
+from hyperion.unit_test.benchmark_actionlist import DummyExperiment, nested_config
+
+
+def wait_until(condition, timeout=5):
+    """ Waits until condition() is True (returns False after timeout seconds). """
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class PausingExperiment(DummyExperiment):
+    """ DummyExperiment that requests a pause at point number pause_at (like the Pause button in the gui). """
+    pause_at = 5
+
+    def point(self, actiondict, nesting):
+        super().point(actiondict, nesting)
+        if self.points == self.pause_at:
+            threading.Thread(target=self.request_pause).start()
+            wait_until(lambda: self.apply_pause)
+
+
+def start_measurement(depth=2, num=10):
+    """ Starts the nested dummy measurement on another thread and waits until it's paused. """
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    e = PausingExperiment()
+    e.load_config('_test_', nested_config(depth, num))
+    thread = threading.Thread(target=e.perform_measurement, args=('nested',))
+    thread.start()
+    assert wait_until(lambda: e.running_status == e._pausing), 'the measurement should be paused'
+    return e, thread
+
+
+def test_pause_and_continue():
+    e, thread = start_measurement()
+    cpu = time.process_time()
+    time.sleep(0.3)
+    assert time.process_time() - cpu < 0.1, 'pausing should not use cpu'
+    assert e.points == e.pause_at and thread.is_alive()
+    e.request_pause(False)
+    thread.join(5)
+    assert not thread.is_alive() and e.points == 10 * 10 * 2
+    assert not e.apply_pause and e.running_status == e._not_running
+
+
+def test_stop_while_paused():
+    e, thread = start_measurement()
+    e.request_stop()
+    thread.join(5)
+    assert not thread.is_alive(), 'stop should end the pause and the measurement'
+    assert e.points == e.pause_at
+    assert not e.apply_stop and e.running_status == e._not_running, 'the flags should be reset'
+
+
+def test_wait_for_stop():
+    e = DummyExperiment()
+    assert not e.wait_for_stop(0.01)
+    threading.Timer(0.1, e.request_stop).start()
+    t0 = time.monotonic()
+    assert e.wait_for_stop(10) and time.monotonic() - t0 < 5, 'waiting should end when stop is requested'
+
+
+class SlowController(GenericSerialControllerDummy):
+    """ Dummy serial controller with a method that takes some time and can fail, with the decorator of write(). """
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.calls = []     # (thread name, start time, end time, cpu time of the thread before the call started)
+
+    @GenericSerialController._wait_while_busy_and_after(additional_timeout=0.1)
+    def slow(self, cpu_start, fail=False):
+        start = time.monotonic()
+        time.sleep(0.2)
+        self.calls.append((threading.current_thread().name, start, time.monotonic(), time.thread_time() - cpu_start))
+        if fail:
+            raise ValueError('device error')
+
+
+def test_serial_calls_wait_for_each_other():
+    controller = SlowController({'port': 'COM10', 'dummy': True})
+
+    def call(fail):
+        try:
+            controller.slow(time.thread_time(), fail)
+        except ValueError:
+            pass
+
+    threads = [threading.Thread(target=call, args=(i == 0,), name=str(i)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join(5)
+    assert len(controller.calls) == 3, 'an error should not keep the controller busy'
+    for (_, _, end, _), (_, start, _, waited_cpu) in zip(controller.calls, controller.calls[1:]):
+        assert start >= end + 0.09, 'calls should not overlap, and wait for the additional timeout'
+        assert waited_cpu < 0.05, 'waiting should not use cpu'
+
+
+if __name__ == '__main__':
+    test_pause_and_continue()
+    test_stop_while_paused()
+    test_wait_for_stop()
+    test_serial_calls_wait_for_each_other()
+    print('Measurement flow tests passed')
@@ -0,0 +1,136 @@
+"""
+===============
+Action profiler
+===============
+
+Tests of the ActionProfiler of a measurement with profiling enabled (BaseExperiment.profiling): the time of an action
+should be split in the time of its nested actions, of the DataManager, of the controllers and its own time, the
+totals should be saved as a table, as collapsed stacks and as attributes of the datafile, and the wrappers of the
+DataManager and controller methods should be removed afterwards, also when the measurement fails (and the next
+measurement shouldn't be profiled then).
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_profiler
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import os
+import time
+import shutil
+import tempfile
+from hyperion import logging
+from hyperion.experiment.base_experiment import BaseExperiment
+
+
+class SlowController:
+    """ Controller of which reading takes 5 ms. """
+    def read(self):
+        time.sleep(0.005)
+        return 1.0
+
+
+class SlowInstrument:
+    def __init__(self):
+        self.controller = SlowController()
+
+
+class ProfiledExperiment(BaseExperiment):
+    """ Experiment with a loop of 3 points that each take at least 10 ms themselves and read the controller. """
+    def save(self, actiondict, nesting):
+        self.datman.open_file(actiondict['filename'])
+
+    def finish(self, actiondict, nesting):
+        self.datman.close()
+
+    def loop(self, actiondict, nesting):
+        time.sleep(0.01)
+        for indx in range(3):
+            self.datman.dim_coord(actiondict, float(indx))
+            nesting()
+
+    def measure(self, actiondict, nesting):
+        time.sleep(0.01)
+        self.datman.var(actiondict, self.instruments_instances['slow'].controller.read())
+
+    def fail(self, actiondict, nesting):
+        self.instruments_instances['slow'].controller.read()
+        raise RuntimeError('device error')
+
+    def idle(self, actiondict, nesting):
+        pass
+
+
+def test_profile():
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    folder = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(folder, 'profiled.nc')
+        actionlist = [{'Name': 'Saving', '_method': 'save', 'filename': filename},
+                      {'Name': 'Loop', '_method': 'loop', '~nested': [{'Name': 'Signal', '_method': 'measure'}]},
+                      {'Name': 'Finish', '_method': 'finish'}]
+        e = ProfiledExperiment()
+        e.load_config('dummy_config.yml', use_dict={
+            'ActionTypes': {}, 'Measurements': {'Profiled': {'automated_actionlist': actionlist}}})
+        e.instruments_instances['slow'] = SlowInstrument()
+        e.profiling = True
+        e.perform_measurement('Profiled')
+
+        totals = e.last_profile.totals()
+        assert set(totals) == {'Saving', 'Loop', 'Signal', 'Finish'}
+        loop, signal = totals['Loop'], totals['Signal']
+        assert loop['calls'] == 1 and signal['calls'] == 3 and signal['method'] == 'measure'
+        assert loop['nested_s'] >= signal['wall_s'] and 0.01 <= loop['self_s'] < loop['wall_s']
+        assert signal['controller_s'] >= 3 * 0.005 and signal['datamanager_s'] > 0 and signal['self_s'] >= 3 * 0.01
+        assert abs(sum(signal[key] for key in ('self_s', 'nested_s', 'datamanager_s', 'controller_s')) -
+                   signal['wall_s']) < 1e-9
+        assert e.last_profile.io_calls['SlowController.read'][0] == 3
+        assert e.last_profile.io_calls['DataManager.var'][0] == 3
+        assert e.last_profile.io_calls['DataManager.dim_coord'][0] == 3 and loop['datamanager_s'] > 0
+
+        with open(os.path.join(folder, 'profiled_profile.folded')) as f:
+            stacks = dict(line.rsplit(' ', 1) for line in f.read().splitlines())
+        assert {'Profiled;Loop', 'Profiled;Loop;Signal', 'Profiled;Loop;Signal;SlowController.read'} <= set(stacks)
+        assert os.path.isfile(os.path.join(folder, 'profiled_profile.txt'))
+        from netCDF4 import Dataset
+        with Dataset(filename) as root:
+            assert root.profile_columns.split(', ')[0] == 'calls'
+            assert list(root.profile_Signal[:2]) == [3, signal['wall_s']]
+
+        assert 'read' not in vars(e.instruments_instances['slow'].controller), 'the wrappers should be removed'
+        assert 'var' not in vars(e.datman)
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_failed_measurement():
+    logging.stream_level = 'CRITICAL'
+    logging.enable_file = False
+    e = ProfiledExperiment()
+    e.load_config('dummy_config.yml', use_dict={'ActionTypes': {}, 'Measurements': {
+        'Broken': {'automated_actionlist': [{'Name': 'Before', '_method': 'idle'},
+                                            {'Name': 'Failing', '_method': 'fail'}], 'profile': True},
+        'Plain': {'automated_actionlist': [{'Name': 'Other', '_method': 'idle'}]}}})
+    e.instruments_instances['slow'] = SlowInstrument()
+    try:
+        e.perform_measurement('Broken')
+    except RuntimeError:
+        pass
+    else:
+        assert False, 'the error of the action should be raised'
+    profile = e.last_profile
+    assert e._profiler is None, 'the profiler should be removed after a failed measurement'
+    assert set(profile.totals()) == {'Before', 'Failing'} and profile.io_calls['SlowController.read'][0] == 1
+    assert 'read' not in vars(e.instruments_instances['slow'].controller), 'the wrappers should be removed'
+    e.perform_measurement('Plain')
+    assert e.last_profile is profile and set(profile.totals()) == {'Before', 'Failing'}, \
+        'the next measurement should not be profiled'
+
+
+if __name__ == '__main__':
+    test_profile()
+    test_failed_measurement()
+    print('Profiler tests passed')
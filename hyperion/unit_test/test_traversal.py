@@ -0,0 +1,139 @@
+"""
+===============
+Traversal order
+===============
+
+Tests of the orders in which a grid can be scanned (traversal_order() in hyperion.tools.array_tools): every order
+visits every point once, and in the serpentine, spiral and Hilbert orders consecutive points are neighbours. A dummy
+measurement that scans a grid with BaseExperiment.traverse() (with an Action with two axes, see sweep_axes(), and with
+nested sweeps) should store the data at the indices of the regular grid, whatever the order.
+
+Run it with pytest or as a script:
+
+    python -m hyperion.unit_test.test_traversal
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+from hyperion import logging
+from hyperion.experiment.base_experiment import BaseExperiment, sweep_axes
+from hyperion.tools.array_tools import traversal_order, traversal_orders
+
+shapes_2d = [(1, 1), (1, 5), (5, 1), (2, 2), (3, 3), (4, 4), (3, 5), (6, 4), (7, 7), (8, 8), (5, 12)]
+
+
+def steps(points):
+    """ Returns the (Manhattan) distance between consecutive points. """
+    return np.abs(np.diff(points, axis=0)).sum(axis=1)
+
+
+def test_permutation():
+    for order in traversal_orders:
+        for shape in shapes_2d + ([(3, 4, 5), (2, 1, 3)] if order in ('raster', 'serpentine') else []):
+            points = traversal_order(shape, order)
+            assert points.shape == (np.prod(shape), len(shape)), (order, shape)
+            assert sorted(map(tuple, points.tolist())) == sorted(map(tuple, np.ndindex(*shape))), (order, shape)
+
+
+def test_adjacency():
+    for shape in shapes_2d + [(3, 4, 5), (2, 1, 3)]:
+        assert (steps(traversal_order(shape, 'serpentine')) == 1).all(), shape
+    for shape in shapes_2d:
+        assert (steps(traversal_order(shape, 'spiral')) == 1).all(), shape
+    for size in (1, 2, 4, 8, 16):
+        assert (steps(traversal_order((size, size), 'hilbert')) == 1).all(), size
+
+
+def test_spiral_starts_in_center():
+    assert traversal_order((5, 5), 'spiral')[0].tolist() == [2, 2]
+    assert traversal_order((4, 4), 'spiral')[-1].tolist() == [3, 0], 'the last ring should not wrap around'
+
+
+def signal(x, y):
+    """ The fake measurement: a value that identifies the position. """
+    return x + 100 * y
+
+
+class TraversalExperiment(BaseExperiment):
+    """ Experiment that scans a grid with traverse() and measures signal() at the position. """
+    def __init__(self):
+        super().__init__()
+        self.position = {}
+        self.visited = {}       # Action name -> list of indices passed to nesting()
+
+    def save(self, actiondict, nesting):
+        self.datman.open_file(actiondict['filename'])
+
+    def finish(self, actiondict, nesting):
+        self.datman.close()
+
+    def scan(self, actiondict, nesting):
+        for indices, values in self.traverse(actiondict):
+            for (name, _), value in zip(sweep_axes(actiondict), values):
+                self.position[name] = value
+            self.visited.setdefault(actiondict['Name'], []).append(indices)
+            nesting(indices)
+
+    def measure(self, actiondict, nesting):
+        self.datman.var(actiondict, signal(self.position['x'], self.position['y']))
+
+
+def measure_grid(actionlist):
+    """ Performs the measurement of actionlist (saving to a file) and returns the experiment and the signal. """
+    from netCDF4 import Dataset
+    logging.stream_level = 'WARNING'
+    logging.enable_file = False
+    folder = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(folder, 'grid.nc')
+        actionlist = [{'Name': 'Saving', '_method': 'save', 'filename': filename}] + actionlist + \
+                     [{'Name': 'Finish', '_method': 'finish'}]
+        experiment = TraversalExperiment()
+        experiment.load_config('dummy_config.yml', use_dict={
+            'ActionTypes': {}, 'Measurements': {'Grid': {'automated_actionlist': actionlist}}})
+        experiment.perform_measurement('Grid')
+        with Dataset(filename) as root:
+            return experiment, root.variables['signal'][:], root.variables['signal'].dimensions
+    finally:
+        shutil.rmtree(folder)
+
+
+def expected_signal(nx, ny):
+    """ Returns the signal on the regular grid of nx x-values (0, 1, ...) and ny y-values (0, 10, ...). """
+    x, y = np.meshgrid(np.arange(nx), 10 * np.arange(ny), indexing='ij')
+    return signal(x, y)
+
+
+def test_two_axes():
+    for order in traversal_orders:
+        axes = [{'Name': 'x', 'start': 0, 'stop': 4, 'num': 5}, {'Name': 'y', 'start': 0, 'stop': 30, 'num': 4}]
+        experiment, data, dims = measure_grid([{'Name': 'xy', '_method': 'scan', 'order': order, 'axes': axes,
+                                                '~nested': [{'Name': 'signal', '_method': 'measure'}]}])
+        assert dims == ('x', 'y'), order
+        assert np.array_equal(data, expected_signal(5, 4)), '{} order: data not at the logical indices'.format(order)
+        assert experiment.visited['xy'] == [tuple(p) for p in traversal_order((5, 4), order).tolist()], order
+
+
+def test_nested_serpentine():
+    sweep = lambda name, stop, num, order, nested: {'Name': name, '_method': 'scan', 'start': 0, 'stop': stop,
+                                                    'num': num, 'order': order, '~nested': nested}
+    experiment, data, dims = measure_grid([sweep('x', 4, 5, 'raster', [sweep('y', 30, 4, 'serpentine', [
+        {'Name': 'signal', '_method': 'measure'}])])])
+    assert dims == ('x', 'y')
+    assert np.array_equal(data, expected_signal(5, 4))
+    assert experiment.visited['y'][:8] == [(0,), (1,), (2,), (3,), (3,), (2,), (1,), (0,)], \
+        'every other pass of y should go backwards'
+
+
+if __name__ == '__main__':
+    test_permutation()
+    test_adjacency()
+    test_spiral_starts_in_center()
+    test_two_axes()
+    test_nested_serpentine()
+    print('Traversal tests passed')
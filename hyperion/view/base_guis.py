@@ -68,6 +68,9 @@ class BaseGui(QWidget):
         text = ''
         for a in traceback.format_exception(etype, value, tb):
             text += '{}'.format(a)
+        dump_file = logging.dump_ring_buffer()
+        if dump_file is not None:
+            msg.setInformativeText('The recent log is saved in {}'.format(dump_file))
 
         msg.setDetailedText("{}".format(text))
         msg.setStandardButtons(QMessageBox.Ignore | QMessageBox.Abort)
@@ -538,7 +541,7 @@ class AutoMeasurementGui(BaseGui):
         measurement should be paused or continued.
         """
         self.logger.debug('start/pause pressed')
-        self.experiment.apply_pause = not self.experiment.apply_pause
+        self.experiment.request_pause(not self.experiment.apply_pause)
         if self.experiment.running_status == self.experiment._not_running:
             self.ensure_output_docks_are_open()
             self.measurement_thread.start()
@@ -554,7 +557,7 @@ class AutoMeasurementGui(BaseGui):
         applied.
         """
         self.logger.debug('break pressed')
-        self.experiment.apply_break = True
+        self.experiment.request_break()
         self.update_buttons()
 
     def apply_stop(self):
@@ -563,7 +566,7 @@ class AutoMeasurementGui(BaseGui):
         Communicates to experiment through the Measurement status flags that a measurement should be stopped (immediately).
         """
         self.logger.debug('stop pressed')
-        self.experiment.apply_stop = True
+        self.experiment.request_stop()
         self.update_buttons()
 
     def config(self):
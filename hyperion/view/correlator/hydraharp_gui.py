@@ -12,7 +12,6 @@ import sys
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 from hyperion.instrument.correlator.hydraharp_instrument import HydraInstrument
-from hyperion.view.general_worker import WorkThread
 from hyperion.view.base_guis import BaseGui, BaseGraph, TimeAxisItem
 from hyperion import ur, root_dir
 import pyqtgraph as pg
@@ -77,7 +76,9 @@ class Hydraharp_GUI(BaseGui):
         self.timer_plot = QTimer()
         self.timer_plot.timeout.connect(self.update_plot)
 
-        self.histogram_thread = WorkThread(self.hydra_instrument.make_histogram, self.integration_time, self.channel)
+        self.acquisition = None     # the HistogramAcquisition of the instrument
+        self.preview_interval = 1   # time in s between the intermediate histograms that are plot
+        self.preview = []           # last intermediate histogram
 
         self.stop = self.stop_histogram
 
@@ -173,7 +174,7 @@ class Hydraharp_GUI(BaseGui):
         self.calculate_axis()
 
         self.channel_combobox = QComboBox(self)
-        self.channel_combobox.addItems(["0", "1"])
+        self.channel_combobox.addItems(["0", "1", "both"])     # both: the histograms of the two channels at once
         self.channel_combobox.setCurrentText(self.channel)
         self.channel_combobox.currentTextChanged.connect(self.set_channel)
 
@@ -210,7 +211,10 @@ class Hydraharp_GUI(BaseGui):
         """This method asks the remaining time from the instrument level,
         and calculates the progress, so both can be displayed.
         """
-        self.time_passed = self.hydra_instrument.time_passed
+        if self.acquisition is not None and not self.acquisition.done():
+            self.time_passed = self.acquisition.time_passed
+        else:
+            self.time_passed = self.hydra_instrument.time_passed
         self.showing_remaining_time.setText(str(self.time_passed))
 
         self.progressbar.setMaximum(int(self.integration_time.magnitude))
@@ -351,18 +355,26 @@ class Hydraharp_GUI(BaseGui):
         self.logger.debug('chosen integration time: ' + str(self.integration_time))
         self.logger.debug('chosen channel: ' + str(self.channel))
 
+        self.preview = []
+        channel = [0, 1] if self.channel == 'both' else self.channel
+        try:
+            self.acquisition = self.hydra_instrument.start_histogram(self.integration_time, channel)
+        except RuntimeError:
+            self.logger.warning('Could not start the histogram: a measurement is running already')
+            return
+        #the take_histogram_button is enabled again by update_plot when the histogram has ended
+        self.take_histogram_button.setEnabled(False)
+        self.acquisition.subscribe(self.store_preview, self.preview_interval)
         self.timer.start(100)
         self.timer_plot.start(100)
         self.show_time_passed()
-        self.histogram_thread = WorkThread(self.hydra_instrument.make_histogram, self.integration_time, self.channel)
-        self.histogram_thread.start()
 
         #make it possible to press the save_histogram_button.(should be True)
         self.save_histogram_button.setEnabled(True)
-        self.take_histogram_button.setEnabled(True)
 
-        self.hydra_instrument.time_passed = 0*ur('s')
-        self.show_time_passed()
+    def store_preview(self, histogram, time_passed):
+        """ Keeps the intermediate histogram of the acquisition, for update_plot (it's called on the acquisition thread). """
+        self.preview = histogram
 
     def update_plot(self):
         pen = pg.mkPen(color=(0, 0, 0))  # makes the plotted lines black
@@ -372,21 +384,21 @@ class Hydraharp_GUI(BaseGui):
             self.timer.stop()
             self.histogram = self.hydra_instrument.hist
             self.calculate_axis()
-            self.draw.histogram_plot.plot(self.time_axis, self.histogram, clear=True, pen=pen)
+            self.draw.plot_histograms(self.time_axis, self.histogram, pen=pen)
             self.draw.histogram_plot.setLabel('bottom',
                                               "<span style=\"color:black;font-size:20px\"> Time ({}) </span>".format(
                                                   self.units))
 
         else:
             self.take_histogram_button.setEnabled(False)
-            self.histogram = self.hydra_instrument.hist
+            self.histogram = self.preview
 
             self.calculate_axis()
             self.logger.debug(
             'length time axis: {}, length histogram: {}'.format(len(self.time_axis), len(self.histogram)))
 
             if len(self.histogram) > 0:
-                self.draw.histogram_plot.plot(self.time_axis, self.histogram, clear=True)
+                self.draw.plot_histograms(self.time_axis, self.histogram)
                 self.draw.histogram_plot.setLabel('bottom', "<span style=\"color:black;font-size:20px\"> Time ({}) </span>".format(self.units))
 
     def save_histogram(self):
@@ -395,7 +407,9 @@ class Hydraharp_GUI(BaseGui):
         """
         self.logger.info('saving the histogram')
         try:
-            plt = pg.plot(self.histogram)
+            plt = pg.plot()
+            for histogram in np.atleast_2d(self.histogram):
+                plt.plot(histogram)
             exporter = pg.exporters.ImageExporter(plt.plotItem)
             # set export parameters if needed
             exporter.parameters()['height'] = 100  # (note this also affects width parameter)
@@ -440,21 +454,14 @@ class Hydraharp_GUI(BaseGui):
         return fileName + ".png"
 
     def stop_histogram(self):
-        """| Here the self.hydra_instrument.stop is set to True, which means the while loop in the instrument breaks.
-        | Afterwards, the hydraharp itself is actually set to stop.
-        | To avoid errors, it is important to quit the thread.
+        """| Here the acquisition of the instrument is stopped, which stops the hydraharp itself.
+        | The histogram so far is plot when the acquisition has ended (see update_plot).
         """
         self.logger.info('Histogram should stop here')
-        self.hydra_instrument.stop = True
         self.hydra_instrument.stop_histogram()
 
-        if self.histogram_thread.isRunning:
-            self.logger.debug('histogram thread was running')
-            self.histogram_thread.quit()
-
         self.hydra_instrument.time_passed = 0*ur('s')
         self.show_time_passed()
-        self.hydra_instrument.stop = False
 
 class DrawHistogram(pg.PlotWidget):
     """This will make a graph for the histogram.
@@ -462,11 +469,36 @@ class DrawHistogram(pg.PlotWidget):
     The title and labels are already set, as is the layout. The units on the x-axis are changed in update plot, since they depend on the chosen resolution.
     """
 
+    channel_colors = [(0, 0, 0), (200, 0, 0), (0, 0, 200), (0, 150, 0)]     # of the histograms of more channels
+
     def __init__(self):
         super().__init__()
         self.histogram_plot = self
         self.initUI()
 
+    def plot_histograms(self, time_axis, histograms, pen=None):
+        """Plots a histogram, or the histograms of more channels (a 2D array, one row per channel) in their own colors.
+
+        :param time_axis: the time of every bin
+        :type time_axis: numpy array
+        :param histograms: the histogram or histograms
+        :type histograms: numpy array
+        :param pen: pen of a single histogram (defaults to None, the default pen)
+        :type pen: pyqtgraph pen
+        """
+        self.histogram_plot.clear()
+        if np.ndim(histograms) == 1:
+            if pen is None:
+                self.histogram_plot.plot(time_axis, histograms)     # pen=None would draw no line
+            else:
+                self.histogram_plot.plot(time_axis, histograms, pen=pen)
+            return
+        if self.histogram_plot.getPlotItem().legend is None:
+            self.histogram_plot.addLegend()
+        for channel, histogram in enumerate(histograms):
+            color = self.channel_colors[channel % len(self.channel_colors)]
+            self.histogram_plot.plot(time_axis, histogram, pen=pg.mkPen(color=color), name='channel {}'.format(channel))
+
     def initUI(self):
         self.layout_plot()
 
@@ -13,8 +13,10 @@ from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 import traceback
+from datetime import timedelta
 import yaml
-from hyperion.tools.loading import get_class
+from hyperion.tools.loading import get_class, prewarm, class_strings
+from hyperion.view.log_viewer import LogViewer
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtCore, QtGui
 import pyqtgraph.console
@@ -88,6 +90,9 @@ class ExpGui(QMainWindow):
         self.logger.debug('Loading Measurement guis (if experiment already has measurement)')
         self.load_all_measurement_guis()
 
+        self.logger.debug('Adding log dock')
+        self.add_log_dock()
+
 
         # self.logger.debug('Creating Example graphs')
         # self.example()
@@ -125,6 +130,8 @@ class ExpGui(QMainWindow):
 
 
         self.toolsMenu = mainMenu.addMenu('Tools')
+        self.log_menu_item = self.toolsMenu.addAction('&Log', lambda: self.__hide_show_raise_dock(self.log_dock))
+        self.log_menu_item.setCheckable(True)
         # self.toolsMenu.addAction("Let widget 1 disappear", self.get_status_open_or_closed)
         # self.toolsMenu.addAction("Make widget", self.create_single_qdockwidget)
 
@@ -283,6 +290,20 @@ class ExpGui(QMainWindow):
                     instr_view_instance._dock.close()
                     instr_view_instance._menu_item.setChecked(False)
 
+    def add_log_dock(self):
+        """
+        Adds a dock with the recent log records (see hyperion.view.log_viewer).
+        It starts hidden, use Tools > Log to show it.
+        """
+        self.log_viewer = LogViewer()
+        self.log_dock = QDockWidget('Log')
+        self.log_dock.setWidget(self.log_viewer)
+        self.log_dock.setFeatures(
+            QDockWidget.DockWidgetMovable | QDockWidget.DockWidgetFloatable | QDockWidget.DockWidgetClosable)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.log_dock)
+        self.log_dock.visibilityChanged.connect(self.log_menu_item.setChecked)
+        self.log_dock.close()
+
     def __add_qt_dock_to_menu(self, name, instance, menu, dock_area):
         # helper function for
         dock = QDockWidget(name)
@@ -315,7 +336,7 @@ class ExpGui(QMainWindow):
     def load_measurement_gui(self, meas_name):
         meas_dict = self.experiment.properties['Measurements'][meas_name]
         if 'view' in meas_dict:
-            meas_class = get_class(meas_dict['view'])
+            meas_class = get_class(meas_dict['view'], lazy=True)  # only imported if the instruments are available
             # Check if required instruments are available
             if 'required_instruments' in meas_dict:
                 missing_instr = [instr_name for instr_name in meas_dict['required_instruments'] if instr_name not in self.experiment.instruments_instances]
@@ -360,6 +381,7 @@ class ExpGui(QMainWindow):
             self.logger.warning('Failed to load YAML config file.')
             QMessageBox.warning(self, 'Loading config failed', "Perhaps invalid YAML?", QMessageBox.Ok)
             return
+        prewarm(class_strings(self.experiment.properties))  # import the guis while the instruments are connecting
         self.reconnect_instruments(dialog=False)
         self.load_all_measurement_guis()
 
@@ -383,7 +405,11 @@ class ExpGui(QMainWindow):
             self.logger.warning('Error while removing instruments')
         try:
             self.logger.debug('Loading instruments:')
-            self.experiment.load_instruments()  # this loads both regular and meta instruments
+            failed = self.experiment.load_instruments()  # this loads both regular and meta instruments
+            if failed:
+                QMessageBox.warning(self, 'Loading instruments failed', "Failed to load: {}\nPerhaps a device is not "
+                                    "connected or it's still in use by another process?".format(', '.join(failed)),
+                                    QMessageBox.Ok)
         except:
             self.logger.warning('Error while loading instruments')
             QMessageBox.warning(self, 'Loading instruments failed', "Perhaps a device is not connected or it's still in use by another process?", QMessageBox.Ok)
@@ -527,6 +553,13 @@ class ExpGui(QMainWindow):
                 msg += ': '+self.experiment._measurement_name
             if self.experiment.measurement_message:
                 msg += ': '+self.experiment.measurement_message
+            progress = self.experiment.progress()
+            if progress is not None:
+                msg += '  [{:.0%}'.format(progress)
+                eta = self.experiment.eta()
+                if eta is not None:
+                    msg += ', {} remaining'.format(timedelta(seconds=round(eta)))
+                msg += ']'
         self.statusBar().showMessage(msg)
         if not self.experiment.running_status and timer is not None:
             timer.stop()
@@ -555,6 +588,9 @@ class ExpGui(QMainWindow):
         text = ''
         for a in traceback.format_exception(etype, value, tb):
             text += '{}'.format(a)
+        dump_file = logging.dump_ring_buffer()
+        if dump_file is not None:
+            msg.setInformativeText('The recent log is saved in {}'.format(dump_file))
 
         msg.setDetailedText("{}".format(text))
         msg.setStandardButtons(QMessageBox.Ignore | QMessageBox.Abort)
@@ -810,6 +846,7 @@ if __name__ == '__main__':
     experiment = MyExperiment()
     # logging.stream_level = logging.DEBUG
     experiment.load_config(config_file)
+    prewarm(class_strings(experiment.properties))  # import the guis in the background while the instruments load
     experiment.load_instruments()
 
     app = QApplication(sys.argv)
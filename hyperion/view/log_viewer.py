@@ -0,0 +1,173 @@
+"""
+==========
+Log viewer
+==========
+
+Widget that shows the log records in the ring buffer of the LoggingManager (see RingBufferHandler in hyperion.core),
+with filters on level and logger name. It's shown in a dock of the ExpGui.
+
+The records are shown in a QTableView, which only asks the model for the rows that are visible. So it stays responsive
+with 100k records in the buffer: the model only keeps (a filtered copy of) the list of tuples and formats a row when
+it's painted. The buffer is checked a few times per second and only copied if there are new records.
+
+:copyright: by Hyperion Authors, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+import os
+from datetime import datetime
+from hyperion import logging
+from PyQt5.QtWidgets import *
+from PyQt5.QtGui import QColor, QFont
+from PyQt5.QtCore import Qt, QTimer, QAbstractTableModel, QModelIndex
+
+
+class LogTableModel(QAbstractTableModel):
+    """
+    Table model of log records as tuples (created, levelno, name, funcName, lineno, msg, args).
+    The text of a cell is only made when the view asks for it.
+    """
+    columns = ('Time', 'Level', 'Logger', 'Function', 'Message')
+    level_colors = {logging.DEBUG: QColor(110, 110, 110), logging.WARNING: QColor(170, 110, 0),
+                    logging.ERROR: QColor(200, 0, 0), logging.CRITICAL: QColor(170, 0, 170)}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.records = []
+
+    def set_records(self, records):
+        """ Replaces the records shown (a list of tuples). """
+        self.beginResetModel()
+        self.records = records
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        created, levelno, name, func, lineno, msg, args = self.records[index.row()]
+        if role == Qt.DisplayRole:
+            column = index.column()
+            if column == 0:
+                return datetime.fromtimestamp(created).strftime('%H:%M:%S.%f')[:-3]
+            elif column == 1:
+                return logging._number_2_level.get(levelno, str(levelno))
+            elif column == 2:
+                return name
+            elif column == 3:
+                return '{}() {}'.format(func, lineno)
+            try:
+                return str(msg) % args if args else str(msg)
+            except Exception:
+                return '{} {}'.format(msg, args)
+        elif role == Qt.ForegroundRole:
+            return self.level_colors.get(levelno)
+        return None
+
+
+class LogViewer(QWidget):
+    """
+    Shows the records in the ring buffer of the LoggingManager. If there's no ring buffer yet, it's created.
+
+    :param parent: parent widget
+    :param refresh_interval: time in ms between checks for new records (defaults to 500)
+    :type refresh_interval: int
+    """
+    levels = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+    def __init__(self, parent=None, refresh_interval=500):
+        super().__init__(parent)
+        self.logger = logging.getLogger(__name__)
+        if logging.ring_buffer is None:
+            logging.set_ring_buffer()
+        self.ring_buffer = logging.ring_buffer
+        self._shown_total = None
+
+        self.model = LogTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setFont(QFont('Consolas', 8))
+        self.table.setWordWrap(False)
+        self.table.setShowGrid(False)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        # Fixed row heights and column widths, so Qt doesn't have to look at all rows to lay them out
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(self.table.fontMetrics().height() + 4)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        for column, width in enumerate((90, 65, 220, 180)):
+            self.table.setColumnWidth(column, width)
+
+        self.level_box = QComboBox()
+        self.level_box.addItems(self.levels)
+        self.level_box.currentIndexChanged.connect(self.refresh)
+        self.logger_edit = QLineEdit()
+        self.logger_edit.setPlaceholderText('logger name contains...')
+        self.logger_edit.textChanged.connect(self.refresh)
+        self.follow_box = QCheckBox('Follow')
+        self.follow_box.setChecked(True)
+        self.count_label = QLabel()
+        dump_button = QPushButton('Save...')
+        dump_button.clicked.connect(self.save)
+
+        top = QHBoxLayout()
+        top.addWidget(QLabel('Level'))
+        top.addWidget(self.level_box)
+        top.addWidget(self.logger_edit)
+        top.addWidget(self.follow_box)
+        top.addWidget(self.count_label)
+        top.addWidget(dump_button)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(2, 2, 2, 2)
+        layout.addLayout(top)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_if_new)
+        self.timer.start(refresh_interval)
+        self.refresh()
+
+    def update_if_new(self):
+        """ Refreshes the table if records were added to the ring buffer (called by the timer). """
+        if self.isVisible() and self.ring_buffer.total != self._shown_total:
+            self.refresh()
+
+    def refresh(self):
+        """ Copies the (filtered) records from the ring buffer into the model. """
+        self._shown_total = self.ring_buffer.total
+        level = logging._level_2_number[self.level_box.currentText()]
+        records = self.ring_buffer.records(level=level, logger=self.logger_edit.text())
+        self.model.set_records(records)
+        self.count_label.setText('{} / {}'.format(len(records), len(self.ring_buffer.buffer)))
+        if self.follow_box.isChecked():
+            self.table.scrollToBottom()
+
+    def save(self):
+        """ Asks for a filename and dumps the ring buffer to it. """
+        filename, _ = QFileDialog.getSaveFileName(self, 'Save log', os.path.join(logging.default_path, 'log.txt'),
+                                                  'Text files (*.txt *.log)')
+        if filename:
+            self.ring_buffer.dump(filename)
+            self.logger.info('Saved the log buffer to {}'.format(filename))
+
+
+if __name__ == '__main__':
+    import sys
+    app = QApplication(sys.argv)
+    logging.set_ring_buffer()
+    logger = logging.getLogger(__name__)
+    for indx in range(100000):
+        logger.debug('Record %d', indx)
+    viewer = LogViewer()
+    viewer.resize(1000, 600)
+    viewer.show()
+    sys.exit(app.exec_())